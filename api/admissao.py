@@ -0,0 +1,246 @@
+# api/admissao.py
+"""
+Controle de admissão na camada de rotas.
+
+- Balde de tokens por carteira: limita a taxa de operações de uma mesma
+  carteira (429 quando esgotado), para que um cliente não enfileire dezenas
+  de requisições atrás dos locks de saldo_carteira.
+- Limite global de requisições em voo que usam o banco: acima dele a
+  requisição falha na hora com 503 em vez de esperar por uma conexão do pool.
+
+O estado fica em memória do processo; com ADMISSAO_REDIS_URL os baldes
+passam a ser compartilhados num Redis (ou compatível) local.
+"""
+import os
+import math
+import time
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+from api.metricas import REGISTRO
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:  # redis é opcional
+    redis_asyncio = None
+
+logger = logging.getLogger(__name__)
+
+
+REJEICOES = REGISTRO.contador(
+    "admissao_rejeicoes_total", "Requisições rejeitadas pelo controle de admissão", ["motivo"]
+)
+EM_VOO = REGISTRO.medidor(
+    "admissao_em_voo", "Requisições que usam o banco em andamento"
+)
+
+
+class BaldeTokensLocal:
+    """
+    Baldes de tokens por chave, em memória. Guarda no máximo `max_chaves`
+    baldes (os menos usados recentemente são descartados, o que equivale a
+    um balde cheio).
+    """
+
+    def __init__(self, taxa: float, rajada: float, max_chaves: int = 100_000):
+        self.taxa = taxa
+        self.rajada = rajada
+        self.max_chaves = max_chaves
+        self._baldes: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def consumir(self, chave: str) -> Tuple[bool, float]:
+        """
+        Retorna (admitido, segundos até o próximo token).
+        """
+        agora = time.monotonic()
+        with self._lock:
+            tokens, atualizado = self._baldes.get(chave, (self.rajada, agora))
+            tokens = min(self.rajada, tokens + (agora - atualizado) * self.taxa)
+            admitido = tokens >= 1
+            if admitido:
+                tokens -= 1
+            self._baldes[chave] = (tokens, agora)
+            self._baldes.move_to_end(chave)
+            if len(self._baldes) > self.max_chaves:
+                self._baldes.popitem(last=False)
+        return admitido, 0.0 if admitido else (1 - tokens) / self.taxa
+
+    async def fechar(self) -> None:
+        pass
+
+
+_SCRIPT_BALDE = """
+local taxa = tonumber(ARGV[1])
+local rajada = tonumber(ARGV[2])
+local agora = tonumber(ARGV[3])
+local dados = redis.call('HMGET', KEYS[1], 't', 'ts')
+local tokens = tonumber(dados[1]) or rajada
+local ts = tonumber(dados[2]) or agora
+tokens = math.min(rajada, tokens + math.max(0, agora - ts) * taxa)
+local admitido = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    admitido = 1
+end
+redis.call('HSET', KEYS[1], 't', tokens, 'ts', agora)
+redis.call('EXPIRE', KEYS[1], math.ceil(rajada / taxa) + 1)
+return {admitido, tostring(tokens)}
+"""
+
+
+class BaldeTokensRedis:
+    """
+    Mesmo algoritmo, executado atomicamente num script Lua no Redis, para
+    compartilhar os limites entre workers. Se o Redis falhar, admite (fail-open).
+    """
+
+    def __init__(self, url: str, taxa: float, rajada: float, prefixo: str = "carteira:admissao:"):
+        if redis_asyncio is None:
+            raise RuntimeError("ADMISSAO_REDIS_URL configurado, mas o pacote redis não está instalado")
+        self.taxa = taxa
+        self.rajada = rajada
+        self.prefixo = prefixo
+        self._cliente = redis_asyncio.from_url(url)
+        self._script = self._cliente.register_script(_SCRIPT_BALDE)
+
+    async def consumir(self, chave: str) -> Tuple[bool, float]:
+        try:
+            admitido, tokens = await self._script(
+                keys=[self.prefixo + chave], args=[self.taxa, self.rajada, time.time()]
+            )
+        except Exception as e:
+            logger.warning(f"Redis indisponível para o controle de admissão: {e}")
+            return True, 0.0
+        tokens = float(tokens)
+        return bool(admitido), 0.0 if admitido else (1 - tokens) / self.taxa
+
+    async def fechar(self) -> None:
+        await self._cliente.aclose()
+
+
+class CapacidadeEsgotadaError(Exception):
+    """Sem vaga no limite global de requisições em voo."""
+
+
+class LimiteEmVoo:
+    """
+    Contador não bloqueante de requisições em andamento.
+    """
+
+    def __init__(self, maximo: int):
+        self.maximo = maximo
+        self._em_voo = 0
+        self._lock = threading.Lock()
+
+    def tentar_entrar(self) -> bool:
+        with self._lock:
+            if self._em_voo >= self.maximo:
+                return False
+            self._em_voo += 1
+            EM_VOO.set(self._em_voo)
+            return True
+
+    def sair(self) -> None:
+        with self._lock:
+            self._em_voo -= 1
+            EM_VOO.set(self._em_voo)
+
+
+def _criar_balde() -> Optional[object]:
+    taxa = float(os.getenv("ADMISSAO_TAXA_CARTEIRA", "10"))
+    rajada = float(os.getenv("ADMISSAO_RAJADA_CARTEIRA", "20"))
+    if taxa <= 0:
+        return None
+    url = os.getenv("ADMISSAO_REDIS_URL")
+    if url:
+        return BaldeTokensRedis(url, taxa, rajada)
+    return BaldeTokensLocal(taxa, rajada)
+
+
+def _max_em_voo_padrao() -> str:
+    # Por padrão, tantas requisições quanto conexões que o pool pode abrir
+    return str(int(os.getenv("DB_POOL_SIZE", "5")) + int(os.getenv("DB_MAX_OVERFLOW", "10")))
+
+
+BALDE_CARTEIRA = _criar_balde()
+_max_em_voo = int(os.getenv("ADMISSAO_MAX_EM_VOO", _max_em_voo_padrao()))
+LIMITE_EM_VOO = LimiteEmVoo(_max_em_voo) if _max_em_voo > 0 else None
+
+
+async def limitar_carteira(request: Request) -> None:
+    """
+    Dependency: aplica o balde de tokens da carteira da rota
+    (endereco_carteira ou endereco_origem).
+    """
+    if BALDE_CARTEIRA is None:
+        return
+    endereco = request.path_params.get("endereco_carteira") or request.path_params.get("endereco_origem")
+    if not endereco:
+        return
+
+    admitido, espera = await BALDE_CARTEIRA.consumir(endereco)
+    if not admitido:
+        REJEICOES.inc(motivo="taxa_carteira")
+        raise HTTPException(
+            status_code=429,
+            detail="Muitas operações para esta carteira. Tente novamente em instantes.",
+            headers={"Retry-After": str(max(1, math.ceil(espera)))},
+        )
+
+
+def _reservar_vaga() -> None:
+    if not LIMITE_EM_VOO.tentar_entrar():
+        REJEICOES.inc(motivo="capacidade")
+        raise CapacidadeEsgotadaError("Servidor no limite de requisições simultâneas. Tente novamente.")
+
+
+def sem_capacidade(e: CapacidadeEsgotadaError) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+
+async def limitar_em_voo():
+    """
+    Dependency: reserva uma vaga entre as requisições que usam o banco,
+    rejeitando com 503 quando não há vaga.
+    """
+    if LIMITE_EM_VOO is None:
+        yield
+        return
+
+    try:
+        _reservar_vaga()
+    except CapacidadeEsgotadaError as e:
+        raise sem_capacidade(e)
+    try:
+        yield
+    finally:
+        LIMITE_EM_VOO.sair()
+
+
+@asynccontextmanager
+async def vaga_em_voo() -> AsyncIterator[None]:
+    """
+    Mesma vaga de limitar_em_voo, para quem só usa o banco depois de uma
+    espera (ex.: movimentações, após a vez na fila da carteira): quem está
+    esperando não ocupa vaga. Sem vaga, CapacidadeEsgotadaError.
+    """
+    if LIMITE_EM_VOO is None:
+        yield
+        return
+
+    _reservar_vaga()
+    try:
+        yield
+    finally:
+        LIMITE_EM_VOO.sair()
+
+
+async def fechar_admissao() -> None:
+    if BALDE_CARTEIRA is not None:
+        await BALDE_CARTEIRA.fechar()
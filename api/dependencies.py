@@ -0,0 +1,160 @@
+# api/dependencies.py
+import os
+import time
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
+
+from api.admissao import fechar_admissao
+from api.metricas import memoria_rss_bytes
+from api.persistence.db import aquecer_pool, engine, engine_leitura
+from api.persistence.outbox import criar_relay
+from api.persistence.repositories.carteira_repository import CarteiraRepository
+from api.services.agendador import criar_agendador
+from api.services.carteira_service import CarteiraService
+from api.services.cotacao_service import get_coinbase_service, fechar_coinbase_service
+
+logger = logging.getLogger(__name__)
+
+
+def _megabytes(valor: Optional[int]) -> str:
+    return "?" if valor is None else f"{valor / 2**20:.1f} MB"
+
+
+async def _medir(app: FastAPI, etapa: str, funcao: Callable[[], Any], essencial: bool = True) -> None:
+    """
+    Executa uma etapa de aquecimento registrando o tempo em app.state.tempos_startup_ms.
+    Falhas de etapas essenciais deixam o worker "não pronto" até serem refeitas.
+    """
+    inicio = time.perf_counter()
+    try:
+        resultado = await funcao()
+        app.state.falhas_startup.pop(etapa, None)
+        app.state.resultados_startup[etapa] = resultado
+    except Exception as e:
+        logger.warning(f"Falha no aquecimento ({etapa}): {e}")
+        if essencial:
+            app.state.falhas_startup[etapa] = str(e)
+    finally:
+        app.state.tempos_startup_ms[etapa] = round((time.perf_counter() - inicio) * 1000, 2)
+
+
+async def aquecer_servicos(app: FastAPI) -> bool:
+    """
+    Aquece (ou reaquece, após falha) pool do banco, dados de referência e
+    cliente HTTP da Coinbase. Retorna True se o worker está pronto.
+    """
+    service: CarteiraService = app.state.carteira_service
+
+    async def pool_db():
+        return await run_in_threadpool(aquecer_pool)
+
+    async def moedas():
+        return await run_in_threadpool(service.carteira_repo.carregar_moedas)
+
+    async def coinbase():
+        return await service.coinbase_service.aquecer()
+
+    async def taxas():
+        return service.taxas.vincular_moedas(service.carteira_repo.codigos_moedas())
+
+    async def pool_carteiras():
+        # A reposição roda em thread própria; aqui só é disparada
+        pool = service.carteira_repo.pool_carteiras
+        if pool is not None:
+            pool.iniciar()
+            return pool.disponiveis
+
+    await _medir(app, "pool_db", pool_db)
+    await _medir(app, "moedas", moedas)
+    await _medir(app, "taxas", taxas)
+    # A Coinbase é externa: indisponibilidade não tira o worker do ar
+    await _medir(app, "coinbase", coinbase, essencial=False)
+    await _medir(app, "pool_carteiras", pool_carteiras, essencial=False)
+
+    app.state.pronto = not app.state.falhas_startup
+    return app.state.pronto
+
+
+async def iniciar_servicos(app: FastAPI) -> None:
+    """
+    Monta o grafo de serviços compartilhado por todas as requisições do worker.
+    """
+    inicio = time.perf_counter()
+    app.state.pronto = False
+    app.state.tempos_startup_ms = {}
+    app.state.resultados_startup = {}
+    app.state.falhas_startup = {}
+
+    # app.state.coinbase_service permite injetar outro provedor de cotações
+    # (ex.: o stand-in offline dos benchmarks) antes do startup
+    coinbase = getattr(app.state, "coinbase_service", None) or await get_coinbase_service()
+    app.state.carteira_service = CarteiraService(CarteiraRepository(), coinbase)
+
+    app.state.relay_outbox = criar_relay()
+    if app.state.relay_outbox is not None:
+        app.state.relay_outbox.iniciar()
+    app.state.carteira_service.taxas.iniciar()
+
+    app.state.agendador = criar_agendador(app.state.carteira_service)
+    if app.state.agendador is not None:
+        app.state.agendador.iniciar()
+
+    await aquecer_servicos(app)
+
+    app.state.tempos_startup_ms["total"] = round((time.perf_counter() - inicio) * 1000, 2)
+    app.state.iniciado_em = datetime.utcnow()
+    logger.info(
+        f"Worker {os.getpid()} aquecido em {app.state.tempos_startup_ms['total']:.0f} ms "
+        f"(pronto={app.state.pronto}, RSS {_megabytes(memoria_rss_bytes())})"
+    )
+
+
+async def encerrar_servicos(app: FastAPI) -> None:
+    """
+    Fecha o cliente HTTP e as conexões do pool.
+    """
+    app.state.pronto = False
+    logger.info(f"Worker {os.getpid()} encerrando (RSS {_megabytes(memoria_rss_bytes())})")
+    agendador = getattr(app.state, "agendador", None)
+    if agendador is not None:
+        await agendador.fechar()
+    service = getattr(app.state, "carteira_service", None)
+    if service:
+        await service.close()
+        await run_in_threadpool(service.taxas.fechar)
+    relay = getattr(app.state, "relay_outbox", None)
+    if relay is not None:
+        await run_in_threadpool(relay.fechar)
+    await fechar_coinbase_service()
+    await fechar_admissao()
+    engine.dispose()
+    if engine_leitura is not None:
+        engine_leitura.dispose()
+
+
+def status_startup(app: FastAPI) -> Dict[str, Any]:
+    return {
+        "pid": os.getpid(),
+        "rss_bytes": memoria_rss_bytes(),
+        "pronto": getattr(app.state, "pronto", False),
+        "iniciado_em": getattr(app.state, "iniciado_em", None),
+        "versao_schema": getattr(app.state, "versao_schema", None),
+        "tempos_ms": getattr(app.state, "tempos_startup_ms", {}),
+        "falhas": getattr(app.state, "falhas_startup", {}),
+    }
+
+
+def get_carteira_service(request: Request) -> CarteiraService:
+    """
+    Dependency do FastAPI: devolve o serviço compartilhado montado no startup.
+    """
+    service = getattr(request.app.state, "carteira_service", None)
+    if service is None:
+        # App usado sem lifespan (ex.: scripts); monta sob demanda
+        service = CarteiraService(CarteiraRepository())
+        request.app.state.carteira_service = service
+    return service
@@ -1,6 +1,27 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from api.routers.carteira_router import router as carteiras_router
+from api.routers.health_router import router as health_router
+from api.routers.metricas_router import router as metricas_router
+from api.routers.admin_router import router as admin_router
+from api.middleware import registrar_middlewares
+from api.persistence.db import engine, engine_leitura
+from api.persistence.instrumentacao import instrumentar_engine
 from api.persistence.db_init import inicializar_banco
+from api.dependencies import iniciar_servicos, encerrar_servicos
+from api.profiler import instalar_sinal
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.versao_schema = inicializar_banco()
+    # O lifespan roda na thread principal, onde sinais podem ser instalados
+    instalar_sinal()
+    await iniciar_servicos(app)
+    yield
+    await encerrar_servicos(app)
+
 
 def create_app() -> FastAPI:
     app = FastAPI(
@@ -8,13 +29,20 @@ def create_app() -> FastAPI:
         version="1.0.0",
         description="API educacional de carteira digital com SQL puro e FastAPI.",
         swagger_ui_parameters={"operationsSorter": "method"},
+        lifespan=lifespan,
     )
 
     app.include_router(carteiras_router)
+    app.include_router(health_router)
+    app.include_router(metricas_router)
+    app.include_router(admin_router)
+
+    registrar_middlewares(app)
+    instrumentar_engine(engine)
+    if engine_leitura is not None:
+        instrumentar_engine(engine_leitura)
 
     return app
 
-inicializar_banco()
 app = create_app()
 
-
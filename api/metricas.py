@@ -0,0 +1,212 @@
+# api/metricas.py
+"""
+Métricas em memória do processo, exportadas no formato texto do Prometheus
+(GET /metrics). Implementação mínima, sem dependências externas.
+"""
+import os
+import math
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+BUCKETS_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_CONTAGEM = (1, 2, 5, 10, 20, 50, 100, 200)
+
+Labels = Tuple[str, ...]
+
+
+def _escapar(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _formatar_labels(nomes: Sequence[str], valores: Labels, extra: str = "") -> str:
+    pares = [f'{n}="{_escapar(str(v))}"' for n, v in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _formatar_numero(valor: float) -> str:
+    if math.isinf(valor):
+        return "+Inf" if valor > 0 else "-Inf"
+    if float(valor).is_integer():
+        return str(int(valor))
+    return repr(float(valor))
+
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nome: str, descricao: str, labels: Sequence[str] = ()):
+        self.nome = nome
+        self.descricao = descricao
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _chave(self, labels: Dict[str, str]) -> Labels:
+        return tuple(str(labels.get(n, "")) for n in self.labels)
+
+    def _amostras(self) -> List[str]:
+        raise NotImplementedError
+
+    def exportar(self) -> str:
+        linhas = [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} {self.tipo}"]
+        linhas.extend(self._amostras())
+        return "\n".join(linhas)
+
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def __init__(self, nome: str, descricao: str, labels: Sequence[str] = ()):
+        super().__init__(nome, descricao, labels)
+        self._valores: Dict[Labels, float] = {}
+
+    def inc(self, valor: float = 1, **labels: str) -> None:
+        chave = self._chave(labels)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def valor(self, **labels: str) -> float:
+        return self._valores.get(self._chave(labels), 0)
+
+    def _amostras(self) -> List[str]:
+        with self._lock:
+            itens = list(self._valores.items())
+        return [f"{self.nome}{_formatar_labels(self.labels, k)} {_formatar_numero(v)}" for k, v in itens]
+
+
+class Medidor(_Metrica):
+    tipo = "gauge"
+
+    def __init__(self, nome: str, descricao: str, labels: Sequence[str] = ()):
+        super().__init__(nome, descricao, labels)
+        self._valores: Dict[Labels, float] = {}
+
+    def set(self, valor: float, **labels: str) -> None:
+        with self._lock:
+            self._valores[self._chave(labels)] = valor
+
+    def inc(self, valor: float = 1, **labels: str) -> None:
+        chave = self._chave(labels)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def dec(self, valor: float = 1, **labels: str) -> None:
+        self.inc(-valor, **labels)
+
+    def remover(self, **labels: str) -> None:
+        with self._lock:
+            self._valores.pop(self._chave(labels), None)
+
+    def valor(self, **labels: str) -> float:
+        return self._valores.get(self._chave(labels), 0)
+
+    def _amostras(self) -> List[str]:
+        with self._lock:
+            itens = list(self._valores.items())
+        return [f"{self.nome}{_formatar_labels(self.labels, k)} {_formatar_numero(v)}" for k, v in itens]
+
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(
+        self,
+        nome: str,
+        descricao: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = BUCKETS_LATENCIA,
+    ):
+        super().__init__(nome, descricao, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # por label: (contagens por bucket, soma, total)
+        self._series: Dict[Labels, Tuple[List[int], List[float]]] = {}
+
+    def observar(self, valor: float, **labels: str) -> None:
+        chave = self._chave(labels)
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = ([0] * len(self.buckets), [0.0, 0])
+                self._series[chave] = serie
+            contagens, soma_total = serie
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    contagens[i] += 1
+                    break
+            soma_total[0] += valor
+            soma_total[1] += 1
+
+    def _amostras(self) -> List[str]:
+        linhas: List[str] = []
+        with self._lock:
+            itens = [(k, (list(c), list(st))) for k, (c, st) in self._series.items()]
+        for chave, (contagens, (soma, total)) in itens:
+            acumulado = 0
+            for limite, contagem in zip(self.buckets, contagens):
+                acumulado += contagem
+                le = 'le="' + _formatar_numero(limite) + '"'
+                linhas.append(f"{self.nome}_bucket{_formatar_labels(self.labels, chave, le)} {acumulado}")
+            linhas.append(f"{self.nome}_sum{_formatar_labels(self.labels, chave)} {_formatar_numero(soma)}")
+            linhas.append(f"{self.nome}_count{_formatar_labels(self.labels, chave)} {_formatar_numero(total)}")
+        return linhas
+
+
+class Registro:
+    def __init__(self):
+        self._metricas: Dict[str, _Metrica] = {}
+        self._lock = threading.Lock()
+
+    def _registrar(self, metrica: _Metrica) -> _Metrica:
+        with self._lock:
+            existente = self._metricas.get(metrica.nome)
+            if existente is not None:
+                return existente
+            self._metricas[metrica.nome] = metrica
+            return metrica
+
+    def contador(self, nome: str, descricao: str, labels: Sequence[str] = ()) -> Contador:
+        return self._registrar(Contador(nome, descricao, labels))
+
+    def medidor(self, nome: str, descricao: str, labels: Sequence[str] = ()) -> Medidor:
+        return self._registrar(Medidor(nome, descricao, labels))
+
+    def histograma(
+        self,
+        nome: str,
+        descricao: str,
+        labels: Sequence[str] = (),
+        buckets: Optional[Sequence[float]] = None,
+    ) -> Histograma:
+        return self._registrar(Histograma(nome, descricao, labels, buckets or BUCKETS_LATENCIA))
+
+    def exportar(self) -> str:
+        with self._lock:
+            metricas = list(self._metricas.values())
+        return "\n".join(m.exportar() for m in metricas) + "\n"
+
+
+REGISTRO = Registro()
+
+
+def memoria_rss_bytes(pid: Optional[int] = None) -> Optional[int]:
+    """
+    Memória residente (RSS) atual de um processo (o próprio, por padrão),
+    lida de /proc. Fora do Linux, só o pico do próprio processo; None se
+    não dá para medir.
+    """
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    if pid not in (None, os.getpid()):
+        return None
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss em KB no Linux, em bytes no macOS
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico if os.uname().sysname == "Darwin" else pico * 1024
@@ -0,0 +1,66 @@
+# api/middleware.py
+import os
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
+
+from api.metricas import REGISTRO
+from api.profiler import admin_autorizado, perfilar_requisicao
+from api.persistence.instrumentacao import iniciar_estatisticas, encerrar_estatisticas
+
+
+API_DEBUG: bool = os.getenv("API_DEBUG", "false").strip().lower() in ("1", "true", "sim")
+
+LATENCIA_HTTP = REGISTRO.histograma(
+    "http_requisicao_duracao_segundos", "Latência das requisições HTTP por rota", ["metodo", "rota", "status"]
+)
+
+
+def _rota(request: Request) -> str:
+    # Usa o template da rota (ex.: /carteiras/{endereco_carteira}) para não
+    # criar uma série por endereço
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "nao_encontrada"
+
+
+def registrar_middlewares(app: FastAPI) -> None:
+    @app.middleware("http")
+    async def perfilar(request: Request, call_next):
+        # cProfile sob demanda: X-Profile: cprofile + X-Admin-Token
+        if request.headers.get("X-Profile") != "cprofile" or not admin_autorizado(
+            request.headers.get("X-Admin-Token")
+        ):
+            return await call_next(request)
+
+        with perfilar_requisicao() as perfil:
+            if perfil is None:
+                response = await call_next(request)
+                response.headers["X-Profile-Arquivo"] = "ocupado"
+                return response
+            response = await call_next(request)
+        # pstats e a escrita do .prof são bloqueantes: fora do event loop
+        caminho = await run_in_threadpool(perfil.salvar, _rota(request))
+        response.headers["X-Profile-Arquivo"] = os.path.basename(caminho)
+        return response
+
+    @app.middleware("http")
+    async def medir_requisicao(request: Request, call_next):
+        inicio = time.perf_counter()
+        estatisticas, token = iniciar_estatisticas()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+        finally:
+            rota = _rota(request)
+            encerrar_estatisticas(token, rota)
+            LATENCIA_HTTP.observar(
+                time.perf_counter() - inicio,
+                metodo=request.method, rota=rota, status=str(status),
+            )
+
+        if API_DEBUG:
+            response.headers["X-DB-Statements"] = str(estatisticas.statements)
+            response.headers["X-DB-Tempo-Ms"] = f"{estatisticas.tempo * 1000:.2f}"
+        return response
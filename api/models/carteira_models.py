@@ -1,4 +1,4 @@
-from typing import Literal
+from typing import List, Literal, Optional
 from datetime import  datetime
 from pydantic import BaseModel
 
@@ -76,4 +76,85 @@ class CotacaoResponse(BaseModel):
     moeda_base: str
     moeda_alvo: str
     cotacao: float
-    timestamp: datetime
\ No newline at end of file
+    timestamp: datetime
+
+class ConsultaSaldosRequest(BaseModel):
+    enderecos: List[str]
+    id_moeda: Optional[int] = None
+    moeda_avaliacao: Optional[str] = None
+
+class SaldoAvaliado(BaseModel):
+    id_moeda: int
+    saldo: float
+    data_atualizacao: datetime
+    valor_avaliado: Optional[float] = None
+
+class SaldosPorCarteira(BaseModel):
+    endereco_carteira: str
+    status: Literal["ATIVA","BLOQUEADA"]
+    saldos: List[SaldoAvaliado]
+    valor_total: Optional[float] = None
+
+class ConsultaSaldosResponse(BaseModel):
+    carteiras: List[SaldosPorCarteira]
+    nao_encontradas: List[str]
+    moeda_avaliacao: Optional[str] = None
+    moedas_sem_cotacao: List[int] = []
+
+class ValorCarteira(BaseModel):
+    endereco_carteira: str
+    moeda: str
+    valor_total: float
+    saldos: List[SaldoAvaliado]
+    moedas_sem_cotacao: List[int] = []
+
+class AvaliacaoCarteirasRequest(BaseModel):
+    enderecos: List[str]
+    moeda: str = "USD"
+
+class ValorTotalCarteira(BaseModel):
+    endereco_carteira: str
+    valor_total: float
+
+class AvaliacaoCarteirasResponse(BaseModel):
+    moeda: str
+    carteiras: List[ValorTotalCarteira]
+    nao_encontradas: List[str]
+    moedas_sem_cotacao: List[int] = []
+
+class AgendamentoRequest(BaseModel):
+    endereco_destino: str
+    id_moeda: int
+    valor: float
+    periodicidade: Literal["UNICA", "DIARIA", "SEMANAL", "MENSAL"]
+    data_inicio: Optional[datetime] = None
+    data_fim: Optional[datetime] = None
+    chave_privada: str
+
+class AgendamentoAtualizacao(BaseModel):
+    chave_privada: str
+    valor: Optional[float] = None
+    status: Optional[Literal["ATIVA", "PAUSADA"]] = None
+    data_fim: Optional[datetime] = None
+
+class AgendamentoCancelamento(BaseModel):
+    chave_privada: str
+
+class AgendamentoResponse(BaseModel):
+    id_agendamento: int
+    endereco_origem: str
+    endereco_destino: str
+    id_moeda: int
+    valor: float
+    periodicidade: Literal["UNICA", "DIARIA", "SEMANAL", "MENSAL"]
+    data_inicio: datetime
+    data_fim: Optional[datetime] = None
+    proxima_ocorrencia: Optional[datetime] = None
+    proxima_execucao: Optional[datetime] = None
+    status: Literal["ATIVA", "PAUSADA", "CONCLUIDA", "CANCELADA", "FALHOU"]
+    execucoes: int
+    falhas_consecutivas: int
+    ultima_execucao: Optional[datetime] = None
+    id_ultima_transferencia: Optional[int] = None
+    ultimo_erro: Optional[str] = None
+    data_criacao: datetime
@@ -0,0 +1,415 @@
+# api/persistence/arquivamento.py
+"""
+Manutenção das partições mensais do histórico (migrations/V002).
+
+- Cria as partições dos próximos meses, separando-as de `pfuturo`.
+- Arquiva partições fechadas (anteriores a ARQUIVO_MESES_RETIDOS meses):
+  a partição é trocada (EXCHANGE PARTITION) por uma tabela vazia, as linhas
+  vão para a tabela *_arquivo compactada ou para um arquivo Parquet em
+  ARQUIVO_DIR e a partição é removida. Linhas que caem na partição depois
+  da troca (data_hora retroativa) são movidas e arquivadas junto antes do
+  DROP. Reexecutar retoma um arquivamento interrompido; um Parquet já
+  existente só é aproveitado se tiver as mesmas linhas da tabela de troca,
+  nunca sobrescrito.
+
+Uso (com um usuário que tenha ALTER/CREATE/DROP):
+    python -m api.persistence.arquivamento --status
+    python -m api.persistence.arquivamento --criar-particoes 3
+    python -m api.persistence.arquivamento --arquivar --destino tabela
+    python -m api.persistence.arquivamento --arquivar --destino parquet
+"""
+import os
+import argparse
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.engine import Connection
+
+from api.persistence.db import BASE_DIR, cursor_servidor, engine
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as pa_dataset
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow é opcional (só para o destino parquet)
+    pa = None
+
+
+TABELAS = ("deposito_saque", "conversao", "transferencia")
+CHAVES = {"deposito_saque": "id_movimento", "conversao": "id_conversao", "transferencia": "id_transferencia"}
+ARQUIVO_DIR = Path(os.getenv("ARQUIVO_DIR", str(BASE_DIR / "arquivo")))
+MESES_RETIDOS = int(os.getenv("ARQUIVO_MESES_RETIDOS", "12"))
+LINHAS_POR_LOTE = 50_000
+
+
+class ParquetIndisponivelError(RuntimeError):
+    """Há partições arquivadas em Parquet, mas o pyarrow não está instalado."""
+
+
+def _schema_parquet(tabela: str):
+    texto = pa.string()
+    moeda = pa.int16()
+    valor = pa.decimal128(18, 4)
+    momento = pa.timestamp("us")
+    campos = {
+        "deposito_saque": [
+            ("id_movimento", pa.int64()), ("endereco_carteira", texto), ("id_moeda", moeda),
+            ("tipo", texto), ("valor", valor), ("taxa_valor", valor), ("data_hora", momento),
+        ],
+        "conversao": [
+            ("id_conversao", pa.int64()), ("endereco_carteira", texto),
+            ("id_moeda_origem", moeda), ("id_moeda_destino", moeda),
+            ("valor_origem", valor), ("valor_destino", valor),
+            ("taxa_percentual", pa.decimal128(5, 2)), ("cotacao_utilizada", valor),
+            ("data_hora", momento),
+        ],
+        "transferencia": [
+            ("id_transferencia", pa.int64()), ("endereco_origem", texto), ("endereco_destino", texto),
+            ("id_moeda", moeda), ("valor", valor), ("taxa_valor", pa.decimal128(5, 2)),
+            ("data_hora", momento),
+        ],
+    }
+    return pa.schema(campos[tabela])
+
+
+def _conexao_ddl() -> Connection:
+    # DDL faz commit implícito no MySQL; em autocommit cada passo fica
+    # gravado e o arquivamento pode ser retomado de onde parou
+    return engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+
+
+def _somar_meses(d: date, meses: int) -> date:
+    total = d.year * 12 + d.month - 1 + meses
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def _limite(descricao: str) -> Optional[date]:
+    """
+    PARTITION_DESCRIPTION de RANGE COLUMNS: "'2026-02-01 00:00:00'" ou "MAXVALUE".
+    """
+    if descricao.upper() == "MAXVALUE":
+        return None
+    return datetime.strptime(descricao.strip("'")[:10], "%Y-%m-%d").date()
+
+
+def listar_particoes(conn: Connection, tabela: str) -> List[Tuple[str, Optional[date], int]]:
+    """
+    (nome, limite superior exclusivo ou None para MAXVALUE, linhas estimadas).
+    """
+    rows = conn.execute(
+        text("""
+            SELECT PARTITION_NAME AS nome,
+                   PARTITION_DESCRIPTION AS descricao,
+                   TABLE_ROWS AS linhas
+              FROM information_schema.PARTITIONS
+             WHERE TABLE_SCHEMA = DATABASE()
+               AND TABLE_NAME = :tabela
+               AND PARTITION_NAME IS NOT NULL
+             ORDER BY PARTITION_ORDINAL_POSITION
+        """),
+        {"tabela": tabela},
+    ).mappings().all()
+    return [(r["nome"], _limite(r["descricao"]), int(r["linhas"] or 0)) for r in rows]
+
+
+def criar_particoes_futuras(meses_adiante: int = 3) -> Dict[str, List[str]]:
+    """
+    Garante partições mensais até `meses_adiante` meses à frente do atual.
+    """
+    alvo = _somar_meses(date.today().replace(day=1), meses_adiante + 1)
+    criadas: Dict[str, List[str]] = {}
+
+    with _conexao_ddl() as conn:
+        for tabela in TABELAS:
+            limites = [limite for _, limite, _ in listar_particoes(conn, tabela) if limite]
+            if not limites:
+                raise RuntimeError(f"Tabela {tabela} não está particionada (aplique as migrações)")
+
+            novas = []
+            inicio = max(limites)
+            while inicio < alvo:
+                fim = _somar_meses(inicio, 1)
+                novas.append((f"p{inicio:%Y%m}", fim))
+                inicio = fim
+            if not novas:
+                continue
+
+            definicoes = ",\n".join(
+                f"PARTITION {nome} VALUES LESS THAN ('{fim:%Y-%m-%d}')" for nome, fim in novas
+            )
+            conn.exec_driver_sql(
+                f"ALTER TABLE {tabela} REORGANIZE PARTITION pfuturo INTO (\n"
+                f"{definicoes},\nPARTITION pfuturo VALUES LESS THAN (MAXVALUE))"
+            )
+            criadas[tabela] = [nome for nome, _ in novas]
+    return criadas
+
+
+def _contar(conn: Connection, origem: str) -> int:
+    return int(conn.exec_driver_sql(f"SELECT COUNT(*) FROM {origem}").scalar())
+
+
+def _tabela_existe(conn: Connection, tabela: str) -> bool:
+    return bool(conn.execute(
+        text("""
+            SELECT COUNT(*) FROM information_schema.TABLES
+             WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :tabela
+        """),
+        {"tabela": tabela},
+    ).scalar())
+
+
+def _exportar_parquet(tabela: str, origem: str, destino: Path, linhas_origem: int, sobrescrever: bool = False) -> int:
+    if pa is None:
+        raise RuntimeError("Destino parquet requer o pacote pyarrow (pip install pyarrow)")
+
+    if destino.exists() and not sobrescrever:
+        existentes = pq.ParquetFile(destino).metadata.num_rows
+        if existentes == linhas_origem:
+            # Exportado por uma execução interrompida depois da cópia
+            return existentes
+        raise RuntimeError(
+            f"{destino} já existe com {existentes} linhas (a tabela {origem} tem {linhas_origem}); "
+            "mova ou confira o arquivo antes de arquivar de novo"
+        )
+
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    temporario = destino.with_suffix(".parquet.tmp")
+    schema = _schema_parquet(tabela)
+    total = 0
+
+    with cursor_servidor(f"SELECT * FROM {origem}") as cursor, \
+            pq.ParquetWriter(temporario, schema, compression="zstd") as writer:
+        while True:
+            lote = cursor.fetchmany(LINHAS_POR_LOTE)
+            if not lote:
+                break
+            colunas = list(zip(*lote))
+            writer.write_batch(pa.RecordBatch.from_arrays(
+                [pa.array(valores, type=campo.type) for valores, campo in zip(colunas, schema)],
+                schema=schema,
+            ))
+            total += len(lote)
+    os.replace(temporario, destino)
+    return total
+
+
+def _mover_restantes(tabela: str, particao: str, troca: str) -> int:
+    """
+    Move para a tabela de troca as linhas gravadas na partição depois do
+    EXCHANGE. As linhas são travadas e movidas por chave: o que chegar
+    durante a cópia fica para a próxima rodada.
+    """
+    chave = CHAVES[tabela]
+    with engine.begin() as conn:
+        ids = [r[0] for r in conn.exec_driver_sql(
+            f"SELECT {chave} FROM {tabela} PARTITION ({particao}) FOR UPDATE"
+        )]
+        if ids:
+            por_chave = bindparam("ids", expanding=True)
+            conn.execute(
+                text(f"INSERT INTO {troca} SELECT * FROM {tabela} PARTITION ({particao}) WHERE {chave} IN :ids")
+                .bindparams(por_chave),
+                {"ids": ids},
+            )
+            conn.execute(
+                text(f"DELETE FROM {tabela} PARTITION ({particao}) WHERE {chave} IN :ids").bindparams(por_chave),
+                {"ids": ids},
+            )
+    return len(ids)
+
+
+def arquivar_particao(tabela: str, particao: str, destino: str = "tabela") -> int:
+    """
+    Move uma partição fechada para o arquivo e a remove. Retorna as linhas movidas.
+    """
+    troca = f"{tabela}_troca_{particao}"
+    arquivo = ARQUIVO_DIR / tabela / f"{particao}.parquet"
+
+    with _conexao_ddl() as conn:
+        # Sem a partição: execução anterior interrompida entre os dois DROPs
+        existe_particao = any(nome == particao for nome, _, _ in listar_particoes(conn, tabela))
+        if not _tabela_existe(conn, troca):
+            if not existe_particao:
+                raise RuntimeError(f"{tabela} não tem a partição {particao}")
+            conn.exec_driver_sql(f"CREATE TABLE {troca} LIKE {tabela}")
+            conn.exec_driver_sql(f"ALTER TABLE {troca} REMOVE PARTITIONING")
+
+        if existe_particao and _contar(conn, troca) == 0:
+            conn.exec_driver_sql(f"ALTER TABLE {tabela} EXCHANGE PARTITION {particao} WITH TABLE {troca}")
+
+        sobrescrever = False
+        while True:
+            if destino == "parquet":
+                linhas = _exportar_parquet(tabela, troca, arquivo, _contar(conn, troca), sobrescrever)
+            else:
+                conn.exec_driver_sql(f"INSERT IGNORE INTO {tabela}_arquivo SELECT * FROM {troca}")
+                linhas = _contar(conn, troca)
+            # Linhas que chegaram depois da troca vão para a tabela de troca e
+            # o arquivo é refeito (o Parquet desta execução pode ser sobrescrito)
+            if not existe_particao or not _mover_restantes(tabela, particao, troca):
+                break
+            sobrescrever = True
+
+        # A partição sai primeiro: se o processo cair antes do DROP da troca,
+        # as linhas continuam na troca e a próxima execução termina o serviço
+        if existe_particao:
+            conn.exec_driver_sql(f"ALTER TABLE {tabela} DROP PARTITION {particao}")
+        conn.exec_driver_sql(f"DROP TABLE {troca}")
+    return linhas
+
+
+def arquivar(meses_retidos: int = MESES_RETIDOS, destino: str = "tabela") -> Dict[str, Dict[str, int]]:
+    """
+    Arquiva todas as partições cujo mês terminou antes do período retido.
+    """
+    corte = _somar_meses(date.today().replace(day=1), -meses_retidos)
+    resultado: Dict[str, Dict[str, int]] = {}
+
+    for tabela in TABELAS:
+        with engine.connect() as conn:
+            particoes = listar_particoes(conn, tabela)
+        fechadas = [nome for nome, limite, _ in particoes if limite and limite <= corte]
+        for particao in fechadas:
+            resultado.setdefault(tabela, {})[particao] = arquivar_particao(tabela, particao, destino)
+    return resultado
+
+
+def ler_parquet(tabela: str, filtro: Any) -> List[Dict[str, Any]]:
+    """
+    Linhas arquivadas em Parquet que satisfazem `filtro` (expressão de
+    pyarrow.dataset). Sem arquivos ou sem pyarrow, retorna lista vazia.
+    """
+    diretorio = ARQUIVO_DIR / tabela
+    if pa is None or not diretorio.is_dir() or not any(diretorio.glob("*.parquet")):
+        return []
+    dataset = pa_dataset.dataset(str(diretorio), format="parquet", schema=_schema_parquet(tabela))
+    return dataset.to_table(filter=filtro).to_pylist()
+
+
+def _arquivos_parquet(tabela: str) -> List[str]:
+    diretorio = ARQUIVO_DIR / tabela
+    return sorted(str(p) for p in diretorio.glob("*.parquet")) if diretorio.is_dir() else []
+
+
+def exigir_leitura_parquet() -> None:
+    """
+    Falha se existe arquivo Parquet que não pode ser lido (sem pyarrow), em
+    vez de deixar consultas "com arquivo" omitirem essas linhas.
+    """
+    if pa is None and any(_arquivos_parquet(tabela) for tabela in TABELAS):
+        raise ParquetIndisponivelError(
+            f"Há partições arquivadas em Parquet em {ARQUIVO_DIR}, mas o pacote pyarrow "
+            "não está instalado (pip install pyarrow)"
+        )
+
+
+def _nulos(n: int) -> List[None]:
+    return [None] * n
+
+
+def _iterar_parquet(
+    tabela: str, filtro: Any, projetar: Callable[[Dict[str, list]], List[Tuple[Any, ...]]], tamanho_lote: int
+) -> Iterator[List[Tuple[Any, ...]]]:
+    arquivos = _arquivos_parquet(tabela)
+    if not arquivos:
+        return
+    dataset = pa_dataset.dataset(arquivos, format="parquet", schema=_schema_parquet(tabela))
+    for lote in dataset.to_batches(filter=filtro, batch_size=tamanho_lote):
+        if lote.num_rows:
+            yield projetar(lote.to_pydict())
+
+
+def historico_em_parquet(endereco: str, tamanho_lote: int = LINHAS_POR_LOTE) -> Iterator[List[Tuple[Any, ...]]]:
+    """
+    Histórico da carteira nas partições arquivadas em Parquet, em lotes de
+    tuplas no formato de COLUNAS_HISTORICO (carteira_repository), na ordem
+    das partições. Lê por RecordBatch: a memória não cresce com o arquivo.
+    """
+    exigir_leitura_parquet()
+    if pa is None:
+        return
+    campo = pa_dataset.field
+
+    def depositos(c: Dict[str, list]) -> List[Tuple[Any, ...]]:
+        n = len(c["id_movimento"])
+        return list(zip(
+            ["deposito_saque"] * n, c["id_movimento"], c["tipo"], c["data_hora"], c["id_moeda"],
+            c["valor"], c["taxa_valor"], _nulos(n), _nulos(n), _nulos(n), _nulos(n), _nulos(n),
+        ))
+
+    def transferencias(tipo: str, contraparte: str) -> Callable[[Dict[str, list]], List[Tuple[Any, ...]]]:
+        def projetar(c: Dict[str, list]) -> List[Tuple[Any, ...]]:
+            n = len(c["id_transferencia"])
+            return list(zip(
+                ["transferencia"] * n, c["id_transferencia"], [tipo] * n, c["data_hora"], c["id_moeda"],
+                c["valor"], c["taxa_valor"], _nulos(n), c[contraparte], _nulos(n), _nulos(n), _nulos(n),
+            ))
+        return projetar
+
+    def conversoes(c: Dict[str, list]) -> List[Tuple[Any, ...]]:
+        n = len(c["id_conversao"])
+        return list(zip(
+            ["conversao"] * n, c["id_conversao"], ["CONVERSAO"] * n, c["data_hora"], c["id_moeda_origem"],
+            c["valor_origem"], _nulos(n), c["taxa_percentual"], _nulos(n), c["id_moeda_destino"],
+            c["valor_destino"], c["cotacao_utilizada"],
+        ))
+
+    # Mesmas consultas de _consultas_historico (carteira_repository)
+    consultas = (
+        ("deposito_saque", campo("endereco_carteira") == endereco, depositos),
+        ("transferencia", campo("endereco_origem") == endereco, transferencias("ENVIADA", "endereco_destino")),
+        (
+            "transferencia",
+            (campo("endereco_destino") == endereco) & (campo("endereco_origem") != endereco),
+            transferencias("RECEBIDA", "endereco_origem"),
+        ),
+        ("conversao", campo("endereco_carteira") == endereco, conversoes),
+    )
+    for tabela, filtro, projetar in consultas:
+        yield from _iterar_parquet(tabela, filtro, projetar, tamanho_lote)
+
+
+def transferencias_em_parquet(
+    endereco: str, inicio: Optional[datetime] = None, fim: Optional[datetime] = None
+) -> List[Dict[str, Any]]:
+    if pa is None:
+        return []
+    campo = pa_dataset.field
+    filtro = (campo("endereco_origem") == endereco) | (campo("endereco_destino") == endereco)
+    if inicio is not None:
+        filtro = filtro & (campo("data_hora") >= pa.scalar(inicio, pa.timestamp("us")))
+    if fim is not None:
+        filtro = filtro & (campo("data_hora") < pa.scalar(fim, pa.timestamp("us")))
+    return ler_parquet("transferencia", filtro)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--status", action="store_true", help="lista as partições de cada tabela")
+    parser.add_argument("--criar-particoes", type=int, metavar="MESES",
+                        help="cria partições até MESES meses à frente")
+    parser.add_argument("--arquivar", action="store_true", help="arquiva partições fechadas")
+    parser.add_argument("--meses-retidos", type=int, default=MESES_RETIDOS)
+    parser.add_argument("--destino", choices=("tabela", "parquet"), default="tabela")
+    args = parser.parse_args()
+
+    if args.criar_particoes is not None:
+        for tabela, nomes in criar_particoes_futuras(args.criar_particoes).items():
+            print(f"{tabela}: criadas {', '.join(nomes)}")
+    if args.arquivar:
+        for tabela, particoes in arquivar(args.meses_retidos, args.destino).items():
+            for particao, linhas in particoes.items():
+                print(f"{tabela}.{particao}: {linhas} linhas -> {args.destino}")
+    if args.status or (args.criar_particoes is None and not args.arquivar):
+        with engine.connect() as conn:
+            for tabela in TABELAS:
+                print(tabela)
+                for nome, limite, linhas in listar_particoes(conn, tabela):
+                    print(f"  {nome:10} < {limite or 'MAXVALUE'}  ~{linhas} linhas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# api/persistence/cache_chaves.py
+"""
+Cache, por processo, de chaves privadas já verificadas.
+
+Guarda apenas (endereço, digest BLAKE2b com segredo aleatório do processo)
+de verificações bem-sucedidas — nunca a chave em claro nem o hash do banco.
+Entradas expiram após o TTL e são removidas quando o status da carteira muda.
+"""
+import os
+import time
+import secrets
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Tuple
+
+from api.metricas import REGISTRO
+
+
+CONSULTAS = REGISTRO.contador(
+    "chave_cache_consultas_total", "Consultas ao cache de chaves verificadas", ["resultado"]
+)
+TAXA_ACERTO = REGISTRO.medidor(
+    "chave_cache_taxa_acerto", "Fração de verificações de chave atendidas pelo cache"
+)
+TAMANHO = REGISTRO.medidor(
+    "chave_cache_entradas", "Entradas no cache de chaves verificadas"
+)
+
+
+class CacheChavesVerificadas:
+    def __init__(self, tamanho_maximo: int, ttl_s: float):
+        self.tamanho_maximo = tamanho_maximo
+        self.ttl_s = ttl_s
+        self._segredo = secrets.token_bytes(32)
+        self._entradas: "OrderedDict[Tuple[str, bytes], float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._acertos = 0
+        self._consultas = 0
+
+    @property
+    def ativo(self) -> bool:
+        return self.tamanho_maximo > 0 and self.ttl_s > 0
+
+    def digest(self, chave_privada: str) -> bytes:
+        return hashlib.blake2b(chave_privada.encode(), key=self._segredo, digest_size=16).digest()
+
+    def _contabilizar(self, acerto: bool) -> None:
+        self._consultas += 1
+        self._acertos += acerto
+        CONSULTAS.inc(resultado="acerto" if acerto else "falta")
+        TAXA_ACERTO.set(self._acertos / self._consultas)
+
+    def contem(self, endereco: str, digest: bytes) -> bool:
+        if not self.ativo:
+            return False
+        chave = (endereco, digest)
+        with self._lock:
+            expira_em = self._entradas.get(chave)
+            acerto = expira_em is not None and expira_em > time.monotonic()
+            if acerto:
+                self._entradas.move_to_end(chave)
+            elif expira_em is not None:
+                del self._entradas[chave]
+            self._contabilizar(acerto)
+        return acerto
+
+    def adicionar(self, endereco: str, digest: bytes) -> None:
+        if not self.ativo:
+            return
+        with self._lock:
+            self._entradas[(endereco, digest)] = time.monotonic() + self.ttl_s
+            self._entradas.move_to_end((endereco, digest))
+            while len(self._entradas) > self.tamanho_maximo:
+                self._entradas.popitem(last=False)
+            TAMANHO.set(len(self._entradas))
+
+    def invalidar(self, endereco: str) -> None:
+        """
+        Remove todas as verificações da carteira (ex.: ao ser bloqueada).
+        """
+        with self._lock:
+            for chave in [c for c in self._entradas if c[0] == endereco]:
+                del self._entradas[chave]
+            TAMANHO.set(len(self._entradas))
+
+    def taxa_acerto(self) -> float:
+        return self._acertos / self._consultas if self._consultas else 0.0
+
+
+CACHE_CHAVES = CacheChavesVerificadas(
+    tamanho_maximo=int(os.getenv("CACHE_CHAVES_TAMANHO", "10000")),
+    ttl_s=float(os.getenv("CACHE_CHAVES_TTL_S", "300")),
+)
@@ -0,0 +1,164 @@
+# api/persistence/commit_em_grupo.py
+"""
+Commit em grupo dos depósitos (opcional, DB_GROUP_COMMIT=true).
+
+Depósitos que chegam dentro de uma janela curta são reunidos e gravados numa
+única transação (um commit/fsync para o lote). Cada chamador continua
+bloqueado até o commit do seu lote e recebe o próprio resultado.
+Se o lote falhar antes do COMMIT (rollback garantido), os depósitos são
+refeitos um a um, para que um item inválido não derrube os demais. Se a falha
+for no próprio COMMIT, não dá para saber se o lote foi gravado: refazer
+poderia duplicar os depósitos, então todos recebem CommitIncertoError.
+"""
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from api.metricas import REGISTRO, BUCKETS_CONTAGEM
+
+logger = logging.getLogger(__name__)
+
+
+TAMANHO_LOTE = REGISTRO.histograma(
+    "deposito_lote_tamanho", "Depósitos gravados por commit em grupo", buckets=BUCKETS_CONTAGEM
+)
+ESPERA_LOTE = REGISTRO.histograma(
+    "deposito_lote_espera_segundos", "Tempo do depósito desde a entrada no lote até o commit"
+)
+COMMITS_LOTE = REGISTRO.contador(
+    "deposito_lote_commits_total", "Commits em grupo de depósitos", ["resultado"]
+)
+
+Item = Tuple[str, int, float]
+
+
+class CommitIncertoError(RuntimeError):
+    """
+    O COMMIT foi enviado e falhou (ex.: conexão caiu): o lote pode ou não ter
+    sido gravado.
+    """
+
+
+def group_commit_ativo() -> bool:
+    return os.getenv("DB_GROUP_COMMIT", "false").lower() in ("1", "true", "sim", "yes")
+
+
+class AgrupadorDepositos:
+    def __init__(
+        self,
+        gravar_lote: Callable[[List[Item]], List[Dict[str, Any]]],
+        gravar_um: Callable[[str, int, float], Dict[str, Any]],
+        janela_s: float,
+        max_lote: int,
+    ):
+        """
+        gravar_lote: grava todos os itens numa transação e devolve um resultado
+            por item; CommitIncertoError se a falha foi no COMMIT.
+        gravar_um: caminho normal, usado quando o lote falha.
+        """
+        self.gravar_lote = gravar_lote
+        self.gravar_um = gravar_um
+        self.janela_s = janela_s
+        self.max_lote = max_lote
+        self._fila: "queue.Queue[Optional[Tuple[Item, Future, float]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _garantir_thread(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._executar, name="commit-em-grupo-depositos", daemon=True
+                )
+                self._thread.start()
+
+    def registrar(self, endereco: str, id_moeda: int, valor: float) -> Dict[str, Any]:
+        """
+        Entra no próximo lote e bloqueia até o commit dele.
+        """
+        self._garantir_thread()
+        futuro: Future = Future()
+        self._fila.put(((endereco, id_moeda, valor), futuro, time.perf_counter()))
+        return futuro.result()
+
+    def _coletar(self, primeiro) -> Tuple[list, bool]:
+        lote = [primeiro]
+        prazo = time.monotonic() + self.janela_s
+        while len(lote) < self.max_lote:
+            restante = prazo - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                item = self._fila.get(timeout=restante)
+            except queue.Empty:
+                break
+            if item is None:
+                return lote, True
+            lote.append(item)
+        return lote, False
+
+    def _executar(self) -> None:
+        while True:
+            primeiro = self._fila.get()
+            if primeiro is None:
+                return
+            lote, parar = self._coletar(primeiro)
+            self._aplicar(lote)
+            if parar:
+                return
+
+    def _aplicar(self, lote: list) -> None:
+        itens = [item for item, _, _ in lote]
+        try:
+            resultados = self.gravar_lote(itens)
+            COMMITS_LOTE.inc(resultado="ok")
+        except CommitIncertoError as e:
+            COMMITS_LOTE.inc(resultado="incerto")
+            logger.error(f"Commit de lote com {len(itens)} depósitos falhou com resultado desconhecido: {e}")
+            resultados = [e] * len(itens)
+        except Exception as e:
+            COMMITS_LOTE.inc(resultado="refeito")
+            logger.warning(f"Lote de {len(itens)} depósitos falhou ({e}); refazendo individualmente")
+            resultados = []
+            for item in itens:
+                try:
+                    resultados.append(self.gravar_um(*item))
+                except Exception as erro:
+                    resultados.append(erro)
+
+        TAMANHO_LOTE.observar(len(lote))
+        agora = time.perf_counter()
+        for (_, futuro, entrada), resultado in zip(lote, resultados):
+            ESPERA_LOTE.observar(agora - entrada)
+            if isinstance(resultado, Exception):
+                futuro.set_exception(resultado)
+            else:
+                futuro.set_result(resultado)
+
+    def fechar(self) -> None:
+        """
+        Grava o que estiver pendente e encerra a thread.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            self._fila.put(None)
+            self._thread.join(timeout=5)
+
+
+def criar_agrupador(
+    gravar_lote: Callable[[List[Item]], List[Dict[str, Any]]],
+    gravar_um: Callable[[str, int, float], Dict[str, Any]],
+) -> Optional[AgrupadorDepositos]:
+    if not group_commit_ativo():
+        return None
+    return AgrupadorDepositos(
+        gravar_lote,
+        gravar_um,
+        janela_s=float(os.getenv("DB_GROUP_COMMIT_JANELA_MS", "2")) / 1000,
+        max_lote=int(os.getenv("DB_GROUP_COMMIT_MAX_LOTE", "64")),
+    )
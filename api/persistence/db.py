@@ -1,10 +1,19 @@
 import os
+import re
+import time
+import logging
 from pathlib import Path
 from contextlib import contextmanager
+from typing import Any, Iterator, List, Mapping, Optional, Tuple
 
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.engine import Engine, Connection
+from sqlalchemy.exc import DBAPIError
+
+from api.persistence.instrumentacao import instrumentada, registrar_statement
+
+logger = logging.getLogger(__name__)
 
 
 # Carrega .env a partir da raiz do projeto
@@ -27,14 +36,59 @@ def get_database_url() -> str:
     return f"mysql+mysqlconnector://{user}:{password}@{host}:{port}/{db}"
 
 
+def get_replica_url() -> Optional[str]:
+    """
+    URL da réplica de leitura (DB_REPLICA_HOST). Usuário, senha, porta e
+    banco, se não informados, são os mesmos do primário.
+    """
+    host = os.getenv("DB_REPLICA_HOST")
+    if not host:
+        return None
+    user = os.getenv("DB_REPLICA_USER") or os.getenv("DB_USER")
+    password = os.getenv("DB_REPLICA_PASSWORD") or os.getenv("DB_PASSWORD")
+    port = os.getenv("DB_REPLICA_PORT") or os.getenv("DB_PORT", "3306")
+    db = os.getenv("DB_REPLICA_NAME") or os.getenv("DB_NAME")
+    return f"mysql+mysqlconnector://{user}:{password}@{host}:{port}/{db}"
+
+
 DATABASE_URL = get_database_url()
+REPLICA_URL = get_replica_url()
 
 engine: Engine = create_engine(
     DATABASE_URL,
     future=True,
     pool_pre_ping=True,
+    pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+    max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+    pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "3600")),
 )
 
+# Engine somente leitura da réplica; None quando DB_REPLICA_HOST não está definido
+engine_leitura: Optional[Engine] = create_engine(
+    REPLICA_URL,
+    future=True,
+    pool_pre_ping=True,
+    pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+    max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+    pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "3600")),
+) if REPLICA_URL else None
+
+
+def aquecer_pool(quantidade: Optional[int] = None) -> int:
+    """
+    Abre `quantidade` conexões (padrão: DB_POOL_SIZE) e as devolve ao pool,
+    para que as primeiras requisições não paguem o custo de conectar.
+    """
+    quantidade = quantidade or engine.pool.size()
+    conexoes = []
+    try:
+        for _ in range(quantidade):
+            conexoes.append(engine.connect())
+    finally:
+        for conn in conexoes:
+            conn.close()
+    return len(conexoes)
+
 
 @contextmanager
 def get_connection() -> Connection:
@@ -51,4 +105,150 @@ def get_connection() -> Connection:
         trans.rollback()
         raise
     finally:
-        conn.close()
\ No newline at end of file
+        conn.close()
+
+
+@contextmanager
+def cursor_servidor(
+    sql: str, params: Optional[Mapping[str, Any]] = None, origem: Optional[Engine] = None
+) -> Iterator[Any]:
+    """
+    Cursor não bufferizado do mysql-connector numa conexão dedicada do pool:
+    as linhas vêm do servidor à medida que são lidas (fetchmany), sem carregar
+    o resultado inteiro na memória. O dialeto do SQLAlchemy para o
+    mysql-connector não oferece stream_results, por isso o cursor é do driver
+    (placeholders no formato %(nome)s).
+    """
+    conn = (origem or engine).raw_connection()
+    cursor = None
+    consumido = False
+    try:
+        cursor = conn.driver_connection.cursor(buffered=False)
+        cursor.execute(sql, params or {})
+        yield cursor
+        # Resultado lido até o fim: a conexão pode voltar ao pool
+        consumido = cursor.fetchone() is None
+    finally:
+        if consumido:
+            cursor.close()
+            conn.close()
+        else:
+            # Linhas pendentes no socket: descarta a conexão em vez de devolvê-la
+            conn.invalidate()
+
+
+# Mesmo padrão de parâmetro nomeado que o text() do SQLAlchemy reconhece
+_PARAMETRO = re.compile(r"(?<![:\w\\]):(\w+)(?!:)")
+
+_preparados_ativos = os.getenv("DB_PREPARED_STATEMENTS", "false").strip().lower() == "true"
+
+
+class ResultadoPreparado:
+    __slots__ = ("linhas", "lastrowid", "rowcount")
+
+    def __init__(self, linhas: List[Tuple[Any, ...]], lastrowid: Optional[int], rowcount: int):
+        self.linhas = linhas
+        self.lastrowid = lastrowid
+        self.rowcount = rowcount
+
+    def primeira(self) -> Optional[Tuple[Any, ...]]:
+        return self.linhas[0] if self.linhas else None
+
+
+class ComandoPreparado:
+    """
+    Statement do caminho quente (leitura e atualização de saldo, INSERT no
+    razão), escrito com parâmetros nomeados como no text().
+
+    Com DB_PREPARED_STATEMENTS=true (padrão false) roda num cursor preparado do
+    mysql-connector guardado na própria conexão do pool: o texto vai ao
+    servidor uma vez por conexão (COM_STMT_PREPARE) e as execuções seguintes
+    mandam só os parâmetros, em binário. O mysql-connector só reaproveita a
+    preparação quando recebe o mesmo objeto str, por isso o SQL do driver é
+    montado uma vez aqui. Sem suporte do driver, usa o text() de sempre.
+
+    Roda na transação da conexão SQLAlchemy recebida; as linhas voltam como
+    tuplas na ordem das colunas do SELECT.
+    """
+
+    def __init__(self, sql: str):
+        self.texto = text(sql)
+        self.nomes = tuple(_PARAMETRO.findall(sql))
+        self.sql_driver = _PARAMETRO.sub("?", sql)
+
+    def executar(self, conn: Connection, params: Mapping[str, Any]) -> ResultadoPreparado:
+        if not _preparados_ativos:
+            return self._executar_texto(conn, params)
+        try:
+            cursor = _cursor_preparado(conn, self.sql_driver)
+        except (TypeError, AttributeError, NotImplementedError) as e:
+            _desativar_preparados(e)
+            return self._executar_texto(conn, params)
+
+        valores = tuple(params[nome] for nome in self.nomes)
+        inicio = time.perf_counter()
+        try:
+            cursor.execute(self.sql_driver, valores)
+            linhas = cursor.fetchall() if cursor.description else []
+        except conn.dialect.loaded_dbapi.Error as e:
+            # O cursor pode ter ficado com resultado pendente: prepara de novo na próxima
+            _fechar_cursores_preparados(conn.connection)
+            # Mesma detecção de queda que o SQLAlchemy faz no conn.execute():
+            # conexão perdida é invalidada em vez de voltar ao pool
+            desconectado = conn.dialect.is_disconnect(e, conn.connection.dbapi_connection, cursor)
+            if desconectado and not conn.invalidated:
+                conn.invalidate(e)
+            raise DBAPIError.instance(
+                self.sql_driver, valores, e, conn.dialect.loaded_dbapi.Error,
+                connection_invalidated=desconectado, dialect=conn.dialect,
+            ) from e
+        if instrumentada(conn.engine):
+            registrar_statement(self.sql_driver, time.perf_counter() - inicio)
+        return ResultadoPreparado(linhas, cursor.lastrowid, cursor.rowcount)
+
+    def _executar_texto(self, conn: Connection, params: Mapping[str, Any]) -> ResultadoPreparado:
+        result = conn.execute(self.texto, params)
+        linhas = [tuple(row) for row in result] if result.returns_rows else []
+        return ResultadoPreparado(linhas, result.lastrowid, result.rowcount)
+
+
+def _cursor_preparado(conn: Connection, sql_driver: str) -> Any:
+    """
+    Um cursor preparado por statement em cada conexão do pool, guardado em
+    info (que acompanha a conexão do driver entre checkouts).
+    """
+    fairy = conn.connection
+    driver = fairy.driver_connection
+    cache = fairy.info.get("cursores_preparados")
+    if cache is None or cache[0] is not driver:
+        # Conexão nova ou reconectada: as preparações anteriores não valem mais
+        cache = fairy.info["cursores_preparados"] = (driver, {})
+    cursor = cache[1].get(sql_driver)
+    if cursor is None:
+        cursor = cache[1][sql_driver] = driver.cursor(prepared=True)
+    return cursor
+
+
+def _fechar_cursores_preparados(fairy: Any) -> None:
+    """
+    Fecha os cursores preparados guardados na conexão e esquece o cache. O
+    cursor do mysql-connector não desaloca o statement no servidor ao ser
+    coletado: sem close(), cada descarte vazaria statements até a conexão
+    ser reciclada (limite max_prepared_stmt_count do servidor).
+    """
+    cache = fairy.info.pop("cursores_preparados", None)
+    if cache is None:
+        return
+    for cursor in cache[1].values():
+        try:
+            cursor.close()
+        except Exception as e:
+            # Conexão caída ou resultado pendente: o servidor libera ao fechar a conexão
+            logger.debug(f"Falha ao fechar cursor preparado: {e}")
+
+
+def _desativar_preparados(erro: Exception) -> None:
+    global _preparados_ativos
+    if _preparados_ativos:
+        _preparados_ativos = False
+        logger.warning(f"Driver sem cursor preparado, usando text(): {erro}")
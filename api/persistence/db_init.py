@@ -1,16 +1,27 @@
 import os
-from sqlalchemy import text
-from api.persistence.db import get_connection
+import logging
+
+from sqlalchemy.exc import OperationalError, InterfaceError
+
+from api.persistence.migrations import aplicar_migracoes, verificar_schema
+
+logger = logging.getLogger(__name__)
+
 
 def inicializar_banco():
-    with get_connection() as conn:
-        # Verifica se já existem moedas cadastradas
-        result = conn.execute(text("SELECT COUNT(*) as total FROM moeda")).mappings().first()
-        if result and result["total"] == 0:
-            data_sql_path = os.path.join(os.path.dirname(__file__), "../../data.sql")
-            with open(data_sql_path, "r") as f:
-                sql_script = f.read()
-            for statement in sql_script.split(";"):
-                stmt = statement.strip()
-                if stmt:
-                    conn.execute(text(stmt))
\ No newline at end of file
+    """
+    Chamado no startup (lifespan) de cada worker.
+
+    Por padrão apenas confere a versão do schema com uma consulta barata;
+    as migrações rodam uma vez via `python -m api.persistence.migrations`.
+    Com DB_MIGRAR_NO_STARTUP=true (desenvolvimento) aplica as pendentes.
+    """
+    try:
+        if os.getenv("DB_MIGRAR_NO_STARTUP", "false").strip().lower() in ("1", "true", "sim"):
+            aplicar_migracoes()
+        return verificar_schema()
+    except (OperationalError, InterfaceError) as e:
+        # Banco indisponível não impede o worker de subir;
+        # o pool (pool_pre_ping) reconecta quando o banco voltar.
+        logger.warning(f"Não foi possível verificar o schema no startup: {e}")
+        return None
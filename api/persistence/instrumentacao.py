@@ -0,0 +1,136 @@
+# api/persistence/instrumentacao.py
+"""
+Instrumentação do SQLAlchemy: conta statements e tempo de banco por
+requisição (via contextvar aberto pelo middleware) e registra o SQL mais
+lento de cada rota.
+"""
+import os
+import re
+import time
+import logging
+import threading
+from contextvars import ContextVar, Token
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from api.metricas import REGISTRO, BUCKETS_CONTAGEM
+
+logger = logging.getLogger(__name__)
+
+SQL_LENTO_S = float(os.getenv("DB_SQL_LENTO_MS", "200")) / 1000
+
+SQL_DURACAO = REGISTRO.histograma(
+    "db_statement_duracao_segundos", "Duração de cada statement SQL", ["operacao"]
+)
+SQL_POR_REQUISICAO = REGISTRO.histograma(
+    "db_statements_por_requisicao", "Statements SQL executados por requisição", ["rota"], BUCKETS_CONTAGEM
+)
+TEMPO_DB_POR_REQUISICAO = REGISTRO.histograma(
+    "db_tempo_por_requisicao_segundos", "Tempo total de banco por requisição", ["rota"]
+)
+SQL_MAIS_LENTO = REGISTRO.medidor(
+    "db_sql_mais_lento_segundos", "Statement mais lento já observado em cada rota", ["rota", "sql"]
+)
+
+_ESPACOS = re.compile(r"\s+")
+
+
+def _normalizar_sql(statement: str, limite: int = 200) -> str:
+    return _ESPACOS.sub(" ", statement).strip()[:limite]
+
+
+class EstatisticasSQL:
+    """
+    Acumulador por requisição. O mesmo objeto é visto pelo middleware e pelas
+    threads do threadpool, pois o contexto é copiado por referência.
+    """
+    __slots__ = ("statements", "tempo", "mais_lento_tempo", "mais_lento_sql")
+
+    def __init__(self):
+        self.statements = 0
+        self.tempo = 0.0
+        self.mais_lento_tempo = 0.0
+        self.mais_lento_sql: Optional[str] = None
+
+    def registrar(self, statement: str, duracao: float) -> None:
+        self.statements += 1
+        self.tempo += duracao
+        if duracao > self.mais_lento_tempo:
+            self.mais_lento_tempo = duracao
+            self.mais_lento_sql = statement
+
+
+_estatisticas: ContextVar[Optional[EstatisticasSQL]] = ContextVar("estatisticas_sql", default=None)
+
+_mais_lento_por_rota: Dict[str, Tuple[float, str]] = {}
+_lock_mais_lento = threading.Lock()
+
+# id() das engines com os eventos instalados (engines são singletons do módulo db)
+_engines_instrumentadas: Set[int] = set()
+
+
+def iniciar_estatisticas() -> Tuple[EstatisticasSQL, Token]:
+    estatisticas = EstatisticasSQL()
+    return estatisticas, _estatisticas.set(estatisticas)
+
+
+def encerrar_estatisticas(token: Token, rota: str) -> None:
+    estatisticas = _estatisticas.get()
+    _estatisticas.reset(token)
+    if estatisticas is None:
+        return
+
+    SQL_POR_REQUISICAO.observar(estatisticas.statements, rota=rota)
+    TEMPO_DB_POR_REQUISICAO.observar(estatisticas.tempo, rota=rota)
+
+    if estatisticas.mais_lento_sql is None:
+        return
+    with _lock_mais_lento:
+        anterior = _mais_lento_por_rota.get(rota)
+        if anterior and anterior[0] >= estatisticas.mais_lento_tempo:
+            return
+        sql = _normalizar_sql(estatisticas.mais_lento_sql)
+        if anterior:
+            SQL_MAIS_LENTO.remover(rota=rota, sql=anterior[1])
+        _mais_lento_por_rota[rota] = (estatisticas.mais_lento_tempo, sql)
+        SQL_MAIS_LENTO.set(estatisticas.mais_lento_tempo, rota=rota, sql=sql)
+
+
+def _antes_de_executar(conn, cursor, statement, parameters, context, executemany):
+    context._inicio_sql = time.perf_counter()
+
+
+def _depois_de_executar(conn, cursor, statement, parameters, context, executemany):
+    inicio = getattr(context, "_inicio_sql", None)
+    if inicio is None:
+        return
+    registrar_statement(statement, time.perf_counter() - inicio)
+
+
+def registrar_statement(statement: str, duracao: float) -> None:
+    """
+    Contabiliza um statement: chamado pelos eventos do SQLAlchemy e pelos
+    cursores preparados do driver (db.ComandoPreparado), que não passam por eles.
+    """
+    operacao = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "?"
+    SQL_DURACAO.observar(duracao, operacao=operacao)
+
+    estatisticas = _estatisticas.get()
+    if estatisticas is not None:
+        estatisticas.registrar(statement, duracao)
+
+    if duracao >= SQL_LENTO_S:
+        logger.warning(f"SQL lento ({duracao * 1000:.1f} ms): {_normalizar_sql(statement, 500)}")
+
+
+def instrumentada(engine: Engine) -> bool:
+    return id(engine) in _engines_instrumentadas
+
+
+def instrumentar_engine(engine: Engine) -> None:
+    _engines_instrumentadas.add(id(engine))
+    if not event.contains(engine, "before_cursor_execute", _antes_de_executar):
+        event.listen(engine, "before_cursor_execute", _antes_de_executar)
+        event.listen(engine, "after_cursor_execute", _depois_de_executar)
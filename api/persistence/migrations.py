@@ -0,0 +1,227 @@
+# api/persistence/migrations.py
+"""
+Runner de migrações versionadas.
+
+- Versão 1 é o data.sql (schema inicial + dados de exemplo).
+- As próximas ficam em migrations/VNNN__descricao.sql.
+- Cada script aplicado é registrado em schema_version com seu SHA-256;
+  alterar um script já aplicado é detectado e bloqueia a execução.
+
+Uso (uma vez por deploy, antes de subir os workers):
+    python -m api.persistence.migrations            # aplica pendentes
+    python -m api.persistence.migrations --status   # mostra versões
+"""
+import argparse
+import hashlib
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import ProgrammingError
+
+from api.persistence.db import BASE_DIR, engine, get_connection
+from api.persistence.sql_script import separar_statements
+
+
+MIGRATIONS_DIR = BASE_DIR / "migrations"
+SCRIPT_INICIAL = BASE_DIR / "data.sql"
+LOCK_NOME = "carteira_digital_migracoes"
+LOCK_TIMEOUT_S = 60
+
+_PADRAO_ARQUIVO = re.compile(r"^V(\d+)__(\w+)\.sql$")
+
+
+@dataclass(frozen=True)
+class Migracao:
+    versao: int
+    descricao: str
+    path: Path
+
+    @property
+    def checksum(self) -> str:
+        return hashlib.sha256(self.path.read_bytes()).hexdigest()
+
+
+def listar_migracoes() -> List[Migracao]:
+    """
+    Retorna todas as migrações conhecidas, ordenadas por versão.
+    """
+    migracoes = [Migracao(1, "schema_inicial", SCRIPT_INICIAL)]
+
+    if MIGRATIONS_DIR.is_dir():
+        for path in MIGRATIONS_DIR.glob("V*.sql"):
+            match = _PADRAO_ARQUIVO.match(path.name)
+            if not match:
+                raise RuntimeError(f"Nome de migração inválido: {path.name}")
+            migracoes.append(Migracao(int(match.group(1)), match.group(2), path))
+
+    migracoes.sort(key=lambda m: m.versao)
+    versoes = [m.versao for m in migracoes]
+    if len(set(versoes)) != len(versoes):
+        raise RuntimeError(f"Versões de migração duplicadas: {versoes}")
+    return migracoes
+
+
+def versao_esperada() -> int:
+    return listar_migracoes()[-1].versao
+
+
+def _criar_tabela_versao(conn: Connection) -> None:
+    conn.execute(
+        text("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                versao INT NOT NULL PRIMARY KEY,
+                descricao VARCHAR(200) NOT NULL,
+                checksum CHAR(64) NOT NULL,
+                aplicado_em DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+                duracao_ms INT NOT NULL
+            )
+        """)
+    )
+
+
+def _versoes_aplicadas(conn: Connection) -> Dict[int, str]:
+    rows = conn.execute(
+        text("SELECT versao, checksum FROM schema_version")
+    ).mappings().all()
+    return {r["versao"]: r["checksum"] for r in rows}
+
+
+def _banco_legado(conn: Connection) -> bool:
+    """
+    Bancos criados pelo antigo inicializar_banco já têm o schema inicial,
+    mas não têm schema_version.
+    """
+    row = conn.execute(
+        text("""
+            SELECT COUNT(*) AS total
+              FROM information_schema.tables
+             WHERE table_schema = DATABASE()
+               AND table_name = 'moeda'
+        """)
+    ).mappings().first()
+    return bool(row and row["total"])
+
+
+def _registrar(conn: Connection, migracao: Migracao, duracao_ms: int) -> None:
+    conn.execute(
+        text("""
+            INSERT INTO schema_version (versao, descricao, checksum, duracao_ms)
+            VALUES (:versao, :descricao, :checksum, :duracao_ms)
+        """),
+        {
+            "versao": migracao.versao,
+            "descricao": migracao.descricao,
+            "checksum": migracao.checksum,
+            "duracao_ms": duracao_ms,
+        },
+    )
+
+
+def aplicar_migracoes() -> List[int]:
+    """
+    Aplica as migrações pendentes, em ordem, sob um lock nomeado do MySQL
+    (execuções concorrentes esperam em vez de aplicar duas vezes).
+    Retorna as versões aplicadas.
+
+    Obs.: DDL no MySQL faz commit implícito, então cada script deve ser
+    idempotente o suficiente para ser reexecutado se falhar no meio.
+    """
+    aplicadas_agora: List[int] = []
+
+    with engine.connect() as conn:
+        with conn.begin():
+            obtido = conn.execute(
+                text("SELECT GET_LOCK(:nome, :timeout) AS obtido"),
+                {"nome": LOCK_NOME, "timeout": LOCK_TIMEOUT_S},
+            ).mappings().first()["obtido"]
+        if obtido != 1:
+            raise RuntimeError("Não foi possível obter o lock de migração")
+
+        try:
+            with conn.begin():
+                legado = _banco_legado(conn)
+                _criar_tabela_versao(conn)
+                aplicadas = _versoes_aplicadas(conn)
+
+                if not aplicadas and legado:
+                    _registrar(conn, listar_migracoes()[0], 0)
+                    aplicadas = _versoes_aplicadas(conn)
+
+            for migracao in listar_migracoes():
+                checksum = aplicadas.get(migracao.versao)
+                if checksum is not None:
+                    if checksum != migracao.checksum:
+                        raise RuntimeError(
+                            f"Checksum divergente na migração V{migracao.versao} "
+                            f"({migracao.path.name}): o script foi alterado após aplicado"
+                        )
+                    continue
+
+                inicio = time.perf_counter()
+                with conn.begin():
+                    with open(migracao.path, "r", encoding="utf-8") as f:
+                        for stmt in separar_statements(f.read()):
+                            conn.exec_driver_sql(stmt)
+                    duracao_ms = int((time.perf_counter() - inicio) * 1000)
+                    _registrar(conn, migracao, duracao_ms)
+                aplicadas_agora.append(migracao.versao)
+        finally:
+            with conn.begin():
+                conn.execute(text("SELECT RELEASE_LOCK(:nome)"), {"nome": LOCK_NOME})
+
+    return aplicadas_agora
+
+
+def versao_atual() -> int:
+    """
+    Versão do schema no banco (uma única consulta barata).
+    Retorna 0 se o banco ainda não foi migrado.
+    """
+    with get_connection() as conn:
+        try:
+            row = conn.execute(
+                text("SELECT MAX(versao) AS versao FROM schema_version")
+            ).mappings().first()
+        except ProgrammingError:
+            # schema_version ainda não existe
+            return 0
+    return int(row["versao"] or 0) if row else 0
+
+
+def verificar_schema() -> int:
+    """
+    Garante que o banco está na versão esperada pela aplicação.
+    """
+    atual = versao_atual()
+    esperada = versao_esperada()
+    if atual < esperada:
+        raise RuntimeError(
+            f"Schema desatualizado (versão {atual}, esperada {esperada}). "
+            "Execute: python -m api.persistence.migrations"
+        )
+    return atual
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--status", action="store_true", help="apenas mostra a versão atual e a esperada")
+    args = parser.parse_args()
+
+    if args.status:
+        print(f"versão atual: {versao_atual()} | esperada: {versao_esperada()}")
+        return
+
+    aplicadas = aplicar_migracoes()
+    if aplicadas:
+        print(f"Migrações aplicadas: {', '.join(f'V{v}' for v in aplicadas)}")
+    else:
+        print("Banco já está atualizado.")
+
+
+if __name__ == "__main__":
+    main()
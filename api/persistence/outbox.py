@@ -0,0 +1,450 @@
+# api/persistence/outbox.py
+"""
+Outbox transacional das movimentações (migrations/V003).
+
+- registrar_eventos() grava uma linha compacta por depósito, saque, conversão
+  ou transferência em outbox_evento, na mesma transação do lançamento.
+- RelayOutbox lê a tabela em ordem de id_evento e entrega lotes a um destino
+  plugável (OUTBOX_DESTINO: arquivo JSON lines, webhook ou fila em memória),
+  gravando em outbox_posicao o último id entregue.
+
+A entrega é "pelo menos uma vez": se o processo cair entre a entrega e a
+gravação da posição, o lote é reenviado; consumidores deduplicam por
+id_evento. Ids que ficaram para trás numa lacuna (transação que commitou
+depois da espera) são entregues fora de ordem quando aparecem, enquanto o
+relay os vigia. Só um relay fica ativo por banco (lock nomeado); nos demais
+workers ele fica esperando a vez.
+
+Uso fora da API:
+    python -m api.persistence.outbox            # relay contínuo
+    python -m api.persistence.outbox --status
+"""
+import os
+import json
+import math
+import time
+import queue
+import logging
+import argparse
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, create_engine, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.pool import NullPool
+
+from api.metricas import REGISTRO
+from api.persistence.db import BASE_DIR, DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+
+ENTREGUES = REGISTRO.contador(
+    "outbox_eventos_entregues_total", "Eventos do outbox entregues ao destino", ["destino"]
+)
+FALHAS = REGISTRO.contador(
+    "outbox_falhas_total", "Ciclos do relay do outbox que falharam", ["destino"]
+)
+ATRASO = REGISTRO.medidor(
+    "outbox_atraso_segundos", "Idade do último evento entregue pelo relay"
+)
+LACUNAS = REGISTRO.contador(
+    "outbox_ids_pulados_total", "Ids do outbox pulados após esperar a lacuna"
+)
+TARDIOS = REGISTRO.contador(
+    "outbox_eventos_tardios_total", "Eventos de ids pulados entregues fora de ordem"
+)
+VIGIADOS = REGISTRO.medidor(
+    "outbox_ids_vigiados", "Ids pulados que o relay ainda procura no outbox"
+)
+
+LOCK_NOME = "carteira_digital_outbox"
+
+# (tipo, id_referencia, endereco_carteira, data_hora, dados)
+Evento = Tuple[str, int, str, datetime, Dict[str, Any]]
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(obj).__name__}")
+
+
+def registrar_eventos(conn: Connection, eventos: Iterable[Evento]) -> None:
+    """
+    Grava os eventos no outbox usando a transação aberta em `conn`.
+    """
+    params = [
+        {
+            "tipo": tipo,
+            "id_referencia": id_referencia,
+            "endereco_carteira": endereco,
+            "data_hora": data_hora,
+            "payload": json.dumps(dados, default=_default, separators=(",", ":")),
+        }
+        for tipo, id_referencia, endereco, data_hora, dados in eventos
+    ]
+    if not params:
+        return
+    conn.execute(
+        text("""
+            INSERT INTO outbox_evento (tipo, id_referencia, endereco_carteira, data_hora, payload)
+            VALUES (:tipo, :id_referencia, :endereco_carteira, :data_hora, :payload)
+        """),
+        params,
+    )
+
+
+class DestinoArquivo:
+    """
+    Acrescenta os eventos, um JSON por linha, a um arquivo local.
+    """
+    nome = "arquivo"
+
+    def __init__(self, caminho: Path):
+        self.caminho = caminho
+
+    def entregar(self, eventos: List[Dict[str, Any]]) -> None:
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        linhas = "".join(
+            json.dumps(e, default=_default, ensure_ascii=False, separators=(",", ":")) + "\n"
+            for e in eventos
+        )
+        with open(self.caminho, "a", encoding="utf-8") as f:
+            f.write(linhas)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def fechar(self) -> None:
+        pass
+
+
+class DestinoWebhook:
+    """
+    POST de cada lote ({"eventos": [...]}) numa URL; qualquer status
+    diferente de 2xx faz o lote ser reenviado.
+    """
+    nome = "webhook"
+
+    def __init__(self, url: str, timeout_s: float = 10.0):
+        import httpx
+
+        self.url = url
+        self._cliente = httpx.Client(timeout=timeout_s)
+
+    def entregar(self, eventos: List[Dict[str, Any]]) -> None:
+        corpo = json.dumps({"eventos": eventos}, default=_default, separators=(",", ":"))
+        resposta = self._cliente.post(
+            self.url, content=corpo, headers={"Content-Type": "application/json"}
+        )
+        resposta.raise_for_status()
+
+    def fechar(self) -> None:
+        self._cliente.close()
+
+
+class DestinoFila:
+    """
+    Fila em memória: stub de um broker de mensagens, útil em testes.
+    Fila cheia conta como falha de entrega (o lote é reenviado depois).
+    """
+    nome = "fila"
+
+    def __init__(self, tamanho_maximo: int = 10_000):
+        self.fila: "queue.Queue[Dict[str, Any]]" = queue.Queue(tamanho_maximo)
+
+    def entregar(self, eventos: List[Dict[str, Any]]) -> None:
+        for evento in eventos:
+            self.fila.put(evento, timeout=5)
+
+    def fechar(self) -> None:
+        pass
+
+
+class RelayOutbox:
+    def __init__(
+        self,
+        destino: Any,
+        consumidor: str = "relay",
+        lote: int = 500,
+        intervalo_s: float = 0.2,
+        espera_lacuna_s: float = 60.0,
+        vigiar_pulados_s: float = 3600.0,
+        retencao_h: int = 168,
+        engine_relay: Optional[Engine] = None,
+    ):
+        """
+        espera_lacuna_s: ids de AUTO_INCREMENT são reservados no INSERT, mas
+        as transações podem commitar fora de ordem. Uma lacuna na sequência
+        segura a entrega por esse tempo, contado no relógio do relay desde
+        que ele viu a lacuna (nunca menos que innodb_lock_wait_timeout + 5 s,
+        para cobrir uma transação parada num lock); depois disso os ids são
+        pulados, com aviso no log.
+        vigiar_pulados_s: por quanto tempo os ids pulados são procurados de
+        novo a cada ciclo (um commit atrasado ainda é entregue); depois
+        disso são dados como rollback.
+        """
+        self.destino = destino
+        self.consumidor = consumidor
+        self.lote = lote
+        self.intervalo_s = intervalo_s
+        self.espera_lacuna_s = espera_lacuna_s
+        self.vigiar_pulados_s = vigiar_pulados_s
+        self.retencao_h = retencao_h
+        # Conexão própria, fora do pool da API: o lock nomeado vive na sessão
+        self._engine = engine_relay or create_engine(DATABASE_URL, future=True, poolclass=NullPool)
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._posicao = 0
+        self._incremento = 1
+        self._limpo_em = -math.inf
+        # id faltante -> quando o relay viu a lacuna (time.monotonic)
+        self._lacunas: Dict[int, float] = {}
+        # id pulado -> até quando procurá-lo (time.monotonic)
+        self._pulados: Dict[int, float] = {}
+
+    def iniciar(self) -> None:
+        self._thread = threading.Thread(target=self.executar, name="relay-outbox", daemon=True)
+        self._thread.start()
+
+    def fechar(self, timeout: float = 5.0) -> None:
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.destino.fechar()
+
+    def executar(self) -> None:
+        """
+        Laço do relay: espera o lock, lê a posição e drena o outbox até fechar().
+        """
+        while not self._parar.is_set():
+            try:
+                with self._engine.connect() as conn:
+                    if not self._obter_lock(conn):
+                        self._parar.wait(max(self.intervalo_s, 1.0))
+                        continue
+                    self._carregar_posicao(conn)
+                    while not self._parar.is_set():
+                        if self.drenar(conn) < self.lote:
+                            self._limpar(conn)
+                            self._parar.wait(self.intervalo_s)
+            except Exception as e:
+                FALHAS.inc(destino=self.destino.nome)
+                logger.warning(f"Relay do outbox falhou, tentando de novo: {e}")
+                self._parar.wait(max(self.intervalo_s, 1.0))
+
+    def _obter_lock(self, conn: Connection) -> bool:
+        with conn.begin():
+            return conn.execute(
+                text("SELECT GET_LOCK(:nome, 0)"), {"nome": LOCK_NOME}
+            ).scalar() == 1
+
+    def _carregar_posicao(self, conn: Connection) -> None:
+        with conn.begin():
+            self._incremento = int(conn.execute(text("SELECT @@auto_increment_increment")).scalar())
+            espera_lock = int(conn.execute(text("SELECT @@innodb_lock_wait_timeout")).scalar())
+            if self.espera_lacuna_s < espera_lock + 5:
+                logger.info(
+                    f"Espera por lacunas do outbox elevada de {self.espera_lacuna_s:g}s para {espera_lock + 5}s "
+                    "(innodb_lock_wait_timeout + 5 s)"
+                )
+                self.espera_lacuna_s = espera_lock + 5
+            conn.execute(
+                text("INSERT IGNORE INTO outbox_posicao (consumidor, ultimo_id) VALUES (:consumidor, 0)"),
+                {"consumidor": self.consumidor},
+            )
+            self._posicao = int(conn.execute(
+                text("SELECT ultimo_id FROM outbox_posicao WHERE consumidor = :consumidor"),
+                {"consumidor": self.consumidor},
+            ).scalar())
+
+    @staticmethod
+    def _evento(row: Any) -> Dict[str, Any]:
+        return {
+            "id_evento": row["id_evento"],
+            "tipo": row["tipo"],
+            "id_referencia": row["id_referencia"],
+            "endereco_carteira": row["endereco_carteira"],
+            "data_hora": row["data_hora"],
+            "dados": json.loads(row["payload"]),
+        }
+
+    def _pular(self, ids: range, agora: float) -> None:
+        for id_evento in ids:
+            self._lacunas.pop(id_evento, None)
+            self._pulados[id_evento] = agora + self.vigiar_pulados_s
+        LACUNAS.inc(len(ids))
+        VIGIADOS.set(len(self._pulados))
+        logger.warning(
+            f"Outbox: ids {ids.start}..{ids[-1]} ausentes há {self.espera_lacuna_s:g}s, pulados; "
+            f"serão entregues fora de ordem se aparecerem nos próximos {self.vigiar_pulados_s:g}s"
+        )
+
+    def _entregar_pulados(self, conn: Connection) -> int:
+        """
+        Procura os ids pulados que ainda estão sendo vigiados e entrega os que
+        apareceram (commit depois da espera da lacuna).
+        """
+        agora = time.monotonic()
+        for id_evento, ate in list(self._pulados.items()):
+            if ate <= agora:
+                del self._pulados[id_evento]
+                logger.warning(f"Outbox: id {id_evento} não apareceu; tratado como rollback")
+        VIGIADOS.set(len(self._pulados))
+        if not self._pulados:
+            return 0
+
+        with conn.begin():
+            rows = conn.execute(
+                text("""
+                    SELECT id_evento, tipo, id_referencia, endereco_carteira, data_hora, payload
+                      FROM outbox_evento
+                     WHERE id_evento IN :ids
+                     ORDER BY id_evento
+                """).bindparams(bindparam("ids", expanding=True)),
+                {"ids": list(self._pulados)},
+            ).mappings().all()
+        if not rows:
+            return 0
+
+        self.destino.entregar([self._evento(row) for row in rows])
+        for row in rows:
+            del self._pulados[row["id_evento"]]
+        VIGIADOS.set(len(self._pulados))
+        TARDIOS.inc(len(rows))
+        ENTREGUES.inc(len(rows), destino=self.destino.nome)
+        logger.warning(f"Outbox: {len(rows)} eventos pulados entregues fora de ordem")
+        return len(rows)
+
+    def drenar(self, conn: Connection) -> int:
+        """
+        Entrega o próximo lote e avança a posição. Retorna os eventos entregues.
+        """
+        self._entregar_pulados(conn)
+        with conn.begin():
+            rows = conn.execute(
+                text("""
+                    SELECT id_evento, tipo, id_referencia, endereco_carteira, data_hora, payload,
+                           TIMESTAMPDIFF(SECOND, data_hora, CURRENT_TIMESTAMP) AS idade_s
+                      FROM outbox_evento
+                     WHERE id_evento > :posicao
+                     ORDER BY id_evento
+                     LIMIT :lote
+                """),
+                {"posicao": self._posicao, "lote": self.lote},
+            ).mappings().all()
+
+        eventos: List[Dict[str, Any]] = []
+        esperado = self._posicao + self._incremento
+        agora = time.monotonic()
+        for row in rows:
+            if row["id_evento"] != esperado:
+                faltantes = range(esperado, row["id_evento"], self._incremento)
+                for id_evento in faltantes:
+                    self._lacunas.setdefault(id_evento, agora)
+                if agora - self._lacunas[esperado] < self.espera_lacuna_s:
+                    break
+                self._pular(faltantes, agora)
+            eventos.append(self._evento(row))
+            esperado = row["id_evento"] + self._incremento
+        if not eventos:
+            return 0
+
+        self.destino.entregar(eventos)
+        ultimo = eventos[-1]["id_evento"]
+        with conn.begin():
+            conn.execute(
+                text("UPDATE outbox_posicao SET ultimo_id = :ultimo WHERE consumidor = :consumidor"),
+                {"ultimo": ultimo, "consumidor": self.consumidor},
+            )
+        self._posicao = ultimo
+        for id_evento in [i for i in self._lacunas if i <= ultimo]:
+            del self._lacunas[id_evento]
+        ENTREGUES.inc(len(eventos), destino=self.destino.nome)
+        ATRASO.set(rows[len(eventos) - 1]["idade_s"])
+        return len(eventos)
+
+    def _limpar(self, conn: Connection) -> None:
+        """
+        Remove, no máximo uma vez por minuto, eventos já entregues mais
+        antigos que retencao_h horas.
+        """
+        agora = time.monotonic()
+        if not self.retencao_h or agora - self._limpo_em < 60:
+            return
+        self._limpo_em = agora
+        with conn.begin():
+            conn.execute(
+                text("""
+                    DELETE FROM outbox_evento
+                     WHERE id_evento <= :posicao
+                       AND data_hora < CURRENT_TIMESTAMP - INTERVAL :horas HOUR
+                     LIMIT 10000
+                """),
+                {"posicao": self._posicao, "horas": self.retencao_h},
+            )
+
+
+def criar_destino(nome: str) -> Any:
+    if nome == "arquivo":
+        return DestinoArquivo(Path(os.getenv("OUTBOX_ARQUIVO", str(BASE_DIR / "outbox" / "eventos.jsonl"))))
+    if nome == "webhook":
+        url = os.getenv("OUTBOX_WEBHOOK_URL")
+        if not url:
+            raise RuntimeError("OUTBOX_DESTINO=webhook requer OUTBOX_WEBHOOK_URL")
+        return DestinoWebhook(url)
+    if nome == "fila":
+        return DestinoFila()
+    raise RuntimeError(f"OUTBOX_DESTINO inválido: {nome} (use arquivo, webhook, fila ou desligado)")
+
+
+def criar_relay() -> Optional[RelayOutbox]:
+    """
+    Relay configurado pelo .env; None com OUTBOX_DESTINO=desligado.
+    """
+    nome = os.getenv("OUTBOX_DESTINO", "arquivo").strip().lower()
+    if nome == "desligado":
+        return None
+    return RelayOutbox(
+        criar_destino(nome),
+        consumidor=os.getenv("OUTBOX_CONSUMIDOR", "relay"),
+        lote=int(os.getenv("OUTBOX_LOTE", "500")),
+        intervalo_s=int(os.getenv("OUTBOX_INTERVALO_MS", "200")) / 1000,
+        espera_lacuna_s=float(os.getenv("OUTBOX_ESPERA_LACUNA_S", "60")),
+        vigiar_pulados_s=float(os.getenv("OUTBOX_VIGIAR_PULADOS_S", "3600")),
+        retencao_h=int(os.getenv("OUTBOX_RETENCAO_H", "168")),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--status", action="store_true", help="mostra a posição de cada consumidor")
+    args = parser.parse_args()
+
+    if args.status:
+        from api.persistence.db import get_connection
+
+        with get_connection() as conn:
+            maximo = conn.execute(text("SELECT COALESCE(MAX(id_evento), 0) FROM outbox_evento")).scalar()
+            rows = conn.execute(text("SELECT consumidor, ultimo_id, atualizado_em FROM outbox_posicao")).mappings().all()
+        print(f"último evento: {maximo}")
+        for r in rows:
+            print(f"  {r['consumidor']}: {r['ultimo_id']} ({maximo - r['ultimo_id']} pendentes, {r['atualizado_em']})")
+        return
+
+    relay = criar_relay()
+    if relay is None:
+        raise SystemExit("OUTBOX_DESTINO=desligado")
+    try:
+        relay.executar()
+    except KeyboardInterrupt:
+        relay.fechar()
+
+
+if __name__ == "__main__":
+    main()
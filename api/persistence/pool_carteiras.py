@@ -0,0 +1,214 @@
+# api/persistence/pool_carteiras.py
+"""
+Pool de carteiras pré-criadas (opcional, CARTEIRA_POOL_TAMANHO > 0).
+
+Uma thread gera chaves e insere carteiras com status RESERVADA em lotes
+(migrations/V005), mantendo até CARTEIRA_POOL_TAMANHO por worker. Quando o
+pool cai para CARTEIRA_POOL_MINIMO, ela o completa de novo. POST /carteiras
+retira uma carteira da fila em memória e a ativa com um único UPDATE
+atômico (status RESERVADA -> ATIVA), sem gerar chave nem inserir na hora.
+Com o pool vazio, a criação segue o caminho normal.
+
+O banco só guarda o hash da chave privada: a chave em claro de uma
+carteira reservada existe apenas na fila em memória deste worker. Reservas
+cujo worker morreu ficam órfãs e são apagadas depois de
+CARTEIRA_POOL_VALIDADE_H horas; a fila descarta as suas antes da metade
+desse prazo, para nunca entregar uma carteira prestes a ser apagada.
+"""
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from api.metricas import REGISTRO
+
+logger = logging.getLogger(__name__)
+
+
+DISPONIVEIS = REGISTRO.medidor(
+    "carteira_pool_disponiveis", "Carteiras reservadas prontas na fila do worker"
+)
+RESERVADAS = REGISTRO.contador(
+    "carteira_pool_reservadas_total", "Carteiras reservadas inseridas pelo pool"
+)
+RETIRADAS = REGISTRO.contador(
+    "carteira_pool_retiradas_total", "Criações de carteira por origem", ["origem"]
+)
+FALHAS = REGISTRO.contador(
+    "carteira_pool_falhas_total", "Falhas ao repor o pool ou ativar uma carteira reservada"
+)
+
+# (endereco, chave_privada, hash_chave_privada)
+Chaves = Tuple[str, str, str]
+
+LIMPEZA_INTERVALO_S = 3600
+
+
+class PoolCarteiras:
+    def __init__(
+        self,
+        gerar_chaves: Callable[[], Chaves],
+        reservar: Callable[[List[Tuple[str, str]]], None],
+        ativar: Callable[[str], Optional[Dict[str, Any]]],
+        remover_expiradas: Callable[[float], int],
+        remover: Callable[[List[str]], int],
+        tamanho: int,
+        minimo: int,
+        lote: int,
+        validade_s: float,
+    ):
+        """
+        reservar: insere (endereco, hash) como RESERVADA numa transação.
+        ativar: UPDATE RESERVADA -> ATIVA; None se a reserva não existe mais.
+        remover_expiradas: apaga reservas mais velhas que N segundos.
+        remover: apaga as reservas informadas (fila descartada no shutdown).
+        """
+        self.gerar_chaves = gerar_chaves
+        self.reservar = reservar
+        self.ativar = ativar
+        self.remover_expiradas = remover_expiradas
+        self.remover = remover
+        self.tamanho = tamanho
+        self.minimo = min(minimo, tamanho)
+        self.lote = max(lote, 1)
+        self.validade_s = validade_s
+        self._fila: Deque[Tuple[Chaves, float]] = deque()
+        self._repor = threading.Event()
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # Protege a fila: retirar (threads das requisições) e a thread de
+        # reposição leem a idade e tiram o item na mesma operação
+        self._lock_fila = threading.Lock()
+        self._limpo_em = -float("inf")
+
+    @property
+    def disponiveis(self) -> int:
+        return len(self._fila)
+
+    def iniciar(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._parar.clear()
+                self._thread = threading.Thread(target=self._executar, name="pool-carteiras", daemon=True)
+                self._thread.start()
+
+    def fechar(self, timeout: float = 5.0) -> None:
+        self._parar.set()
+        self._repor.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        with self._lock_fila:
+            restantes = [endereco for (endereco, _, _), _ in self._fila]
+            self._fila.clear()
+        DISPONIVEIS.set(0)
+        if restantes:
+            try:
+                self.remover(restantes)
+            except Exception as e:
+                logger.warning(f"Falha ao apagar {len(restantes)} carteiras reservadas: {e}")
+
+    def _proxima(self) -> Optional[Chaves]:
+        """
+        Tira da fila a próxima reserva dentro da validade (as vencidas são
+        descartadas; a limpeza de reservas expiradas apaga as linhas).
+        """
+        limite = time.monotonic() - self.validade_s / 2
+        with self._lock_fila:
+            while self._fila:
+                chaves, reservada_em = self._fila.popleft()
+                if reservada_em >= limite:
+                    return chaves
+        return None
+
+    def retirar(self) -> Optional[Dict[str, Any]]:
+        """
+        Ativa uma carteira da fila e devolve seus dados com a chave privada.
+        None com a fila vazia ou se a ativação falhar (o chamador cria do
+        jeito normal).
+        """
+        self.iniciar()
+        while True:
+            chaves = self._proxima()
+            if chaves is None:
+                carteira = None
+                break
+            endereco, chave_privada, _ = chaves
+            try:
+                carteira = self.ativar(endereco)
+            except Exception as e:
+                # A reserva fica órfã e é apagada pela limpeza de expiradas
+                FALHAS.inc()
+                logger.warning(f"Falha ao ativar carteira reservada {endereco}: {e}")
+                carteira = None
+                break
+            if carteira is not None:
+                carteira["chave_privada"] = chave_privada
+                break
+
+        DISPONIVEIS.set(len(self._fila))
+        if len(self._fila) <= self.minimo:
+            self._repor.set()
+        RETIRADAS.inc(origem="pool" if carteira else "direto")
+        return carteira
+
+    def _completar(self) -> None:
+        while not self._parar.is_set() and len(self._fila) < self.tamanho:
+            quantidade = min(self.lote, self.tamanho - len(self._fila))
+            chaves = [self.gerar_chaves() for _ in range(quantidade)]
+            self.reservar([(endereco, hash_privada) for endereco, _, hash_privada in chaves])
+            agora = time.monotonic()
+            with self._lock_fila:
+                self._fila.extend((c, agora) for c in chaves)
+            RESERVADAS.inc(quantidade)
+            DISPONIVEIS.set(len(self._fila))
+
+    def _descartar_velhas(self) -> None:
+        limite = time.monotonic() - self.validade_s / 2
+        with self._lock_fila:
+            while self._fila and self._fila[0][1] < limite:
+                self._fila.popleft()
+        DISPONIVEIS.set(len(self._fila))
+
+    def _executar(self) -> None:
+        while not self._parar.is_set():
+            try:
+                if time.monotonic() - self._limpo_em >= LIMPEZA_INTERVALO_S:
+                    removidas = self.remover_expiradas(self.validade_s)
+                    self._limpo_em = time.monotonic()
+                    if removidas:
+                        logger.info(f"Pool de carteiras: {removidas} reservas expiradas apagadas")
+                self._descartar_velhas()
+                if len(self._fila) <= self.minimo:
+                    self._completar()
+            except Exception as e:
+                FALHAS.inc()
+                logger.warning(f"Falha ao repor o pool de carteiras: {e}")
+                self._parar.wait(5)
+                continue
+            self._repor.wait(60)
+            self._repor.clear()
+
+
+def criar_pool_carteiras(
+    gerar_chaves: Callable[[], Chaves],
+    reservar: Callable[[List[Tuple[str, str]]], None],
+    ativar: Callable[[str], Optional[Dict[str, Any]]],
+    remover_expiradas: Callable[[float], int],
+    remover: Callable[[List[str]], int],
+) -> Optional[PoolCarteiras]:
+    """
+    Pool configurado pelo .env; None com CARTEIRA_POOL_TAMANHO=0 (padrão).
+    """
+    tamanho = int(os.getenv("CARTEIRA_POOL_TAMANHO", "0"))
+    if tamanho <= 0:
+        return None
+    return PoolCarteiras(
+        gerar_chaves, reservar, ativar, remover_expiradas, remover,
+        tamanho=tamanho,
+        minimo=int(os.getenv("CARTEIRA_POOL_MINIMO") or tamanho // 4),
+        lote=int(os.getenv("CARTEIRA_POOL_LOTE", "100")),
+        validade_s=float(os.getenv("CARTEIRA_POOL_VALIDADE_H", "24")) * 3600,
+    )
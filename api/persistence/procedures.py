@@ -0,0 +1,39 @@
+# api/persistence/procedures.py
+import os
+from pathlib import Path
+
+from api.persistence.db import BASE_DIR, get_connection
+from api.persistence.sql_script import separar_statements
+
+
+PROCEDURES_VERSAO = 1
+PROCEDURES_PATH = BASE_DIR / f"procedures_v{PROCEDURES_VERSAO}.sql"
+
+
+def usar_procedures() -> bool:
+    """
+    Indica se transferências e conversões devem rodar como stored procedures
+    (DB_USAR_PROCEDURES=true no .env).
+    """
+    return os.getenv("DB_USAR_PROCEDURES", "false").strip().lower() in ("1", "true", "sim")
+
+
+def instalar_procedures(path: Path = PROCEDURES_PATH) -> int:
+    """
+    Instala (ou reinstala) as stored procedures do arquivo versionado.
+    Exige um usuário com privilégio CREATE ROUTINE.
+    Retorna a quantidade de statements executados.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        statements = separar_statements(f.read())
+
+    with get_connection() as conn:
+        for stmt in statements:
+            conn.exec_driver_sql(stmt)
+
+    return len(statements)
+
+
+if __name__ == "__main__":
+    total = instalar_procedures()
+    print(f"{PROCEDURES_PATH.name}: {total} statements executados")
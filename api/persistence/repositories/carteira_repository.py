@@ -1,53 +1,597 @@
 # api/persistence/repositories/carteira_repository.py
 import os
+import hmac
 import secrets
 import hashlib
-from typing import Dict, Any, Optional, List
+from datetime import datetime
+from functools import lru_cache
+from typing import Callable, Dict, Any, Iterator, Optional, List, Set, Tuple
 from decimal import Decimal
 
-from sqlalchemy import text
+from sqlalchemy import Integer, String, bindparam, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.sql.elements import TextClause
+from sqlalchemy.types import TupleType
 
 from api.models.carteira_models import SaldoCarteira
-from api.persistence.db import get_connection
+from api.persistence.db import ComandoPreparado, cursor_servidor, get_connection
+from api.persistence.arquivamento import exigir_leitura_parquet, historico_em_parquet, transferencias_em_parquet
+from api.persistence.cache_chaves import CACHE_CHAVES, CacheChavesVerificadas
+from api.persistence.commit_em_grupo import AgrupadorDepositos, CommitIncertoError, criar_agrupador
+from api.persistence.outbox import registrar_eventos
+from api.persistence.pool_carteiras import PoolCarteiras, criar_pool_carteiras
+from api.persistence.roteamento_leitura import ROTEADOR_LEITURA, RoteadorLeitura
+from api.persistence.procedures import PROCEDURES_VERSAO, usar_procedures as usar_procedures_env
+
+
+def _mensagem_signal(e: DBAPIError) -> Optional[str]:
+    """
+    Extrai a mensagem de um SIGNAL SQLSTATE '45000' disparado pelas procedures
+    (erros de regra de negócio). Retorna None para os demais erros.
+    """
+    orig = getattr(e, "orig", None)
+    if getattr(orig, "sqlstate", None) == "45000":
+        return getattr(orig, "msg", None) or str(orig)
+    return None
+
+
+# Colunas das tuplas produzidas por CarteiraRepository.iterar_historico
+COLUNAS_HISTORICO = (
+    "origem", "id", "tipo", "data_hora", "id_moeda", "valor", "taxa_valor",
+    "taxa_percentual", "endereco_contraparte", "id_moeda_destino", "valor_destino",
+    "cotacao_utilizada",
+)
+
+# Colunas de transferencia_agendada devolvidas pela API e as que podem ser
+# alteradas depois da criação
+COLUNAS_AGENDAMENTO = (
+    "id_agendamento, endereco_origem, endereco_destino, id_moeda, valor, periodicidade, "
+    "data_inicio, data_fim, proxima_ocorrencia, proxima_execucao, jitter_s, status, execucoes, "
+    "falhas_consecutivas, ultima_execucao, id_ultima_transferencia, ultimo_erro, data_criacao"
+)
+COLUNAS_AGENDAMENTO_EDITAVEIS = {
+    "valor", "status", "data_fim", "proxima_ocorrencia", "proxima_execucao", "falhas_consecutivas",
+}
+
+
+SQL_INSERIR_CARTEIRA = text("""
+    INSERT INTO carteira (endereco_carteira, hash_chave_privada)
+    VALUES (:endereco, :hash_privada)
+""")
+
+SQL_CARTEIRA_CRIADA = text("""
+    SELECT endereco_carteira,
+           data_criacao,
+           status,
+           hash_chave_privada
+      FROM carteira
+     WHERE endereco_carteira = :endereco
+""")
+
+SQL_RESERVAR_CARTEIRA = text("""
+    INSERT INTO carteira (endereco_carteira, hash_chave_privada, status)
+    VALUES (:endereco, :hash_privada, 'RESERVADA')
+""")
+
+SQL_ATIVAR_RESERVADA = text("""
+    UPDATE carteira
+       SET status = 'ATIVA', data_criacao = :data_criacao
+     WHERE endereco_carteira = :endereco AND status = 'RESERVADA'
+""")
+
+SQL_REMOVER_RESERVADAS_EXPIRADAS = text("""
+    DELETE FROM carteira
+     WHERE status = 'RESERVADA'
+       AND data_criacao < NOW() - INTERVAL :validade_s SECOND
+""")
+
+SQL_REMOVER_RESERVADAS = text("""
+    DELETE FROM carteira
+     WHERE status = 'RESERVADA' AND endereco_carteira IN :enderecos
+""").bindparams(bindparam("enderecos", expanding=True))
+
+SQL_CARTEIRA_POR_ENDERECO = text("""
+    SELECT endereco_carteira,
+           data_criacao,
+           status,
+           hash_chave_privada
+      FROM carteira
+     WHERE endereco_carteira = :endereco AND status <> 'RESERVADA'
+""")
+
+SQL_LISTAR_CARTEIRAS = text("""
+    SELECT endereco_carteira,
+           data_criacao,
+           status,
+           hash_chave_privada
+      FROM carteira
+     WHERE status <> 'RESERVADA'
+""")
+
+SQL_LISTAR_RESUMO_CARTEIRAS = text("""
+    SELECT endereco_carteira,
+           data_criacao,
+           status
+      FROM carteira
+     WHERE status <> 'RESERVADA'
+""")
+
+SQL_ATUALIZAR_STATUS_CARTEIRA = text("""
+    UPDATE carteira
+       SET status = :status
+     WHERE endereco_carteira = :endereco AND status <> 'RESERVADA'
+""")
+
+SQL_SALDO_CARTEIRA_MOEDA = text("""
+    SELECT endereco_carteira, id_moeda, saldo, data_atualizacao
+    FROM saldo_carteira
+    WHERE endereco_carteira = :endereco_carteira AND id_moeda = :id_moeda
+""")
+
+SQL_SALDOS_CARTEIRA = text("""
+    SELECT endereco_carteira, id_moeda, saldo, data_atualizacao
+    FROM saldo_carteira
+    WHERE endereco_carteira = :endereco_carteira
+""")
+
+SQL_SALDOS_COLUNAS = text("""
+    SELECT c.endereco_carteira, s.id_moeda, CAST(s.saldo AS DOUBLE) AS saldo
+      FROM carteira c
+      LEFT JOIN saldo_carteira s ON s.endereco_carteira = c.endereco_carteira
+     WHERE c.endereco_carteira IN :enderecos AND c.status <> 'RESERVADA'
+""").bindparams(bindparam("enderecos", expanding=True))
+
+SQL_INSERIR_DEPOSITO = ComandoPreparado("""
+    INSERT INTO deposito_saque
+    (endereco_carteira, id_moeda, tipo, valor, taxa_valor, data_hora)
+    VALUES (:endereco_carteira, :id_moeda, 'DEPOSITO', :valor, :valor_liquido, CURRENT_TIMESTAMP)
+""")
+
+SQL_DATA_MOVIMENTO = text("""
+    SELECT data_hora
+    FROM deposito_saque
+    WHERE id_movimento = :id
+""")
+
+SQL_SOMAR_SALDO = ComandoPreparado("""
+    INSERT INTO saldo_carteira
+    (endereco_carteira, id_moeda, saldo, data_atualizacao)
+    VALUES (:endereco_carteira, :id_moeda, :valor, CURRENT_TIMESTAMP)
+    ON DUPLICATE KEY UPDATE
+        saldo = saldo + :valor,
+        data_atualizacao = CURRENT_TIMESTAMP
+""")
+
+SQL_SALDO_ATUAL = ComandoPreparado("""
+    SELECT saldo FROM saldo_carteira
+    WHERE endereco_carteira = :endereco_carteira AND id_moeda = :id_moeda
+""")
+
+SQL_DATA_HORA_ATUAL = text("SELECT CURRENT_TIMESTAMP")
+
+SQL_SALDOS_LOTE = text("""
+    SELECT endereco_carteira, id_moeda, saldo
+    FROM saldo_carteira
+    WHERE (endereco_carteira, id_moeda) IN :chaves
+""").bindparams(bindparam("chaves", expanding=True, type_=TupleType(String(), Integer())))
+
+SQL_INSERIR_DEPOSITO_LOTE = ComandoPreparado("""
+    INSERT INTO deposito_saque
+    (endereco_carteira, id_moeda, tipo, valor, taxa_valor, data_hora)
+    VALUES (:endereco_carteira, :id_moeda, 'DEPOSITO', :valor, :valor, :data_hora)
+""")
+
+SQL_INSERIR_SAQUE = ComandoPreparado("""
+    INSERT INTO deposito_saque
+    (endereco_carteira, id_moeda, tipo, valor, taxa_valor, data_hora)
+    VALUES (:endereco_carteira, :id_moeda, 'SAQUE', :valor, :taxa_valor, CURRENT_TIMESTAMP)
+""")
+
+SQL_DEBITAR_SALDO_SAQUE = ComandoPreparado("""
+    UPDATE saldo_carteira
+    SET saldo = saldo - :taxa_valor,
+        data_atualizacao = CURRENT_TIMESTAMP
+    WHERE endereco_carteira = :endereco_carteira AND id_moeda = :id_moeda
+""")
+
+SQL_LISTAR_MOEDAS = text("""
+    SELECT id_moeda, codigo, nome, tipo
+    FROM moeda
+""")
+
+SQL_CODIGO_MOEDA = text("""
+    SELECT codigo FROM moeda WHERE id_moeda = :id_moeda
+""")
+
+SQL_MOEDA_POR_CODIGO = text("""
+    SELECT id_moeda, codigo, nome, tipo
+    FROM moeda WHERE codigo = :codigo
+""")
+
+SQL_INICIAR_TRANSACAO = text("START TRANSACTION")
+
+SQL_STATUS_CARTEIRA_CONVERSAO = text("""
+    SELECT status FROM carteira
+    WHERE endereco_carteira = :endereco_carteira
+""")
+
+SQL_SALDO_ORIGEM_CONVERSAO = text("""
+    SELECT saldo FROM saldo_carteira
+    WHERE endereco_carteira = :endereco_carteira
+    AND id_moeda = :id_moeda_origem
+""")
+
+SQL_DEBITAR_SALDO_CONVERSAO = text("""
+    UPDATE saldo_carteira
+    SET saldo = saldo - :valor_origem,
+        data_atualizacao = CURRENT_TIMESTAMP
+    WHERE endereco_carteira = :endereco_carteira
+    AND id_moeda = :id_moeda_origem
+""")
+
+SQL_SALDO_DESTINO_CONVERSAO = text("""
+    SELECT saldo FROM saldo_carteira
+    WHERE endereco_carteira = :endereco_carteira
+    AND id_moeda = :id_moeda_destino
+""")
+
+SQL_CREDITAR_SALDO_CONVERSAO = text("""
+    UPDATE saldo_carteira
+    SET saldo = saldo + :valor_destino,
+        data_atualizacao = CURRENT_TIMESTAMP
+    WHERE endereco_carteira = :endereco_carteira
+    AND id_moeda = :id_moeda_destino
+""")
+
+SQL_INSERIR_SALDO_CONVERSAO = text("""
+    INSERT INTO saldo_carteira
+    (endereco_carteira, id_moeda, saldo, data_atualizacao)
+    VALUES (:endereco_carteira, :id_moeda_destino, :valor_destino, CURRENT_TIMESTAMP)
+""")
+
+SQL_INSERIR_CONVERSAO = text("""
+    INSERT INTO conversao
+    (endereco_carteira, id_moeda_origem, id_moeda_destino,
+     valor_origem, valor_destino, taxa_percentual, cotacao_utilizada)
+    VALUES (:endereco_carteira, :id_moeda_origem, :id_moeda_destino,
+            :valor_origem, :valor_destino, :taxa_percentual, :cotacao_utilizada)
+""")
+
+SQL_INSERIR_SAQUE_CONVERSAO = text("""
+    INSERT INTO deposito_saque
+    (endereco_carteira, id_moeda, tipo, valor, taxa_valor, data_hora)
+    VALUES (:endereco_carteira, :id_moeda, 'SAQUE', :valor, :valor_liquido, CURRENT_TIMESTAMP)
+""")
+
+SQL_DATA_CONVERSAO = text("""
+    SELECT data_hora FROM conversao
+    WHERE id_conversao = :id_conversao
+""")
+
+SQL_CONFIRMAR_TRANSACAO = text("COMMIT")
+
+SQL_DESFAZER_TRANSACAO = text("ROLLBACK")
+
+SQL_STATUS_CARTEIRA = text("""
+    SELECT status FROM carteira
+    WHERE endereco_carteira = :endereco
+""")
+
+SQL_SALDO_TRANSFERENCIA = ComandoPreparado("""
+    SELECT saldo FROM saldo_carteira
+    WHERE endereco_carteira = :endereco AND id_moeda = :id_moeda
+""")
+
+SQL_DEBITAR_SALDO_TRANSFERENCIA = ComandoPreparado("""
+    UPDATE saldo_carteira
+    SET saldo = saldo - :valor_total,
+        data_atualizacao = CURRENT_TIMESTAMP
+    WHERE endereco_carteira = :endereco_origem
+    AND id_moeda = :id_moeda
+""")
+
+SQL_CREDITAR_SALDO_TRANSFERENCIA = ComandoPreparado("""
+    UPDATE saldo_carteira
+    SET saldo = saldo + :valor,
+        data_atualizacao = CURRENT_TIMESTAMP
+    WHERE endereco_carteira = :endereco_destino
+    AND id_moeda = :id_moeda
+""")
+
+SQL_INSERIR_SALDO_TRANSFERENCIA = text("""
+    INSERT INTO saldo_carteira
+    (endereco_carteira, id_moeda, saldo, data_atualizacao)
+    VALUES (:endereco_destino, :id_moeda, :valor, CURRENT_TIMESTAMP)
+""")
+
+SQL_INSERIR_TRANSFERENCIA = text("""
+    INSERT INTO transferencia
+    (endereco_origem, endereco_destino, id_moeda, valor, taxa_valor, data_hora)
+    VALUES (:endereco_origem, :endereco_destino, :id_moeda, :valor, :taxa_valor, CURRENT_TIMESTAMP)
+""")
+
+SQL_INSERIR_SAQUE_TRANSFERENCIA = ComandoPreparado("""
+    INSERT INTO deposito_saque
+    (endereco_carteira, id_moeda, tipo, valor, taxa_valor, data_hora)
+    VALUES (:endereco, :id_moeda, 'SAQUE', :valor, :taxa_valor, CURRENT_TIMESTAMP)
+""")
+
+SQL_INSERIR_DEPOSITO_TRANSFERENCIA = ComandoPreparado("""
+    INSERT INTO deposito_saque
+    (endereco_carteira, id_moeda, tipo, valor, taxa_valor, data_hora)
+    VALUES (:endereco, :id_moeda, 'DEPOSITO', :valor, :valor, CURRENT_TIMESTAMP)
+""")
+
+SQL_DATA_TRANSFERENCIA = text("""
+    SELECT data_hora FROM transferencia
+    WHERE id_transferencia = :id_transferencia
+""")
+
+SQL_CHAMAR_SP_CONVERSAO = text(f"""
+    CALL sp_registrar_conversao_v{PROCEDURES_VERSAO}(
+        :endereco_carteira, :id_moeda_origem, :id_moeda_destino,
+        :valor_origem, :valor_destino, :taxa_percentual, :cotacao_utilizada,
+        @id_conversao, @saldo_origem_final, @saldo_destino_final, @data_hora
+    )
+""")
+
+SQL_RESULTADO_SP_CONVERSAO = text("""
+    SELECT @id_conversao AS id_conversao,
+           @saldo_origem_final AS saldo_origem_final,
+           @saldo_destino_final AS saldo_destino_final,
+           CAST(@data_hora AS DATETIME) AS data_hora
+""")
+
+SQL_CHAMAR_SP_TRANSFERENCIA = text(f"""
+    CALL sp_registrar_transferencia_v{PROCEDURES_VERSAO}(
+        :endereco_origem, :endereco_destino, :id_moeda, :valor, :taxa_valor,
+        @id_transferencia, @saldo_origem_final, @saldo_destino_final, @data_hora
+    )
+""")
+
+SQL_RESULTADO_SP_TRANSFERENCIA = text("""
+    SELECT @id_transferencia AS id_transferencia,
+           @saldo_origem_final AS saldo_origem_final,
+           @saldo_destino_final AS saldo_destino_final,
+           CAST(@data_hora AS DATETIME) AS data_hora
+""")
+
+SQL_TRANSFERENCIA_POR_ID = text("""
+    SELECT
+        id_transferencia,
+        endereco_origem,
+        endereco_destino,
+        id_moeda,
+        valor,
+        taxa_valor,
+        data_hora
+    FROM transferencia
+    WHERE id_transferencia = :id
+""")
+
+SQL_INSERIR_AGENDAMENTO = text("""
+    INSERT INTO transferencia_agendada
+    (endereco_origem, endereco_destino, id_moeda, valor, periodicidade,
+     data_inicio, data_fim, proxima_ocorrencia, proxima_execucao, jitter_s)
+    VALUES (:endereco_origem, :endereco_destino, :id_moeda, :valor, :periodicidade,
+            :data_inicio, :data_fim, :proxima_ocorrencia, :proxima_execucao, :jitter_s)
+""")
+
+SQL_AGENDAMENTO_POR_ID = text(f"SELECT {COLUNAS_AGENDAMENTO} FROM transferencia_agendada WHERE id_agendamento = :id")
+
+SQL_CONTAR_AGENDAMENTOS = text("""
+    SELECT COUNT(*) FROM transferencia_agendada
+    WHERE endereco_origem = :endereco AND status IN ('ATIVA', 'PAUSADA')
+""")
+
+SQL_LISTAR_AGENDAMENTOS = text(f"""
+    SELECT {COLUNAS_AGENDAMENTO} FROM transferencia_agendada
+    WHERE endereco_origem = :endereco
+    ORDER BY id_agendamento
+""")
+
+SQL_AGENDAMENTO_DA_CARTEIRA = text(f"""
+    SELECT {COLUNAS_AGENDAMENTO} FROM transferencia_agendada
+    WHERE id_agendamento = :id AND endereco_origem = :endereco
+""")
+
+SQL_RESUMO_AGENDAMENTOS_VENCIDOS = text("""
+    SELECT COUNT(*) AS pendentes,
+           COALESCE(TIMESTAMPDIFF(SECOND, MIN(proxima_execucao), NOW()), 0) AS atraso
+    FROM transferencia_agendada
+    WHERE status = 'ATIVA' AND proxima_execucao <= NOW()
+""")
+
+SQL_AGENDAMENTOS_VENCIDOS = text("""
+    SELECT id_agendamento, endereco_origem, endereco_destino
+    FROM transferencia_agendada
+    WHERE status = 'ATIVA' AND proxima_execucao <= NOW()
+    ORDER BY proxima_execucao
+    LIMIT :limite
+""")
+
+SQL_BLOQUEAR_AGENDAMENTOS_VENCIDOS = text("""
+    SELECT id_agendamento, endereco_origem, endereco_destino, id_moeda, valor,
+           periodicidade, data_inicio, data_fim, proxima_ocorrencia,
+           proxima_execucao, jitter_s, falhas_consecutivas
+    FROM transferencia_agendada
+    WHERE id_agendamento IN :ids
+      AND status = 'ATIVA' AND proxima_execucao <= NOW()
+    ORDER BY proxima_execucao, id_agendamento
+    FOR UPDATE SKIP LOCKED
+""").bindparams(bindparam("ids", expanding=True))
+
+SQL_AGORA = text("SELECT NOW()")
+
+SQL_REAGENDAR_AGENDAMENTO = text("""
+    UPDATE transferencia_agendada
+    SET status = :status,
+        proxima_ocorrencia = :proxima_ocorrencia,
+        proxima_execucao = :proxima_execucao,
+        falhas_consecutivas = :falhas_consecutivas,
+        ultimo_erro = :ultimo_erro,
+        execucoes = execucoes + :executou,
+        ultima_execucao = IF(:executou, :agora, ultima_execucao),
+        id_ultima_transferencia = COALESCE(:id_transferencia, id_ultima_transferencia)
+    WHERE id_agendamento = :id_agendamento
+""")
+
+
+def _sql_saldos_carteiras(filtro_moeda: str) -> TextClause:
+    return text(f"""
+        SELECT c.endereco_carteira, c.status,
+               s.id_moeda, s.saldo, s.data_atualizacao
+          FROM carteira c
+          LEFT JOIN saldo_carteira s
+            ON s.endereco_carteira = c.endereco_carteira {filtro_moeda}
+         WHERE c.endereco_carteira IN :enderecos AND c.status <> 'RESERVADA'
+    """).bindparams(bindparam("enderecos", expanding=True))
+
+
+SQL_SALDOS_CARTEIRAS = _sql_saldos_carteiras("")
+SQL_SALDOS_CARTEIRAS_MOEDA = _sql_saldos_carteiras("AND s.id_moeda = :id_moeda")
+
+
+@lru_cache(maxsize=None)
+def _sql_transferencias_carteira(com_inicio: bool, com_fim: bool, incluir_arquivo: bool) -> TextClause:
+    """
+    Histórico de transferências de uma carteira; uma variante por
+    combinação de filtros, montada uma vez.
+    """
+    filtro = ""
+    if com_inicio:
+        filtro += " AND data_hora >= :inicio"
+    if com_fim:
+        filtro += " AND data_hora < :fim"
+
+    tabelas = ["transferencia", "transferencia_arquivo"] if incluir_arquivo else ["transferencia"]
+    # Um ramo por índice (origem, data_hora) / (destino, data_hora)
+    consultas = []
+    for tabela in tabelas:
+        consultas.append(f"""
+            SELECT id_transferencia, endereco_origem, endereco_destino,
+                   id_moeda, valor, taxa_valor, data_hora
+              FROM {tabela}
+             WHERE endereco_origem = :endereco{filtro}
+        """)
+        consultas.append(f"""
+            SELECT id_transferencia, endereco_origem, endereco_destino,
+                   id_moeda, valor, taxa_valor, data_hora
+              FROM {tabela}
+             WHERE endereco_destino = :endereco
+               AND endereco_origem <> :endereco{filtro}
+        """)
+    return text(" UNION ALL ".join(consultas) + " ORDER BY data_hora DESC")
+
+
+@lru_cache(maxsize=None)
+def _consultas_historico(incluir_arquivo: bool) -> Tuple[str, ...]:
+    """
+    Consultas de iterar_historico (cursor do driver, placeholders %(nome)s).
+    """
+    sufixos = ["", "_arquivo"] if incluir_arquivo else [""]
+    consultas: List[str] = []
+    for sufixo in sufixos:
+        consultas += [
+            f"""
+                SELECT 'deposito_saque', id_movimento, tipo, data_hora, id_moeda, valor,
+                       taxa_valor, NULL, NULL, NULL, NULL, NULL
+                  FROM deposito_saque{sufixo}
+                 WHERE endereco_carteira = %(endereco)s
+                 ORDER BY data_hora, id_movimento
+            """,
+            f"""
+                SELECT 'transferencia', id_transferencia, 'ENVIADA', data_hora, id_moeda, valor,
+                       taxa_valor, NULL, endereco_destino, NULL, NULL, NULL
+                  FROM transferencia{sufixo}
+                 WHERE endereco_origem = %(endereco)s
+                 ORDER BY data_hora, id_transferencia
+            """,
+            f"""
+                SELECT 'transferencia', id_transferencia, 'RECEBIDA', data_hora, id_moeda, valor,
+                       taxa_valor, NULL, endereco_origem, NULL, NULL, NULL
+                  FROM transferencia{sufixo}
+                 WHERE endereco_destino = %(endereco)s
+                   AND endereco_origem <> %(endereco)s
+                 ORDER BY data_hora, id_transferencia
+            """,
+            f"""
+                SELECT 'conversao', id_conversao, 'CONVERSAO', data_hora, id_moeda_origem, valor_origem,
+                       NULL, taxa_percentual, NULL, id_moeda_destino, valor_destino, cotacao_utilizada
+                  FROM conversao{sufixo}
+                 WHERE endereco_carteira = %(endereco)s
+                 ORDER BY data_hora, id_conversao
+            """,
+        ]
+
+    return tuple(consultas)
 
 
 class CarteiraRepository:
     """
     Acesso a dados da carteira usando SQLAlchemy Core + SQL puro.
+
+    Com usar_procedures=True (ou DB_USAR_PROCEDURES=true), transferência e
+    conversão são executadas pelas stored procedures de procedures_v1.sql.
+    Com DB_GROUP_COMMIT=true, depósitos concorrentes são gravados em lote
+    (ver commit_em_grupo.py). Com CARTEIRA_POOL_TAMANHO > 0, criar() ativa
+    carteiras pré-criadas (ver pool_carteiras.py). Com DB_REPLICA_HOST, as
+    consultas de leitura passam por roteamento_leitura.py.
+    Toda movimentação grava também um evento no outbox (outbox.py), na
+    mesma transação.
     """
 
+    def __init__(
+        self,
+        usar_procedures: Optional[bool] = None,
+        cache_chaves: CacheChavesVerificadas = CACHE_CHAVES,
+        leitura: RoteadorLeitura = ROTEADOR_LEITURA,
+    ):
+        self.usar_procedures = usar_procedures_env() if usar_procedures is None else usar_procedures
+        self.cache_chaves = cache_chaves
+        self.leitura = leitura
+        # Cache da tabela moeda (dados de referência), preenchido por carregar_moedas()
+        self._moedas_por_id: Dict[int, Dict[str, Any]] = {}
+        self._moedas_por_codigo: Dict[str, Dict[str, Any]] = {}
+        self.agrupador_depositos: Optional[AgrupadorDepositos] = criar_agrupador(
+            self.registrar_depositos_em_lote, self._registrar_deposito_unico
+        )
+        self.pool_carteiras: Optional[PoolCarteiras] = criar_pool_carteiras(
+            self._gerar_chaves, self._reservar_carteiras, self._ativar_reservada,
+            self._remover_reservadas_expiradas, self._remover_reservadas,
+        )
+
+    def fechar(self) -> None:
+        if self.agrupador_depositos is not None:
+            self.agrupador_depositos.fechar()
+        if self.pool_carteiras is not None:
+            self.pool_carteiras.fechar()
+
     def criar(self) -> Dict[str, Any]:
         """
         Gera chave pública, chave privada, salva no banco (apenas hash da privada)
         e retorna os dados da carteira + chave privada em claro.
         """
+        if self.pool_carteiras is not None:
+            carteira = self.pool_carteiras.retirar()
+            if carteira is not None:
+                return carteira
+
         # 1) Geração das chaves
-        private_key_size:int = int(os.getenv("PRIVATE_KEY_SIZE"))
-        public_key_size:int = int(os.getenv("PUBLIC_KEY_SIZE"))
-        chave_privada = secrets.token_hex(private_key_size)      # 32 bytes -> 64 hex chars (configurável depois)
-        endereco = secrets.token_hex(public_key_size)           # "chave pública" simplificada
-        hash_privada = hashlib.sha256(chave_privada.encode()).hexdigest()
+        endereco, chave_privada, hash_privada = self._gerar_chaves()
+        self.leitura.registrar_escrita(endereco)
 
         with get_connection() as conn:
             # 2) INSERT
             conn.execute(
-                text("""
-                    INSERT INTO carteira (endereco_carteira, hash_chave_privada)
-                    VALUES (:endereco, :hash_privada)
-                """),
+                SQL_INSERIR_CARTEIRA,
                 {"endereco": endereco, "hash_privada": hash_privada},
             )
 
             # 3) SELECT para retornar a carteira criada
             row = conn.execute(
-                text("""
-                    SELECT endereco_carteira,
-                           data_criacao,
-                           status,
-                           hash_chave_privada
-                      FROM carteira
-                     WHERE endereco_carteira = :endereco
-                """),
+                SQL_CARTEIRA_CRIADA,
                 {"endereco": endereco},
             ).mappings().first()
 
@@ -55,78 +599,135 @@ class CarteiraRepository:
         carteira["chave_privada"] = chave_privada
         return carteira
 
-    def buscar_por_endereco(self, endereco_carteira: str) -> Optional[Dict[str, Any]]:
+    @staticmethod
+    def _gerar_chaves() -> Tuple[str, str, str]:
+        """
+        (endereço, chave privada em claro, SHA-256 da chave privada).
+        """
+        private_key_size:int = int(os.getenv("PRIVATE_KEY_SIZE"))
+        public_key_size:int = int(os.getenv("PUBLIC_KEY_SIZE"))
+        chave_privada = secrets.token_hex(private_key_size)      # 32 bytes -> 64 hex chars (configurável depois)
+        endereco = secrets.token_hex(public_key_size)           # "chave pública" simplificada
+        hash_privada = hashlib.sha256(chave_privada.encode()).hexdigest()
+        return endereco, chave_privada, hash_privada
+
+    def _reservar_carteiras(self, itens: List[Tuple[str, str]]) -> None:
+        """
+        Insere (endereço, hash) como RESERVADA numa única transação (pool_carteiras.py).
+        """
+        with get_connection() as conn:
+            conn.execute(
+                SQL_RESERVAR_CARTEIRA,
+                [{"endereco": endereco, "hash_privada": hash_privada} for endereco, hash_privada in itens],
+            )
+
+    def _ativar_reservada(self, endereco: str) -> Optional[Dict[str, Any]]:
+        """
+        Ativa uma carteira reservada com um único UPDATE. None se a reserva
+        não existe mais (apagada por expiração).
+        """
+        data_criacao = datetime.now().replace(microsecond=0)
+        self.leitura.registrar_escrita(endereco)
+        with get_connection() as conn:
+            result = conn.execute(
+                SQL_ATIVAR_RESERVADA,
+                {"endereco": endereco, "data_criacao": data_criacao},
+            )
+        if result.rowcount != 1:
+            return None
+        return {"endereco_carteira": endereco, "data_criacao": data_criacao, "status": "ATIVA"}
+
+    def _remover_reservadas_expiradas(self, validade_s: float) -> int:
+        with get_connection() as conn:
+            return conn.execute(
+                SQL_REMOVER_RESERVADAS_EXPIRADAS,
+                {"validade_s": int(validade_s)},
+            ).rowcount
+
+    def _remover_reservadas(self, enderecos: List[str]) -> int:
         with get_connection() as conn:
+            return conn.execute(
+                SQL_REMOVER_RESERVADAS,
+                {"enderecos": enderecos},
+            ).rowcount
+
+    def buscar_por_endereco(self, endereco_carteira: str, usar_primario: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        usar_primario=True para validações antes de uma escrita (status atual).
+        """
+        with self.leitura.conexao(endereco_carteira, usar_primario) as conn:
             row = conn.execute(
-                text("""
-                    SELECT endereco_carteira,
-                           data_criacao,
-                           status,
-                           hash_chave_privada
-                      FROM carteira
-                     WHERE endereco_carteira = :endereco
-                """),
+                SQL_CARTEIRA_POR_ENDERECO,
                 {"endereco": endereco_carteira},
             ).mappings().first()
 
+        if row is None and not usar_primario and self.leitura.ativo:
+            # Carteira criada em outro worker pode ainda não ter chegado à réplica
+            return self.buscar_por_endereco(endereco_carteira, usar_primario=True)
         return dict(row) if row else None
 
     def listar(self) -> List[Dict[str, Any]]:
-        with get_connection() as conn:
+        with self.leitura.conexao() as conn:
+            rows = conn.execute(
+                SQL_LISTAR_CARTEIRAS
+            ).mappings().all()
+
+        return [dict(r) for r in rows]
+
+    def listar_resumo(self) -> List[Dict[str, Any]]:
+        """
+        Como listar(), mas só com as colunas públicas (sem o hash da chave).
+        Usado pelo caminho rápido de serialização.
+        """
+        with self.leitura.conexao() as conn:
             rows = conn.execute(
-                text("""
-                    SELECT endereco_carteira,
-                           data_criacao,
-                           status,
-                           hash_chave_privada
-                      FROM carteira
-                """)
+                SQL_LISTAR_RESUMO_CARTEIRAS
             ).mappings().all()
 
         return [dict(r) for r in rows]
 
     def atualizar_status(self, endereco_carteira: str, status: str) -> Optional[Dict[str, Any]]:
+        self.leitura.registrar_escrita(endereco_carteira)
         with get_connection() as conn:
             conn.execute(
-                text("""
-                    UPDATE carteira
-                       SET status = :status
-                     WHERE endereco_carteira = :endereco
-                """),
+                SQL_ATUALIZAR_STATUS_CARTEIRA,
                 {"status": status, "endereco": endereco_carteira},
             )
 
             row = conn.execute(
-                text("""
-                    SELECT endereco_carteira,
-                           data_criacao,
-                           status,
-                           hash_chave_privada
-                      FROM carteira
-                     WHERE endereco_carteira = :endereco
-                """),
+                SQL_CARTEIRA_POR_ENDERECO,
                 {"endereco": endereco_carteira},
             ).mappings().first()
 
+        # Após o commit, para que nenhuma verificação concorrente recoloque a entrada
+        self.cache_chaves.invalidar(endereco_carteira)
         return dict(row) if row else None
     
     def validar_chave_privada(self, endereco: str, chave_privada: str) -> bool:
+        """
+        Verifica a chave privada contra o hash salvo. Verificações bem-sucedidas
+        ficam no cache do processo (sem a chave em claro) até o TTL expirar ou
+        o status da carteira mudar, evitando a ida ao banco e o SHA-256.
+        """
+        digest = self.cache_chaves.digest(chave_privada)
+        if self.cache_chaves.contem(endereco, digest):
+            return True
+
         carteira = self.buscar_por_endereco(endereco)
         if not carteira:
             return False
         
         hash_privada = hashlib.sha256(chave_privada.encode()).hexdigest()
 
-        return hash_privada == carteira['hash_chave_privada']
+        valida = hmac.compare_digest(hash_privada, carteira['hash_chave_privada'])
+        if valida:
+            self.cache_chaves.adicionar(endereco, digest)
+        return valida
 
     def obter_saldo(self, endereco: str, id_moeda: int) -> Optional[SaldoCarteira]:
-        with get_connection() as conn:
+        with self.leitura.conexao(endereco) as conn:
             row = conn.execute(
-                text("""
-                    SELECT endereco_carteira, id_moeda, saldo, data_atualizacao
-                    FROM saldo_carteira
-                    WHERE endereco_carteira = :endereco_carteira AND id_moeda = :id_moeda
-                """),
+                SQL_SALDO_CARTEIRA_MOEDA,
                 {"endereco_carteira": endereco, "id_moeda": id_moeda}
             ).mappings().first()
             
@@ -135,27 +736,82 @@ class CarteiraRepository:
             return None
     
     def obter_saldos(self, endereco: str) -> List[SaldoCarteira]:
-        with get_connection() as conn:
+        with self.leitura.conexao(endereco) as conn:
             rows = conn.execute(
-                text("""
-                    SELECT endereco_carteira, id_moeda, saldo, data_atualizacao
-                    FROM saldo_carteira
-                    WHERE endereco_carteira = :endereco_carteira
-                """),
+                SQL_SALDOS_CARTEIRA,
                 {"endereco_carteira": endereco}
             ).mappings().all()
             
             return [SaldoCarteira(**dict(row)) for row in rows]
+
+    def obter_saldos_linhas(self, endereco: str) -> List[Dict[str, Any]]:
+        """
+        Saldos da carteira como dicts crus do banco (sem modelo Pydantic).
+        """
+        with self.leitura.conexao(endereco) as conn:
+            rows = conn.execute(
+                SQL_SALDOS_CARTEIRA,
+                {"endereco_carteira": endereco}
+            ).mappings().all()
+
+            return [dict(row) for row in rows]
+
+    def obter_saldos_carteiras(
+        self, enderecos: List[str], id_moeda: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Saldos de várias carteiras numa única consulta (IN). Carteiras sem
+        saldo voltam numa linha com id_moeda NULL; endereços inexistentes
+        não aparecem.
+        """
+        params: Dict[str, Any] = {"enderecos": list(enderecos)}
+        consulta = SQL_SALDOS_CARTEIRAS
+        if id_moeda is not None:
+            params["id_moeda"] = id_moeda
+            consulta = SQL_SALDOS_CARTEIRAS_MOEDA
+
+        with self.leitura.conexao(usar_primario=self.leitura.alguma_fixada(enderecos)) as conn:
+            rows = conn.execute(consulta, params).mappings().all()
+
+        return [dict(row) for row in rows]
+
+    def obter_saldos_colunas(
+        self, enderecos: List[str], tamanho_lote: int = 1000
+    ) -> Tuple[Set[str], List[str], List[int], List[float]]:
+        """
+        Saldos de muitas carteiras em colunas paralelas (endereço, id_moeda,
+        saldo como float), sem um dict por linha, para a avaliação vetorizada. A consulta
+        IN vai em blocos de tamanho_lote endereços, na mesma conexão.
+        Retorna também o conjunto de carteiras existentes.
+        """
+        existentes: Set[str] = set()
+        colunas_endereco: List[str] = []
+        colunas_moeda: List[int] = []
+        colunas_saldo: List[float] = []
+
+        with self.leitura.conexao(usar_primario=self.leitura.alguma_fixada(enderecos)) as conn:
+            for inicio in range(0, len(enderecos), tamanho_lote):
+                bloco = list(enderecos[inicio:inicio + tamanho_lote])
+                for endereco, id_moeda, saldo in conn.execute(SQL_SALDOS_COLUNAS, {"enderecos": bloco}):
+                    existentes.add(endereco)
+                    if id_moeda is not None:
+                        colunas_endereco.append(endereco)
+                        colunas_moeda.append(id_moeda)
+                        colunas_saldo.append(saldo)
+
+        return existentes, colunas_endereco, colunas_moeda, colunas_saldo
     
     def registrar_deposito(self, endereco: str, id_moeda: int, valor: float) -> Dict:
+        self.leitura.registrar_escrita(endereco)
+        if self.agrupador_depositos is not None:
+            return self.agrupador_depositos.registrar(endereco, id_moeda, valor)
+        return self._registrar_deposito_unico(endereco, id_moeda, valor)
+
+    def _registrar_deposito_unico(self, endereco: str, id_moeda: int, valor: float) -> Dict:
         with get_connection() as conn:
             try:
-                result = conn.execute(
-                    text("""
-                        INSERT INTO deposito_saque 
-                        (endereco_carteira, id_moeda, tipo, valor, taxa_valor, data_hora)
-                        VALUES (:endereco_carteira, :id_moeda, 'DEPOSITO', :valor, :valor_liquido, CURRENT_TIMESTAMP)
-                    """),
+                result = SQL_INSERIR_DEPOSITO.executar(
+                    conn,
                     {
                         "endereco_carteira": endereco,
                         "id_moeda": id_moeda,
@@ -167,37 +823,28 @@ class CarteiraRepository:
                 id_transacao = result.lastrowid
                 
                 row = conn.execute(
-                    text("""
-                        SELECT data_hora 
-                        FROM deposito_saque 
-                        WHERE id_movimento = :id
-                    """),
+                    SQL_DATA_MOVIMENTO,
                     {"id": id_transacao}
                 ).mappings().first()
 
                 data_transacao = row["data_hora"]
 
-                conn.execute(
-                    text("""
-                        INSERT INTO saldo_carteira 
-                        (endereco_carteira, id_moeda, saldo, data_atualizacao)
-                        VALUES (:endereco_carteira, :id_moeda, :valor, CURRENT_TIMESTAMP)
-                        ON DUPLICATE KEY UPDATE 
-                            saldo = saldo + :valor,
-                            data_atualizacao = CURRENT_TIMESTAMP
-                    """),
+                SQL_SOMAR_SALDO.executar(
+                    conn,
                     {"endereco_carteira": endereco, "id_moeda": id_moeda, "valor": valor}
                 )
                 
-                row = conn.execute(
-                    text("""
-                        SELECT saldo FROM saldo_carteira 
-                        WHERE endereco_carteira = :endereco_carteira AND id_moeda = :id_moeda
-                    """),
+                row = SQL_SALDO_ATUAL.executar(
+                    conn,
                     {"endereco_carteira": endereco, "id_moeda": id_moeda}
-                ).mappings().first()
+                ).primeira()
                 
-                saldo_final = float(row['saldo'])
+                saldo_final = float(row[0])
+
+                registrar_eventos(conn, [(
+                    "DEPOSITO", id_transacao, endereco, data_transacao,
+                    {"id_moeda": id_moeda, "valor": valor},
+                )])
                         
                 return {
                     'id_transacao': id_transacao,
@@ -209,30 +856,82 @@ class CarteiraRepository:
                 conn.rollback()
                 raise e
             
-    def registrar_saque(self, endereco: str, id_moeda: int, valor: float) -> Dict:
-        taxa_percentual = float(os.getenv("TAXA_SAQUE_PERCENTUAL"))
-        taxa_valor = valor * taxa_percentual
+    def registrar_depositos_em_lote(self, itens: List[Tuple[str, int, float]]) -> List[Dict[str, Any]]:
+        """
+        Grava vários depósitos numa única transação: um INSERT por movimento,
+        um upsert por (carteira, moeda) com a soma do lote e uma leitura dos
+        saldos finais. O saldo_final de cada item é o saldo logo após ele,
+        na ordem do lote. Falha no COMMIT vira CommitIncertoError.
+        """
+        totais: Dict[Tuple[str, int], Decimal] = {}
+        for endereco, id_moeda, valor in itens:
+            chave = (endereco, id_moeda)
+            totais[chave] = totais.get(chave, Decimal(0)) + Decimal(str(valor))
+
+        enviado = False
+        try:
+            with get_connection() as conn:
+                data_hora = conn.execute(SQL_DATA_HORA_ATUAL).scalar()
+
+                ids = []
+                for endereco, id_moeda, valor in itens:
+                    result = SQL_INSERIR_DEPOSITO_LOTE.executar(
+                        conn,
+                        {"endereco_carteira": endereco, "id_moeda": id_moeda, "valor": valor, "data_hora": data_hora}
+                    )
+                    ids.append(result.lastrowid)
+
+                registrar_eventos(conn, [
+                    ("DEPOSITO", id_transacao, endereco, data_hora, {"id_moeda": id_moeda, "valor": valor})
+                    for id_transacao, (endereco, id_moeda, valor) in zip(ids, itens)
+                ])
+
+                # Ordem fixa de (carteira, moeda): lotes concorrentes (e depósitos
+                # avulsos) travam as linhas de saldo_carteira na mesma ordem
+                for (endereco, id_moeda), total in sorted(totais.items()):
+                    SQL_SOMAR_SALDO.executar(
+                        conn,
+                        {"endereco_carteira": endereco, "id_moeda": id_moeda, "valor": total}
+                    )
+
+                rows = conn.execute(SQL_SALDOS_LOTE, {"chaves": list(totais)}).mappings().all()
+                saldos = {(r["endereco_carteira"], r["id_moeda"]): Decimal(r["saldo"]) for r in rows}
+                # Daqui em diante só falta o COMMIT de get_connection
+                enviado = True
+        except Exception as e:
+            if enviado:
+                raise CommitIncertoError(f"Falha no commit do lote de depósitos: {e}") from e
+            raise
+
+        # Percorre o lote de trás para frente descontando os depósitos posteriores
+        resultados: List[Dict[str, Any]] = [{} for _ in itens]
+        for i in range(len(itens) - 1, -1, -1):
+            endereco, id_moeda, valor = itens[i]
+            chave = (endereco, id_moeda)
+            resultados[i] = {
+                "id_transacao": ids[i],
+                "data_hora": data_hora,
+                "saldo_final": float(saldos[chave]),
+            }
+            saldos[chave] -= Decimal(str(valor))
+        return resultados
+
+    def registrar_saque(self, endereco: str, id_moeda: int, valor: float, taxa_valor: float) -> Dict:
         valor_liquido = valor + taxa_valor
+        self.leitura.registrar_escrita(endereco)
         
         with get_connection() as conn:
             try:
-                row = conn.execute(
-                    text("""
-                        SELECT saldo FROM saldo_carteira 
-                        WHERE endereco_carteira = :endereco_carteira AND id_moeda = :id_moeda
-                    """),
+                row = SQL_SALDO_ATUAL.executar(
+                    conn,
                     {"endereco_carteira": endereco, "id_moeda": id_moeda}
-                ).mappings().first()
+                ).primeira()
                 
-                if not row or float(row['saldo']) < valor_liquido:
+                if not row or float(row[0]) < valor_liquido:
                     raise ValueError("Saldo insuficiente para realizar o saque (valor + taxa)")
                 
-                result = conn.execute(
-                    text("""
-                        INSERT INTO deposito_saque 
-                        (endereco_carteira, id_moeda, tipo, valor, taxa_valor, data_hora)
-                        VALUES (:endereco_carteira, :id_moeda, 'SAQUE', :valor, :taxa_valor, CURRENT_TIMESTAMP)
-                    """),
+                result = SQL_INSERIR_SAQUE.executar(
+                    conn,
                     {
                         "endereco_carteira": endereco,
                         "id_moeda": id_moeda,
@@ -244,35 +943,28 @@ class CarteiraRepository:
                 id_transacao = result.lastrowid
 
                 row = conn.execute(
-                    text("""
-                        SELECT data_hora 
-                        FROM deposito_saque 
-                        WHERE id_movimento = :id
-                    """),
+                    SQL_DATA_MOVIMENTO,
                     {"id": id_transacao}
                 ).mappings().first()
 
                 data_transacao = row["data_hora"]
                 
-                conn.execute(
-                    text("""
-                        UPDATE saldo_carteira 
-                        SET saldo = saldo - :taxa_valor,
-                            data_atualizacao = CURRENT_TIMESTAMP
-                        WHERE endereco_carteira = :endereco_carteira AND id_moeda = :id_moeda
-                    """),
+                SQL_DEBITAR_SALDO_SAQUE.executar(
+                    conn,
                     {"taxa_valor": valor_liquido, "endereco_carteira": endereco, "id_moeda": id_moeda}
                 )
                 
-                row = conn.execute(
-                    text("""
-                        SELECT saldo FROM saldo_carteira 
-                        WHERE endereco_carteira = :endereco_carteira AND id_moeda = :id_moeda
-                    """),
+                row = SQL_SALDO_ATUAL.executar(
+                    conn,
                     {"endereco_carteira": endereco, "id_moeda": id_moeda}
-                ).mappings().first()
+                ).primeira()
                 
-                saldo_final = float(row['saldo'])
+                saldo_final = float(row[0])
+
+                registrar_eventos(conn, [(
+                    "SAQUE", id_transacao, endereco, data_transacao,
+                    {"id_moeda": id_moeda, "valor": valor, "taxa_valor": taxa_valor},
+                )])
                                 
                 return {
                     'id_transacao': id_transacao,
@@ -285,15 +977,43 @@ class CarteiraRepository:
                 conn.rollback()
                 raise e
     
+    def listar_moedas(self) -> List[Dict[str, Any]]:
+        with get_connection() as conn:
+            rows = conn.execute(
+                SQL_LISTAR_MOEDAS
+            ).mappings().all()
+
+            return [dict(row) for row in rows]
+
+    def carregar_moedas(self) -> int:
+        """
+        Carrega a tabela moeda em memória. A partir daí obter_codigo_moeda e
+        obter_moeda_por_codigo não vão mais ao banco para moedas conhecidas.
+        """
+        moedas = self.listar_moedas()
+        self._moedas_por_id = {m["id_moeda"]: m for m in moedas}
+        self._moedas_por_codigo = {m["codigo"]: m for m in moedas}
+        return len(moedas)
+
+    def codigos_moedas(self) -> Dict[int, str]:
+        """
+        id_moeda -> código de todas as moedas (do cache de carregar_moedas).
+        """
+        if not self._moedas_por_id:
+            self.carregar_moedas()
+        return {id_moeda: m["codigo"] for id_moeda, m in self._moedas_por_id.items()}
+
     def obter_codigo_moeda(self, id_moeda: int) -> Optional[str]:
         """
         Obtém o código da moeda pelo ID.
         """
+        moeda = self._moedas_por_id.get(id_moeda)
+        if moeda:
+            return moeda["codigo"]
+
         with get_connection() as conn:
             row = conn.execute(
-                text("""
-                    SELECT codigo FROM moeda WHERE id_moeda = :id_moeda
-                """),
+                SQL_CODIGO_MOEDA,
                 {"id_moeda": id_moeda}
             ).mappings().first()
             
@@ -303,12 +1023,13 @@ class CarteiraRepository:
         """
         Obtém os dados da moeda pelo código.
         """
+        moeda = self._moedas_por_codigo.get(codigo)
+        if moeda:
+            return dict(moeda)
+
         with get_connection() as conn:
             row = conn.execute(
-                text("""
-                    SELECT id_moeda, codigo, nome, tipo 
-                    FROM moeda WHERE codigo = :codigo
-                """),
+                SQL_MOEDA_POR_CODIGO,
                 {"codigo": codigo}
             ).mappings().first()
             
@@ -328,17 +1049,21 @@ class CarteiraRepository:
         Registra uma operação de conversão entre moedas.
         Usa transação para garantir consistência.
         """
+        self.leitura.registrar_escrita(endereco_carteira)
+        if self.usar_procedures:
+            return self._registrar_conversao_procedure(
+                endereco_carteira, id_moeda_origem, id_moeda_destino,
+                valor_origem, valor_destino, taxa_percentual, cotacao_utilizada
+            )
+
         with get_connection() as conn:
             try:
                 # Inicia transação
-                conn.execute(text("START TRANSACTION"))
+                conn.execute(SQL_INICIAR_TRANSACAO)
                 
                 # 1. Verifica se carteira existe e está ativa
                 carteira = conn.execute(
-                    text("""
-                        SELECT status FROM carteira 
-                        WHERE endereco_carteira = :endereco_carteira
-                    """),
+                    SQL_STATUS_CARTEIRA_CONVERSAO,
                     {"endereco_carteira": endereco_carteira}
                 ).mappings().first()
                 
@@ -347,11 +1072,7 @@ class CarteiraRepository:
                 
                 # 2. Verifica saldo da moeda origem
                 saldo_origem = conn.execute(
-                    text("""
-                        SELECT saldo FROM saldo_carteira 
-                        WHERE endereco_carteira = :endereco_carteira 
-                        AND id_moeda = :id_moeda_origem
-                    """),
+                    SQL_SALDO_ORIGEM_CONVERSAO,
                     {
                         "endereco_carteira": endereco_carteira,
                         "id_moeda_origem": id_moeda_origem
@@ -363,13 +1084,7 @@ class CarteiraRepository:
                 
                 # 3. Atualiza saldo da moeda origem (subtrai)
                 conn.execute(
-                    text("""
-                        UPDATE saldo_carteira 
-                        SET saldo = saldo - :valor_origem, 
-                            data_atualizacao = CURRENT_TIMESTAMP
-                        WHERE endereco_carteira = :endereco_carteira 
-                        AND id_moeda = :id_moeda_origem
-                    """),
+                    SQL_DEBITAR_SALDO_CONVERSAO,
                     {
                         "valor_origem": valor_origem,
                         "endereco_carteira": endereco_carteira,
@@ -379,11 +1094,7 @@ class CarteiraRepository:
                 
                 # 4. Verifica se já existe saldo da moeda destino
                 saldo_destino = conn.execute(
-                    text("""
-                        SELECT saldo FROM saldo_carteira 
-                        WHERE endereco_carteira = :endereco_carteira 
-                        AND id_moeda = :id_moeda_destino
-                    """),
+                    SQL_SALDO_DESTINO_CONVERSAO,
                     {
                         "endereco_carteira": endereco_carteira,
                         "id_moeda_destino": id_moeda_destino
@@ -393,13 +1104,7 @@ class CarteiraRepository:
                 if saldo_destino:
                     # Atualiza saldo existente
                     conn.execute(
-                        text("""
-                            UPDATE saldo_carteira 
-                            SET saldo = saldo + :valor_destino, 
-                                data_atualizacao = CURRENT_TIMESTAMP
-                            WHERE endereco_carteira = :endereco_carteira 
-                            AND id_moeda = :id_moeda_destino
-                        """),
+                        SQL_CREDITAR_SALDO_CONVERSAO,
                         {
                             "valor_destino": valor_destino,
                             "endereco_carteira": endereco_carteira,
@@ -409,11 +1114,7 @@ class CarteiraRepository:
                 else:
                     # Cria novo registro de saldo
                     conn.execute(
-                        text("""
-                            INSERT INTO saldo_carteira 
-                            (endereco_carteira, id_moeda, saldo, data_atualizacao) 
-                            VALUES (:endereco_carteira, :id_moeda_destino, :valor_destino, CURRENT_TIMESTAMP)
-                        """),
+                        SQL_INSERIR_SALDO_CONVERSAO,
                         {
                             "endereco_carteira": endereco_carteira,
                             "id_moeda_destino": id_moeda_destino,
@@ -423,13 +1124,7 @@ class CarteiraRepository:
                 
                 # 5. Registra a conversão
                 result = conn.execute(
-                    text("""
-                        INSERT INTO conversao 
-                        (endereco_carteira, id_moeda_origem, id_moeda_destino, 
-                         valor_origem, valor_destino, taxa_percentual, cotacao_utilizada) 
-                        VALUES (:endereco_carteira, :id_moeda_origem, :id_moeda_destino,
-                                :valor_origem, :valor_destino, :taxa_percentual, :cotacao_utilizada)
-                    """),
+                    SQL_INSERIR_CONVERSAO,
                     {
                         "endereco_carteira": endereco_carteira,
                         "id_moeda_origem": id_moeda_origem,
@@ -445,11 +1140,7 @@ class CarteiraRepository:
                 
                 # 6. Obtém saldos finais
                 saldo_origem_final = conn.execute(
-                    text("""
-                        SELECT saldo FROM saldo_carteira 
-                        WHERE endereco_carteira = :endereco_carteira 
-                        AND id_moeda = :id_moeda_origem
-                    """),
+                    SQL_SALDO_ORIGEM_CONVERSAO,
                     {
                         "endereco_carteira": endereco_carteira,
                         "id_moeda_origem": id_moeda_origem
@@ -457,11 +1148,7 @@ class CarteiraRepository:
                 ).mappings().first()['saldo']
                 
                 saldo_destino_final = conn.execute(
-                    text("""
-                        SELECT saldo FROM saldo_carteira 
-                        WHERE endereco_carteira = :endereco_carteira 
-                        AND id_moeda = :id_moeda_destino
-                    """),
+                    SQL_SALDO_DESTINO_CONVERSAO,
                     {
                         "endereco_carteira": endereco_carteira,
                         "id_moeda_destino": id_moeda_destino
@@ -471,11 +1158,7 @@ class CarteiraRepository:
                 # 7. Registra os movimentos como saque e depósito
                 # Saque da moeda origem
                 conn.execute(
-                    text("""
-                        INSERT INTO deposito_saque 
-                        (endereco_carteira, id_moeda, tipo, valor, taxa_valor, data_hora) 
-                        VALUES (:endereco_carteira, :id_moeda, 'SAQUE', :valor, :valor_liquido, CURRENT_TIMESTAMP)
-                    """),
+                    SQL_INSERIR_SAQUE_CONVERSAO,
                     {
                         "endereco_carteira": endereco_carteira,
                         "id_moeda": id_moeda_origem,
@@ -485,12 +1168,8 @@ class CarteiraRepository:
                 )
                 
                 # Depósito da moeda destino
-                conn.execute(
-                    text("""
-                        INSERT INTO deposito_saque 
-                        (endereco_carteira, id_moeda, tipo, valor, taxa_valor, data_hora) 
-                        VALUES (:endereco_carteira, :id_moeda, 'DEPOSITO', :valor, :valor_liquido, CURRENT_TIMESTAMP)
-                    """),
+                SQL_INSERIR_DEPOSITO.executar(
+                    conn,
                     {
                         "endereco_carteira": endereco_carteira,
                         "id_moeda": id_moeda_destino,
@@ -501,15 +1180,24 @@ class CarteiraRepository:
                 
                 # Obtém data da conversão
                 data_hora = conn.execute(
-                    text("""
-                        SELECT data_hora FROM conversao 
-                        WHERE id_conversao = :id_conversao
-                    """),
+                    SQL_DATA_CONVERSAO,
                     {"id_conversao": id_conversao}
                 ).mappings().first()['data_hora']
                 
+                registrar_eventos(conn, [(
+                    "CONVERSAO", id_conversao, endereco_carteira, data_hora,
+                    {
+                        "id_moeda_origem": id_moeda_origem,
+                        "id_moeda_destino": id_moeda_destino,
+                        "valor_origem": valor_origem,
+                        "valor_destino": valor_destino,
+                        "taxa_percentual": taxa_percentual,
+                        "cotacao_utilizada": cotacao_utilizada,
+                    },
+                )])
+                
                 # Commit da transação
-                conn.execute(text("COMMIT"))
+                conn.execute(SQL_CONFIRMAR_TRANSACAO)
                 
                 return {
                     "id_conversao": id_conversao,
@@ -519,7 +1207,7 @@ class CarteiraRepository:
                 }
                 
             except Exception as e:
-                conn.execute(text("ROLLBACK"))
+                conn.execute(SQL_DESFAZER_TRANSACAO)
                 raise e
     
     def registrar_transferencia(
@@ -534,237 +1222,535 @@ class CarteiraRepository:
         Registra uma transferência entre carteiras.
         Deve ser executado dentro de uma transação.
         """
+        self.leitura.registrar_escrita(endereco_origem, endereco_destino)
+        if self.usar_procedures:
+            return self._registrar_transferencia_procedure(
+                endereco_origem, endereco_destino, id_moeda, valor, taxa_valor
+            )
+
         with get_connection() as conn:
             try:
-                # 1. Valida carteira origem (ativa)
-                carteira_origem = conn.execute(
-                    text("""
-                        SELECT status FROM carteira 
-                        WHERE endereco_carteira = :endereco
-                    """),
-                    {"endereco": endereco_origem}
-                ).mappings().first()
-                
-                if not carteira_origem or carteira_origem['status'] != 'ATIVA':
-                    raise ValueError("Carteira origem não encontrada ou bloqueada")
-                
-                # 2. Valida carteira destino (ativa)
-                carteira_destino = conn.execute(
-                    text("""
-                        SELECT status FROM carteira 
-                        WHERE endereco_carteira = :endereco
-                    """),
-                    {"endereco": endereco_destino}
-                ).mappings().first()
-                
-                if not carteira_destino or carteira_destino['status'] != 'ATIVA':
-                    raise ValueError("Carteira destino não encontrada ou bloqueada")
-                
-                # 3. Verifica se não é transferência para mesma carteira
-                if endereco_origem == endereco_destino:
-                    raise ValueError("Não é possível transferir para a mesma carteira")
-                
-                # 4. Verifica saldo da carteira origem (incluindo taxa)
-                valor_total = valor + taxa_valor
-                
-                saldo_origem = conn.execute(
-                    text("""
-                        SELECT saldo FROM saldo_carteira 
-                        WHERE endereco_carteira = :endereco AND id_moeda = :id_moeda
-                    """),
-                    {"endereco": endereco_origem, "id_moeda": id_moeda}
-                ).mappings().first()
-                
-                if not saldo_origem or float(saldo_origem['saldo']) < valor_total:
-                    raise ValueError("Saldo insuficiente para realizar a transferência (valor + taxa)")
-                
-                # 5. Debitar carteira origem (valor + taxa)
-                conn.execute(
-                    text("""
-                        UPDATE saldo_carteira 
-                        SET saldo = saldo - :valor_total,
-                            data_atualizacao = CURRENT_TIMESTAMP
-                        WHERE endereco_carteira = :endereco_origem 
-                        AND id_moeda = :id_moeda
-                    """),
-                    {
-                        "valor_total": valor_total,
-                        "endereco_origem": endereco_origem,
-                        "id_moeda": id_moeda
-                    }
-                )
-                
-                # 6. Creditar carteira destino (apenas valor, sem taxa)
-                saldo_destino = conn.execute(
-                    text("""
-                        SELECT saldo FROM saldo_carteira 
-                        WHERE endereco_carteira = :endereco AND id_moeda = :id_moeda
-                    """),
-                    {"endereco": endereco_destino, "id_moeda": id_moeda}
-                ).mappings().first()
-                
-                if saldo_destino:
-                    # Atualiza saldo existente
-                    conn.execute(
-                        text("""
-                            UPDATE saldo_carteira 
-                            SET saldo = saldo + :valor,
-                                data_atualizacao = CURRENT_TIMESTAMP
-                            WHERE endereco_carteira = :endereco_destino 
-                            AND id_moeda = :id_moeda
-                        """),
-                        {
-                            "valor": valor,
-                            "endereco_destino": endereco_destino,
-                            "id_moeda": id_moeda
-                        }
-                    )
-                else:
-                    # Cria novo registro de saldo
-                    conn.execute(
-                        text("""
-                            INSERT INTO saldo_carteira 
-                            (endereco_carteira, id_moeda, saldo, data_atualizacao) 
-                            VALUES (:endereco_destino, :id_moeda, :valor, CURRENT_TIMESTAMP)
-                        """),
-                        {
-                            "endereco_destino": endereco_destino,
-                            "id_moeda": id_moeda,
-                            "valor": valor
-                        }
-                    )
-                
-                # 7. Registra a transferência
-                result = conn.execute(
-                    text("""
-                        INSERT INTO transferencia 
-                        (endereco_origem, endereco_destino, id_moeda, valor, taxa_valor, data_hora) 
-                        VALUES (:endereco_origem, :endereco_destino, :id_moeda, :valor, :taxa_valor, CURRENT_TIMESTAMP)
-                    """),
-                    {
-                        "endereco_origem": endereco_origem,
-                        "endereco_destino": endereco_destino,
-                        "id_moeda": id_moeda,
-                        "valor": valor,
-                        "taxa_valor": taxa_valor
-                    }
-                )
-                
-                id_transferencia = result.lastrowid
-                
-                # 8. Registra movimentações (saque na origem, depósito no destino)
-                # Saque na carteira origem
-                conn.execute(
-                    text("""
-                        INSERT INTO deposito_saque 
-                        (endereco_carteira, id_moeda, tipo, valor, taxa_valor, data_hora) 
-                        VALUES (:endereco, :id_moeda, 'SAQUE', :valor, :taxa_valor, CURRENT_TIMESTAMP)
-                    """),
-                    {
-                        "endereco": endereco_origem,
-                        "id_moeda": id_moeda,
-                        "valor": valor,
-                        "taxa_valor": valor_total
-                    }
-                )
-                
-                # Depósito na carteira destino
-                conn.execute(
-                    text("""
-                        INSERT INTO deposito_saque 
-                        (endereco_carteira, id_moeda, tipo, valor, taxa_valor, data_hora) 
-                        VALUES (:endereco, :id_moeda, 'DEPOSITO', :valor, :valor, CURRENT_TIMESTAMP)
-                    """),
-                    {
-                        "endereco": endereco_destino,
-                        "id_moeda": id_moeda,
-                        "valor": valor,
-                        "taxa_valor": valor
-                    }
-                )
-                
-                # 9. Obtém saldos finais
-                saldo_origem_final = conn.execute(
-                    text("""
-                        SELECT saldo FROM saldo_carteira 
-                        WHERE endereco_carteira = :endereco AND id_moeda = :id_moeda
-                    """),
-                    {"endereco": endereco_origem, "id_moeda": id_moeda}
-                ).mappings().first()['saldo']
-                
-                saldo_destino_final = conn.execute(
-                    text("""
-                        SELECT saldo FROM saldo_carteira 
-                        WHERE endereco_carteira = :endereco AND id_moeda = :id_moeda
-                    """),
-                    {"endereco": endereco_destino, "id_moeda": id_moeda}
-                ).mappings().first()['saldo']
-                
-                # 10. Obtém data da transferência
-                data_transferencia = conn.execute(
-                    text("""
-                        SELECT data_hora FROM transferencia 
-                        WHERE id_transferencia = :id_transferencia
-                    """),
-                    {"id_transferencia": id_transferencia}
-                ).mappings().first()['data_hora']
-                
-                return {
-                    "id_transferencia": id_transferencia,
-                    "saldo_origem_final": float(saldo_origem_final),
-                    "saldo_destino_final": float(saldo_destino_final),
-                    "data_hora": data_transferencia
-                }
-                
+                return self._transferir_sql(conn, endereco_origem, endereco_destino, id_moeda, valor, taxa_valor)
             except Exception as e:
                 conn.rollback()
                 raise e
+
+    def _transferir_sql(
+        self,
+        conn: Connection,
+        endereco_origem: str,
+        endereco_destino: str,
+        id_moeda: int,
+        valor: float,
+        taxa_valor: float
+    ) -> Dict[str, Any]:
+        """
+        Corpo da transferência em SQL, na transação de conn (não faz commit).
+        """
+        # 1. Valida carteira origem (ativa)
+        carteira_origem = conn.execute(
+            SQL_STATUS_CARTEIRA,
+            {"endereco": endereco_origem}
+        ).mappings().first()
+        
+        if not carteira_origem or carteira_origem['status'] != 'ATIVA':
+            raise ValueError("Carteira origem não encontrada ou bloqueada")
+        
+        # 2. Valida carteira destino (ativa)
+        carteira_destino = conn.execute(
+            SQL_STATUS_CARTEIRA,
+            {"endereco": endereco_destino}
+        ).mappings().first()
+        
+        if not carteira_destino or carteira_destino['status'] != 'ATIVA':
+            raise ValueError("Carteira destino não encontrada ou bloqueada")
+        
+        # 3. Verifica se não é transferência para mesma carteira
+        if endereco_origem == endereco_destino:
+            raise ValueError("Não é possível transferir para a mesma carteira")
+        
+        # 4. Verifica saldo da carteira origem (incluindo taxa)
+        valor_total = valor + taxa_valor
+        
+        saldo_origem = SQL_SALDO_TRANSFERENCIA.executar(
+            conn,
+            {"endereco": endereco_origem, "id_moeda": id_moeda}
+        ).primeira()
+        
+        if not saldo_origem or float(saldo_origem[0]) < valor_total:
+            raise ValueError("Saldo insuficiente para realizar a transferência (valor + taxa)")
+        
+        # 5. Debitar carteira origem (valor + taxa)
+        SQL_DEBITAR_SALDO_TRANSFERENCIA.executar(
+            conn,
+            {
+                "valor_total": valor_total,
+                "endereco_origem": endereco_origem,
+                "id_moeda": id_moeda
+            }
+        )
+        
+        # 6. Creditar carteira destino (apenas valor, sem taxa)
+        saldo_destino = SQL_SALDO_TRANSFERENCIA.executar(
+            conn,
+            {"endereco": endereco_destino, "id_moeda": id_moeda}
+        ).primeira()
+        
+        if saldo_destino:
+            # Atualiza saldo existente
+            SQL_CREDITAR_SALDO_TRANSFERENCIA.executar(
+                conn,
+                {
+                    "valor": valor,
+                    "endereco_destino": endereco_destino,
+                    "id_moeda": id_moeda
+                }
+            )
+        else:
+            # Cria novo registro de saldo
+            conn.execute(
+                SQL_INSERIR_SALDO_TRANSFERENCIA,
+                {
+                    "endereco_destino": endereco_destino,
+                    "id_moeda": id_moeda,
+                    "valor": valor
+                }
+            )
+        
+        # 7. Registra a transferência
+        result = conn.execute(
+            SQL_INSERIR_TRANSFERENCIA,
+            {
+                "endereco_origem": endereco_origem,
+                "endereco_destino": endereco_destino,
+                "id_moeda": id_moeda,
+                "valor": valor,
+                "taxa_valor": taxa_valor
+            }
+        )
+        
+        id_transferencia = result.lastrowid
+        
+        # 8. Registra movimentações (saque na origem, depósito no destino)
+        # Saque na carteira origem
+        SQL_INSERIR_SAQUE_TRANSFERENCIA.executar(
+            conn,
+            {
+                "endereco": endereco_origem,
+                "id_moeda": id_moeda,
+                "valor": valor,
+                "taxa_valor": valor_total
+            }
+        )
+        
+        # Depósito na carteira destino
+        SQL_INSERIR_DEPOSITO_TRANSFERENCIA.executar(
+            conn,
+            {
+                "endereco": endereco_destino,
+                "id_moeda": id_moeda,
+                "valor": valor,
+                "taxa_valor": valor
+            }
+        )
+        
+        # 9. Obtém saldos finais
+        saldo_origem_final = SQL_SALDO_TRANSFERENCIA.executar(
+            conn,
+            {"endereco": endereco_origem, "id_moeda": id_moeda}
+        ).primeira()[0]
+        
+        saldo_destino_final = SQL_SALDO_TRANSFERENCIA.executar(
+            conn,
+            {"endereco": endereco_destino, "id_moeda": id_moeda}
+        ).primeira()[0]
+        
+        # 10. Obtém data da transferência
+        data_transferencia = conn.execute(
+            SQL_DATA_TRANSFERENCIA,
+            {"id_transferencia": id_transferencia}
+        ).mappings().first()['data_hora']
+
+        registrar_eventos(conn, [(
+            "TRANSFERENCIA", id_transferencia, endereco_origem, data_transferencia,
+            {
+                "endereco_destino": endereco_destino,
+                "id_moeda": id_moeda,
+                "valor": valor,
+                "taxa_valor": taxa_valor,
+            },
+        )])
+        
+        return {
+            "id_transferencia": id_transferencia,
+            "saldo_origem_final": float(saldo_origem_final),
+            "saldo_destino_final": float(saldo_destino_final),
+            "data_hora": data_transferencia
+        }
+        
     
-    def obter_transferencias_por_carteira(self, endereco_carteira: str) -> List[Dict[str, Any]]:
+    def _registrar_conversao_procedure(
+        self,
+        endereco_carteira: str,
+        id_moeda_origem: int,
+        id_moeda_destino: int,
+        valor_origem: float,
+        valor_destino: float,
+        taxa_percentual: float,
+        cotacao_utilizada: float
+    ) -> Dict[str, Any]:
         """
-        Obtém todas as transferências relacionadas a uma carteira
-        (como origem ou como destino).
+        Conversão via sp_registrar_conversao_vN: um único CALL faz validação,
+        lock, débito/crédito e registros. Os resultados voltam nos parâmetros OUT.
         """
         with get_connection() as conn:
+            try:
+                conn.execute(
+                    SQL_CHAMAR_SP_CONVERSAO,
+                    {
+                        "endereco_carteira": endereco_carteira,
+                        "id_moeda_origem": id_moeda_origem,
+                        "id_moeda_destino": id_moeda_destino,
+                        "valor_origem": valor_origem,
+                        "valor_destino": valor_destino,
+                        "taxa_percentual": taxa_percentual,
+                        "cotacao_utilizada": cotacao_utilizada
+                    }
+                )
+            except DBAPIError as e:
+                mensagem = _mensagem_signal(e)
+                if mensagem:
+                    raise ValueError(mensagem) from e
+                raise
+
+            row = conn.execute(
+                SQL_RESULTADO_SP_CONVERSAO
+            ).mappings().first()
+
+            # A procedure não controla a transação: o outbox entra no mesmo commit
+            registrar_eventos(conn, [(
+                "CONVERSAO", int(row["id_conversao"]), endereco_carteira, row["data_hora"],
+                {
+                    "id_moeda_origem": id_moeda_origem,
+                    "id_moeda_destino": id_moeda_destino,
+                    "valor_origem": valor_origem,
+                    "valor_destino": valor_destino,
+                    "taxa_percentual": taxa_percentual,
+                    "cotacao_utilizada": cotacao_utilizada,
+                },
+            )])
+
+        return {
+            "id_conversao": int(row["id_conversao"]),
+            "saldo_origem_final": float(row["saldo_origem_final"]),
+            "saldo_destino_final": float(row["saldo_destino_final"]),
+            "data_hora": row["data_hora"]
+        }
+
+    def _registrar_transferencia_procedure(
+        self,
+        endereco_origem: str,
+        endereco_destino: str,
+        id_moeda: int,
+        valor: float,
+        taxa_valor: float
+    ) -> Dict[str, Any]:
+        """
+        Transferência via sp_registrar_transferencia_vN: um único CALL faz
+        validação, lock, débito/crédito e registros.
+        """
+        with get_connection() as conn:
+            return self._transferir_procedure(conn, endereco_origem, endereco_destino, id_moeda, valor, taxa_valor)
+
+    def _transferir_procedure(
+        self,
+        conn: Connection,
+        endereco_origem: str,
+        endereco_destino: str,
+        id_moeda: int,
+        valor: float,
+        taxa_valor: float
+    ) -> Dict[str, Any]:
+        """
+        CALL da procedure de transferência na transação de conn.
+        """
+        try:
+            conn.execute(
+                SQL_CHAMAR_SP_TRANSFERENCIA,
+                {
+                    "endereco_origem": endereco_origem,
+                    "endereco_destino": endereco_destino,
+                    "id_moeda": id_moeda,
+                    "valor": valor,
+                    "taxa_valor": taxa_valor
+                }
+            )
+        except DBAPIError as e:
+            mensagem = _mensagem_signal(e)
+            if mensagem:
+                raise ValueError(mensagem) from e
+            raise
+
+        row = conn.execute(
+            SQL_RESULTADO_SP_TRANSFERENCIA
+        ).mappings().first()
+
+        registrar_eventos(conn, [(
+            "TRANSFERENCIA", int(row["id_transferencia"]), endereco_origem, row["data_hora"],
+            {
+                "endereco_destino": endereco_destino,
+                "id_moeda": id_moeda,
+                "valor": valor,
+                "taxa_valor": taxa_valor,
+            },
+        )])
+
+        return {
+            "id_transferencia": int(row["id_transferencia"]),
+            "saldo_origem_final": float(row["saldo_origem_final"]),
+            "saldo_destino_final": float(row["saldo_destino_final"]),
+            "data_hora": row["data_hora"]
+        }
+
+    def obter_transferencias_por_carteira(
+        self,
+        endereco_carteira: str,
+        inicio: Optional[datetime] = None,
+        fim: Optional[datetime] = None,
+        incluir_arquivo: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Obtém as transferências relacionadas a uma carteira
+        (como origem ou como destino), opcionalmente no período [inicio, fim).
+
+        O filtro por data_hora faz o MySQL ler só as partições do período.
+        Com incluir_arquivo=True, também consulta transferencia_arquivo e os
+        arquivos Parquet gerados pelo arquivamento.
+        """
+        params: Dict[str, Any] = {"endereco": endereco_carteira}
+        if inicio is not None:
+            params["inicio"] = inicio
+        if fim is not None:
+            params["fim"] = fim
+
+        with self.leitura.conexao(endereco_carteira) as conn:
             rows = conn.execute(
-                text("""
-                    SELECT 
-                        id_transferencia,
-                        endereco_origem,
-                        endereco_destino,
-                        id_moeda,
-                        valor,
-                        taxa_valor,
-                        data_hora
-                    FROM transferencia
-                    WHERE endereco_origem = :endereco 
-                    OR endereco_destino = :endereco
-                    ORDER BY data_hora DESC
-                """),
-                {"endereco": endereco_carteira}
+                _sql_transferencias_carteira(inicio is not None, fim is not None, incluir_arquivo),
+                params
             ).mappings().all()
-            
-            return [dict(row) for row in rows]
+
+        linhas = [dict(row) for row in rows]
+        if incluir_arquivo:
+            arquivadas = transferencias_em_parquet(endereco_carteira, inicio, fim)
+            if arquivadas:
+                linhas.extend(arquivadas)
+                linhas.sort(key=lambda r: r["data_hora"], reverse=True)
+        return linhas
     
-    def obter_transferencia_por_id(self, id_transferencia: int) -> Optional[Dict[str, Any]]:
+    def iterar_historico(
+        self, endereco_carteira: str, incluir_arquivo: bool = False, tamanho_lote: int = 10_000
+    ) -> Iterator[List[Tuple[Any, ...]]]:
+        """
+        Percorre todo o histórico da carteira (depósitos/saques, transferências
+        enviadas e recebidas, conversões), em ordem cronológica por tabela, em
+        lotes de até `tamanho_lote` tuplas no formato de COLUNAS_HISTORICO.
+        Usa cursor no servidor: a memória não cresce com o tamanho do histórico.
+        Com incluir_arquivo, lê também as tabelas *_arquivo e as partições
+        arquivadas em Parquet; sem pyarrow para lê-las, ParquetIndisponivelError
+        já na chamada (antes de qualquer lote).
+        """
+        if incluir_arquivo:
+            exigir_leitura_parquet()
+        return self._iterar_historico(endereco_carteira, incluir_arquivo, tamanho_lote)
+
+    def _iterar_historico(
+        self, endereco_carteira: str, incluir_arquivo: bool, tamanho_lote: int
+    ) -> Iterator[List[Tuple[Any, ...]]]:
+        origem = self.leitura.escolher_engine(endereco_carteira)
+        for sql in _consultas_historico(incluir_arquivo):
+            with cursor_servidor(sql, {"endereco": endereco_carteira}, origem) as cursor:
+                while True:
+                    lote = cursor.fetchmany(tamanho_lote)
+                    if not lote:
+                        break
+                    yield lote
+        if incluir_arquivo:
+            yield from historico_em_parquet(endereco_carteira, tamanho_lote)
+
+    def obter_transferencia_por_id(self, id_transferencia: int, usar_primario: bool = False) -> Optional[Dict[str, Any]]:
         """
         Obtém uma transferência específica pelo ID.
         """
+        with self.leitura.conexao(usar_primario=usar_primario) as conn:
+            row = conn.execute(
+                SQL_TRANSFERENCIA_POR_ID,
+                {"id": id_transferencia}
+            ).mappings().first()
+
+        if row is None and not usar_primario and self.leitura.ativo:
+            # Transferência recente pode ainda não ter chegado à réplica
+            return self.obter_transferencia_por_id(id_transferencia, usar_primario=True)
+        return dict(row) if row else None
+
+    def _transferir(
+        self, conn: Connection, endereco_origem: str, endereco_destino: str,
+        id_moeda: int, valor: float, taxa_valor: float
+    ) -> Dict[str, Any]:
+        if self.usar_procedures:
+            return self._transferir_procedure(conn, endereco_origem, endereco_destino, id_moeda, valor, taxa_valor)
+        return self._transferir_sql(conn, endereco_origem, endereco_destino, id_moeda, valor, taxa_valor)
+
+    def criar_agendamento(self, dados: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Grava uma transferência agendada (migrations/V004) e a devolve.
+        """
         with get_connection() as conn:
+            result = conn.execute(
+                SQL_INSERIR_AGENDAMENTO,
+                dados
+            )
             row = conn.execute(
-                text("""
-                    SELECT 
-                        id_transferencia,
-                        endereco_origem,
-                        endereco_destino,
-                        id_moeda,
-                        valor,
-                        taxa_valor,
-                        data_hora
-                    FROM transferencia
-                    WHERE id_transferencia = :id
+                SQL_AGENDAMENTO_POR_ID,
+                {"id": result.lastrowid}
+            ).mappings().first()
+        self.leitura.registrar_escrita(dados["endereco_origem"])
+        return dict(row)
+
+    def contar_agendamentos(self, endereco_origem: str) -> int:
+        """
+        Agendamentos ainda vigentes (ATIVA ou PAUSADA) da carteira.
+        """
+        with get_connection() as conn:
+            return conn.execute(
+                SQL_CONTAR_AGENDAMENTOS,
+                {"endereco": endereco_origem}
+            ).scalar()
+
+    def listar_agendamentos(self, endereco_origem: str) -> List[Dict[str, Any]]:
+        with self.leitura.conexao(endereco_origem) as conn:
+            rows = conn.execute(
+                SQL_LISTAR_AGENDAMENTOS,
+                {"endereco": endereco_origem}
+            ).mappings().all()
+        return [dict(row) for row in rows]
+
+    def obter_agendamento(
+        self, endereco_origem: str, id_agendamento: int, usar_primario: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        with self.leitura.conexao(endereco_origem, usar_primario) as conn:
+            row = conn.execute(
+                SQL_AGENDAMENTO_DA_CARTEIRA,
+                {"id": id_agendamento, "endereco": endereco_origem}
+            ).mappings().first()
+        return dict(row) if row else None
+
+    def atualizar_agendamento(
+        self, endereco_origem: str, id_agendamento: int, campos: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Atualiza um agendamento vigente (ATIVA ou PAUSADA). Retorna None se
+        ele não existe ou já terminou.
+        """
+        invalidas = set(campos) - COLUNAS_AGENDAMENTO_EDITAVEIS
+        if invalidas:
+            raise ValueError(f"Colunas não editáveis: {', '.join(sorted(invalidas))}")
+        self.leitura.registrar_escrita(endereco_origem)
+
+        with get_connection() as conn:
+            atribuicoes = ", ".join(f"{coluna} = :{coluna}" for coluna in campos)
+            result = conn.execute(
+                text(f"""
+                    UPDATE transferencia_agendada SET {atribuicoes}
+                    WHERE id_agendamento = :id_agendamento AND endereco_origem = :endereco_origem
+                      AND status IN ('ATIVA', 'PAUSADA')
                 """),
-                {"id": id_transferencia}
+                {**campos, "id_agendamento": id_agendamento, "endereco_origem": endereco_origem}
+            )
+            if result.rowcount == 0:
+                return None
+            row = conn.execute(
+                SQL_AGENDAMENTO_POR_ID,
+                {"id": id_agendamento}
             ).mappings().first()
-            
-            return dict(row) if row else None
\ No newline at end of file
+        return dict(row)
+
+    def resumo_agendamentos_vencidos(self) -> Tuple[int, float]:
+        """
+        (quantidade, atraso em segundos do mais antigo) dos agendamentos
+        vencidos e ainda não executados.
+        """
+        with get_connection() as conn:
+            row = conn.execute(
+                SQL_RESUMO_AGENDAMENTOS_VENCIDOS
+            ).mappings().first()
+        return int(row["pendentes"]), float(row["atraso"])
+
+    def agendamentos_vencidos(self, limite: int) -> List[Dict[str, Any]]:
+        """
+        Até `limite` agendamentos vencidos, mais antigos primeiro. Leitura sem
+        lock: quem garante a execução única é o FOR UPDATE SKIP LOCKED de
+        executar_agendamentos.
+        """
+        with get_connection() as conn:
+            rows = conn.execute(
+                SQL_AGENDAMENTOS_VENCIDOS,
+                {"limite": limite}
+            ).mappings().all()
+        return [dict(row) for row in rows]
+
+    def executar_agendamentos(
+        self,
+        ids: List[int],
+        calcular_taxa: Callable[[int, float], float],
+        reagendar: Callable[[Dict[str, Any], datetime, Optional[str]], Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        """
+        Executa numa única transação os agendamentos vencidos entre `ids`
+        (em geral, os de uma mesma carteira origem). Cada transferência roda
+        num savepoint: um erro de regra (ex.: saldo insuficiente) desfaz só
+        ela e é registrado no agendamento. `reagendar` devolve as colunas do
+        próximo estado de cada agendamento.
+        """
+        with get_connection() as conn:
+            agendamentos = conn.execute(
+                SQL_BLOQUEAR_AGENDAMENTOS_VENCIDOS,
+                {"ids": ids}
+            ).mappings().all()
+            if not agendamentos:
+                return []
+            agora = conn.execute(SQL_AGORA).scalar()
+
+            execucoes: List[Dict[str, Any]] = []
+            for agendamento in agendamentos:
+                agendamento = dict(agendamento)
+                valor = float(agendamento["valor"])
+                self.leitura.registrar_escrita(agendamento["endereco_origem"], agendamento["endereco_destino"])
+                resultado, erro = None, None
+                try:
+                    with conn.begin_nested():
+                        resultado = self._transferir(
+                            conn, agendamento["endereco_origem"], agendamento["endereco_destino"],
+                            agendamento["id_moeda"], valor,
+                            calcular_taxa(agendamento["id_moeda"], valor),
+                        )
+                except ValueError as e:
+                    erro = str(e)[:255]
+
+                estado = reagendar(agendamento, agora, erro)
+                conn.execute(
+                    SQL_REAGENDAR_AGENDAMENTO,
+                    {
+                        **estado,
+                        "executou": 1 if resultado else 0,
+                        "agora": agora,
+                        "id_transferencia": resultado["id_transferencia"] if resultado else None,
+                        "id_agendamento": agendamento["id_agendamento"],
+                    }
+                )
+                execucoes.append({
+                    "agendamento": agendamento,
+                    "executado_em": agora,
+                    "resultado": resultado,
+                    "erro": erro,
+                })
+        return execucoes
@@ -0,0 +1,192 @@
+# api/persistence/roteamento_leitura.py
+"""
+Roteamento de leituras entre o primário e a réplica (DB_REPLICA_HOST).
+
+Leituras vão para a réplica, exceto:
+- carteiras com escrita recente neste worker, fixadas no primário por
+  DB_REPLICA_FIXAR_S segundos (ler o que acabou de escrever);
+- quando a réplica está atrasada mais que DB_REPLICA_ATRASO_MAX_S, sem
+  replicação (SHOW REPLICA STATUS vazio, salvo com
+  DB_REPLICA_SEM_REPLICACAO_OK=true) ou inacessível, caso em que tudo volta
+  para o primário.
+
+A fixação é em memória do processo: com vários workers (api.servidor), a
+leitura seguinte do cliente pode cair em outro worker, que não viu a escrita.
+"""
+import os
+import math
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, Optional
+
+from sqlalchemy.engine import Connection, Engine
+
+from api.metricas import REGISTRO
+from api.persistence.db import engine, engine_leitura, get_connection
+
+logger = logging.getLogger(__name__)
+
+
+LEITURAS = REGISTRO.contador(
+    "db_leituras_total", "Leituras roteadas por destino", ["destino", "motivo"]
+)
+ATRASO_REPLICA = REGISTRO.medidor(
+    "db_replica_atraso_segundos", "Atraso da réplica de leitura na última verificação"
+)
+
+
+class RoteadorLeitura:
+    def __init__(
+        self,
+        engine_replica: Optional[Engine],
+        fixar_s: float,
+        atraso_max_s: float,
+        verificar_a_cada_s: float,
+        aceitar_sem_replicacao: bool = False,
+    ):
+        self.engine_replica = engine_replica
+        self.fixar_s = fixar_s
+        self.atraso_max_s = atraso_max_s
+        self.verificar_a_cada_s = verificar_a_cada_s
+        self.aceitar_sem_replicacao = aceitar_sem_replicacao
+        self._fixadas: Dict[str, float] = {}
+        self._atraso_s = 0.0
+        self._verificado_em = -math.inf
+        self._lock_verificacao = threading.Lock()
+        self._aviso: Optional[str] = None
+
+    @property
+    def ativo(self) -> bool:
+        return self.engine_replica is not None
+
+    def registrar_escrita(self, *enderecos: str) -> None:
+        """
+        Fixa as carteiras no primário pelos próximos fixar_s segundos.
+        """
+        if not self.ativo:
+            return
+        agora = time.monotonic()
+        for endereco in enderecos:
+            self._fixadas[endereco] = agora + self.fixar_s
+        if len(self._fixadas) > 10_000:
+            for endereco, expira_em in list(self._fixadas.items()):
+                if expira_em <= agora:
+                    self._fixadas.pop(endereco, None)
+
+    def _fixada(self, endereco: str) -> bool:
+        expira_em = self._fixadas.get(endereco)
+        return expira_em is not None and expira_em > time.monotonic()
+
+    def alguma_fixada(self, enderecos: Iterable[str]) -> bool:
+        """
+        Para leituras de várias carteiras: True se alguma teve escrita recente.
+        """
+        return self.ativo and any(self._fixada(e) for e in enderecos)
+
+    def _avisar(self, aviso: Optional[str]) -> None:
+        # Loga só quando o motivo muda, não a cada verificação
+        if aviso != self._aviso:
+            if aviso is not None:
+                logger.warning(f"{aviso}; lendo do primário")
+            elif self._aviso is not None:
+                logger.info("Réplica de leitura normalizada")
+            self._aviso = aviso
+
+    def _medir_atraso(self) -> float:
+        with self.engine_replica.connect() as conn:
+            row = conn.exec_driver_sql("SHOW REPLICA STATUS").mappings().first()
+        if row is None:
+            # Instância sem replicação: só vale como réplica em ambiente de
+            # teste, com opt-in explícito
+            if self.aceitar_sem_replicacao:
+                self._avisar(None)
+                return 0.0
+            self._avisar("Réplica sem replicação configurada (SHOW REPLICA STATUS vazio)")
+            return math.inf
+        valor = row.get("Seconds_Behind_Source")
+        if valor is None:
+            self._avisar("Replicação parada na réplica (Seconds_Behind_Source NULL)")
+            return math.inf
+        self._avisar(None)
+        return float(valor)
+
+    def atraso(self) -> float:
+        """
+        Atraso da réplica em segundos, medido no máximo uma vez a cada
+        verificar_a_cada_s; enquanto uma thread mede, as outras usam o último valor.
+        """
+        if time.monotonic() - self._verificado_em < self.verificar_a_cada_s:
+            return self._atraso_s
+        if not self._lock_verificacao.acquire(blocking=False):
+            return self._atraso_s
+        try:
+            try:
+                self._atraso_s = self._medir_atraso()
+            except Exception as e:
+                self._avisar(f"Não foi possível verificar a réplica: {e}")
+                self._atraso_s = math.inf
+            self._verificado_em = time.monotonic()
+            ATRASO_REPLICA.set(self._atraso_s if math.isfinite(self._atraso_s) else -1)
+        finally:
+            self._lock_verificacao.release()
+        return self._atraso_s
+
+    def _motivo_primario(self, endereco: Optional[str], usar_primario: bool) -> Optional[str]:
+        if not self.ativo:
+            return "sem_replica"
+        if usar_primario:
+            return "solicitado"
+        if endereco is not None and self._fixada(endereco):
+            return "escrita_recente"
+        if self.atraso() > self.atraso_max_s:
+            return "atraso"
+        return None
+
+    def escolher_engine(self, endereco: Optional[str] = None) -> Engine:
+        """
+        Engine para leituras longas que não passam por conexao() (ex.: cursores
+        de exportação). Mesmas regras; sem fallback em caso de falha ao conectar.
+        """
+        motivo = self._motivo_primario(endereco, False)
+        LEITURAS.inc(destino="primario" if motivo else "replica", motivo=motivo or "ok")
+        return engine if motivo else self.engine_replica
+
+    @contextmanager
+    def conexao(self, endereco: Optional[str] = None, usar_primario: bool = False) -> Iterator[Connection]:
+        """
+        Conexão para leitura: réplica quando possível, senão primário.
+        """
+        motivo = self._motivo_primario(endereco, usar_primario)
+        conn: Optional[Connection] = None
+        if motivo is None:
+            try:
+                conn = self.engine_replica.connect()
+            except Exception as e:
+                logger.warning(f"Réplica inacessível, lendo do primário: {e}")
+                # Força nova verificação antes de voltar a usar a réplica
+                self._atraso_s = math.inf
+                self._verificado_em = time.monotonic()
+                motivo = "falha_replica"
+
+        if conn is None:
+            LEITURAS.inc(destino="primario", motivo=motivo)
+            with get_connection() as conn_primario:
+                yield conn_primario
+            return
+
+        LEITURAS.inc(destino="replica", motivo="ok")
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+
+ROTEADOR_LEITURA = RoteadorLeitura(
+    engine_leitura,
+    fixar_s=float(os.getenv("DB_REPLICA_FIXAR_S", "5")),
+    atraso_max_s=float(os.getenv("DB_REPLICA_ATRASO_MAX_S", "2")),
+    verificar_a_cada_s=float(os.getenv("DB_REPLICA_VERIFICAR_S", "1")),
+    aceitar_sem_replicacao=os.getenv("DB_REPLICA_SEM_REPLICACAO_OK", "false").lower() in ("1", "true", "sim", "yes"),
+)
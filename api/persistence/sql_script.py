@@ -0,0 +1,78 @@
+# api/persistence/sql_script.py
+from typing import List
+
+
+def separar_statements(script: str) -> List[str]:
+    """
+    Divide um script SQL em statements individuais.
+
+    Respeita strings ('...', "...", `...`), comentários (-- e /* */) e a
+    diretiva DELIMITER do cliente mysql, usada nos arquivos de procedures.
+    """
+    statements: List[str] = []
+    atual: List[str] = []
+    delimitador = ";"
+    i = 0
+    n = len(script)
+    inicio_linha = True
+
+    while i < n:
+        # Diretiva DELIMITER (só vale no início de linha)
+        if inicio_linha:
+            j = i
+            while j < n and script[j] in " \t":
+                j += 1
+            if script[j:j + 10].upper() == "DELIMITER ":
+                fim = script.find("\n", j)
+                fim = n if fim == -1 else fim
+                delimitador = script[j + 10:fim].strip()
+                i = fim + 1
+                continue
+
+        c = script[i]
+        inicio_linha = c == "\n"
+
+        # Comentário de linha
+        if script.startswith("--", i) or c == "#":
+            fim = script.find("\n", i)
+            i = n if fim == -1 else fim
+            continue
+
+        # Comentário de bloco
+        if script.startswith("/*", i):
+            fim = script.find("*/", i + 2)
+            i = n if fim == -1 else fim + 2
+            continue
+
+        # Strings e identificadores entre crases
+        if c in ("'", '"', "`"):
+            j = i + 1
+            while j < n:
+                if script[j] == "\\" and c != "`":
+                    j += 2
+                    continue
+                if script[j] == c:
+                    if j + 1 < n and script[j + 1] == c:
+                        j += 2
+                        continue
+                    break
+                j += 1
+            atual.append(script[i:j + 1])
+            i = j + 1
+            continue
+
+        if script.startswith(delimitador, i):
+            stmt = "".join(atual).strip()
+            if stmt:
+                statements.append(stmt)
+            atual = []
+            i += len(delimitador)
+            continue
+
+        atual.append(c)
+        i += 1
+
+    stmt = "".join(atual).strip()
+    if stmt:
+        statements.append(stmt)
+    return statements
@@ -0,0 +1,336 @@
+# api/profiler.py
+"""
+Profiling sob demanda em produção (sem debugger).
+
+- Amostragem de pilhas: uma thread lê sys._current_frames() a
+  PROFILER_FREQUENCIA_HZ vezes por segundo durante N segundos e conta as
+  pilhas de todas as threads do worker (event loop e threadpool). O
+  resultado sai no formato "collapsed" (uma pilha por linha, frames
+  separados por ";" e a contagem no fim), aceito por flamegraph.pl,
+  speedscope e inferno. Threads paradas em espera (lock, fila, select) ficam
+  de fora por padrão. Disparo por GET /admin/profiler/amostras ou pelo sinal
+  PROFILER_SINAL (ex.: SIGUSR2), que grava o arquivo em PROFILER_DIR.
+- cProfile por requisição: com os headers X-Profile: cprofile e
+  X-Admin-Token, a requisição roda sob cProfile no event loop e em cada
+  trecho que ela executa no threadpool; o .prof vai para PROFILER_DIR e o
+  nome volta no header X-Profile-Arquivo. Uma requisição perfilada por vez
+  no worker; o trecho do event loop inclui o que mais rodou nele no período.
+  No Python 3.12+ o cProfile usa sys.monitoring, que vale para o processo
+  todo: só um Profile pode estar ligado (um segundo enable() levanta
+  ValueError) e o do event loop já registra todas as threads. Lá não há
+  trechos por thread, e o perfil inclui o que as outras requisições rodaram
+  no threadpool no período.
+
+Os endpoints de /admin só existem com ADMIN_TOKEN definido.
+"""
+import os
+import sys
+import hmac
+import time
+import signal
+import cProfile
+import inspect
+import logging
+import pstats
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from functools import wraps
+from types import CodeType, FrameType
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from fastapi.routing import APIRoute
+
+from api.metricas import REGISTRO
+
+logger = logging.getLogger(__name__)
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILER_DIR = os.getenv("PROFILER_DIR", "perfis")
+PROFILER_MAX_S = float(os.getenv("PROFILER_MAX_S", "60"))
+PROFILER_FREQUENCIA_HZ = float(os.getenv("PROFILER_FREQUENCIA_HZ", "99"))
+PROFILER_ARQUIVOS_MAX = int(os.getenv("PROFILER_ARQUIVOS_MAX", "50"))
+
+# Antes do 3.12 o cProfile só mede a thread em que foi ligado
+PERFIL_POR_THREAD = sys.version_info < (3, 12)
+
+SESSOES = REGISTRO.contador(
+    "profiler_sessoes_total", "Sessões de profiling por tipo", ["tipo"]
+)
+
+# Frames em que uma thread está só esperando (o frame Python de cima de uma
+# chamada bloqueante em C)
+_ARQUIVOS_ESPERA = ("threading.py", "selectors.py", "queue.py")
+
+
+class ProfilerOcupadoError(Exception):
+    """Já existe uma sessão de profiling do mesmo tipo em andamento."""
+
+
+def admin_autorizado(token: Optional[str]) -> bool:
+    return bool(ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+# ---------------------------------------------------------------------------
+# Amostragem de pilhas
+# ---------------------------------------------------------------------------
+
+_rotulos: Dict[CodeType, str] = {}
+
+
+def _rotulo(code: CodeType) -> str:
+    rotulo = _rotulos.get(code)
+    if rotulo is None:
+        pasta, arquivo = os.path.split(code.co_filename)
+        if arquivo == "__init__.py":
+            arquivo = os.path.basename(pasta) + "/" + arquivo
+        nome = getattr(code, "co_qualname", code.co_name)
+        rotulo = _rotulos[code] = f"{nome} ({arquivo}:{code.co_firstlineno})".replace(";", ",")
+    return rotulo
+
+
+def _em_espera(frame: FrameType) -> bool:
+    return frame.f_code.co_filename.endswith(_ARQUIVOS_ESPERA)
+
+
+def _pilha(frame: Optional[FrameType]) -> List[str]:
+    pilha = []
+    while frame is not None:
+        pilha.append(_rotulo(frame.f_code))
+        frame = frame.f_back
+    pilha.reverse()
+    return pilha
+
+
+class AmostradorPilhas:
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def amostrar(self, segundos: float, frequencia_hz: float, incluir_ociosas: bool = False) -> Counter:
+        """
+        Bloqueia por `segundos` amostrando as pilhas de todas as outras
+        threads. Retorna "thread;frame;...;frame" -> número de amostras.
+        """
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerOcupadoError("Já existe uma amostragem em andamento neste worker")
+        try:
+            return self._amostrar(segundos, 1 / frequencia_hz, incluir_ociosas)
+        finally:
+            self._lock.release()
+
+    def _amostrar(self, segundos: float, intervalo: float, incluir_ociosas: bool) -> Counter:
+        propria = threading.get_ident()
+        pilhas: Counter = Counter()
+        nomes: Dict[int, str] = {}
+        fim = time.monotonic() + segundos
+        proxima = time.monotonic()
+        while proxima < fim:
+            frames = sys._current_frames()
+            if frames.keys() - nomes.keys():
+                nomes = {t.ident: t.name.replace(";", ",") for t in threading.enumerate()}
+            for ident, frame in frames.items():
+                if ident == propria or (not incluir_ociosas and _em_espera(frame)):
+                    continue
+                pilha = _pilha(frame)
+                pilha.insert(0, nomes.get(ident, str(ident)))
+                pilhas[";".join(pilha)] += 1
+            proxima += intervalo
+            time.sleep(max(proxima - time.monotonic(), 0))
+        return pilhas
+
+
+AMOSTRADOR = AmostradorPilhas()
+
+
+def formatar_collapsed(pilhas: Counter) -> str:
+    return "".join(f"{pilha} {contagem}\n" for pilha, contagem in sorted(pilhas.items()))
+
+
+def _novo_arquivo(prefixo: str, extensao: str) -> str:
+    os.makedirs(PROFILER_DIR, exist_ok=True)
+    antigos = sorted(
+        (os.path.join(PROFILER_DIR, nome) for nome in os.listdir(PROFILER_DIR)),
+        key=os.path.getmtime,
+    )
+    for caminho in antigos[:max(len(antigos) - PROFILER_ARQUIVOS_MAX + 1, 0)]:
+        os.remove(caminho)
+    momento = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    return os.path.join(PROFILER_DIR, f"{prefixo}-{os.getpid()}-{momento}.{extensao}")
+
+
+def listar_arquivos() -> List[Dict[str, Any]]:
+    if not os.path.isdir(PROFILER_DIR):
+        return []
+    arquivos = []
+    for nome in sorted(os.listdir(PROFILER_DIR)):
+        caminho = os.path.join(PROFILER_DIR, nome)
+        arquivos.append({
+            "nome": nome,
+            "bytes": os.path.getsize(caminho),
+            "criado_em": datetime.fromtimestamp(os.path.getmtime(caminho)),
+        })
+    return arquivos
+
+
+def caminho_arquivo(nome: str) -> Optional[str]:
+    """
+    Caminho de um arquivo de PROFILER_DIR (None se não existe ou se o nome
+    tenta sair da pasta).
+    """
+    if os.path.basename(nome) != nome:
+        return None
+    caminho = os.path.join(PROFILER_DIR, nome)
+    return caminho if os.path.isfile(caminho) else None
+
+
+def resumo_cprofile(caminho: str, linhas: int = 60) -> str:
+    """
+    Funções com maior tempo acumulado de um .prof, em texto.
+    """
+    from io import StringIO
+
+    saida = StringIO()
+    pstats.Stats(caminho, stream=saida).sort_stats("cumulative").print_stats(linhas)
+    return saida.getvalue()
+
+
+def _amostrar_por_sinal(segundos: float) -> None:
+    try:
+        pilhas = AMOSTRADOR.amostrar(segundos, PROFILER_FREQUENCIA_HZ)
+    except ProfilerOcupadoError as e:
+        logger.warning(f"Sinal de profiling ignorado: {e}")
+        return
+    caminho = _novo_arquivo("amostras", "collapsed")
+    with open(caminho, "w", encoding="utf-8") as f:
+        f.write(formatar_collapsed(pilhas))
+    SESSOES.inc(tipo="sinal")
+    logger.info(f"Amostras de {segundos:.0f}s gravadas em {caminho}")
+
+
+def instalar_sinal() -> Optional[str]:
+    """
+    Com PROFILER_SINAL (ex.: SIGUSR2), o sinal dispara uma amostragem de
+    PROFILER_SINAL_S segundos numa thread. Retorna o nome do sinal instalado.
+    """
+    nome = os.getenv("PROFILER_SINAL", "").strip().upper()
+    if not nome:
+        return None
+    segundos = min(float(os.getenv("PROFILER_SINAL_S", "30")), PROFILER_MAX_S)
+
+    def tratar(signum, frame):
+        threading.Thread(
+            target=_amostrar_por_sinal, args=(segundos,), name="profiler-sinal", daemon=True
+        ).start()
+
+    try:
+        signal.signal(getattr(signal, nome), tratar)
+    except (AttributeError, ValueError) as e:
+        # Sinal inexistente na plataforma ou fora da thread principal
+        logger.warning(f"PROFILER_SINAL={nome} não instalado: {e}")
+        return None
+    return nome
+
+
+# ---------------------------------------------------------------------------
+# cProfile por requisição
+# ---------------------------------------------------------------------------
+
+class PerfilRequisicao:
+    """
+    Um cProfile.Profile por trecho da requisição (o cProfile só mede a
+    thread em que foi ligado; no 3.12+ há só o do event loop);
+    salvar() junta todos num único .prof.
+    """
+
+    def __init__(self):
+        self.thread_loop = threading.get_ident()
+        self._perfis: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def segmento(self) -> Iterator[None]:
+        perfil = cProfile.Profile()
+        perfil.enable()
+        try:
+            yield
+        finally:
+            perfil.disable()
+            with self._lock:
+                self._perfis.append(perfil)
+
+    def salvar(self, rota: str) -> str:
+        prefixo = "cprofile-" + "".join(c if c.isalnum() else "_" for c in rota).strip("_")[:60]
+        caminho = _novo_arquivo(prefixo, "prof")
+        with self._lock:
+            estatisticas = pstats.Stats(self._perfis[0])
+            for perfil in self._perfis[1:]:
+                estatisticas.add(perfil)
+        estatisticas.dump_stats(caminho)
+        return caminho
+
+
+_perfil_requisicao: ContextVar[Optional[PerfilRequisicao]] = ContextVar("perfil_requisicao", default=None)
+_lock_requisicao = threading.Lock()
+
+
+@contextmanager
+def perfilar_requisicao() -> Iterator[Optional[PerfilRequisicao]]:
+    """
+    Liga o cProfile para a requisição atual (no event loop). Entrega None se
+    outra requisição já está sendo perfilada neste worker.
+    """
+    if not _lock_requisicao.acquire(blocking=False):
+        yield None
+        return
+    perfil = PerfilRequisicao()
+    token = _perfil_requisicao.set(perfil)
+    try:
+        with perfil.segmento():
+            yield perfil
+    finally:
+        _perfil_requisicao.reset(token)
+        _lock_requisicao.release()
+        SESSOES.inc(tipo="cprofile")
+
+
+def perfilavel(funcao: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Envolve uma função que roda no threadpool: se a requisição que a chamou
+    está sendo perfilada, a execução vira um trecho do perfil. No 3.12+
+    devolve a própria função (o perfil do event loop já cobre o threadpool).
+    """
+    if not PERFIL_POR_THREAD:
+        return funcao
+
+    @wraps(funcao)
+    def executar(*args: Any, **kwargs: Any) -> Any:
+        perfil = _perfil_requisicao.get()
+        if perfil is None or threading.get_ident() == perfil.thread_loop:
+            return funcao(*args, **kwargs)
+        with perfil.segmento():
+            return funcao(*args, **kwargs)
+    return executar
+
+
+async def em_threadpool(funcao: Callable[..., Any], *args: Any) -> Any:
+    """
+    run_in_threadpool que acompanha o cProfile da requisição.
+    """
+    if PERFIL_POR_THREAD and _perfil_requisicao.get() is not None:
+        funcao = perfilavel(funcao)
+    return await run_in_threadpool(funcao, *args)
+
+
+class RotaPerfilavel(APIRoute):
+    """
+    Rota cujos endpoints síncronos (que o FastAPI roda no threadpool)
+    entram no cProfile da requisição.
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any):
+        if not inspect.iscoroutinefunction(endpoint):
+            endpoint = perfilavel(endpoint)
+        super().__init__(path, endpoint, **kwargs)
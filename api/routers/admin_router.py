@@ -0,0 +1,79 @@
+# api/routers/admin_router.py
+import asyncio
+import threading
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import FileResponse, PlainTextResponse
+
+from api import profiler
+
+
+def exigir_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    # Sem ADMIN_TOKEN (ou com token errado) os endpoints "não existem"
+    if not profiler.admin_autorizado(x_admin_token):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+router = APIRouter(
+    prefix="/admin", tags=["admin"], include_in_schema=False, dependencies=[Depends(exigir_admin)]
+)
+
+
+@router.get("/profiler/amostras", response_class=PlainTextResponse)
+async def amostrar_pilhas(
+    segundos: float = Query(10, gt=0),
+    frequencia_hz: float = Query(profiler.PROFILER_FREQUENCIA_HZ, gt=0, le=1000),
+    ociosas: bool = Query(False, description="Inclui threads paradas em espera"),
+):
+    """
+    Amostra as pilhas de todas as threads do worker por N segundos e devolve
+    no formato collapsed (flamegraph.pl, speedscope). Atende só o worker que
+    recebeu a requisição.
+    """
+    if segundos > profiler.PROFILER_MAX_S:
+        raise HTTPException(status_code=400, detail=f"segundos deve ser no máximo {profiler.PROFILER_MAX_S:g}")
+
+    # Thread própria (não o threadpool), para não ocupar um worker da API
+    # nem aparecer nas amostras
+    loop = asyncio.get_running_loop()
+    resultado = loop.create_future()
+
+    def executar():
+        try:
+            pilhas = profiler.AMOSTRADOR.amostrar(segundos, frequencia_hz, ociosas)
+            loop.call_soon_threadsafe(resultado.set_result, pilhas)
+        except Exception as e:
+            loop.call_soon_threadsafe(resultado.set_exception, e)
+
+    threading.Thread(target=executar, name="profiler-amostras", daemon=True).start()
+    try:
+        pilhas = await resultado
+    except profiler.ProfilerOcupadoError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    profiler.SESSOES.inc(tipo="amostras")
+    return PlainTextResponse(profiler.formatar_collapsed(pilhas))
+
+
+@router.get("/profiler/perfis")
+def listar_perfis():
+    """
+    Arquivos gravados em PROFILER_DIR (cProfile por requisição e amostras
+    disparadas por sinal).
+    """
+    return profiler.listar_arquivos()
+
+
+@router.get("/profiler/perfis/{nome}")
+def obter_perfil(nome: str, formato: str = Query("texto", pattern="^(texto|arquivo)$")):
+    """
+    Resumo em texto (funções por tempo acumulado) ou o arquivo original
+    (.prof para snakeviz/pstats, .collapsed para flame graphs).
+    """
+    caminho = profiler.caminho_arquivo(nome)
+    if caminho is None:
+        raise HTTPException(status_code=404, detail="Perfil não encontrado")
+    if formato == "arquivo" or not nome.endswith(".prof"):
+        return FileResponse(caminho, filename=nome)
+    return PlainTextResponse(profiler.resumo_cprofile(caminho))
@@ -1,24 +1,47 @@
 # api/routers/carteira_router.py
-from fastapi import APIRouter, HTTPException, Depends
-from typing import Any, Dict, List
+import os
+import asyncio
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Any, Dict, List, Optional
 
 from api.services.carteira_service import CarteiraService
-from api.persistence.repositories.carteira_repository import CarteiraRepository
+from api.services import exportacao
+from api.services.fila_carteira import FilaCheiaError
+from api.services.eventos_saldo import LimiteAssinantesError
+from api.persistence.arquivamento import ParquetIndisponivelError
+from api.admissao import CapacidadeEsgotadaError, limitar_carteira, limitar_em_voo, sem_capacidade, vaga_em_voo
+from api.dependencies import get_carteira_service
+from api.profiler import RotaPerfilavel, em_threadpool
+from api.routers.json_rapido import JSON_RAPIDO, RespostaJSONRapida, serializar
 from api.models.carteira_models import (
     Carteira, CarteiraCriada, DepositoRequest, SaldoCarteira, 
     SaqueRequest, TransacaoResponse, ConversaoRequest, 
-    ConversaoResponse, CotacaoResponse, TransferenciaRequest, TransferenciaResponse
+    ConversaoResponse, CotacaoResponse, TransferenciaRequest, TransferenciaResponse,
+    ConsultaSaldosRequest, ConsultaSaldosResponse, ValorCarteira,
+    AvaliacaoCarteirasRequest, AvaliacaoCarteirasResponse,
+    AgendamentoRequest, AgendamentoAtualizacao, AgendamentoCancelamento, AgendamentoResponse
 )
 
 
-router = APIRouter(prefix="/carteiras", tags=["carteiras"])
+router = APIRouter(prefix="/carteiras", tags=["carteiras"], route_class=RotaPerfilavel)
 
+# Controle de admissão: toda rota que usa o banco ocupa uma vaga do limite
+# global; movimentações consomem o balde de tokens da carteira e só ocupam a
+# vaga depois da vez na fila da carteira (executar_em_fila)
+USA_BANCO = [Depends(limitar_em_voo)]
+MOVIMENTACAO = [Depends(limitar_carteira)]
 
-def get_carteira_service() -> CarteiraService:
-    repo = CarteiraRepository()
-    return CarteiraService(repo)
+SSE_HEARTBEAT_S = float(os.getenv("SSE_HEARTBEAT_S", "15"))
+SSE_RESYNC_S = float(os.getenv("SSE_RESYNC_S", "30"))
 
-@router.post("", response_model=CarteiraCriada, status_code=201)
+
+def _fila_cheia(e: FilaCheiaError) -> HTTPException:
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+
+
+@router.post("", response_model=CarteiraCriada, status_code=201, dependencies=USA_BANCO)
 def criar_carteira(
     service: CarteiraService = Depends(get_carteira_service),
 )->CarteiraCriada:
@@ -32,12 +55,56 @@ def criar_carteira(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("", response_model=List[Carteira])
+@router.get("", response_model=List[Carteira], dependencies=USA_BANCO)
 def listar_carteiras(service: CarteiraService = Depends(get_carteira_service)):
+    if JSON_RAPIDO:
+        return RespostaJSONRapida(service.listar_linhas())
     return service.listar()
 
 
-@router.get("/{endereco_carteira}", response_model=Carteira)
+@router.post("/saldos/consulta", response_model=ConsultaSaldosResponse, dependencies=USA_BANCO)
+async def consultar_saldos(
+    consulta: ConsultaSaldosRequest,
+    service: CarteiraService = Depends(get_carteira_service),
+):
+    """
+    Saldos de várias carteiras numa única consulta ao banco (até
+    SALDOS_CONSULTA_MAX endereços), agrupados por carteira.
+
+    - **id_moeda**: opcional, só os saldos dessa moeda
+    - **moeda_avaliacao**: opcional (ex.: USD), inclui o valor de cada saldo e
+      o total da carteira nessa moeda, com as cotações em cache
+    """
+    try:
+        resultado = await service.consultar_saldos(
+            consulta.enderecos, consulta.id_moeda, consulta.moeda_avaliacao
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if JSON_RAPIDO:
+        return RespostaJSONRapida(resultado)
+    return resultado
+
+
+@router.post("/valor/consulta", response_model=AvaliacaoCarteirasResponse, dependencies=USA_BANCO)
+async def avaliar_carteiras(
+    consulta: AvaliacaoCarteirasRequest,
+    service: CarteiraService = Depends(get_carteira_service),
+):
+    """
+    Valor total de várias carteiras (até AVALIACAO_MAX_CARTEIRAS) na moeda
+    pedida, calculado de uma vez sobre todos os saldos com as cotações em cache.
+    """
+    try:
+        resultado = await service.avaliar_carteiras(consulta.enderecos, consulta.moeda)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if JSON_RAPIDO:
+        return RespostaJSONRapida(resultado)
+    return resultado
+
+
+@router.get("/{endereco_carteira}", response_model=Carteira, dependencies=USA_BANCO)
 def buscar_carteira(
     endereco_carteira: str,
     service: CarteiraService = Depends(get_carteira_service),
@@ -48,7 +115,25 @@ def buscar_carteira(
         raise HTTPException(status_code=404, detail=str(e))
 
 
-@router.delete("/{endereco_carteira}", response_model=Carteira)
+@router.get("/{endereco_carteira}/valor", response_model=ValorCarteira, dependencies=USA_BANCO)
+async def avaliar_carteira(
+    endereco_carteira: str,
+    moeda: str = Query("USD", description="Moeda da avaliação (ex.: USD, BRL, BTC)"),
+    service: CarteiraService = Depends(get_carteira_service),
+):
+    """
+    Quanto a carteira vale em `moeda`, com as cotações em cache.
+    """
+    try:
+        valor = await service.avaliar_carteira(endereco_carteira, moeda)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if valor is None:
+        raise HTTPException(status_code=404, detail="Carteira não encontrada")
+    return valor
+
+
+@router.delete("/{endereco_carteira}", response_model=Carteira, dependencies=USA_BANCO)
 def bloquear_carteira(
     endereco_carteira: str,
     service: CarteiraService = Depends(get_carteira_service),
@@ -58,46 +143,163 @@ def bloquear_carteira(
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
-@router.post("/{endereco_carteira}/depositos", response_model=TransacaoResponse, status_code=201)
-def realizar_deposito(
+@router.post("/{endereco_carteira}/depositos", response_model=TransacaoResponse, status_code=201, dependencies=MOVIMENTACAO)
+async def realizar_deposito(
     endereco_carteira: str,
     deposito: DepositoRequest,
     service: CarteiraService = Depends(get_carteira_service),
 ):
     try:
-        return service.realizar_deposito(endereco_carteira, deposito)
+        return await service.executar_em_fila(
+            [endereco_carteira], service.realizar_deposito, endereco_carteira, deposito, vaga=vaga_em_voo
+        )
+    except FilaCheiaError as e:
+        raise _fila_cheia(e)
+    except CapacidadeEsgotadaError as e:
+        raise sem_capacidade(e)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/{endereco_carteira}/saques", response_model=TransacaoResponse, status_code=201)
-def realizar_saque(
+@router.post("/{endereco_carteira}/saques", response_model=TransacaoResponse, status_code=201, dependencies=MOVIMENTACAO)
+async def realizar_saque(
     endereco_carteira: str,
     saque: SaqueRequest,
     service: CarteiraService = Depends(get_carteira_service),
 ):
     try:
-        return service.realizar_saque(endereco_carteira, saque)
+        return await service.executar_em_fila(
+            [endereco_carteira], service.realizar_saque, endereco_carteira, saque, vaga=vaga_em_voo
+        )
+    except FilaCheiaError as e:
+        raise _fila_cheia(e)
+    except CapacidadeEsgotadaError as e:
+        raise sem_capacidade(e)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/{endereco_carteira}/saldos", response_model=List[SaldoCarteira])
+@router.get("/{endereco_carteira}/saldos", response_model=List[SaldoCarteira], dependencies=USA_BANCO)
 def obter_saldos(
     endereco_carteira: str,
     service: CarteiraService = Depends(get_carteira_service),
 ):
     try:
-        saldos = service.obter_saldos(endereco_carteira)
+        if JSON_RAPIDO:
+            saldos = service.obter_saldos_linhas(endereco_carteira)
+        else:
+            saldos = service.obter_saldos(endereco_carteira)
         if not saldos:
             raise ValueError("Nenhum saldo encontrado")
+        if JSON_RAPIDO:
+            return RespostaJSONRapida(saldos)
         return saldos
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     
-@router.get("/{endereco_carteira}/saldos/{id_moeda}", response_model=SaldoCarteira)
+def _evento_sse(evento: Dict[str, Any]) -> bytes:
+    return b"event: saldo\ndata: " + serializar(evento) + b"\n\n"
+
+
+@router.get("/{endereco_carteira}/saldos/stream")
+async def stream_saldos(
+    endereco_carteira: str,
+    request: Request,
+    service: CarteiraService = Depends(get_carteira_service),
+):
+    """
+    Server-Sent Events com os saldos da carteira: primeiro o estado atual,
+    depois cada mudança logo após o commit. Consumidores lentos recebem só o
+    saldo mais recente de cada moeda. A cada SSE_RESYNC_S o saldo é relido
+    do banco, para cobrir movimentações feitas em outros workers.
+    """
+    if service.publicador.lotado:
+        raise HTTPException(status_code=503, detail="Limite de conexões de saldo atingido", headers={"Retry-After": "5"})
+    try:
+        await em_threadpool(service.buscar_por_endereco, endereco_carteira)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    async def eventos():
+        # Assina dentro do gerador: o finally abaixo sempre cancela a assinatura
+        try:
+            assinatura = service.publicador.assinar(endereco_carteira)
+        except LimiteAssinantesError as e:
+            yield b"event: erro\ndata: " + serializar({"detail": str(e)}) + b"\n\n"
+            return
+
+        ultimos: Dict[int, Dict[str, Any]] = {}
+
+        async def ler_estado() -> Optional[List[Dict[str, Any]]]:
+            # Com a vez da carteira nenhuma movimentação deste worker está em
+            # andamento e as já commitadas foram entregues à assinatura: os
+            # pendentes são descartados (a leitura os cobre) e tudo que chegar
+            # depois é mais novo que ela
+            try:
+                async with service.fila.vez(endereco_carteira):
+                    assinatura.descartar()
+                    return await em_threadpool(service.obter_saldos_linhas, endereco_carteira)
+            except FilaCheiaError:
+                return None
+
+        def atualizados(linhas: List[Dict[str, Any]], operacao: str) -> List[Dict[str, Any]]:
+            novos = []
+            for linha in linhas:
+                anterior = ultimos.get(linha["id_moeda"])
+                if anterior is not None and anterior["saldo"] == linha["saldo"]:
+                    continue
+                novos.append({
+                    "endereco_carteira": endereco_carteira,
+                    "id_moeda": linha["id_moeda"],
+                    "saldo": linha["saldo"],
+                    "operacao": operacao,
+                    "data_hora": linha["data_atualizacao"],
+                })
+            return novos
+
+        try:
+            linhas = await ler_estado()
+            if linhas is None:
+                # Fila da carteira cheia: lê sem a vez; o resync corrige
+                linhas = await em_threadpool(service.obter_saldos_linhas, endereco_carteira)
+            pendentes = atualizados(linhas, "ESTADO_ATUAL")
+            loop = asyncio.get_running_loop()
+            proximo_resync = loop.time() + SSE_RESYNC_S
+            while True:
+                for evento in pendentes:
+                    ultimos[evento["id_moeda"]] = evento
+                    yield _evento_sse(evento)
+                if await request.is_disconnected():
+                    break
+
+                espera = min(SSE_HEARTBEAT_S, max(0.0, proximo_resync - loop.time()))
+                pendentes = await assinatura.proximos(timeout=espera)
+                if pendentes:
+                    continue
+                if loop.time() >= proximo_resync:
+                    proximo_resync = loop.time() + SSE_RESYNC_S
+                    linhas_atuais = await ler_estado()
+                    if linhas_atuais is not None:
+                        pendentes = atualizados(linhas_atuais, "RESYNC")
+                if not pendentes:
+                    # Comentário SSE: mantém a conexão viva em proxies
+                    yield b": ping\n\n"
+        except ValueError:
+            # Carteira removida durante o stream
+            pass
+        finally:
+            service.publicador.cancelar(assinatura)
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/{endereco_carteira}/saldos/{id_moeda}", response_model=SaldoCarteira, dependencies=USA_BANCO)
 def obter_saldo(
     endereco_carteira: str,
     id_moeda: int,
@@ -111,7 +313,7 @@ def obter_saldo(
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
-@router.post("/{endereco_carteira}/conversoes", response_model=ConversaoResponse, status_code=201)
+@router.post("/{endereco_carteira}/conversoes", response_model=ConversaoResponse, status_code=201, dependencies=MOVIMENTACAO)
 async def realizar_conversao(
     endereco_carteira: str,
     conversao: ConversaoRequest,
@@ -126,10 +328,20 @@ async def realizar_conversao(
     - **chave_privada**: chave privada para autenticação
     
     Usa a API da Coinbase para obter cotações em tempo real.
-    Aplica uma taxa de 0.5% para a conversão.
+    Aplica a taxa de conversão da política de taxas (TAXA_CONVERSAO_PERCENTUAL).
     """
     try:
-        return await service.realizar_conversao(endereco_carteira, conversao)
+        # Cotação antes da vez: a chamada à Coinbase não segura a fila da
+        # carteira nem a vaga em voo
+        cotacao = await service.cotar_conversao(conversao)
+        return await service.executar_em_fila(
+            [endereco_carteira], service.realizar_conversao, endereco_carteira, conversao, cotacao,
+            vaga=vaga_em_voo,
+        )
+    except FilaCheiaError as e:
+        raise _fila_cheia(e)
+    except CapacidadeEsgotadaError as e:
+        raise sem_capacidade(e)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -152,8 +364,8 @@ async def obter_cotacao(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/{endereco_origem}/transferencias", response_model=TransferenciaResponse, status_code=201)
-def realizar_transferencia(
+@router.post("/{endereco_origem}/transferencias", response_model=TransferenciaResponse, status_code=201, dependencies=MOVIMENTACAO)
+async def realizar_transferencia(
     endereco_origem: str,
     transferencia: TransferenciaRequest,
     service: CarteiraService = Depends(get_carteira_service),
@@ -166,27 +378,43 @@ def realizar_transferencia(
     - **valor**: Valor a ser transferido (deve ser positivo)
     - **chave_privada**: chave privada da carteira origem para autenticação
     
-    Taxa aplicada: 1% do valor da transferência
+    Taxa aplicada: política de taxas (padrão 1% do valor, mínimo 0.01)
     """
     try:
-        return service.realizar_transferencia(endereco_origem, transferencia)
+        return await service.executar_em_fila(
+            [endereco_origem, transferencia.endereco_destino],
+            service.realizar_transferencia, endereco_origem, transferencia, vaga=vaga_em_voo,
+        )
+    except FilaCheiaError as e:
+        raise _fila_cheia(e)
+    except CapacidadeEsgotadaError as e:
+        raise sem_capacidade(e)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/{endereco_carteira}/transferencias", response_model=List[Dict[str, Any]])
+@router.get("/{endereco_carteira}/transferencias", response_model=List[Dict[str, Any]], dependencies=USA_BANCO)
 def listar_transferencias(
     endereco_carteira: str,
+    inicio: Optional[datetime] = Query(None, description="Início do período (inclusive)"),
+    fim: Optional[datetime] = Query(None, description="Fim do período (exclusivo)"),
+    incluir_arquivo: bool = Query(False, description="Inclui o histórico arquivado"),
     service: CarteiraService = Depends(get_carteira_service),
 ):
     """
     Lista todas as transferências relacionadas a uma carteira
     (tanto como origem quanto como destino).
+
+    Informar o período evita ler meses inteiros de histórico.
     """
+    if inicio is not None and fim is not None and inicio >= fim:
+        raise HTTPException(status_code=400, detail="Período inválido: início deve ser anterior ao fim")
     try:
-        transferencias = service.obter_transferencias(endereco_carteira)
+        transferencias = service.obter_transferencias(endereco_carteira, inicio, fim, incluir_arquivo)
+        if JSON_RAPIDO:
+            return RespostaJSONRapida(transferencias)
         return transferencias
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -194,7 +422,127 @@ def listar_transferencias(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/transferencias/{id_transferencia}", response_model=Dict[str, Any])
+@router.post("/{endereco_origem}/agendamentos", response_model=AgendamentoResponse, status_code=201, dependencies=USA_BANCO)
+def criar_agendamento(
+    endereco_origem: str,
+    agendamento: AgendamentoRequest,
+    service: CarteiraService = Depends(get_carteira_service),
+):
+    """
+    Agenda uma transferência única ou recorrente (ordem permanente).
+
+    - **periodicidade**: UNICA, DIARIA, SEMANAL ou MENSAL
+    - **data_inicio**: primeira execução (padrão: agora); as seguintes
+      repetem o horário (ex.: toda segunda às 9h)
+    - **data_fim**: opcional, última data em que pode executar
+    - **chave_privada**: chave privada da carteira origem
+
+    As execuções são feitas pelo agendador da API, com a mesma taxa e
+    validações de uma transferência comum.
+    """
+    try:
+        return service.criar_agendamento(endereco_origem, agendamento)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/{endereco_origem}/agendamentos", response_model=List[AgendamentoResponse], dependencies=USA_BANCO)
+def listar_agendamentos(
+    endereco_origem: str,
+    service: CarteiraService = Depends(get_carteira_service),
+):
+    try:
+        return service.listar_agendamentos(endereco_origem)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.get("/{endereco_origem}/agendamentos/{id_agendamento}", response_model=AgendamentoResponse, dependencies=USA_BANCO)
+def buscar_agendamento(
+    endereco_origem: str,
+    id_agendamento: int,
+    service: CarteiraService = Depends(get_carteira_service),
+):
+    agendamento = service.obter_agendamento(endereco_origem, id_agendamento)
+    if not agendamento:
+        raise HTTPException(status_code=404, detail="Agendamento não encontrado")
+    return agendamento
+
+
+@router.patch("/{endereco_origem}/agendamentos/{id_agendamento}", response_model=AgendamentoResponse, dependencies=USA_BANCO)
+def atualizar_agendamento(
+    endereco_origem: str,
+    id_agendamento: int,
+    atualizacao: AgendamentoAtualizacao,
+    service: CarteiraService = Depends(get_carteira_service),
+):
+    """
+    Altera valor ou data_fim, pausa (status PAUSADA) ou retoma (status ATIVA).
+    """
+    try:
+        agendamento = service.atualizar_agendamento(endereco_origem, id_agendamento, atualizacao)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not agendamento:
+        raise HTTPException(status_code=404, detail="Agendamento não encontrado")
+    return agendamento
+
+
+@router.delete("/{endereco_origem}/agendamentos/{id_agendamento}", response_model=AgendamentoResponse, dependencies=USA_BANCO)
+def cancelar_agendamento(
+    endereco_origem: str,
+    id_agendamento: int,
+    cancelamento: AgendamentoCancelamento,
+    service: CarteiraService = Depends(get_carteira_service),
+):
+    try:
+        agendamento = service.cancelar_agendamento(endereco_origem, id_agendamento, cancelamento.chave_privada)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not agendamento:
+        raise HTTPException(status_code=404, detail="Agendamento não encontrado")
+    return agendamento
+
+
+@router.get("/{endereco_carteira}/exportar", dependencies=USA_BANCO)
+def exportar_historico(
+    endereco_carteira: str,
+    formato: str = Query("csv", pattern="^(csv|parquet)$"),
+    destino: str = Query("resposta", pattern="^(resposta|arquivo)$"),
+    incluir_arquivo: bool = Query(False, description="Inclui as tabelas de arquivo"),
+    service: CarteiraService = Depends(get_carteira_service),
+):
+    """
+    Exporta todo o histórico da carteira (depósitos, saques, transferências e
+    conversões) em CSV ou Parquet.
+
+    - **destino=resposta**: o arquivo é enviado em streaming na resposta
+    - **destino=arquivo**: o arquivo é gravado no servidor (EXPORTACAO_DIR)
+    """
+    try:
+        exportacao.validar_formato(formato)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        if destino == "arquivo":
+            return service.salvar_historico(endereco_carteira, formato, incluir_arquivo)
+        conteudo = service.exportar_historico(endereco_carteira, formato, incluir_arquivo)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ParquetIndisponivelError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return StreamingResponse(
+        conteudo,
+        media_type=exportacao.FORMATOS[formato],
+        headers={"Content-Disposition": f'attachment; filename="{endereco_carteira}.{formato}"'},
+    )
+
+
+@router.get("/transferencias/{id_transferencia}", response_model=Dict[str, Any], dependencies=USA_BANCO)
 def buscar_transferencia(
     id_transferencia: int,
     service: CarteiraService = Depends(get_carteira_service),
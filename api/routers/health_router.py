@@ -0,0 +1,35 @@
+# api/routers/health_router.py
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
+
+from api.dependencies import aquecer_servicos, status_startup
+
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+
+@router.get("/live")
+def liveness():
+    """
+    O processo está de pé (não consulta dependências).
+    """
+    return {"status": "ok"}
+
+
+@router.get("/ready")
+async def readiness(request: Request):
+    """
+    O worker terminou o aquecimento (pool do banco, moedas, cliente HTTP).
+    Retorna 503 enquanto não estiver pronto; etapas que falharam no startup
+    são refeitas a cada chamada. Inclui os tempos de startup por etapa.
+    """
+    app = request.app
+    if not getattr(app.state, "pronto", False) and hasattr(app.state, "carteira_service"):
+        await aquecer_servicos(app)
+
+    status = status_startup(app)
+    return JSONResponse(
+        status_code=200 if status["pronto"] else 503,
+        content=jsonable_encoder(status),
+    )
@@ -0,0 +1,49 @@
+# api/routers/json_rapido.py
+"""
+Caminho rápido de serialização para endpoints de listagem.
+
+Com API_JSON_RAPIDO=true, os endpoints de lista devolvem as linhas do banco
+direto em bytes (orjson, se instalado), sem criar modelos Pydantic por linha
+e sem a segunda validação do response_model.
+"""
+import os
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional
+    orjson = None
+
+
+JSON_RAPIDO: bool = os.getenv("API_JSON_RAPIDO", "false").strip().lower() in ("1", "true", "sim")
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(obj).__name__}")
+
+
+def serializar(conteudo: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(conteudo, default=_default)
+    return json.dumps(conteudo, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class RespostaJSONRapida(Response):
+    """
+    Response que serializa linhas do banco (dicts com Decimal/datetime) direto para JSON.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return serializar(content)
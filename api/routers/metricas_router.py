@@ -0,0 +1,23 @@
+# api/routers/metricas_router.py
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from api.metricas import REGISTRO, memoria_rss_bytes
+
+
+router = APIRouter(tags=["metricas"])
+
+MEMORIA_RSS = REGISTRO.medidor(
+    "processo_memoria_rss_bytes", "Memória residente (RSS) do worker"
+)
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metricas():
+    """
+    Métricas do processo no formato texto do Prometheus.
+    """
+    rss = memoria_rss_bytes()
+    if rss is not None:
+        MEMORIA_RSS.set(rss)
+    return PlainTextResponse(REGISTRO.exportar(), media_type="text/plain; version=0.0.4; charset=utf-8")
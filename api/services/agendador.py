@@ -0,0 +1,267 @@
+# api/services/agendador.py
+"""
+Transferências agendadas e recorrentes (migrations/V004).
+
+Cada worker roda um AgendadorTransferencias no event loop. A cada tick
+(AGENDADOR_INTERVALO_S, com ±20% de jitter para os workers não baterem no
+banco juntos) ele:
+
+1. mede o backlog (agendamentos vencidos) e o atraso do mais antigo;
+2. lista até AGENDADOR_LOTE vencidos (leitura sem lock);
+3. agrupa por carteira origem e executa cada grupo numa única transação,
+   pela mesma lógica de transferência da API, na vez das carteiras
+   envolvidas (fila_carteira.py).
+
+Vários workers dividem o trabalho: a transação de execução relê os
+agendamentos com FOR UPDATE SKIP LOCKED e confere que ainda estão vencidos,
+então cada ocorrência roda uma vez só (os que outro worker já pegou são
+pulados). Para espalhar a carga das ordens marcadas
+para o mesmo horário ("toda segunda às 9h"), cada agendamento recebe na
+criação um atraso fixo aleatório de até AGENDADOR_JITTER_S segundos.
+
+Falhas de regra (saldo insuficiente, carteira bloqueada) são retentadas a
+cada AGENDADOR_RETENTATIVA_S; depois de AGENDADOR_MAX_FALHAS seguidas, a
+ocorrência é pulada (ou o agendamento único fica FALHOU).
+"""
+import os
+import time
+import random
+import asyncio
+import calendar
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from api.metricas import REGISTRO
+from api.services.fila_carteira import FilaCheiaError
+
+logger = logging.getLogger(__name__)
+
+PENDENTES = REGISTRO.medidor(
+    "agendador_pendentes", "Transferências agendadas vencidas aguardando execução"
+)
+ATRASO = REGISTRO.medidor(
+    "agendador_atraso_segundos", "Atraso do agendamento vencido mais antigo"
+)
+ATRASO_EXECUCAO = REGISTRO.histograma(
+    "agendador_atraso_execucao_segundos", "Atraso entre o horário agendado e a execução",
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600),
+)
+EXECUCOES = REGISTRO.contador(
+    "agendador_execucoes_total", "Transferências agendadas executadas por resultado", ["resultado"]
+)
+
+PERIODICIDADES = ("UNICA", "DIARIA", "SEMANAL", "MENSAL")
+JITTER_TICK = 0.2
+
+
+def _somar_meses(data: datetime, meses: int, dia: int) -> datetime:
+    mes = data.month - 1 + meses
+    ano, mes = data.year + mes // 12, mes % 12 + 1
+    # Dia 31 em meses mais curtos cai no último dia do mês
+    return data.replace(year=ano, month=mes, day=min(dia, calendar.monthrange(ano, mes)[1]))
+
+
+def proxima_ocorrencia(periodicidade: str, data_inicio: datetime, ocorrencia: datetime) -> Optional[datetime]:
+    """
+    Ocorrência seguinte a `ocorrencia` (None para agendamento único).
+    """
+    if periodicidade == "DIARIA":
+        return ocorrencia + timedelta(days=1)
+    if periodicidade == "SEMANAL":
+        return ocorrencia + timedelta(weeks=1)
+    if periodicidade == "MENSAL":
+        return _somar_meses(ocorrencia, 1, data_inicio.day)
+    return None
+
+
+def ocorrencia_apos(
+    periodicidade: str, data_inicio: datetime, ocorrencia: datetime, agora: datetime
+) -> Optional[datetime]:
+    """
+    Primeira ocorrência depois de `agora`, a partir de `ocorrencia`. As que
+    ficaram para trás (agendador parado, agendamento pausado) são puladas,
+    não executadas em sequência.
+    """
+    while ocorrencia is not None and ocorrencia <= agora:
+        ocorrencia = proxima_ocorrencia(periodicidade, data_inicio, ocorrencia)
+    return ocorrencia
+
+
+def estado_da_ocorrencia(agendamento: Dict[str, Any], ocorrencia: Optional[datetime]) -> Dict[str, Any]:
+    """
+    Colunas de agenda para a ocorrência dada (CONCLUIDA se não há próxima
+    ou se ela passa de data_fim).
+    """
+    data_fim = agendamento.get("data_fim")
+    if ocorrencia is None or (data_fim is not None and ocorrencia > data_fim):
+        return {"status": "CONCLUIDA", "proxima_ocorrencia": None, "proxima_execucao": None}
+    return {
+        "status": "ATIVA",
+        "proxima_ocorrencia": ocorrencia,
+        "proxima_execucao": ocorrencia + timedelta(seconds=agendamento["jitter_s"]),
+    }
+
+
+def reagendar(
+    agendamento: Dict[str, Any], agora: datetime, erro: Optional[str],
+    max_falhas: int, retentativa_s: float,
+) -> Dict[str, Any]:
+    """
+    Próximo estado de um agendamento depois de uma tentativa de execução.
+    """
+    falhas = agendamento["falhas_consecutivas"] + 1 if erro else 0
+    if erro and falhas < max_falhas:
+        return {
+            "status": "ATIVA",
+            "proxima_ocorrencia": agendamento["proxima_ocorrencia"],
+            "proxima_execucao": agora + timedelta(seconds=retentativa_s),
+            "falhas_consecutivas": falhas,
+            "ultimo_erro": erro,
+        }
+
+    seguinte = ocorrencia_apos(
+        agendamento["periodicidade"], agendamento["data_inicio"], agendamento["proxima_ocorrencia"], agora
+    )
+    estado = estado_da_ocorrencia(agendamento, seguinte)
+    if erro and agendamento["periodicidade"] == "UNICA":
+        estado["status"] = "FALHOU"
+    estado["falhas_consecutivas"] = 0
+    estado["ultimo_erro"] = erro
+    return estado
+
+
+class AgendadorTransferencias:
+    def __init__(
+        self,
+        service: Any,
+        intervalo_s: float,
+        lote: int,
+        paralelismo: int,
+        max_falhas: int,
+        retentativa_s: float,
+    ):
+        self.service = service
+        self.intervalo_s = intervalo_s
+        self.lote = lote
+        self.max_falhas = max_falhas
+        self.retentativa_s = retentativa_s
+        self._paralelismo = asyncio.Semaphore(max(paralelismo, 1))
+        self._tarefa: Optional[asyncio.Task] = None
+
+    def iniciar(self) -> None:
+        self._tarefa = asyncio.get_running_loop().create_task(self._executar())
+
+    async def fechar(self) -> None:
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            try:
+                await self._tarefa
+            except asyncio.CancelledError:
+                pass
+            self._tarefa = None
+
+    async def _executar(self) -> None:
+        while True:
+            await asyncio.sleep(self.intervalo_s * random.uniform(1 - JITTER_TICK, 1 + JITTER_TICK))
+            try:
+                await self.tick()
+            except Exception as e:
+                EXECUCOES.inc(resultado="erro")
+                logger.warning(f"Tick do agendador de transferências falhou: {e}")
+
+    def _reagendar(self, agendamento: Dict[str, Any], agora: datetime, erro: Optional[str]) -> Dict[str, Any]:
+        return reagendar(agendamento, agora, erro, self.max_falhas, self.retentativa_s)
+
+    def _executar_grupo_sync(self, ids: List[int]) -> List[Dict[str, Any]]:
+        return self.service.carteira_repo.executar_agendamentos(
+            ids,
+            lambda id_moeda, valor: self.service.taxas.calcular("TRANSFERENCIA", id_moeda, valor),
+            self._reagendar,
+        )
+
+    async def _executar_grupo(self, endereco_origem: str, agendamentos: List[Dict[str, Any]]) -> int:
+        enderecos = [endereco_origem] + [a["endereco_destino"] for a in agendamentos]
+        ids = [a["id_agendamento"] for a in agendamentos]
+        async with self._paralelismo:
+            try:
+                # O limite em voo é das requisições da API; o agendador já tem o seu
+                # (_paralelismo)
+                execucoes = await self.service.executar_em_fila(
+                    enderecos, self._executar_grupo_sync, ids
+                )
+            except FilaCheiaError:
+                # Carteira ocupada com operações da API: fica para o próximo tick
+                return 0
+
+        for execucao in execucoes:
+            agendamento, resultado = execucao["agendamento"], execucao["resultado"]
+            ATRASO_EXECUCAO.observar(
+                max((execucao["executado_em"] - agendamento["proxima_execucao"]).total_seconds(), 0)
+            )
+            if resultado is None:
+                EXECUCOES.inc(resultado="falha")
+                continue
+            EXECUCOES.inc(resultado="ok")
+            self.service._publicar_saldos(
+                agendamento["endereco_origem"], "TRANSFERENCIA_ENVIADA", resultado["data_hora"],
+                (agendamento["id_moeda"], resultado["saldo_origem_final"]),
+            )
+            self.service._publicar_saldos(
+                agendamento["endereco_destino"], "TRANSFERENCIA_RECEBIDA", resultado["data_hora"],
+                (agendamento["id_moeda"], resultado["saldo_destino_final"]),
+            )
+        return len(execucoes)
+
+    async def tick(self) -> int:
+        """
+        Executa os agendamentos vencidos. Retorna quantos foram tentados.
+        """
+        repo = self.service.carteira_repo
+        pendentes, atraso = await run_in_threadpool(repo.resumo_agendamentos_vencidos)
+        PENDENTES.set(pendentes)
+        ATRASO.set(atraso)
+        if not pendentes:
+            return 0
+
+        grupos: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for agendamento in await run_in_threadpool(repo.agendamentos_vencidos, self.lote):
+            grupos[agendamento["endereco_origem"]].append(agendamento)
+
+        inicio = time.perf_counter()
+        resultados = await asyncio.gather(*(
+            self._executar_grupo(origem, agendamentos) for origem, agendamentos in grupos.items()
+        ), return_exceptions=True)
+        total = 0
+        for origem, resultado in zip(grupos, resultados):
+            if isinstance(resultado, BaseException):
+                # Um grupo com erro não cancela nem esconde os demais
+                EXECUCOES.inc(resultado="erro")
+                logger.warning(f"Agendamentos da carteira {origem} falharam: {resultado!r}")
+                continue
+            total += resultado
+        if total:
+            logger.info(
+                f"Agendador: {total} transferência(s) em {len(grupos)} carteira(s) "
+                f"em {time.perf_counter() - inicio:.2f}s"
+            )
+        return total
+
+
+def criar_agendador(service: Any) -> Optional[AgendadorTransferencias]:
+    """
+    Agendador configurado pelo .env; None com AGENDADOR_ATIVO=false.
+    """
+    if os.getenv("AGENDADOR_ATIVO", "true").strip().lower() != "true":
+        return None
+    return AgendadorTransferencias(
+        service,
+        intervalo_s=float(os.getenv("AGENDADOR_INTERVALO_S", "10")),
+        lote=int(os.getenv("AGENDADOR_LOTE", "500")),
+        paralelismo=int(os.getenv("AGENDADOR_PARALELISMO", "4")),
+        max_falhas=int(os.getenv("AGENDADOR_MAX_FALHAS", "3")),
+        retentativa_s=float(os.getenv("AGENDADOR_RETENTATIVA_S", "300")),
+    )
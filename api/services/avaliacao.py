@@ -0,0 +1,126 @@
+# api/services/avaliacao.py
+"""
+Avaliação de saldos numa moeda alvo a partir da tabela de cotações em cache.
+
+A tabela da Coinbase para a moeda alvo diz quantas unidades de cada moeda
+valem 1 unidade da alvo; o valor de um saldo na alvo é saldo / cotação.
+
+A tabela vira um vetor indexado por id_moeda e os saldos de todas as
+carteiras viram colunas (endereço, id_moeda, saldo): avaliar N carteiras é
+uma passada sobre as colunas com o vetor, sem dict por linha nem chamada
+por moeda.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+
+VetorCotacoes = List[Optional[float]]
+
+# Último vetor montado por moeda alvo, reaproveitado enquanto a tabela em
+# cache do CoinbaseService (mesmo objeto) e as moedas não mudarem
+_VETORES: Dict[str, Tuple[Dict[str, float], Dict[int, str], VetorCotacoes]] = {}
+
+
+def vetor_cotacoes(moeda: str, codigos: Dict[int, str], tabela: Dict[str, float]) -> VetorCotacoes:
+    """
+    Cotação de cada moeda indexada por id_moeda (None sem cotação).
+    """
+    em_cache = _VETORES.get(moeda)
+    if em_cache and em_cache[0] is tabela and em_cache[1] == codigos:
+        return em_cache[2]
+
+    vetor: VetorCotacoes = [None] * (max(codigos, default=0) + 1)
+    for id_moeda, codigo in codigos.items():
+        cotacao = tabela.get(codigo)
+        if cotacao:
+            vetor[id_moeda] = cotacao
+    _VETORES[moeda] = (tabela, codigos, vetor)
+    return vetor
+
+
+def avaliar_colunas(
+    enderecos: Sequence[str], ids_moeda: Sequence[int], saldos: Sequence[Any], vetor: VetorCotacoes
+) -> Tuple[List[Optional[float]], Dict[str, float], Set[int]]:
+    """
+    Avalia saldos em colunas paralelas numa única passada. Retorna o valor de
+    cada saldo (None sem cotação), o total por endereço e as moedas sem cotação.
+    """
+    valores: List[Optional[float]] = []
+    totais: Dict[str, float] = {}
+    sem_cotacao: Set[int] = set()
+    limite = len(vetor)
+    for endereco, id_moeda, saldo in zip(enderecos, ids_moeda, saldos):
+        # Moedas acima do vetor (cadastradas depois do cache) ficam sem cotação
+        cotacao = vetor[id_moeda] if id_moeda < limite else None
+        if cotacao is None:
+            sem_cotacao.add(id_moeda)
+            valores.append(None)
+            totais.setdefault(endereco, 0.0)
+            continue
+        valor = float(saldo) / cotacao
+        valores.append(valor)
+        totais[endereco] = totais.get(endereco, 0.0) + valor
+    return valores, totais, sem_cotacao
+
+
+def avaliar_saldos(carteiras: List[Dict[str, Any]], vetor: VetorCotacoes) -> Set[int]:
+    """
+    Preenche valor_avaliado de cada saldo e valor_total de cada carteira
+    (dicts com a lista "saldos"). Retorna as moedas sem cotação, que ficam
+    com valor_avaliado None e fora do total.
+    """
+    enderecos: List[str] = []
+    ids_moeda: List[int] = []
+    saldos: List[Any] = []
+    for carteira in carteiras:
+        for saldo in carteira["saldos"]:
+            enderecos.append(carteira["endereco_carteira"])
+            ids_moeda.append(saldo["id_moeda"])
+            saldos.append(saldo["saldo"])
+
+    valores, totais, sem_cotacao = avaliar_colunas(enderecos, ids_moeda, saldos, vetor)
+    posicao = 0
+    for carteira in carteiras:
+        for saldo in carteira["saldos"]:
+            saldo["valor_avaliado"] = valores[posicao]
+            posicao += 1
+        carteira["valor_total"] = totais.get(carteira["endereco_carteira"], 0.0)
+    return sem_cotacao
+
+
+def chave_endereco(endereco: str) -> str:
+    """
+    Chave para casar o endereço pedido com o do banco: a collation da coluna
+    não diferencia maiúsculas, então o IN encontra a carteira com outra grafia.
+    """
+    return endereco.lower()
+
+
+def agrupar_por_carteira(
+    enderecos: List[str], linhas: Iterable[Dict[str, Any]]
+) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    Agrupa as linhas (carteira LEFT JOIN saldo) por carteira, na ordem dos
+    endereços pedidos e com a grafia de cada um. Endereços sem linha ficam
+    com None.
+    """
+    carteiras: Dict[str, Optional[Dict[str, Any]]] = dict.fromkeys(enderecos)
+    pedidos: Dict[str, List[str]] = {}
+    for endereco in enderecos:
+        pedidos.setdefault(chave_endereco(endereco), []).append(endereco)
+
+    for linha in linhas:
+        for endereco in pedidos.get(chave_endereco(linha["endereco_carteira"]), ()):
+            carteira = carteiras[endereco]
+            if carteira is None:
+                carteira = carteiras[endereco] = {
+                    "endereco_carteira": endereco,
+                    "status": linha["status"],
+                    "saldos": [],
+                }
+            if linha["id_moeda"] is not None:
+                carteira["saldos"].append({
+                    "id_moeda": linha["id_moeda"],
+                    "saldo": linha["saldo"],
+                    "data_atualizacao": linha["data_atualizacao"],
+                })
+    return carteiras
@@ -1,22 +1,93 @@
 # api/services/carteira_service.py
+import os
+import random
 import hashlib
-from typing import Any, Dict, List, Optional
+import inspect
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Any, AsyncContextManager, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 from decimal import Decimal
 
+from api.profiler import em_threadpool
+from api.services import avaliacao, exportacao
+from api.services.agendador import estado_da_ocorrencia, ocorrencia_apos
 from api.services.cotacao_service import CoinbaseService, get_coinbase_service
+from api.services.eventos_saldo import PUBLICADOR_SALDOS, PublicadorSaldos
+from api.services.fila_carteira import FilaPorCarteira, criar_fila_carteira
+from api.services.taxas import POLITICA_TAXAS, PoliticaTaxas
 from api.persistence.repositories.carteira_repository import CarteiraRepository
 from api.models.carteira_models import (
     Carteira, CarteiraCriada, DepositoRequest, SaldoCarteira, 
     SaqueRequest, TransacaoResponse, ConversaoRequest, 
-    ConversaoResponse, CotacaoResponse, TransferenciaRequest, TransferenciaResponse
+    ConversaoResponse, CotacaoResponse, TransferenciaRequest, TransferenciaResponse,
+    AgendamentoRequest, AgendamentoAtualizacao
 )
 
 
+CONSULTA_MAX_CARTEIRAS = int(os.getenv("SALDOS_CONSULTA_MAX", "500"))
+AVALIACAO_MAX_CARTEIRAS = int(os.getenv("AVALIACAO_MAX_CARTEIRAS", "100000"))
+AGENDAMENTOS_MAX_CARTEIRA = int(os.getenv("AGENDAMENTOS_MAX_CARTEIRA", "100"))
+AGENDADOR_JITTER_S = int(os.getenv("AGENDADOR_JITTER_S", "60"))
+
+
+def _sem_fuso(data: Optional[datetime]) -> Optional[datetime]:
+    """
+    Datas com fuso viram horário local sem fuso, como o CURRENT_TIMESTAMP do banco.
+    """
+    if data is not None and data.tzinfo is not None:
+        return data.astimezone().replace(tzinfo=None)
+    return data
+
+
 class CarteiraService:
-    def __init__(self, carteira_repo: CarteiraRepository):
+    def __init__(
+        self,
+        carteira_repo: CarteiraRepository,
+        coinbase_service: Optional[CoinbaseService] = None,
+        fila: Optional[FilaPorCarteira] = None,
+        publicador: PublicadorSaldos = PUBLICADOR_SALDOS,
+        taxas: PoliticaTaxas = POLITICA_TAXAS,
+    ):
         self.carteira_repo = carteira_repo
-        self.coinbase_service = None
+        self.coinbase_service = coinbase_service
+        self.fila = fila or criar_fila_carteira()
+        self.publicador = publicador
+        self.taxas = taxas
+
+    def _publicar_saldos(self, endereco_carteira: str, operacao: str, data_hora: Any, *saldos: Any) -> None:
+        """
+        Publica os saldos finais (pares id_moeda, saldo) de uma movimentação já commitada.
+        """
+        self.publicador.publicar(endereco_carteira, [
+            {
+                "endereco_carteira": endereco_carteira,
+                "id_moeda": id_moeda,
+                "saldo": saldo,
+                "operacao": operacao,
+                "data_hora": data_hora,
+            }
+            for id_moeda, saldo in saldos
+        ])
         
+    async def executar_em_fila(
+        self,
+        enderecos: Iterable[str],
+        operacao: Callable[..., Any],
+        *args: Any,
+        vaga: Optional[Callable[[], AsyncContextManager[Any]]] = None,
+    ) -> Any:
+        """
+        Executa uma movimentação depois de obter a vez das carteiras envolvidas.
+        Métodos síncronos rodam no threadpool; a conexão só é aberta ao executar.
+        `vaga` (do router, ex.: a vaga em voo da admissão) é aberta só depois
+        da vez, para que a espera na fila não conte no limite.
+        """
+        async with self.fila.vez(*enderecos):
+            async with (vaga() if vaga is not None else nullcontext()):
+                if inspect.iscoroutinefunction(operacao):
+                    return await operacao(*args)
+                return await em_threadpool(operacao, *args)
+
     async def _get_coinbase_service(self):
         """Inicializa o serviço da Coinbase se necessário"""
         if self.coinbase_service is None:
@@ -54,6 +125,12 @@ class CarteiraService:
             for r in rows
         ]
 
+    def listar_linhas(self) -> List[Dict[str, Any]]:
+        """
+        Carteiras como dicts crus, para o caminho rápido de serialização.
+        """
+        return self.carteira_repo.listar_resumo()
+
     def bloquear(self, endereco_carteira: str) -> Carteira:
         row = self.carteira_repo.atualizar_status(endereco_carteira, "BLOQUEADA")
         if not row:
@@ -66,12 +143,15 @@ class CarteiraService:
         )
         
     def realizar_deposito(self, endereco_carteira: str, deposito: DepositoRequest) -> TransacaoResponse:
-        carteira = self.carteira_repo.buscar_por_endereco(endereco_carteira)
+        carteira = self.carteira_repo.buscar_por_endereco(endereco_carteira, usar_primario=True)
         if not carteira or carteira["status"] != "ATIVA":
             raise ValueError("Carteira não encontrada ou bloqueada")
         if deposito.valor <= 0:
             raise ValueError("Valor do depósito deve ser positivo")
         result = self.carteira_repo.registrar_deposito(endereco_carteira, deposito.id_moeda, deposito.valor)
+        self._publicar_saldos(
+            endereco_carteira, "DEPOSITO", result["data_hora"], (deposito.id_moeda, result["saldo_final"])
+        )
         return TransacaoResponse(
             id_transacao=result["id_transacao"],
             tipo="DEPOSITO",
@@ -84,14 +164,18 @@ class CarteiraService:
         )
 
     def realizar_saque(self, endereco_carteira: str, saque: SaqueRequest) -> TransacaoResponse:
-        carteira = self.carteira_repo.buscar_por_endereco(endereco_carteira)
+        carteira = self.carteira_repo.buscar_por_endereco(endereco_carteira, usar_primario=True)
         if not carteira or carteira["status"] != "ATIVA":
             raise ValueError("Carteira não encontrada ou bloqueada")
         if saque.valor <= 0:
             raise ValueError("Valor do saque deve ser positivo")
         if not self.carteira_repo.validar_chave_privada(endereco_carteira, saque.chave_privada):
             raise ValueError("Chave privada inválida")
-        result = self.carteira_repo.registrar_saque(endereco_carteira, saque.id_moeda, saque.valor)
+        taxa_valor = self.taxas.calcular("SAQUE", saque.id_moeda, saque.valor)
+        result = self.carteira_repo.registrar_saque(endereco_carteira, saque.id_moeda, saque.valor, taxa_valor)
+        self._publicar_saldos(
+            endereco_carteira, "SAQUE", result["data_hora"], (saque.id_moeda, result["saldo_final"])
+        )
         return TransacaoResponse(
             id_transacao=result["id_transacao"],
             tipo="SAQUE",
@@ -109,6 +193,109 @@ class CarteiraService:
             raise ValueError("Carteira não encontrada")
         return self.carteira_repo.obter_saldos(endereco_carteira)
     
+    def obter_saldos_linhas(self, endereco_carteira: str) -> List[Dict[str, Any]]:
+        carteira = self.carteira_repo.buscar_por_endereco(endereco_carteira)
+        if not carteira:
+            raise ValueError("Carteira não encontrada")
+        return self.carteira_repo.obter_saldos_linhas(endereco_carteira)
+    
+    async def consultar_saldos(
+        self,
+        enderecos: List[str],
+        id_moeda: Optional[int] = None,
+        moeda_avaliacao: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Saldos de várias carteiras numa única consulta, agrupados por carteira
+        e, opcionalmente, avaliados em moeda_avaliacao com as cotações em cache.
+        """
+        enderecos = list(dict.fromkeys(enderecos))
+        if not enderecos:
+            raise ValueError("Informe ao menos um endereço")
+        if len(enderecos) > CONSULTA_MAX_CARTEIRAS:
+            raise ValueError(f"Máximo de {CONSULTA_MAX_CARTEIRAS} carteiras por consulta")
+
+        linhas = await em_threadpool(self.carteira_repo.obter_saldos_carteiras, enderecos, id_moeda)
+        agrupadas = avaliacao.agrupar_por_carteira(enderecos, linhas)
+        carteiras = [c for c in agrupadas.values() if c is not None]
+        resultado: Dict[str, Any] = {
+            "carteiras": carteiras,
+            "nao_encontradas": [e for e, c in agrupadas.items() if c is None],
+            "moeda_avaliacao": None,
+            "moedas_sem_cotacao": [],
+        }
+
+        if moeda_avaliacao:
+            codigo, vetor = await self._vetor_cotacoes(moeda_avaliacao)
+            sem_cotacao = avaliacao.avaliar_saldos(carteiras, vetor)
+            resultado["moeda_avaliacao"] = codigo
+            resultado["moedas_sem_cotacao"] = sorted(sem_cotacao)
+        return resultado
+
+    async def _vetor_cotacoes(self, moeda: str) -> Tuple[str, avaliacao.VetorCotacoes]:
+        """
+        Vetor de cotações (por id_moeda) para avaliar saldos em `moeda`.
+        """
+        codigo = moeda.upper()
+        coinbase = await self._get_coinbase_service()
+        tabela = await coinbase.obter_tabela_cotacoes(codigo)
+        if not tabela:
+            raise ValueError(f"Não foi possível obter cotações para {codigo}")
+        codigos = await em_threadpool(self.carteira_repo.codigos_moedas)
+        return codigo, avaliacao.vetor_cotacoes(codigo, codigos, tabela)
+
+    async def avaliar_carteira(self, endereco_carteira: str, moeda: str) -> Optional[Dict[str, Any]]:
+        """
+        Quanto vale a carteira em `moeda`, saldo a saldo e no total.
+        None se a carteira não existe.
+        """
+        linhas = await em_threadpool(self.carteira_repo.obter_saldos_carteiras, [endereco_carteira])
+        carteira = avaliacao.agrupar_por_carteira([endereco_carteira], linhas)[endereco_carteira]
+        if carteira is None:
+            return None
+        codigo, vetor = await self._vetor_cotacoes(moeda)
+        sem_cotacao = avaliacao.avaliar_saldos([carteira], vetor)
+        return {
+            "endereco_carteira": endereco_carteira,
+            "moeda": codigo,
+            "valor_total": carteira["valor_total"],
+            "saldos": carteira["saldos"],
+            "moedas_sem_cotacao": sorted(sem_cotacao),
+        }
+
+    async def avaliar_carteiras(self, enderecos: List[str], moeda: str) -> Dict[str, Any]:
+        """
+        Valor total de muitas carteiras em `moeda`, num único cálculo vetorizado.
+        """
+        enderecos = list(dict.fromkeys(enderecos))
+        if not enderecos:
+            raise ValueError("Informe ao menos um endereço")
+        if len(enderecos) > AVALIACAO_MAX_CARTEIRAS:
+            raise ValueError(f"Máximo de {AVALIACAO_MAX_CARTEIRAS} carteiras por avaliação")
+
+        codigo, vetor = await self._vetor_cotacoes(moeda)
+        existentes, colunas_endereco, colunas_moeda, colunas_saldo = await em_threadpool(
+            self.carteira_repo.obter_saldos_colunas, enderecos
+        )
+        _, totais, sem_cotacao = await em_threadpool(
+            avaliacao.avaliar_colunas, colunas_endereco, colunas_moeda, colunas_saldo, vetor
+        )
+        # O banco devolve a grafia dele; a resposta usa a que o cliente mandou
+        chave = avaliacao.chave_endereco
+        encontradas = {chave(e) for e in existentes}
+        totais_por_chave: Dict[str, float] = {}
+        for endereco, total in totais.items():
+            totais_por_chave[chave(endereco)] = totais_por_chave.get(chave(endereco), 0.0) + total
+        return {
+            "moeda": codigo,
+            "carteiras": [
+                {"endereco_carteira": e, "valor_total": totais_por_chave.get(chave(e), 0.0)}
+                for e in enderecos if chave(e) in encontradas
+            ],
+            "nao_encontradas": [e for e in enderecos if chave(e) not in encontradas],
+            "moedas_sem_cotacao": sorted(sem_cotacao),
+        }
+
     def obter_saldo(self, endereco_carteira: str, id_moeda: int) -> List[SaldoCarteira]:
         carteira = self.carteira_repo.buscar_por_endereco(endereco_carteira)
         if not carteira:
@@ -133,17 +320,11 @@ class CarteiraService:
             timestamp=datetime.utcnow()
         )
     
-    async def realizar_conversao(self, endereco_carteira: str, conversao: ConversaoRequest) -> ConversaoResponse:
+    async def cotar_conversao(self, conversao: ConversaoRequest) -> float:
         """
-        Realiza conversão entre moedas usando a API da Coinbase.
+        Cotação origem -> destino na Coinbase. Roda antes da vez na fila da
+        carteira, para a chamada de rede não segurar a vez nem a vaga em voo.
         """
-        carteira = self.carteira_repo.buscar_por_endereco(endereco_carteira)
-        if not carteira or carteira["status"] != "ATIVA":
-            raise ValueError("Carteira não encontrada ou bloqueada")
-        
-        if not self.carteira_repo.validar_chave_privada(endereco_carteira, conversao.chave_privada):
-            raise ValueError("Chave privada inválida")
-        
         if conversao.id_moeda_origem == conversao.id_moeda_destino:
             raise ValueError("Moeda de origem e destino não podem ser iguais")
         
@@ -165,9 +346,26 @@ class CarteiraService:
                 cotacao = 1 / cotacao_inversa
             else:
                 raise ValueError(f"Não foi possível obter cotação para {codigo_origem}/{codigo_destino}")
+        return cotacao
+
+    def realizar_conversao(
+        self, endereco_carteira: str, conversao: ConversaoRequest, cotacao: float
+    ) -> ConversaoResponse:
+        """
+        Realiza conversão entre moedas com a cotação obtida em cotar_conversao.
+        """
+        carteira = self.carteira_repo.buscar_por_endereco(endereco_carteira, usar_primario=True)
+        if not carteira or carteira["status"] != "ATIVA":
+            raise ValueError("Carteira não encontrada ou bloqueada")
+        
+        if not self.carteira_repo.validar_chave_privada(endereco_carteira, conversao.chave_privada):
+            raise ValueError("Chave privada inválida")
         
-        taxa_percentual = 0.5
-        valor_com_taxa = conversao.valor_origem * (1 - taxa_percentual / 100)
+        taxa_valor = self.taxas.calcular("CONVERSAO", conversao.id_moeda_origem, conversao.valor_origem)
+        if taxa_valor >= conversao.valor_origem:
+            raise ValueError("Valor de origem não cobre a taxa de conversão")
+        taxa_percentual = taxa_valor / conversao.valor_origem * 100
+        valor_com_taxa = conversao.valor_origem - taxa_valor
         valor_destino = valor_com_taxa * cotacao
         
         resultado = self.carteira_repo.registrar_conversao(
@@ -179,6 +377,11 @@ class CarteiraService:
             taxa_percentual=taxa_percentual,
             cotacao_utilizada=cotacao
         )
+        self._publicar_saldos(
+            endereco_carteira, "CONVERSAO", resultado["data_hora"],
+            (conversao.id_moeda_origem, resultado["saldo_origem_final"]),
+            (conversao.id_moeda_destino, resultado["saldo_destino_final"]),
+        )
         
         return ConversaoResponse(
             id_conversao=resultado["id_conversao"],
@@ -199,11 +402,11 @@ class CarteiraService:
         Realiza transferência entre carteiras.
         """
         # 1. Validações iniciais
-        carteira_origem = self.carteira_repo.buscar_por_endereco(endereco_origem)
+        carteira_origem = self.carteira_repo.buscar_por_endereco(endereco_origem, usar_primario=True)
         if not carteira_origem or carteira_origem["status"] != "ATIVA":
             raise ValueError("Carteira origem não encontrada ou bloqueada")
         
-        carteira_destino = self.carteira_repo.buscar_por_endereco(transferencia.endereco_destino)
+        carteira_destino = self.carteira_repo.buscar_por_endereco(transferencia.endereco_destino, usar_primario=True)
         if not carteira_destino or carteira_destino["status"] != "ATIVA":
             raise ValueError("Carteira destino não encontrada ou bloqueada")
         
@@ -216,9 +419,8 @@ class CarteiraService:
         if endereco_origem == transferencia.endereco_destino:
             raise ValueError("Não é possível transferir para a mesma carteira")
         
-        # 2. Calcula taxa (exemplo: 1% para transferências, mínimo 0.01)
-        taxa_percentual = 1.0  # 1% de taxa
-        taxa_valor = max(transferencia.valor * taxa_percentual / 100, 0.01)  # Mínimo 0.01
+        # 2. Calcula taxa pela política de taxas (padrão: 1%, mínimo 0.01)
+        taxa_valor = self.taxas.calcular("TRANSFERENCIA", transferencia.id_moeda, transferencia.valor)
         
         # 3. Realiza transferência no repository
         try:
@@ -229,6 +431,14 @@ class CarteiraService:
                 valor=transferencia.valor,
                 taxa_valor=taxa_valor
             )
+            self._publicar_saldos(
+                endereco_origem, "TRANSFERENCIA_ENVIADA", resultado["data_hora"],
+                (transferencia.id_moeda, resultado["saldo_origem_final"]),
+            )
+            self._publicar_saldos(
+                transferencia.endereco_destino, "TRANSFERENCIA_RECEBIDA", resultado["data_hora"],
+                (transferencia.id_moeda, resultado["saldo_destino_final"]),
+            )
             
             return TransferenciaResponse(
                 id_transferencia=resultado["id_transferencia"],
@@ -247,15 +457,53 @@ class CarteiraService:
         except Exception as e:
             raise Exception(f"Erro na transferência: {str(e)}")
     
-    def obter_transferencias(self, endereco_carteira: str) -> List[Dict[str, Any]]:
+    def obter_transferencias(
+        self,
+        endereco_carteira: str,
+        inicio: Optional[datetime] = None,
+        fim: Optional[datetime] = None,
+        incluir_arquivo: bool = False,
+    ) -> List[Dict[str, Any]]:
         """
-        Obtém todas as transferências de uma carteira.
+        Obtém as transferências de uma carteira, opcionalmente num período
+        e incluindo o histórico arquivado.
         """
         carteira = self.carteira_repo.buscar_por_endereco(endereco_carteira)
         if not carteira:
             raise ValueError("Carteira não encontrada")
         
-        return self.carteira_repo.obter_transferencias_por_carteira(endereco_carteira)
+        return self.carteira_repo.obter_transferencias_por_carteira(
+            endereco_carteira, inicio, fim, incluir_arquivo
+        )
+    
+    def exportar_historico(
+        self, endereco_carteira: str, formato: str, incluir_arquivo: bool = False
+    ) -> Iterator[bytes]:
+        """
+        Histórico completo da carteira em CSV ou Parquet, gerado em partes.
+        """
+        carteira = self.carteira_repo.buscar_por_endereco(endereco_carteira)
+        if not carteira:
+            raise ValueError("Carteira não encontrada")
+        lotes = self.carteira_repo.iterar_historico(
+            endereco_carteira, incluir_arquivo, exportacao.LINHAS_POR_LOTE
+        )
+        return exportacao.gerar(formato, lotes)
+
+    def salvar_historico(
+        self, endereco_carteira: str, formato: str, incluir_arquivo: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Grava o histórico completo num arquivo local (EXPORTACAO_DIR).
+        """
+        carteira = self.carteira_repo.buscar_por_endereco(endereco_carteira)
+        if not carteira:
+            raise ValueError("Carteira não encontrada")
+        lotes = self.carteira_repo.iterar_historico(
+            endereco_carteira, incluir_arquivo, exportacao.LINHAS_POR_LOTE
+        )
+        caminho, tamanho = exportacao.salvar(formato, lotes, endereco_carteira)
+        return {"arquivo": str(caminho), "formato": formato, "bytes": tamanho}
     
     def obter_transferencia(self, id_transferencia: int) -> Optional[Dict[str, Any]]:
         """
@@ -263,7 +511,128 @@ class CarteiraService:
         """
         return self.carteira_repo.obter_transferencia_por_id(id_transferencia)
     
+    def criar_agendamento(self, endereco_origem: str, agendamento: AgendamentoRequest) -> Dict[str, Any]:
+        """
+        Agenda uma transferência única ou recorrente. A chave privada é
+        validada agora; as execuções usam a mesma lógica de realizar_transferencia.
+        """
+        carteira_origem = self.carteira_repo.buscar_por_endereco(endereco_origem, usar_primario=True)
+        if not carteira_origem or carteira_origem["status"] != "ATIVA":
+            raise ValueError("Carteira origem não encontrada ou bloqueada")
+
+        carteira_destino = self.carteira_repo.buscar_por_endereco(agendamento.endereco_destino, usar_primario=True)
+        if not carteira_destino or carteira_destino["status"] != "ATIVA":
+            raise ValueError("Carteira destino não encontrada ou bloqueada")
+
+        if agendamento.valor <= 0:
+            raise ValueError("Valor da transferência deve ser positivo")
+
+        if endereco_origem == agendamento.endereco_destino:
+            raise ValueError("Não é possível transferir para a mesma carteira")
+
+        if not self.carteira_repo.validar_chave_privada(endereco_origem, agendamento.chave_privada):
+            raise ValueError("Chave privada inválida")
+
+        if not self.carteira_repo.obter_codigo_moeda(agendamento.id_moeda):
+            raise ValueError("Moeda não encontrada")
+
+        data_inicio = _sem_fuso(agendamento.data_inicio) or datetime.now().replace(microsecond=0)
+        data_fim = _sem_fuso(agendamento.data_fim)
+        if data_fim is not None and data_fim < data_inicio:
+            raise ValueError("data_fim deve ser posterior a data_inicio")
+
+        if self.carteira_repo.contar_agendamentos(endereco_origem) >= AGENDAMENTOS_MAX_CARTEIRA:
+            raise ValueError("Limite de agendamentos da carteira atingido")
+
+        dados = {
+            "endereco_origem": endereco_origem,
+            "endereco_destino": agendamento.endereco_destino,
+            "id_moeda": agendamento.id_moeda,
+            "valor": agendamento.valor,
+            "periodicidade": agendamento.periodicidade,
+            "data_inicio": data_inicio,
+            "data_fim": data_fim,
+            "jitter_s": random.randint(0, AGENDADOR_JITTER_S),
+        }
+        estado = estado_da_ocorrencia(dados, data_inicio)
+        dados["proxima_ocorrencia"] = estado["proxima_ocorrencia"]
+        dados["proxima_execucao"] = estado["proxima_execucao"]
+        return self.carteira_repo.criar_agendamento(dados)
+
+    def listar_agendamentos(self, endereco_origem: str) -> List[Dict[str, Any]]:
+        carteira = self.carteira_repo.buscar_por_endereco(endereco_origem)
+        if not carteira:
+            raise ValueError("Carteira não encontrada")
+        return self.carteira_repo.listar_agendamentos(endereco_origem)
+
+    def obter_agendamento(self, endereco_origem: str, id_agendamento: int) -> Optional[Dict[str, Any]]:
+        return self.carteira_repo.obter_agendamento(endereco_origem, id_agendamento)
+
+    def atualizar_agendamento(
+        self, endereco_origem: str, id_agendamento: int, atualizacao: AgendamentoAtualizacao
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Altera valor ou data_fim, pausa ou retoma um agendamento. Ao retomar,
+        as ocorrências recorrentes que passaram durante a pausa são puladas.
+        Retorna None se o agendamento não existe.
+        """
+        if not self.carteira_repo.validar_chave_privada(endereco_origem, atualizacao.chave_privada):
+            raise ValueError("Chave privada inválida")
+
+        atual = self.carteira_repo.obter_agendamento(endereco_origem, id_agendamento, usar_primario=True)
+        if atual is None:
+            return None
+        if atual["status"] not in ("ATIVA", "PAUSADA"):
+            raise ValueError("Agendamento já encerrado")
+
+        campos: Dict[str, Any] = {}
+        if atualizacao.valor is not None:
+            if atualizacao.valor <= 0:
+                raise ValueError("Valor da transferência deve ser positivo")
+            campos["valor"] = atualizacao.valor
+
+        if "data_fim" in atualizacao.model_fields_set:
+            data_fim = _sem_fuso(atualizacao.data_fim)
+            if data_fim is not None and data_fim < atual["data_inicio"]:
+                raise ValueError("data_fim deve ser posterior a data_inicio")
+            campos["data_fim"] = atual["data_fim"] = data_fim
+
+        status = atualizacao.status or atual["status"]
+        if status == "PAUSADA":
+            campos["status"] = "PAUSADA"
+        elif atual["status"] == "PAUSADA" or "data_fim" in campos:
+            ocorrencia = atual["proxima_ocorrencia"]
+            if atual["status"] == "PAUSADA" and atual["periodicidade"] != "UNICA":
+                ocorrencia = ocorrencia_apos(
+                    atual["periodicidade"], atual["data_inicio"], ocorrencia, datetime.now()
+                )
+            campos.update(estado_da_ocorrencia(atual, ocorrencia))
+            campos["falhas_consecutivas"] = 0
+
+        if not campos:
+            return atual
+        resultado = self.carteira_repo.atualizar_agendamento(endereco_origem, id_agendamento, campos)
+        if resultado is None:
+            raise ValueError("Agendamento já encerrado")
+        return resultado
+
+    def cancelar_agendamento(self, endereco_origem: str, id_agendamento: int, chave_privada: str) -> Optional[Dict[str, Any]]:
+        if not self.carteira_repo.validar_chave_privada(endereco_origem, chave_privada):
+            raise ValueError("Chave privada inválida")
+
+        atual = self.carteira_repo.obter_agendamento(endereco_origem, id_agendamento, usar_primario=True)
+        if atual is None:
+            return None
+        resultado = self.carteira_repo.atualizar_agendamento(
+            endereco_origem, id_agendamento,
+            {"status": "CANCELADA", "proxima_ocorrencia": None, "proxima_execucao": None},
+        )
+        if resultado is None:
+            raise ValueError("Agendamento já encerrado")
+        return resultado
+
     async def close(self):
-        """Fecha o serviço da Coinbase"""
+        """Fecha o serviço da Coinbase e grava depósitos pendentes"""
+        self.carteira_repo.fechar()
         if self.coinbase_service:
             await self.coinbase_service.close()
\ No newline at end of file
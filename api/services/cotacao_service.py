@@ -1,19 +1,36 @@
 # api/services/coinbase_service.py
+import os
 import httpx
 import asyncio
-from typing import Dict, Optional
+import time
+from typing import Dict, Optional, Tuple
 import logging
 from datetime import datetime
 from contextlib import asynccontextmanager
 
+from api.metricas import REGISTRO
+
 logger = logging.getLogger(__name__)
 
+COINBASE_LATENCIA = REGISTRO.histograma(
+    "coinbase_requisicao_duracao_segundos", "Latência das chamadas à API da Coinbase", ["resultado"]
+)
+COINBASE_ERROS = REGISTRO.contador(
+    "coinbase_erros_total", "Erros nas chamadas à API da Coinbase", ["tipo"]
+)
+
+COTACOES_TTL_S = float(os.getenv("COTACOES_CACHE_TTL_S", "60"))
+
 
 class CoinbaseService:
     BASE_URL = "https://api.coinbase.com/v2"
     
-    def __init__(self):
+    def __init__(self, ttl_cotacoes_s: float = COTACOES_TTL_S):
         self.client = None
+        self.ttl_cotacoes_s = ttl_cotacoes_s
+        # moeda base -> (obtida em, tabela completa de cotações)
+        self._tabelas: Dict[str, Tuple[float, Dict[str, float]]] = {}
+        self._locks_tabela: Dict[str, asyncio.Lock] = {}
         
     async def initialize(self):
         """Inicializa o cliente HTTP assíncrono"""
@@ -24,9 +41,45 @@ class CoinbaseService:
         Obtém a taxa de câmbio da Coinbase.
         Exemplo: BTC para USD
         """
+        rates = await self._buscar_cotacoes(from_currency)
+        rate = rates.get(to_currency) if rates else None
+        if rate:
+            return float(rate)
+        return None
+
+    async def obter_tabela_cotacoes(self, moeda_base: str) -> Optional[Dict[str, float]]:
+        """
+        Tabela completa de cotações de moeda_base (quantas unidades de cada
+        moeda valem 1 moeda_base), em cache por COTACOES_CACHE_TTL_S segundos.
+        Se a Coinbase falhar, devolve a última tabela obtida, mesmo vencida.
+        """
+        em_cache = self._tabelas.get(moeda_base)
+        if em_cache and time.monotonic() - em_cache[0] < self.ttl_cotacoes_s:
+            return em_cache[1]
+
+        # Uma busca por moeda base; as demais requisições esperam por ela
+        lock = self._locks_tabela.setdefault(moeda_base, asyncio.Lock())
+        async with lock:
+            em_cache = self._tabelas.get(moeda_base)
+            if em_cache and time.monotonic() - em_cache[0] < self.ttl_cotacoes_s:
+                return em_cache[1]
+            rates = await self._buscar_cotacoes(moeda_base)
+            if not rates:
+                return em_cache[1] if em_cache else None
+            tabela = {codigo: float(valor) for codigo, valor in rates.items()}
+            tabela[moeda_base] = 1.0
+            self._tabelas[moeda_base] = (time.monotonic(), tabela)
+            return tabela
+
+    async def _buscar_cotacoes(self, from_currency: str) -> Optional[Dict[str, str]]:
+        """
+        GET /exchange-rates: todas as cotações de from_currency numa chamada.
+        """
         if not self.client:
             await self.initialize()
             
+        inicio = time.perf_counter()
+        resultado = "ok"
         try:
             url = f"{self.BASE_URL}/exchange-rates"
             params = {"currency": from_currency}
@@ -35,20 +88,25 @@ class CoinbaseService:
             response.raise_for_status()
             
             data = response.json()
-            rates = data.get("data", {}).get("rates", {})
-            
-            rate = rates.get(to_currency)
-            if rate:
-                return float(rate)
+            return data.get("data", {}).get("rates", {})
             
+        except httpx.HTTPStatusError as e:
+            resultado = "erro"
+            COINBASE_ERROS.inc(tipo=f"http_{e.response.status_code}")
+            logger.error(f"Erro HTTP ao buscar taxas de câmbio de {from_currency}: {e}")
             return None
-            
         except httpx.HTTPError as e:
-            logger.error(f"Erro HTTP ao buscar taxa de câmbio {from_currency}/{to_currency}: {e}")
+            resultado = "erro"
+            COINBASE_ERROS.inc(tipo=type(e).__name__)
+            logger.error(f"Erro HTTP ao buscar taxas de câmbio de {from_currency}: {e}")
             return None
         except Exception as e:
+            resultado = "erro"
+            COINBASE_ERROS.inc(tipo="inesperado")
             logger.error(f"Erro inesperado ao buscar taxa de câmbio: {e}")
             return None
+        finally:
+            COINBASE_LATENCIA.observar(time.perf_counter() - inicio, resultado=resultado)
     
     async def convert_currency(self, from_currency: str, to_currency: str, amount: float) -> Optional[Dict]:
         """
@@ -74,10 +132,20 @@ class CoinbaseService:
             logger.error(f"Erro na conversão: {e}")
             return None
     
+    async def aquecer(self) -> bool:
+        """
+        Abre o cliente e faz uma cotação de teste, deixando a conexão
+        TLS com a Coinbase pronta para as primeiras requisições.
+        """
+        if not self.client:
+            await self.initialize()
+        return await self.get_exchange_rate("USD", "BTC") is not None
+
     async def close(self):
         """Fecha o cliente HTTP"""
         if self.client:
             await self.client.aclose()
+            self.client = None
 
 
 _coinbase_service = None
@@ -88,4 +156,12 @@ async def get_coinbase_service() -> CoinbaseService:
     if _coinbase_service is None:
         _coinbase_service = CoinbaseService()
         await _coinbase_service.initialize()
-    return _coinbase_service
\ No newline at end of file
+    return _coinbase_service
+
+
+async def fechar_coinbase_service() -> None:
+    """Fecha o singleton da Coinbase (shutdown da aplicação)"""
+    global _coinbase_service
+    if _coinbase_service is not None:
+        await _coinbase_service.close()
+        _coinbase_service = None
\ No newline at end of file
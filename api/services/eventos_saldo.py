@@ -0,0 +1,123 @@
+# api/services/eventos_saldo.py
+"""
+Pub/sub em memória de mudanças de saldo, por carteira.
+
+As movimentações do CarteiraService publicam o saldo final de cada
+(carteira, moeda) depois do commit; as conexões de
+GET /carteiras/{endereco}/saldos/stream assinam a carteira.
+
+Contrapressão: cada assinatura guarda só o último saldo pendente por moeda.
+Um consumidor lento não acumula fila — recebe direto o valor mais recente
+(os intermediários são agrupados e contados em /metrics).
+"""
+import os
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional, Set
+
+from api.metricas import REGISTRO
+
+
+ASSINANTES = REGISTRO.medidor(
+    "saldo_stream_assinantes", "Conexões assinando mudanças de saldo"
+)
+EVENTOS = REGISTRO.contador(
+    "saldo_stream_eventos_total", "Eventos de saldo publicados por resultado", ["resultado"]
+)
+
+
+class LimiteAssinantesError(Exception):
+    pass
+
+
+class Assinatura:
+    __slots__ = ("endereco", "pendentes", "sinal")
+
+    def __init__(self, endereco: str):
+        self.endereco = endereco
+        self.pendentes: Dict[int, Dict[str, Any]] = {}
+        self.sinal = asyncio.Event()
+
+    def _entregar(self, evento: Dict[str, Any]) -> None:
+        EVENTOS.inc(resultado="agrupado" if evento["id_moeda"] in self.pendentes else "entregue")
+        self.pendentes[evento["id_moeda"]] = evento
+        self.sinal.set()
+
+    async def proximos(self, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Espera por eventos e devolve os pendentes (lista vazia no timeout).
+        """
+        try:
+            await asyncio.wait_for(self.sinal.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self.sinal.clear()
+        eventos = list(self.pendentes.values())
+        self.pendentes.clear()
+        return eventos
+
+    def descartar(self) -> None:
+        """
+        Descarta os pendentes (já cobertos por uma leitura do banco).
+        """
+        self.pendentes.clear()
+        self.sinal.clear()
+
+
+class PublicadorSaldos:
+    def __init__(self, max_assinantes: int):
+        self.max_assinantes = max_assinantes
+        self._assinaturas: Dict[str, Set[Assinatura]] = {}
+        self._total = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    @property
+    def lotado(self) -> bool:
+        return self._total >= self.max_assinantes
+
+    def assinar(self, endereco: str) -> Assinatura:
+        """
+        Deve ser chamado no event loop (a entrega acontece nele).
+        """
+        with self._lock:
+            if self._total >= self.max_assinantes:
+                raise LimiteAssinantesError("Limite de conexões de saldo atingido")
+            self._loop = asyncio.get_running_loop()
+            assinatura = Assinatura(endereco)
+            self._assinaturas.setdefault(endereco, set()).add(assinatura)
+            self._total += 1
+            ASSINANTES.set(self._total)
+        return assinatura
+
+    def cancelar(self, assinatura: Assinatura) -> None:
+        with self._lock:
+            assinaturas = self._assinaturas.get(assinatura.endereco)
+            if assinaturas is None or assinatura not in assinaturas:
+                return
+            assinaturas.discard(assinatura)
+            if not assinaturas:
+                del self._assinaturas[assinatura.endereco]
+            self._total -= 1
+            ASSINANTES.set(self._total)
+
+    def _entregar(self, endereco: str, eventos: List[Dict[str, Any]]) -> None:
+        for assinatura in list(self._assinaturas.get(endereco, ())):
+            for evento in eventos:
+                assinatura._entregar(evento)
+
+    def publicar(self, endereco: str, eventos: List[Dict[str, Any]]) -> None:
+        """
+        Publica saldos já commitados. Pode ser chamado de qualquer thread;
+        sem assinantes da carteira, não faz nada.
+        """
+        if endereco not in self._assinaturas or self._loop is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._entregar, endereco, eventos)
+        except RuntimeError:
+            # Event loop já encerrado (shutdown)
+            pass
+
+
+PUBLICADOR_SALDOS = PublicadorSaldos(int(os.getenv("SSE_MAX_ASSINANTES", "10000")))
@@ -0,0 +1,142 @@
+# api/services/exportacao.py
+"""
+Exportação do histórico completo de uma carteira em CSV ou Parquet.
+
+Os lotes de tuplas do repositório (cursor no servidor) viram blocos de CSV
+ou record batches colunares do Parquet e são escritos à medida que chegam,
+na resposta HTTP ou num arquivo local. A memória fica limitada a um lote.
+"""
+import io
+import os
+import csv
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterable, Iterator, List, Tuple
+
+from api.persistence.db import BASE_DIR
+from api.persistence.repositories.carteira_repository import COLUNAS_HISTORICO
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow é opcional (só para formato=parquet)
+    pa = None
+
+
+FORMATOS = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+EXPORTACAO_DIR = Path(os.getenv("EXPORTACAO_DIR", str(BASE_DIR / "exportacoes")))
+LINHAS_POR_LOTE = int(os.getenv("EXPORTACAO_LINHAS_POR_LOTE", "10000"))
+
+
+def validar_formato(formato: str) -> None:
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato inválido: {formato} (use csv ou parquet)")
+    if formato == "parquet" and pa is None:
+        raise ValueError("Exportação em parquet requer o pacote pyarrow")
+
+
+def _schema_historico():
+    valor = pa.decimal128(18, 4)
+    moeda = pa.int16()
+    return pa.schema([
+        ("origem", pa.string()),
+        ("id", pa.int64()),
+        ("tipo", pa.string()),
+        ("data_hora", pa.timestamp("us")),
+        ("id_moeda", moeda),
+        ("valor", valor),
+        ("taxa_valor", valor),
+        ("taxa_percentual", pa.decimal128(5, 2)),
+        ("endereco_contraparte", pa.string()),
+        ("id_moeda_destino", moeda),
+        ("valor_destino", valor),
+        ("cotacao_utilizada", valor),
+    ])
+
+
+class _Vazao(io.RawIOBase):
+    """
+    Destino de escrita que só acumula os bytes até serem drenados, para o
+    ParquetWriter escrever direto na resposta.
+    """
+
+    def __init__(self):
+        self._partes: List[bytes] = []
+        self._posicao = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, dados) -> int:
+        dados = bytes(dados)
+        self._partes.append(dados)
+        self._posicao += len(dados)
+        return len(dados)
+
+    def tell(self) -> int:
+        return self._posicao
+
+    def drenar(self) -> bytes:
+        dados = b"".join(self._partes)
+        self._partes.clear()
+        return dados
+
+
+def _csv(lotes: Iterable[List[Tuple[Any, ...]]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(COLUNAS_HISTORICO)
+    for lote in lotes:
+        escritor.writerows(lote)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    resto = buffer.getvalue()
+    if resto:
+        yield resto.encode("utf-8")
+
+
+def _record_batch(lote: List[Tuple[Any, ...]], schema) -> "pa.RecordBatch":
+    colunas = list(zip(*lote))
+    return pa.RecordBatch.from_arrays(
+        [pa.array(valores, type=campo.type) for valores, campo in zip(colunas, schema)],
+        schema=schema,
+    )
+
+
+def _parquet(lotes: Iterable[List[Tuple[Any, ...]]]) -> Iterator[bytes]:
+    schema = _schema_historico()
+    vazao = _Vazao()
+    # Um row group por lote: cada lote é escrito e liberado logo em seguida
+    with pq.ParquetWriter(vazao, schema, compression="zstd") as writer:
+        for lote in lotes:
+            writer.write_batch(_record_batch(lote, schema))
+            dados = vazao.drenar()
+            if dados:
+                yield dados
+    yield vazao.drenar()
+
+
+def gerar(formato: str, lotes: Iterable[List[Tuple[Any, ...]]]) -> Iterator[bytes]:
+    """
+    Bytes do arquivo exportado, produzidos incrementalmente.
+    """
+    validar_formato(formato)
+    return _csv(lotes) if formato == "csv" else _parquet(lotes)
+
+
+def salvar(formato: str, lotes: Iterable[List[Tuple[Any, ...]]], nome_base: str) -> Tuple[Path, int]:
+    """
+    Grava a exportação em EXPORTACAO_DIR. Retorna o caminho e o tamanho em bytes.
+    """
+    validar_formato(formato)
+    EXPORTACAO_DIR.mkdir(parents=True, exist_ok=True)
+    caminho = EXPORTACAO_DIR / f"{nome_base}_{datetime.utcnow():%Y%m%dT%H%M%S}.{formato}"
+    temporario = caminho.with_suffix(caminho.suffix + ".tmp")
+    tamanho = 0
+    with open(temporario, "wb") as f:
+        for parte in gerar(formato, lotes):
+            f.write(parte)
+            tamanho += len(parte)
+    os.replace(temporario, caminho)
+    return caminho, tamanho
@@ -0,0 +1,108 @@
+# api/services/fila_carteira.py
+"""
+Fila por carteira, em memória do worker.
+
+Operações que movimentam a mesma carteira esperam a vez aqui (sem conexão
+do pool) em vez de abrirem conexões que ficariam paradas nos locks de
+saldo_carteira. Carteiras diferentes continuam em paralelo.
+"""
+import os
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+
+from api.metricas import REGISTRO
+
+
+ESPERA = REGISTRO.histograma(
+    "fila_carteira_espera_segundos", "Tempo de espera pela vez da carteira"
+)
+AGUARDANDO = REGISTRO.medidor(
+    "fila_carteira_aguardando", "Operações esperando a vez de alguma carteira"
+)
+REJEICOES = REGISTRO.contador(
+    "fila_carteira_rejeicoes_total", "Operações rejeitadas por fila da carteira cheia"
+)
+
+
+class FilaCheiaError(Exception):
+    pass
+
+
+class _Vez:
+    __slots__ = ("lock", "pendentes")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        # Operação em execução + as que aguardam
+        self.pendentes = 0
+
+
+class FilaPorCarteira:
+    def __init__(self, tamanho_maximo: int):
+        """
+        tamanho_maximo: operações que podem aguardar por carteira além da que
+        está executando; 0 desliga a serialização.
+        """
+        self.tamanho_maximo = tamanho_maximo
+        self._vezes: Dict[str, _Vez] = {}
+        self._aguardando = 0
+
+    @property
+    def ativa(self) -> bool:
+        return self.tamanho_maximo > 0
+
+    def _liberar(self, endereco: str, vez: _Vez, adquirido: bool) -> None:
+        if adquirido:
+            vez.lock.release()
+        vez.pendentes -= 1
+        if vez.pendentes == 0:
+            del self._vezes[endereco]
+
+    async def _entrar(self, endereco: str) -> _Vez:
+        vez = self._vezes.get(endereco)
+        if vez is None:
+            vez = self._vezes[endereco] = _Vez()
+        if vez.pendentes > self.tamanho_maximo:
+            REJEICOES.inc()
+            raise FilaCheiaError("Muitas operações pendentes para esta carteira. Tente novamente.")
+
+        vez.pendentes += 1
+        self._aguardando += 1
+        AGUARDANDO.set(self._aguardando)
+        inicio = time.perf_counter()
+        try:
+            await vez.lock.acquire()
+        except BaseException:
+            self._liberar(endereco, vez, adquirido=False)
+            raise
+        finally:
+            self._aguardando -= 1
+            AGUARDANDO.set(self._aguardando)
+        ESPERA.observar(time.perf_counter() - inicio)
+        return vez
+
+    @asynccontextmanager
+    async def vez(self, *enderecos: str) -> AsyncIterator[None]:
+        """
+        Aguarda a vez de todas as carteiras informadas. A ordem de aquisição é
+        sempre a ordem dos endereços, então duas transferências em sentidos
+        opostos não se bloqueiam mutuamente.
+        """
+        if not self.ativa:
+            yield
+            return
+
+        adquiridas = []
+        try:
+            for endereco in sorted(set(enderecos)):
+                adquiridas.append((endereco, await self._entrar(endereco)))
+            yield
+        finally:
+            for endereco, vez in reversed(adquiridas):
+                self._liberar(endereco, vez, adquirido=True)
+
+
+def criar_fila_carteira() -> FilaPorCarteira:
+    return FilaPorCarteira(int(os.getenv("FILA_CARTEIRA_MAX", "8")))
@@ -0,0 +1,263 @@
+# api/services/taxas.py
+"""
+Política de taxas de saque, conversão e transferência.
+
+A configuração é compilada uma vez numa tabela (operação, id_moeda) -> regra;
+calcular() só faz um lookup no dict e uma busca binária nas faixas, sem ler
+o ambiente nem arquivos.
+
+Configuração:
+- TAXA_SAQUE_PERCENTUAL, TAXA_CONVERSAO_PERCENTUAL e
+  TAXA_TRANSFERENCIA_PERCENTUAL (frações: 0.01 = 1%) e
+  TAXA_TRANSFERENCIA_MINIMA definem a regra padrão de cada operação.
+- TAXAS_ARQUIVO (opcional) aponta para um JSON que sobrepõe as regras,
+  inclusive por moeda (código) e por faixa de valor:
+
+    {
+      "TRANSFERENCIA": {"percentual": 0.01, "minima": 0.01},
+      "SAQUE": {
+        "percentual": 0.01,
+        "moedas": {
+          "BTC": {"faixas": [
+            {"a_partir_de": 0, "percentual": 0.01, "minima": 0.0001},
+            {"a_partir_de": 10, "percentual": 0.005}
+          ]}
+        }
+      }
+    }
+
+  Cada regra (ou faixa) aceita percentual, fixa, minima e maxima:
+  taxa = min(max(valor * percentual + fixa, minima), maxima).
+  As faixas não são progressivas: a faixa do valor vale para o valor
+  inteiro, então a taxa pode cair ao cruzar um limite (no exemplo, 9.99 BTC
+  pagam 0.0999 e 10 BTC pagam 0.05). Uma "fixa" na faixa de cima evita o
+  degrau.
+
+O arquivo é verificado a cada TAXAS_RECARGA_S segundos numa thread; quando
+muda, a política é recompilada e trocada de uma vez, sem redeploy. Um arquivo
+inválido na recarga é ignorado (mantém a política anterior).
+"""
+import os
+import json
+import logging
+import threading
+from bisect import bisect_right
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from api.metricas import REGISTRO
+
+logger = logging.getLogger(__name__)
+
+OPERACOES = ("SAQUE", "CONVERSAO", "TRANSFERENCIA")
+
+RECARGAS = REGISTRO.contador(
+    "taxas_recargas_total", "Recargas do arquivo de taxas por resultado", ["resultado"]
+)
+
+_CAMPOS_FAIXA = ("a_partir_de", "percentual", "fixa", "minima", "maxima")
+
+
+class Faixa:
+    __slots__ = ("percentual", "fixa", "minima", "maxima")
+
+    def __init__(self, percentual: float, fixa: float, minima: float, maxima: Optional[float]):
+        self.percentual = percentual
+        self.fixa = fixa
+        self.minima = minima
+        self.maxima = maxima
+
+    def calcular(self, valor: float) -> float:
+        taxa = max(valor * self.percentual + self.fixa, self.minima)
+        if self.maxima is not None and taxa > self.maxima:
+            return self.maxima
+        return taxa
+
+
+class Regra:
+    """
+    Faixas ordenadas por limite inferior; uma regra simples tem uma faixa só.
+    """
+    __slots__ = ("limites", "faixas")
+
+    def __init__(self, limites: Tuple[float, ...], faixas: Tuple[Faixa, ...]):
+        self.limites = limites
+        self.faixas = faixas
+
+    def calcular(self, valor: float) -> float:
+        if len(self.faixas) == 1:
+            return self.faixas[0].calcular(valor)
+        # Valores abaixo da primeira faixa usam a primeira
+        return self.faixas[max(bisect_right(self.limites, valor) - 1, 0)].calcular(valor)
+
+
+def _numero(config: Mapping[str, Any], campo: str, padrao: Optional[float]) -> Optional[float]:
+    valor = config.get(campo, padrao)
+    if valor is None:
+        return None
+    valor = float(valor)
+    if valor < 0:
+        raise ValueError(f"Taxa inválida: {campo} negativo")
+    return valor
+
+
+def _faixa(config: Mapping[str, Any], base: Mapping[str, Any]) -> Faixa:
+    desconhecidos = set(config) - set(_CAMPOS_FAIXA) - {"faixas", "moedas"}
+    if desconhecidos:
+        raise ValueError(f"Campos de taxa desconhecidos: {', '.join(sorted(desconhecidos))}")
+    herdado = {**base, **config}
+    faixa = Faixa(
+        percentual=_numero(herdado, "percentual", 0.0),
+        fixa=_numero(herdado, "fixa", 0.0),
+        minima=_numero(herdado, "minima", 0.0),
+        maxima=_numero(herdado, "maxima", None),
+    )
+    if faixa.maxima is not None and faixa.maxima < faixa.minima:
+        raise ValueError("Taxa inválida: maxima menor que minima")
+    return faixa
+
+
+def compilar_regra(config: Mapping[str, Any], base: Optional[Mapping[str, Any]] = None) -> Regra:
+    """
+    Compila uma regra (campos simples ou lista "faixas"). Campos ausentes
+    herdam de base (a regra padrão da operação, no caso de uma moeda).
+    """
+    base = {c: v for c, v in (base or {}).items() if c in _CAMPOS_FAIXA}
+    faixas_config = config.get("faixas")
+    if not faixas_config:
+        return Regra((0.0,), (_faixa(config, base),))
+
+    # Campos fora das faixas valem para todas elas
+    comum = {**base, **{c: v for c, v in config.items() if c in _CAMPOS_FAIXA}}
+    ordenadas = sorted(faixas_config, key=lambda f: float(f.get("a_partir_de", 0)))
+    limites = tuple(float(f.get("a_partir_de", 0)) for f in ordenadas)
+    if len(set(limites)) != len(limites):
+        raise ValueError("Taxa inválida: faixas com o mesmo a_partir_de")
+    return Regra(limites, tuple(_faixa(f, comum) for f in ordenadas))
+
+
+def configuracao_ambiente() -> Dict[str, Dict[str, Any]]:
+    """
+    Regras padrão de cada operação a partir do .env (valores atuais como padrão).
+    """
+    return {
+        "SAQUE": {"percentual": float(os.getenv("TAXA_SAQUE_PERCENTUAL", "0.01"))},
+        "CONVERSAO": {"percentual": float(os.getenv("TAXA_CONVERSAO_PERCENTUAL", "0.005"))},
+        "TRANSFERENCIA": {
+            "percentual": float(os.getenv("TAXA_TRANSFERENCIA_PERCENTUAL", "0.01")),
+            "minima": float(os.getenv("TAXA_TRANSFERENCIA_MINIMA", "0.01")),
+        },
+    }
+
+
+def mesclar_configuracao(
+    base: Dict[str, Dict[str, Any]], arquivo: Mapping[str, Any]
+) -> Dict[str, Dict[str, Any]]:
+    desconhecidas = set(arquivo) - set(OPERACOES)
+    if desconhecidas:
+        raise ValueError(f"Operações de taxa desconhecidas: {', '.join(sorted(desconhecidas))}")
+    config = {operacao: dict(regra) for operacao, regra in base.items()}
+    for operacao, regra in arquivo.items():
+        if "faixas" in regra:
+            # Faixas substituem a regra simples do .env
+            config[operacao] = {}
+        config[operacao].update(regra)
+    return config
+
+
+class TabelaTaxas:
+    """
+    Política compilada e imutável: regra padrão por operação e, para moedas
+    com regra própria, uma entrada por (operação, id_moeda).
+    """
+
+    def __init__(self, config: Mapping[str, Mapping[str, Any]], codigos: Optional[Mapping[int, str]] = None):
+        self.config = config
+        self.padrao: Dict[str, Regra] = {}
+        self.por_codigo: Dict[Tuple[str, str], Regra] = {}
+        for operacao in OPERACOES:
+            regra = config.get(operacao, {})
+            self.padrao[operacao] = compilar_regra(regra)
+            for codigo, regra_moeda in (regra.get("moedas") or {}).items():
+                self.por_codigo[(operacao, codigo.upper())] = compilar_regra(regra_moeda, regra)
+
+        self.por_id: Dict[Tuple[str, int], Regra] = {}
+        for id_moeda, codigo in (codigos or {}).items():
+            for operacao in OPERACOES:
+                regra = self.por_codigo.get((operacao, codigo.upper()))
+                if regra is not None:
+                    self.por_id[(operacao, id_moeda)] = regra
+
+    def regra(self, operacao: str, id_moeda: int) -> Regra:
+        return self.por_id.get((operacao, id_moeda)) or self.padrao[operacao]
+
+
+class PoliticaTaxas:
+    def __init__(self, arquivo: Optional[str] = None, intervalo_recarga_s: float = 30.0):
+        self.arquivo = arquivo or None
+        self.intervalo_recarga_s = intervalo_recarga_s
+        self._codigos: Dict[int, str] = {}
+        self._mtime: Optional[float] = None
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.tabela = self._compilar()
+
+    def _compilar(self) -> TabelaTaxas:
+        config = configuracao_ambiente()
+        if self.arquivo:
+            self._mtime = os.path.getmtime(self.arquivo)
+            with open(self.arquivo, encoding="utf-8") as f:
+                config = mesclar_configuracao(config, json.load(f))
+        return TabelaTaxas(config, self._codigos)
+
+    def vincular_moedas(self, codigos: Mapping[int, str]) -> int:
+        """
+        Resolve as regras por código de moeda para id_moeda (chamado no
+        aquecimento, depois de carregar a tabela moeda).
+        """
+        self._codigos = dict(codigos)
+        self.tabela = TabelaTaxas(self.tabela.config, self._codigos)
+        return len(self.tabela.por_id)
+
+    def calcular(self, operacao: str, id_moeda: int, valor: float) -> float:
+        """
+        Valor da taxa da operação, na moeda da operação.
+        """
+        return self.tabela.regra(operacao, id_moeda).calcular(valor)
+
+    def recarregar_se_mudou(self) -> bool:
+        if not self.arquivo:
+            return False
+        try:
+            if os.path.getmtime(self.arquivo) == self._mtime:
+                return False
+            self.tabela = self._compilar()
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            RECARGAS.inc(resultado="erro")
+            logger.warning(f"Arquivo de taxas inválido, mantendo a política anterior: {e}")
+            return False
+        RECARGAS.inc(resultado="ok")
+        logger.info(f"Política de taxas recarregada de {self.arquivo}")
+        return True
+
+    def iniciar(self) -> None:
+        if not self.arquivo or self.intervalo_recarga_s <= 0 or self._thread is not None:
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._executar, name="recarga-taxas", daemon=True)
+        self._thread.start()
+
+    def _executar(self) -> None:
+        while not self._parar.wait(self.intervalo_recarga_s):
+            self.recarregar_se_mudou()
+
+    def fechar(self, timeout: float = 5.0) -> None:
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+POLITICA_TAXAS = PoliticaTaxas(
+    os.getenv("TAXAS_ARQUIVO", ""),
+    float(os.getenv("TAXAS_RECARGA_S", "30")),
+)
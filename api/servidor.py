@@ -0,0 +1,189 @@
+# api/servidor.py
+"""
+Entrada de produção: N workers uvicorn servindo o mesmo socket.
+
+    python -m api.servidor [--workers N] [--host 0.0.0.0] [--porta 8000]
+
+- O processo pai aplica as migrações (data.sql e migrations/) uma única vez,
+  antes de subir os workers; neles o inicializar_banco só confere a versão
+  do schema.
+- Cada worker importa a aplicação e faz o aquecimento no lifespan (pool do
+  banco, moedas, taxas, cliente da Coinbase) antes de aceitar conexões.
+  Nada é compartilhado entre workers: caches, pools e filas são do processo.
+- Depois de SERVIDOR_MAX_REQUISICOES requisições (mais um jitter, para os
+  workers não reiniciarem juntos) o worker termina as que estão em
+  andamento e sai, e o pai sobe outro no lugar. Isso limita o crescimento
+  de memória de processos longos.
+- O pai loga quanto cada worker levou para ficar pronto, o startup total e,
+  a cada SERVIDOR_RELATORIO_S segundos, o RSS de cada worker.
+"""
+import os
+import copy
+import time
+import logging
+import argparse
+import importlib
+from socket import socket
+from typing import Dict, List, Optional
+
+import uvicorn
+from uvicorn.config import LOGGING_CONFIG
+from uvicorn.supervisors import Multiprocess
+from uvicorn.supervisors.multiprocess import Process
+
+from api.metricas import memoria_rss_bytes
+
+logger = logging.getLogger("api.servidor")
+
+
+def _workers_padrao() -> int:
+    # Núcleos disponíveis para o processo (respeita cpuset de contêineres)
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _megabytes(valor: Optional[int]) -> str:
+    return "?" if valor is None else f"{valor / 2**20:.1f} MB"
+
+
+def configuracao_log(nivel: str) -> Dict:
+    """
+    Config de log do uvicorn com os loggers "api.*" no mesmo handler (os
+    workers são processos novos e não herdam a configuração do pai).
+    """
+    config = copy.deepcopy(LOGGING_CONFIG)
+    config["loggers"]["api"] = {"handlers": ["default"], "level": nivel.upper(), "propagate": False}
+    return config
+
+
+class Supervisor(Multiprocess):
+    """
+    Supervisor do uvicorn (sobe, vigia e repõe workers) com o tempo até cada
+    worker ficar pronto e relatórios de RSS.
+    """
+
+    def __init__(self, config: uvicorn.Config, sockets: List[socket], timeout_startup_s: float, relatorio_s: float):
+        super().__init__(config, sockets)
+        self.timeout_startup_s = timeout_startup_s
+        self.relatorio_s = relatorio_s
+        self._subindo: Dict[Process, float] = {}
+        self._relatorio_em = time.monotonic()
+
+    def init_processes(self) -> None:
+        inicio = time.monotonic()
+        super().init_processes()
+        for processo in self.processes:
+            self._subindo[processo] = inicio
+        self._acompanhar_startup(bloquear=True)
+        prontos = len(self.processes) - len(self._subindo)
+        logger.info(f"{prontos}/{len(self.processes)} workers prontos em {time.monotonic() - inicio:.2f}s")
+        self._relatar_memoria()
+
+    def keep_subprocess_alive(self) -> None:
+        anteriores = set(self.processes)
+        super().keep_subprocess_alive()
+        for processo in self.processes:
+            if processo not in anteriores:
+                # Reposto (limite de requisições ou queda)
+                self._subindo[processo] = time.monotonic()
+        self._acompanhar_startup(bloquear=False)
+        if self.relatorio_s > 0 and time.monotonic() - self._relatorio_em >= self.relatorio_s:
+            self._relatar_memoria()
+
+    def _acompanhar_startup(self, bloquear: bool) -> None:
+        limite = time.monotonic() + self.timeout_startup_s
+        while self._subindo:
+            for processo, inicio in list(self._subindo.items()):
+                if processo not in self.processes or not processo.process.is_alive():
+                    # keep_subprocess_alive cuida de repor
+                    del self._subindo[processo]
+                # Espera a resposta do ping pelo mesmo prazo do healthcheck do
+                # uvicorn: uma resposta atrasada ficaria no pipe e seria lida
+                # pelo próximo ping (deste loop ou do keep_subprocess_alive)
+                elif processo.is_ready(timeout=self.config.timeout_worker_healthcheck):
+                    del self._subindo[processo]
+                    logger.info(
+                        f"Worker {processo.pid} pronto em {time.monotonic() - inicio:.2f}s "
+                        f"(RSS {_megabytes(memoria_rss_bytes(processo.pid))})"
+                    )
+            if not bloquear or self.should_exit.is_set():
+                return
+            if time.monotonic() > limite:
+                pendentes = ", ".join(str(p.pid) for p in self._subindo)
+                logger.warning(f"Workers ainda aquecendo após {self.timeout_startup_s:.0f}s: {pendentes}")
+                return
+            self.should_exit.wait(0.05)
+
+    def _relatar_memoria(self) -> None:
+        self._relatorio_em = time.monotonic()
+        rss = [(p.pid, memoria_rss_bytes(p.pid)) for p in self.processes]
+        total = sum(valor for _, valor in rss if valor is not None)
+        detalhes = ", ".join(f"{pid}={_megabytes(valor)}" for pid, valor in rss)
+        logger.info(f"RSS dos workers: {detalhes} (total {_megabytes(total)})")
+
+
+def migrar() -> None:
+    """
+    Migrações (e a carga inicial do data.sql) uma vez, no pai. Os workers
+    herdam DB_MIGRAR_NO_STARTUP=false e só conferem a versão do schema.
+    """
+    from api.persistence.migrations import aplicar_migracoes, verificar_schema
+
+    inicio = time.perf_counter()
+    aplicadas = aplicar_migracoes()
+    versao = verificar_schema()
+    descricao = ", ".join(f"V{v}" for v in aplicadas) or "nenhuma pendente"
+    logger.info(f"Migrações: {descricao}; schema na versão {versao} ({time.perf_counter() - inicio:.2f}s)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVIDOR_WORKERS") or _workers_padrao()))
+    parser.add_argument("--host", default=os.getenv("SERVIDOR_HOST", "0.0.0.0"))
+    parser.add_argument("--porta", type=int, default=int(os.getenv("SERVIDOR_PORTA", "8000")))
+    parser.add_argument(
+        "--max-requisicoes", type=int, default=int(os.getenv("SERVIDOR_MAX_REQUISICOES", "10000")),
+        help="requisições por worker antes de reiniciá-lo (0 desliga)",
+    )
+    parser.add_argument("--sem-migrar", action="store_true", help="não aplica as migrações no pai")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    max_requisicoes = max(args.max_requisicoes, 0)
+    jitter = os.getenv("SERVIDOR_JITTER_REQUISICOES")
+    config = uvicorn.Config(
+        "api.main:app",
+        host=args.host,
+        port=args.porta,
+        workers=max(args.workers, 1),
+        limit_max_requests=max_requisicoes or None,
+        limit_max_requests_jitter=int(jitter) if jitter else max_requisicoes // 10,
+        timeout_graceful_shutdown=int(os.getenv("SERVIDOR_TIMEOUT_DESLIGAMENTO_S", "30")),
+        log_config=configuracao_log(os.getenv("SERVIDOR_LOG_NIVEL", "info")),
+    )
+
+    if not args.sem_migrar:
+        migrar()
+    os.environ["DB_MIGRAR_NO_STARTUP"] = "false"
+
+    # Erro de import aparece aqui, uma vez, e não em cada worker
+    importlib.import_module("api.main")
+    logger.info(
+        f"Subindo {config.workers} workers em {args.host}:{args.porta} "
+        f"(reinício a cada {max_requisicoes or '∞'} requisições; pai pronto em {time.perf_counter() - inicio:.2f}s)"
+    )
+
+    # Mesmo com 1 worker o supervisor fica no pai, para repor o worker que
+    # sai ao atingir o limite de requisições
+    Supervisor(
+        config,
+        [config.bind_socket()],
+        timeout_startup_s=float(os.getenv("SERVIDOR_TIMEOUT_STARTUP_S", "120")),
+        relatorio_s=float(os.getenv("SERVIDOR_RELATORIO_S", "300")),
+    ).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# bench/bench_exportacao.py
+"""
+Throughput da exportação de histórico (GET /carteiras/{endereco}/exportar)
+em linhas/s, MB/s e memória de pico, para CSV e Parquet.
+
+- Com banco (.env): exporta o histórico real de uma carteira; sem
+  --endereco, usa a carteira com mais movimentos (popule antes com
+  bench.gerador para ter carteiras "quentes").
+- --sintetico N: não usa banco; gera N linhas em memória e mede só a
+  conversão em CSV/Parquet.
+
+Uso:
+    python -m bench.bench_exportacao --formato parquet
+    python -m bench.bench_exportacao --sintetico 1000000
+"""
+import argparse
+import json
+import resource
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List, Tuple
+
+from api.services import exportacao
+
+
+def _rss_pico_mb() -> float:
+    # ru_maxrss é em KB no Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def lotes_sinteticos(n: int, tamanho: int) -> Iterator[List[Tuple[Any, ...]]]:
+    inicio = datetime(2025, 1, 1)
+    valor = Decimal("10.5000")
+    for base in range(0, n, tamanho):
+        yield [
+            ("deposito_saque", i, "DEPOSITO", inicio + timedelta(seconds=i), i % 4 + 1,
+             valor, valor, None, None, None, None, None)
+            for i in range(base, min(n, base + tamanho))
+        ]
+
+
+def carteira_mais_ativa() -> str:
+    from sqlalchemy import text
+    from api.persistence.db import get_connection
+
+    with get_connection() as conn:
+        row = conn.execute(
+            text("""
+                SELECT endereco_carteira, COUNT(*) AS total
+                  FROM deposito_saque
+                 GROUP BY endereco_carteira
+                 ORDER BY total DESC
+                 LIMIT 1
+            """)
+        ).mappings().first()
+    if not row:
+        raise SystemExit("Banco sem movimentos: rode bench.gerador antes")
+    return row["endereco_carteira"]
+
+
+def medir(formato: str, lotes: Iterator[List[Tuple[Any, ...]]]) -> Dict[str, Any]:
+    linhas = 0
+
+    def contar():
+        nonlocal linhas
+        for lote in lotes:
+            linhas += len(lote)
+            yield lote
+
+    rss_antes = _rss_pico_mb()
+    inicio = time.perf_counter()
+    tamanho = 0
+    for parte in exportacao.gerar(formato, contar()):
+        tamanho += len(parte)
+    duracao = time.perf_counter() - inicio
+
+    return {
+        "formato": formato,
+        "linhas": linhas,
+        "bytes": tamanho,
+        "duracao_s": round(duracao, 3),
+        "linhas_por_s": round(linhas / duracao) if duracao else None,
+        "mb_por_s": round(tamanho / duracao / 1e6, 2) if duracao else None,
+        "rss_pico_mb": round(_rss_pico_mb(), 1),
+        "rss_crescimento_mb": round(_rss_pico_mb() - rss_antes, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--formato", choices=("csv", "parquet", "ambos"), default="ambos")
+    parser.add_argument("--endereco", help="carteira a exportar (padrão: a mais ativa)")
+    parser.add_argument("--incluir-arquivo", action="store_true")
+    parser.add_argument("--sintetico", type=int, metavar="LINHAS", help="não usa banco")
+    parser.add_argument("--lote", type=int, default=exportacao.LINHAS_POR_LOTE)
+    args = parser.parse_args()
+
+    formatos = ["csv", "parquet"] if args.formato == "ambos" else [args.formato]
+    resultados = []
+
+    if args.sintetico:
+        for formato in formatos:
+            resultados.append(medir(formato, lotes_sinteticos(args.sintetico, args.lote)))
+    else:
+        from api.persistence.repositories.carteira_repository import CarteiraRepository
+
+        repo = CarteiraRepository()
+        endereco = args.endereco or carteira_mais_ativa()
+        for formato in formatos:
+            resultado = medir(formato, repo.iterar_historico(endereco, args.incluir_arquivo, args.lote))
+            resultado["endereco"] = endereco
+            resultados.append(resultado)
+
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == "__main__":
+    main()
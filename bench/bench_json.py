@@ -0,0 +1,94 @@
+# bench/bench_json.py
+"""
+Compara a serialização padrão dos endpoints de lista (modelo Pydantic por
+linha + validação do response_model + encoder JSON da stdlib) com o caminho
+rápido de api/routers/json_rapido.py (linhas do banco direto para bytes).
+
+Não precisa de banco: usa linhas sintéticas no formato de saldo_carteira.
+
+Uso:
+    python -m bench.bench_json --linhas 1000 --repeticoes 200
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from api.models.carteira_models import SaldoCarteira
+from api.routers.json_rapido import orjson, serializar
+
+
+def gerar_linhas(n: int) -> List[Dict[str, Any]]:
+    agora = datetime(2024, 1, 1)
+    return [
+        {
+            "endereco_carteira": f"{i:032x}",
+            "id_moeda": i % 4 + 1,
+            "saldo": Decimal(i) / Decimal("3.7"),
+            "data_atualizacao": agora + timedelta(seconds=i),
+        }
+        for i in range(n)
+    ]
+
+
+_adapter = TypeAdapter(List[SaldoCarteira])
+
+
+def caminho_padrao(linhas: List[Dict[str, Any]]) -> bytes:
+    # repositório -> modelos, FastAPI valida no response_model e serializa
+    modelos = [SaldoCarteira(**linha) for linha in linhas]
+    validados = _adapter.validate_python(modelos, from_attributes=True)
+    conteudo = jsonable_encoder(_adapter.dump_python(validados, mode="json"))
+    return json.dumps(conteudo, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def caminho_rapido(linhas: List[Dict[str, Any]]) -> bytes:
+    return serializar(linhas)
+
+
+def medir(funcao: Callable[[List[Dict[str, Any]]], bytes], linhas: List[Dict[str, Any]], repeticoes: int) -> Dict[str, float]:
+    funcao(linhas)  # aquecimento
+
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao(linhas)
+    total = time.perf_counter() - inicio
+
+    # Memória alocada no pico de uma resposta (objetos intermediários + bytes finais)
+    tracemalloc.start()
+    funcao(linhas)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "linhas_por_segundo": round(len(linhas) * repeticoes / total),
+        "ms_por_resposta": round(total / repeticoes * 1000, 3),
+        "pico_alocado_por_resposta_kb": round(pico / 1024, 1),
+        "bytes_alocados_por_linha": round(pico / len(linhas)),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, default=1000)
+    parser.add_argument("--repeticoes", type=int, default=200)
+    args = parser.parse_args()
+
+    linhas = gerar_linhas(args.linhas)
+    resultado = {
+        "linhas": args.linhas,
+        "encoder_rapido": "orjson" if orjson is not None else "json (stdlib)",
+        "padrao": medir(caminho_padrao, linhas, args.repeticoes),
+        "rapido": medir(caminho_rapido, linhas, args.repeticoes),
+    }
+    print(json.dumps(resultado, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# bench/bench_procedures.py
+"""
+Compara transferência e conversão executadas statement a statement
+com a execução via stored procedures (procedures_v1.sql).
+
+Uso (com o banco do .env e as procedures instaladas):
+    python -m bench.bench_procedures --operacoes 500
+"""
+import argparse
+import json
+import statistics
+import time
+from typing import Callable, Dict, List
+
+from api.persistence.repositories.carteira_repository import CarteiraRepository
+
+
+def _percentil(valores: List[float], p: float) -> float:
+    ordenados = sorted(valores)
+    idx = min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[idx]
+
+
+def _medir(operacao: Callable[[int], None], n: int) -> Dict[str, float]:
+    latencias: List[float] = []
+    inicio = time.perf_counter()
+    for i in range(n):
+        t0 = time.perf_counter()
+        operacao(i)
+        latencias.append((time.perf_counter() - t0) * 1000)
+    total = time.perf_counter() - inicio
+
+    return {
+        "operacoes": n,
+        "ops_por_segundo": round(n / total, 1),
+        "media_ms": round(statistics.mean(latencias), 3),
+        "p50_ms": round(_percentil(latencias, 50), 3),
+        "p95_ms": round(_percentil(latencias, 95), 3),
+        "p99_ms": round(_percentil(latencias, 99), 3),
+    }
+
+
+def executar(n: int, id_moeda: int, id_moeda_destino: int) -> Dict[str, Dict[str, Dict[str, float]]]:
+    setup = CarteiraRepository(usar_procedures=False)
+    a = setup.criar()["endereco_carteira"]
+    b = setup.criar()["endereco_carteira"]
+    # Saldo suficiente para todas as rodadas dos dois modos
+    setup.registrar_deposito(a, id_moeda, n * 10.0)
+    setup.registrar_deposito(b, id_moeda, n * 10.0)
+
+    resultados: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for modo, usar in (("sql", False), ("procedure", True)):
+        repo = CarteiraRepository(usar_procedures=usar)
+
+        def transferir(i: int) -> None:
+            origem, destino = (a, b) if i % 2 == 0 else (b, a)
+            repo.registrar_transferencia(origem, destino, id_moeda, 1.0, 0.01)
+
+        def converter(i: int) -> None:
+            repo.registrar_conversao(a, id_moeda, id_moeda_destino, 0.5, 0.25, 0.5, 0.5)
+
+        resultados[modo] = {
+            "transferencia": _medir(transferir, n),
+            "conversao": _medir(converter, n),
+        }
+
+    return resultados
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--operacoes", type=int, default=200)
+    parser.add_argument("--id-moeda", type=int, default=1)
+    parser.add_argument("--id-moeda-destino", type=int, default=2)
+    args = parser.parse_args()
+
+    print(json.dumps(executar(args.operacoes, args.id_moeda, args.id_moeda_destino), indent=2))
+
+
+if __name__ == "__main__":
+    main()
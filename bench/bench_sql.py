@@ -0,0 +1,168 @@
+# bench/bench_sql.py
+"""
+CPU do lado Python por requisição para os statements do caminho quente do
+repositório (INSERT no razão, upsert do saldo e leitura do saldo final, a
+sequência de um depósito), em três variantes:
+
+- texto: um text() novo a cada chamada (como o repositório fazia);
+- compilado: o text() montado uma vez no módulo (SQL_* do repositório);
+- preparado: db.ComandoPreparado com cursor preparado do mysql-connector
+  (medido mesmo com DB_PREPARED_STATEMENTS=false, para decidir se vale
+  ligar).
+
+Mede time.process_time() (CPU do processo, sem a espera pelo servidor) e o
+tempo de parede. Com banco (.env), roda numa carteira existente dentro de
+uma transação desfeita no fim. Com --sqlite, não precisa de MySQL: compara
+só texto x compilado num SQLite em memória.
+
+Uso:
+    python -m bench.bench_sql --requisicoes 5000
+    python -m bench.bench_sql --sqlite --requisicoes 20000
+"""
+import argparse
+import json
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection
+
+
+Variante = Callable[[Connection, Dict[str, Any]], Any]
+
+
+def medir(conn: Connection, requisicao: Variante, params: Dict[str, Any], requisicoes: int) -> Dict[str, float]:
+    for _ in range(min(requisicoes // 10, 200)):
+        requisicao(conn, params)  # aquecimento (cache de compilação, preparação)
+
+    cpu, parede = time.process_time(), time.perf_counter()
+    for _ in range(requisicoes):
+        requisicao(conn, params)
+    cpu, parede = time.process_time() - cpu, time.perf_counter() - parede
+    return {
+        "cpu_us_por_requisicao": round(cpu / requisicoes * 1e6, 1),
+        "parede_us_por_requisicao": round(parede / requisicoes * 1e6, 1),
+    }
+
+
+def variantes_mysql() -> List[Tuple[str, Variante]]:
+    from api.persistence import db
+    from api.persistence.repositories.carteira_repository import (
+        SQL_INSERIR_DEPOSITO, SQL_SALDO_ATUAL, SQL_SOMAR_SALDO,
+    )
+    comandos = (SQL_INSERIR_DEPOSITO, SQL_SOMAR_SALDO, SQL_SALDO_ATUAL)
+    sqls = [c.texto.text for c in comandos]
+
+    def texto(conn: Connection, params: Dict[str, Any]) -> Any:
+        conn.execute(text(sqls[0]), params)
+        conn.execute(text(sqls[1]), params)
+        return conn.execute(text(sqls[2]), params).mappings().first()
+
+    def compilado(conn: Connection, params: Dict[str, Any]) -> Any:
+        conn.execute(comandos[0].texto, params)
+        conn.execute(comandos[1].texto, params)
+        return conn.execute(comandos[2].texto, params).mappings().first()
+
+    def preparado(conn: Connection, params: Dict[str, Any]) -> Any:
+        comandos[0].executar(conn, params)
+        comandos[1].executar(conn, params)
+        return comandos[2].executar(conn, params).primeira()
+
+    # Liga os preparados só neste processo; se o driver não suportar,
+    # _desativar_preparados os desliga de novo e a variante sai do resultado
+    db._preparados_ativos = True
+    return [("texto", texto), ("compilado", compilado), ("preparado", preparado)]
+
+
+SQLITE_ESQUEMA = (
+    """CREATE TABLE deposito_saque (
+        id_movimento INTEGER PRIMARY KEY AUTOINCREMENT, endereco_carteira TEXT, id_moeda INTEGER,
+        tipo TEXT, valor NUMERIC, taxa_valor NUMERIC, data_hora TIMESTAMP)""",
+    """CREATE TABLE saldo_carteira (
+        endereco_carteira TEXT, id_moeda INTEGER, saldo NUMERIC, data_atualizacao TIMESTAMP,
+        PRIMARY KEY (endereco_carteira, id_moeda))""",
+    "INSERT INTO saldo_carteira VALUES ('carteira', 1, 0, CURRENT_TIMESTAMP)",
+)
+
+SQLITE_SQLS = (
+    """
+        INSERT INTO deposito_saque
+        (endereco_carteira, id_moeda, tipo, valor, taxa_valor, data_hora)
+        VALUES (:endereco_carteira, :id_moeda, 'DEPOSITO', :valor, :valor_liquido, CURRENT_TIMESTAMP)
+    """,
+    """
+        UPDATE saldo_carteira
+        SET saldo = saldo + :valor, data_atualizacao = CURRENT_TIMESTAMP
+        WHERE endereco_carteira = :endereco_carteira AND id_moeda = :id_moeda
+    """,
+    """
+        SELECT saldo FROM saldo_carteira
+        WHERE endereco_carteira = :endereco_carteira AND id_moeda = :id_moeda
+    """,
+)
+
+
+def variantes_sqlite() -> List[Tuple[str, Variante]]:
+    compilados = [text(sql) for sql in SQLITE_SQLS]
+
+    def texto(conn: Connection, params: Dict[str, Any]) -> Any:
+        conn.execute(text(SQLITE_SQLS[0]), params)
+        conn.execute(text(SQLITE_SQLS[1]), params)
+        return conn.execute(text(SQLITE_SQLS[2]), params).mappings().first()
+
+    def compilado(conn: Connection, params: Dict[str, Any]) -> Any:
+        conn.execute(compilados[0], params)
+        conn.execute(compilados[1], params)
+        return conn.execute(compilados[2], params).mappings().first()
+
+    return [("texto", texto), ("compilado", compilado)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requisicoes", type=int, default=5000)
+    parser.add_argument("--sqlite", action="store_true", help="SQLite em memória, sem MySQL")
+    args = parser.parse_args()
+
+    if args.sqlite:
+        engine = create_engine("sqlite://", future=True)
+        variantes = variantes_sqlite()
+        endereco = "carteira"
+    else:
+        from api.persistence.db import engine
+        variantes = variantes_mysql()
+        with engine.connect() as conn:
+            endereco = conn.execute(
+                text("SELECT endereco_carteira FROM carteira WHERE status = 'ATIVA' LIMIT 1")
+            ).scalar()
+        if endereco is None:
+            raise SystemExit("Banco sem carteiras: rode bench.seed antes")
+
+    params = {"endereco_carteira": endereco, "id_moeda": 1, "valor": 1.0, "valor_liquido": 1.0}
+    resultado: Dict[str, Any] = {"banco": "sqlite" if args.sqlite else "mysql", "requisicoes": args.requisicoes}
+    with engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            if args.sqlite:
+                for ddl in SQLITE_ESQUEMA:
+                    conn.exec_driver_sql(ddl)
+            for nome, variante in variantes:
+                resultado[nome] = medir(conn, variante, params, args.requisicoes)
+            if not args.sqlite:
+                from api.persistence import db
+                if not db._preparados_ativos:
+                    # O driver não tem cursor preparado: a medição foi do text()
+                    variantes = [v for v in variantes if v[0] != "preparado"]
+                    resultado.pop("preparado")
+        finally:
+            # Nada do benchmark fica no banco
+            trans.rollback()
+
+    base = resultado["texto"]["cpu_us_por_requisicao"]
+    for nome, _ in variantes[1:]:
+        resultado[nome]["cpu_us_economizada"] = round(base - resultado[nome]["cpu_us_por_requisicao"], 1)
+    print(json.dumps(resultado, indent=2))
+
+
+if __name__ == "__main__":
+    main()
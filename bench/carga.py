@@ -0,0 +1,203 @@
+# bench/carga.py
+"""
+Benchmark de carga dos endpoints de carteira.
+
+Popula o banco do .env (bench.seed), sobe a aplicação em processo com o
+stand-in offline de cotações e executa uma carga mista (criar, depósito,
+saque, transferência, conversão, listagem, saldos e histórico) com
+concorrência fixa. O resultado sai em JSON para comparar entre commits.
+
+Uso:
+    python -m bench.carga --carteiras 500 --historico 5000 \
+        --concorrencia 16 --operacoes 5000 --saida resultado.json
+"""
+import os
+
+# Os headers X-DB-Statements só são enviados em modo debug
+os.environ.setdefault("API_DEBUG", "true")
+# Sem controle de admissão por padrão: a carga mede o caminho até o banco
+os.environ.setdefault("ADMISSAO_TAXA_CARTEIRA", "0")
+os.environ.setdefault("ADMISSAO_MAX_EM_VOO", "0")
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import subprocess
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+import httpx
+
+from api.main import create_app
+from bench.cotacao_offline import CotacaoOffline
+from bench.seed import semear
+
+
+MIX_PADRAO: Dict[str, int] = {
+    "criar": 5,
+    "deposito": 20,
+    "saque": 10,
+    "transferencia": 15,
+    "conversao": 10,
+    "listar": 2,
+    "saldos": 25,
+    "historico": 13,
+}
+
+
+def _percentil(valores: List[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    idx = min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[idx]
+
+
+def _commit_atual() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "desconhecido"
+
+
+class Carga:
+    def __init__(self, client: httpx.AsyncClient, carteiras: List[Tuple[str, str]], seed: int):
+        self.client = client
+        self.carteiras = carteiras
+        self.seed = seed
+        self.latencias: Dict[str, List[float]] = {op: [] for op in MIX_PADRAO}
+        self.statements: Dict[str, List[int]] = {op: [] for op in MIX_PADRAO}
+        self.erros: Dict[str, int] = {op: 0 for op in MIX_PADRAO}
+
+    def gerador(self, trabalhador: int) -> random.Random:
+        # Um gerador por trabalhador, derivado da seed: as requisições de cada
+        # um não dependem da ordem em que o event loop intercala os demais
+        return random.Random(f"{self.seed}:{trabalhador}")
+
+    def _requisicao(self, operacao: str, rnd: random.Random) -> Tuple[str, str, Any]:
+        endereco, chave = rnd.choice(self.carteiras)
+        id_moeda = rnd.randint(1, 4)
+
+        if operacao == "criar":
+            return "POST", "/carteiras", None
+        if operacao == "deposito":
+            return "POST", f"/carteiras/{endereco}/depositos", {"id_moeda": id_moeda, "valor": 10.0}
+        if operacao == "saque":
+            return "POST", f"/carteiras/{endereco}/saques", {
+                "id_moeda": id_moeda, "valor": 1.0, "chave_privada": chave}
+        if operacao == "transferencia":
+            destino, _ = rnd.choice(self.carteiras)
+            return "POST", f"/carteiras/{endereco}/transferencias", {
+                "endereco_destino": destino, "id_moeda": id_moeda, "valor": 1.0, "chave_privada": chave}
+        if operacao == "conversao":
+            destino = id_moeda % 4 + 1
+            return "POST", f"/carteiras/{endereco}/conversoes", {
+                "id_moeda_origem": id_moeda, "id_moeda_destino": destino,
+                "valor_origem": 0.01, "chave_privada": chave}
+        if operacao == "listar":
+            return "GET", "/carteiras", None
+        if operacao == "saldos":
+            return "GET", f"/carteiras/{endereco}/saldos", None
+        return "GET", f"/carteiras/{endereco}/transferencias", None
+
+    async def executar_uma(self, operacao: str, rnd: random.Random) -> None:
+        metodo, url, corpo = self._requisicao(operacao, rnd)
+        inicio = time.perf_counter()
+        try:
+            resposta = await self.client.request(metodo, url, json=corpo)
+        except Exception:
+            self.erros[operacao] += 1
+            return
+        self.latencias[operacao].append((time.perf_counter() - inicio) * 1000)
+
+        if resposta.status_code >= 400:
+            self.erros[operacao] += 1
+        statements = resposta.headers.get("x-db-statements")
+        if statements is not None:
+            self.statements[operacao].append(int(statements))
+
+    def relatorio(self, duracao_s: float) -> Dict[str, Any]:
+        por_operacao: Dict[str, Any] = {}
+        for op, latencias in self.latencias.items():
+            if not latencias and not self.erros[op]:
+                continue
+            por_operacao[op] = {
+                "requisicoes": len(latencias),
+                "erros": self.erros[op],
+                "throughput_rps": round(len(latencias) / duracao_s, 1),
+                "p50_ms": round(_percentil(latencias, 50), 2),
+                "p95_ms": round(_percentil(latencias, 95), 2),
+                "p99_ms": round(_percentil(latencias, 99), 2),
+                "statements_db_media": round(statistics.mean(self.statements[op]), 2) if self.statements[op] else None,
+            }
+        total = sum(len(l) for l in self.latencias.values())
+        return {
+            "total_requisicoes": total,
+            "duracao_s": round(duracao_s, 2),
+            "throughput_rps": round(total / duracao_s, 1),
+            "operacoes": por_operacao,
+        }
+
+
+async def executar(args: argparse.Namespace) -> Dict[str, Any]:
+    carteiras = semear(args.carteiras, args.historico, seed=args.seed)
+
+    app = create_app()
+    app.state.coinbase_service = CotacaoOffline(latencia_s=args.latencia_cotacao_ms / 1000)
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            carga = Carga(client, carteiras, args.seed)
+            operacoes, pesos = zip(*MIX_PADRAO.items())
+            fila = random.Random(args.seed).choices(operacoes, weights=pesos, k=args.operacoes)
+
+            async def trabalhador(indice: int):
+                # Fatia fixa da fila por trabalhador, para a mesma seed repetir
+                # as mesmas requisições em cada um
+                rnd = carga.gerador(indice)
+                for operacao in fila[indice::args.concorrencia]:
+                    await carga.executar_uma(operacao, rnd)
+
+            inicio = time.perf_counter()
+            await asyncio.gather(*(trabalhador(i) for i in range(args.concorrencia)))
+            duracao = time.perf_counter() - inicio
+
+    resultado = carga.relatorio(duracao)
+    resultado["parametros"] = {
+        "carteiras": args.carteiras,
+        "historico": args.historico,
+        "concorrencia": args.concorrencia,
+        "operacoes": args.operacoes,
+        "seed": args.seed,
+        "mix": MIX_PADRAO,
+    }
+    resultado["commit"] = _commit_atual()
+    resultado["executado_em"] = datetime.utcnow().isoformat()
+    return resultado
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--carteiras", type=int, default=500)
+    parser.add_argument("--historico", type=int, default=5000)
+    parser.add_argument("--concorrencia", type=int, default=16)
+    parser.add_argument("--operacoes", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--latencia-cotacao-ms", type=float, default=0.0)
+    parser.add_argument("--saida", help="arquivo JSON de saída (além do stdout)")
+    args = parser.parse_args()
+
+    resultado = asyncio.run(executar(args))
+    texto = json.dumps(resultado, indent=2)
+    if args.saida:
+        with open(args.saida, "w") as f:
+            f.write(texto)
+    print(texto)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+# bench/cotacao_offline.py
+"""
+Stand-in offline do CoinbaseService para benchmarks: mesma interface,
+cotações fixas em memória, latência simulada opcional.
+"""
+import asyncio
+from typing import Dict, Optional
+
+
+# Preço de 1 unidade em USD
+PRECOS_USD: Dict[str, float] = {
+    "BTC": 65000.0,
+    "ETH": 3200.0,
+    "SOL": 150.0,
+    "USD": 1.0,
+}
+
+
+class CotacaoOffline:
+    def __init__(self, precos_usd: Optional[Dict[str, float]] = None, latencia_s: float = 0.0):
+        self.precos_usd = precos_usd or PRECOS_USD
+        self.latencia_s = latencia_s
+        self.client = None
+
+    async def initialize(self):
+        pass
+
+    async def get_exchange_rate(self, from_currency: str, to_currency: str) -> Optional[float]:
+        if self.latencia_s:
+            await asyncio.sleep(self.latencia_s)
+        origem = self.precos_usd.get(from_currency)
+        destino = self.precos_usd.get(to_currency)
+        if origem is None or destino is None:
+            return None
+        return origem / destino
+
+    async def obter_tabela_cotacoes(self, moeda_base: str) -> Optional[Dict[str, float]]:
+        base = self.precos_usd.get(moeda_base)
+        if base is None:
+            return None
+        return {codigo: base / preco for codigo, preco in self.precos_usd.items()}
+
+    async def aquecer(self) -> bool:
+        return True
+
+    async def close(self):
+        pass
@@ -0,0 +1,376 @@
+# bench/gerador.py
+"""
+Gerador de dados sintéticos em larga escala para o banco do .env.
+
+Preenche carteira, saldo_carteira, deposito_saque, transferencia e conversao
+com distribuições realistas: poucas carteiras "quentes" concentram a maior
+parte das operações (Zipf), uma cauda longa de carteiras pouco ativas e
+moedas com pesos desiguais. Os saldos gerados batem exatamente com o razão:
+
+    saldo = SUM(valor dos DEPOSITO) - SUM(taxa_valor dos SAQUE)
+
+(no schema atual, taxa_valor do SAQUE guarda o total debitado).
+
+O trabalho é dividido em fatias de carteiras, uma por processo; cada fatia
+só movimenta entre as próprias carteiras, então os saldos são calculados
+localmente, sem coordenação entre processos. A escrita usa
+LOAD DATA LOCAL INFILE (padrão, exige local_infile=ON no servidor) ou
+INSERTs multi-linha em lotes (--modo insert).
+
+Uso:
+    python -m bench.gerador --carteiras 2000000 --eventos 15000000 --processos 8
+    python -m bench.gerador --verificar
+"""
+import argparse
+import bisect
+import csv
+import hashlib
+import itertools
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.pool import NullPool
+
+from api.persistence.db import get_database_url
+from bench.cotacao_offline import PRECOS_USD
+
+
+# Valores são inteiros em décimos de milésimo (DECIMAL(18, 4) exato)
+ESCALA = 10_000
+CODIGOS_MOEDA = {1: "BTC", 2: "ETH", 3: "SOL", 4: "USD"}
+PESOS_MOEDA_PADRAO = "1:0.20,2:0.12,3:0.08,4:0.60"
+PESOS_EVENTO = {"deposito": 0.35, "saque": 0.15, "transferencia": 0.35, "conversao": 0.15}
+TAXA_CONVERSAO_PERCENTUAL = 0.5
+# transferencia.taxa_valor é DECIMAL(5, 2): limita o valor para a taxa caber
+VALOR_MAX_TRANSFERENCIA = 99_999 * ESCALA
+
+COLUNAS = {
+    "carteira": ("endereco_carteira", "hash_chave_privada", "data_criacao", "status"),
+    "saldo_carteira": ("endereco_carteira", "id_moeda", "saldo", "data_atualizacao"),
+    "deposito_saque": ("endereco_carteira", "id_moeda", "tipo", "valor", "taxa_valor", "data_hora"),
+    "transferencia": ("endereco_origem", "endereco_destino", "id_moeda", "valor", "taxa_valor", "data_hora"),
+    "conversao": ("endereco_carteira", "id_moeda_origem", "id_moeda_destino", "valor_origem",
+                  "valor_destino", "taxa_percentual", "cotacao_utilizada", "data_hora"),
+}
+
+
+def chave_privada(seed: int, indice: int) -> str:
+    """
+    Chave privada determinística da carteira `indice` (permite usar as
+    carteiras geradas em benchmarks sem guardar as chaves).
+    """
+    return hashlib.sha256(f"carteira:{seed}:{indice}".encode()).hexdigest()
+
+
+def endereco(seed: int, indice: int) -> str:
+    return hashlib.sha256(f"endereco:{seed}:{indice}".encode()).hexdigest()[:32]
+
+
+def _decimal(unidades: int) -> str:
+    sinal = "-" if unidades < 0 else ""
+    inteiro, fracao = divmod(abs(unidades), ESCALA)
+    return f"{sinal}{inteiro}.{fracao:04d}"
+
+
+def _data(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _parse_pesos(texto: str) -> Dict[int, float]:
+    pesos = {}
+    for par in texto.split(","):
+        id_moeda, peso = par.split(":")
+        pesos[int(id_moeda)] = float(peso)
+    return pesos
+
+
+def _acumulados(pesos: Sequence[float]) -> List[float]:
+    return list(itertools.accumulate(pesos))
+
+
+class _Saida:
+    """
+    Destino das linhas de uma fatia: arquivos TSV para LOAD DATA ou lotes de INSERT.
+    """
+
+    def __init__(self, conn: Connection, modo: str, diretorio: str, fatia: int, lote: int):
+        self.conn = conn
+        self.modo = modo
+        self.lote = lote
+        self.contagem = {tabela: 0 for tabela in COLUNAS}
+        self._buffers: Dict[str, List[Tuple]] = {tabela: [] for tabela in COLUNAS}
+        self._arquivos = {}
+        self._writers = {}
+        if modo == "load":
+            for tabela in COLUNAS:
+                path = os.path.join(diretorio, f"{tabela}_{fatia}.tsv")
+                f = open(path, "w", newline="", encoding="utf-8")
+                self._arquivos[tabela] = (path, f)
+                self._writers[tabela] = csv.writer(f, delimiter="\t", lineterminator="\n",
+                                                   quoting=csv.QUOTE_NONE, escapechar="\\")
+
+    def escrever(self, tabela: str, linha: Tuple) -> None:
+        self.contagem[tabela] += 1
+        if self.modo == "load":
+            self._writers[tabela].writerow(linha)
+            return
+        buffer = self._buffers[tabela]
+        buffer.append(linha)
+        if len(buffer) >= self.lote:
+            self._inserir(tabela)
+
+    def _inserir(self, tabela: str) -> None:
+        buffer = self._buffers[tabela]
+        if not buffer:
+            return
+        colunas = COLUNAS[tabela]
+        self.conn.execute(
+            text(f"INSERT INTO {tabela} ({', '.join(colunas)}) VALUES ({', '.join(':' + c for c in colunas)})"),
+            [dict(zip(colunas, linha)) for linha in buffer],
+        )
+        self.conn.commit()
+        buffer.clear()
+
+    def finalizar(self) -> None:
+        if self.modo == "insert":
+            for tabela in COLUNAS:
+                self._inserir(tabela)
+            return
+
+        for tabela, (path, f) in self._arquivos.items():
+            f.close()
+            self.conn.exec_driver_sql(
+                f"LOAD DATA LOCAL INFILE '{path}' INTO TABLE {tabela} "
+                "CHARACTER SET utf8mb4 FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' "
+                f"LINES TERMINATED BY '\\n' ({', '.join(COLUNAS[tabela])})"
+            )
+            self.conn.commit()
+            os.remove(path)
+
+
+def _gerar_fatia(parametros: Dict) -> Dict[str, int]:
+    fatia: int = parametros["fatia"]
+    seed: int = parametros["seed"]
+    primeiro, ultimo = parametros["intervalo"]
+    n = ultimo - primeiro
+    rnd = random.Random(seed * 1_000_003 + fatia)
+
+    moedas = list(parametros["pesos_moeda"].keys())
+    acum_moedas = _acumulados(list(parametros["pesos_moeda"].values()))
+    tipos = list(PESOS_EVENTO.keys())
+    acum_tipos = _acumulados(list(PESOS_EVENTO.values()))
+
+    # Zipf sobre uma permutação: carteiras quentes espalhadas pela fatia
+    ordem = list(range(n))
+    rnd.shuffle(ordem)
+    acum_carteiras = _acumulados([1 / (rank + 1) ** parametros["zipf"] for rank in range(n)])
+    total_zipf = acum_carteiras[-1]
+
+    def sortear_carteira() -> int:
+        return ordem[bisect.bisect_left(acum_carteiras, rnd.random() * total_zipf)]
+
+    def sortear_moeda() -> int:
+        return moedas[bisect.bisect_left(acum_moedas, rnd.random() * acum_moedas[-1])]
+
+    def valor_usd_em(id_moeda: int) -> int:
+        usd = min(rnd.lognormvariate(4.0, 1.8), 1_000_000.0)
+        return max(int(usd / PRECOS_USD[CODIGOS_MOEDA[id_moeda]] * ESCALA), 1)
+
+    engine = create_engine(get_database_url(), poolclass=NullPool,
+                           connect_args={"allow_local_infile": True})
+    taxa_saque = float(os.getenv("TAXA_SAQUE_PERCENTUAL", "0.01"))
+    inicio: datetime = parametros["inicio"]
+    passo = timedelta(days=parametros["dias"]) / max(parametros["eventos"], 1)
+
+    enderecos = [endereco(seed, primeiro + i) for i in range(n)]
+    saldos: Dict[Tuple[int, int], int] = {}
+    atualizado: Dict[Tuple[int, int], datetime] = {}
+
+    with engine.connect() as conn:
+        conn.exec_driver_sql("SET SESSION unique_checks = 0")
+        conn.exec_driver_sql("SET SESSION foreign_key_checks = 0")
+        saida = _Saida(conn, parametros["modo"], parametros["diretorio"], fatia, parametros["lote"])
+
+        def movimento(i: int, id_moeda: int, tipo: str, valor: int, debito: int, quando: datetime) -> None:
+            chave = (i, id_moeda)
+            saldos[chave] = saldos.get(chave, 0) + (valor if tipo == "DEPOSITO" else -debito)
+            atualizado[chave] = quando
+            saida.escrever("deposito_saque", (
+                enderecos[i], id_moeda, tipo, _decimal(valor),
+                _decimal(valor if tipo == "DEPOSITO" else debito), _data(quando)))
+
+        # Carteiras e depósito inicial em 1 a 3 moedas
+        for i in range(n):
+            saida.escrever("carteira", (
+                enderecos[i], hashlib.sha256(chave_privada(seed, primeiro + i).encode()).hexdigest(),
+                _data(inicio), "ATIVA"))
+            for id_moeda in {sortear_moeda() for _ in range(rnd.randint(1, 3))}:
+                movimento(i, id_moeda, "DEPOSITO", valor_usd_em(id_moeda), 0, inicio)
+
+        quando = inicio
+        for _ in range(parametros["eventos"]):
+            quando += passo
+            tipo = tipos[bisect.bisect_left(acum_tipos, rnd.random() * acum_tipos[-1])]
+            i = sortear_carteira()
+            id_moeda = sortear_moeda()
+            saldo = saldos.get((i, id_moeda), 0)
+
+            if tipo == "saque" and saldo > 1:
+                valor = max(int(saldo * rnd.uniform(0.01, 0.5) / (1 + taxa_saque)), 1)
+                taxa = int(valor * taxa_saque)
+                movimento(i, id_moeda, "SAQUE", valor, valor + taxa, quando)
+
+            elif tipo == "transferencia" and saldo > 2 * ESCALA // 100 and n > 1:
+                j = sortear_carteira()
+                while j == i:
+                    j = sortear_carteira()
+                valor = min(int(saldo * rnd.uniform(0.01, 0.5)), VALOR_MAX_TRANSFERENCIA)
+                taxa = max(valor // 100 // 100 * 100, ESCALA // 100)  # 1%, em centavos, mínimo 0.01
+                if valor + taxa > saldo:
+                    valor = saldo - taxa
+                saida.escrever("transferencia", (
+                    enderecos[i], enderecos[j], id_moeda, _decimal(valor), _decimal(taxa), _data(quando)))
+                movimento(i, id_moeda, "SAQUE", valor, valor + taxa, quando)
+                movimento(j, id_moeda, "DEPOSITO", valor, 0, quando)
+
+            elif tipo == "conversao" and saldo > 1 and len(moedas) > 1:
+                destino = sortear_moeda()
+                while destino == id_moeda:
+                    destino = moedas[rnd.randrange(len(moedas))]
+                cotacao = PRECOS_USD[CODIGOS_MOEDA[id_moeda]] / PRECOS_USD[CODIGOS_MOEDA[destino]]
+                valor_origem = max(int(saldo * rnd.uniform(0.01, 0.5)), 1)
+                valor_destino = int(valor_origem * (1 - TAXA_CONVERSAO_PERCENTUAL / 100) * cotacao)
+                if valor_destino <= 0:
+                    movimento(i, id_moeda, "DEPOSITO", valor_usd_em(id_moeda), 0, quando)
+                    continue
+                saida.escrever("conversao", (
+                    enderecos[i], id_moeda, destino, _decimal(valor_origem), _decimal(valor_destino),
+                    f"{TAXA_CONVERSAO_PERCENTUAL:.2f}", f"{cotacao:.4f}", _data(quando)))
+                movimento(i, id_moeda, "SAQUE", valor_origem, valor_origem, quando)
+                movimento(i, destino, "DEPOSITO", valor_destino, 0, quando)
+
+            else:
+                # depósito (ou operação sem saldo suficiente, convertida em depósito)
+                movimento(i, id_moeda, "DEPOSITO", valor_usd_em(id_moeda), 0, quando)
+
+        for (i, id_moeda), saldo in saldos.items():
+            saida.escrever("saldo_carteira", (
+                enderecos[i], id_moeda, _decimal(saldo), _data(atualizado[(i, id_moeda)])))
+
+        saida.finalizar()
+
+    engine.dispose()
+    return saida.contagem
+
+
+def gerar(
+    carteiras: int,
+    eventos: int,
+    processos: int,
+    seed: int = 1,
+    dias: int = 365,
+    zipf: float = 1.1,
+    pesos_moeda: Optional[Dict[int, float]] = None,
+    modo: str = "load",
+    lote: int = 5000,
+    diretorio: Optional[str] = None,
+) -> Dict[str, int]:
+    """
+    Gera os dados em `processos` fatias paralelas e devolve as linhas por tabela.
+    """
+    processos = max(1, min(processos, carteiras))
+    pesos_moeda = pesos_moeda or _parse_pesos(PESOS_MOEDA_PADRAO)
+    diretorio = diretorio or tempfile.mkdtemp(prefix="carteira_gerador_")
+    inicio = datetime.now().replace(microsecond=0) - timedelta(days=dias)
+
+    limites = [carteiras * f // processos for f in range(processos + 1)]
+    tarefas = [
+        {
+            "fatia": f,
+            "seed": seed,
+            "intervalo": (limites[f], limites[f + 1]),
+            "eventos": eventos * (limites[f + 1] - limites[f]) // carteiras,
+            "inicio": inicio,
+            "dias": dias,
+            "zipf": zipf,
+            "pesos_moeda": pesos_moeda,
+            "modo": modo,
+            "lote": lote,
+            "diretorio": diretorio,
+        }
+        for f in range(processos)
+    ]
+
+    total = {tabela: 0 for tabela in COLUNAS}
+    with multiprocessing.Pool(processos) as pool:
+        for contagem in pool.imap_unordered(_gerar_fatia, tarefas):
+            for tabela, linhas in contagem.items():
+                total[tabela] += linhas
+    return total
+
+
+def verificar_consistencia() -> int:
+    """
+    Conta saldos que não batem com o razão (deposito_saque).
+    """
+    engine = create_engine(get_database_url(), poolclass=NullPool)
+    with engine.connect() as conn:
+        divergentes = conn.execute(
+            text("""
+                SELECT COUNT(*) AS total
+                  FROM saldo_carteira s
+                  LEFT JOIN (
+                        SELECT endereco_carteira, id_moeda,
+                               SUM(CASE WHEN tipo = 'DEPOSITO' THEN valor ELSE -taxa_valor END) AS razao
+                          FROM deposito_saque
+                         GROUP BY endereco_carteira, id_moeda
+                  ) r USING (endereco_carteira, id_moeda)
+                 WHERE s.saldo <> COALESCE(r.razao, 0)
+            """)
+        ).mappings().first()["total"]
+    engine.dispose()
+    return int(divergentes)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--carteiras", type=int, default=100_000)
+    parser.add_argument("--eventos", type=int, default=1_000_000,
+                        help="operações no histórico (transferência/conversão geram 3 linhas)")
+    parser.add_argument("--processos", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--dias", type=int, default=365, help="período coberto pelo histórico")
+    parser.add_argument("--zipf", type=float, default=1.1, help="expoente da concentração em carteiras quentes")
+    parser.add_argument("--pesos-moeda", default=PESOS_MOEDA_PADRAO, help="id:peso separados por vírgula")
+    parser.add_argument("--modo", choices=("load", "insert"), default="load")
+    parser.add_argument("--lote", type=int, default=5000, help="linhas por INSERT no modo insert")
+    parser.add_argument("--diretorio", help="onde gravar os TSV temporários (modo load)")
+    parser.add_argument("--verificar", action="store_true", help="apenas confere saldos x razão")
+    args = parser.parse_args()
+
+    if args.verificar:
+        print(f"Saldos divergentes do razão: {verificar_consistencia()}")
+        return
+
+    inicio = time.perf_counter()
+    total = gerar(
+        args.carteiras, args.eventos, args.processos, seed=args.seed, dias=args.dias,
+        zipf=args.zipf, pesos_moeda=_parse_pesos(args.pesos_moeda), modo=args.modo,
+        lote=args.lote, diretorio=args.diretorio,
+    )
+    duracao = time.perf_counter() - inicio
+    linhas = sum(total.values())
+    for tabela, quantidade in total.items():
+        print(f"{tabela:>15}: {quantidade}")
+    print(f"{linhas} linhas em {duracao:.1f}s ({linhas / duracao:,.0f} linhas/s)")
+
+
+if __name__ == "__main__":
+    main()
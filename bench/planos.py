@@ -0,0 +1,418 @@
+# bench/planos.py
+"""
+Comparação dos planos de execução das consultas do CarteiraRepository com
+um orçamento gravado (script de diagnóstico, não verificação de regressão:
+veja abaixo).
+
+Chama os métodos do repositório contra o banco do .env (uma base local
+semeada com bench.seed), captura cada statement emitido e roda
+EXPLAIN FORMAT=JSON nele com os mesmos parâmetros. Para cada tabela do
+plano, compara o tipo de acesso e as linhas examinadas por varredura com o
+orçamento gravado em bench/planos_orcamento.json:
+
+- tipo de acesso pior que o do orçamento (ex.: ref -> ALL) é regressão;
+- linhas examinadas acima de max(orçamento * --tolerancia, orçamento +
+  --folga) também;
+- mudança na forma do plano (tabelas acessadas) e statement novo, sem
+  orçamento, falham até serem aprovados com --atualizar.
+
+Código de saída 1 quando há regressão. Sem o arquivo de orçamento nada é
+verificado: a saída é 2 ("não armado"), para não ser confundida com um
+resultado. O orçamento ainda não foi gravado no repositório; até ser
+gravado numa base MySQL semeada (--semear 2000 20000 --atualizar) e
+commitado junto com uma execução limpa, isto é um script, não uma
+verificação de regressão.
+
+O orçamento vale para o volume de dados em que foi gravado (contagem das
+tabelas e semeadura guardadas no arquivo); use a mesma semeadura para
+verificar.
+
+Uso (base local descartável):
+    python -m bench.planos --semear 2000 20000 --atualizar   # grava o orçamento
+    python -m bench.planos                                    # verifica
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event, text
+
+from api.persistence import db
+from api.persistence.repositories import carteira_repository
+from api.persistence.repositories.carteira_repository import CarteiraRepository
+from api.services.agendador import reagendar
+from bench.seed import semear
+
+
+ORCAMENTO_PADRAO = os.path.join(os.path.dirname(__file__), "planos_orcamento.json")
+
+# Do melhor para o pior (documentação do EXPLAIN do MySQL)
+ACESSOS = (
+    "system", "const", "eq_ref", "ref", "fulltext", "ref_or_null", "index_merge",
+    "unique_subquery", "index_subquery", "range", "index", "ALL",
+)
+ORDEM_ACESSO = {acesso: posicao for posicao, acesso in enumerate(ACESSOS)}
+
+TABELAS = (
+    "carteira", "saldo_carteira", "deposito_saque", "transferencia",
+    "conversao", "moeda", "transferencia_agendada",
+)
+
+# Planos sem tabela por falta de linha: a busca é pontual, não há o que medir
+MENSAGENS_SEM_LINHA = ("no matching row in const table", "impossible where")
+
+
+def normalizar(sql: str) -> str:
+    return re.sub(r"\s+", " ", sql).strip()
+
+
+def identificador(sql: str) -> str:
+    return hashlib.sha1(sql.encode()).hexdigest()[:12]
+
+
+def explicavel(sql: str) -> bool:
+    palavra = sql.split(" ", 1)[0].upper()
+    if palavra in ("SELECT", "UPDATE", "DELETE", "WITH"):
+        return True
+    # INSERT ... VALUES não tem plano; INSERT ... SELECT tem
+    return palavra in ("INSERT", "REPLACE") and re.search(r"\bSELECT\b", sql, re.IGNORECASE) is not None
+
+
+class Captura:
+    """
+    Statements do repositório (primeira ocorrência de cada um) com os
+    parâmetros do driver e o método que os emitiu.
+    """
+
+    def __init__(self):
+        self.statements: Dict[str, Dict[str, Any]] = {}
+        self.etapa = ""
+        self.ativa = False
+
+    def registrar(self, sql: str, params: Any) -> None:
+        if not self.ativa:
+            return
+        sql = normalizar(sql)
+        if not explicavel(sql) or sql in self.statements:
+            return
+        if isinstance(params, (list, tuple)) and params and isinstance(params[0], (dict, list, tuple)):
+            # executemany: o plano do primeiro conjunto de parâmetros
+            params = params[0]
+        self.statements[sql] = {"params": params, "origem": self.etapa}
+
+    def _antes_de_executar(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        self.registrar(statement, parameters)
+
+    @contextmanager
+    def instalar(self) -> Iterator["Captura"]:
+        engines = [e for e in (db.engine, db.engine_leitura) if e is not None]
+        for e in engines:
+            event.listen(e, "before_cursor_execute", self._antes_de_executar)
+
+        # iterar_historico usa o cursor do driver, que não passa pelos eventos
+        cursor_servidor = carteira_repository.cursor_servidor
+
+        def cursor_servidor_capturado(sql, params=None, origem=None):
+            self.registrar(sql, dict(params or {}))
+            return cursor_servidor(sql, params, origem)
+
+        carteira_repository.cursor_servidor = cursor_servidor_capturado
+        self.ativa = True
+        try:
+            yield self
+        finally:
+            self.ativa = False
+            carteira_repository.cursor_servidor = cursor_servidor
+            for e in engines:
+                event.remove(e, "before_cursor_execute", self._antes_de_executar)
+
+
+def _tabelas_do_plano(no: Any, tabelas: List[Dict[str, Any]]) -> None:
+    if isinstance(no, dict):
+        tabela = no.get("table")
+        if isinstance(tabela, dict) and "table_name" in tabela:
+            tabelas.append({
+                "tabela": tabela["table_name"],
+                "acesso": tabela.get("access_type"),
+                "indice": tabela.get("key"),
+                "linhas": tabela.get("rows_examined_per_scan"),
+            })
+        for valor in no.values():
+            _tabelas_do_plano(valor, tabelas)
+    elif isinstance(no, list):
+        for item in no:
+            _tabelas_do_plano(item, tabelas)
+
+
+def _mensagem_do_plano(no: Any) -> Optional[str]:
+    if isinstance(no, dict):
+        if isinstance(no.get("message"), str):
+            return no["message"]
+        for valor in no.values():
+            mensagem = _mensagem_do_plano(valor)
+            if mensagem:
+                return mensagem
+    elif isinstance(no, list):
+        for item in no:
+            mensagem = _mensagem_do_plano(item)
+            if mensagem:
+                return mensagem
+    return None
+
+
+def explicar(sql: str, params: Any) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Tabelas do plano (na ordem do EXPLAIN) e a mensagem do otimizador, se houver.
+    """
+    with db.engine.connect() as conn:
+        plano = json.loads(conn.exec_driver_sql("EXPLAIN FORMAT=JSON " + sql, params or {}).scalar())
+        conn.rollback()
+    tabelas: List[Dict[str, Any]] = []
+    _tabelas_do_plano(plano, tabelas)
+    return tabelas, _mensagem_do_plano(plano)
+
+
+def contar_tabelas() -> Dict[str, int]:
+    with db.engine.connect() as conn:
+        contagem = {t: conn.execute(text(f"SELECT COUNT(*) FROM {t}")).scalar() for t in TABELAS}
+        conn.rollback()
+    return contagem
+
+
+def analisar_tabelas() -> None:
+    # Estatísticas recalculadas: as estimativas de linhas ficam estáveis entre execuções
+    with db.engine.connect() as conn:
+        conn.exec_driver_sql("ANALYZE TABLE " + ", ".join(TABELAS)).all()
+        conn.rollback()
+
+
+def _carteira_ativa() -> str:
+    with db.engine.connect() as conn:
+        row = conn.execute(
+            text("""
+                SELECT endereco_origem FROM transferencia
+                GROUP BY endereco_origem ORDER BY COUNT(*) DESC LIMIT 1
+            """)
+        ).first()
+        conn.rollback()
+    if not row:
+        raise SystemExit("Banco sem transferências: rode com --semear ou bench.seed antes")
+    return row[0]
+
+
+def exercitar(repo: CarteiraRepository, captura: Captura) -> None:
+    """
+    Chama cada método do repositório ao menos uma vez (escreve no banco).
+    """
+    ativa = _carteira_ativa()
+
+    def etapa(nome: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        captura.etapa = nome
+        return fn(*args, **kwargs)
+
+    moedas = etapa("listar_moedas", repo.listar_moedas)
+    m1, m2 = moedas[0]["id_moeda"], moedas[1]["id_moeda"]
+    etapa("obter_codigo_moeda", repo.obter_codigo_moeda, m1)
+    etapa("obter_moeda_por_codigo", repo.obter_moeda_por_codigo, moedas[0]["codigo"])
+
+    nova = etapa("criar", repo.criar)
+    outra = etapa("criar", repo.criar)
+    a, b = nova["endereco_carteira"], outra["endereco_carteira"]
+    etapa("buscar_por_endereco", repo.buscar_por_endereco, ativa)
+    etapa("buscar_por_endereco", repo.buscar_por_endereco, a, usar_primario=True)
+    etapa("listar", repo.listar)
+    etapa("listar_resumo", repo.listar_resumo)
+    repo.cache_chaves.invalidar(a)
+    etapa("validar_chave_privada", repo.validar_chave_privada, a, nova["chave_privada"])
+    etapa("atualizar_status", repo.atualizar_status, b, "BLOQUEADA")
+    etapa("atualizar_status", repo.atualizar_status, b, "ATIVA")
+
+    etapa("registrar_deposito", repo.registrar_deposito, a, m1, 1000)
+    etapa("registrar_depositos_em_lote", repo.registrar_depositos_em_lote, [(a, m2, 1000), (b, m1, 10)])
+    etapa("registrar_saque", repo.registrar_saque, a, m1, 1, 0.01)
+    etapa("registrar_conversao", repo.registrar_conversao, a, m1, m2, 1, 0.5, 0.5, 2.0)
+    transferencia = etapa("registrar_transferencia", repo.registrar_transferencia, a, b, m1, 1, 0.01)
+
+    etapa("obter_saldo", repo.obter_saldo, ativa, m1)
+    etapa("obter_saldos", repo.obter_saldos, ativa)
+    etapa("obter_saldos_linhas", repo.obter_saldos_linhas, ativa)
+    etapa("obter_saldos_carteiras", repo.obter_saldos_carteiras, [ativa, a, b])
+    etapa("obter_saldos_carteiras", repo.obter_saldos_carteiras, [ativa, a, b], m1)
+    etapa("obter_saldos_colunas", repo.obter_saldos_colunas, [ativa, a, b])
+
+    agora = datetime.now().replace(microsecond=0)
+    etapa("obter_transferencias_por_carteira", repo.obter_transferencias_por_carteira, ativa)
+    etapa(
+        "obter_transferencias_por_carteira", repo.obter_transferencias_por_carteira,
+        ativa, agora - timedelta(days=30), agora + timedelta(days=1),
+    )
+    # Gerador: as consultas só rodam quando consumido
+    etapa("iterar_historico", lambda endereco: list(repo.iterar_historico(endereco)), ativa)
+    etapa("obter_transferencia_por_id", repo.obter_transferencia_por_id, transferencia["id_transferencia"], True)
+
+    vencimento = agora - timedelta(minutes=1)
+    agendamento = etapa("criar_agendamento", repo.criar_agendamento, {
+        "endereco_origem": a, "endereco_destino": b, "id_moeda": m1, "valor": 1,
+        "periodicidade": "DIARIA", "data_inicio": vencimento, "data_fim": None,
+        "proxima_ocorrencia": vencimento, "proxima_execucao": vencimento, "jitter_s": 0,
+    })
+    id_agendamento = agendamento["id_agendamento"]
+    etapa("contar_agendamentos", repo.contar_agendamentos, a)
+    etapa("listar_agendamentos", repo.listar_agendamentos, a)
+    etapa("obter_agendamento", repo.obter_agendamento, a, id_agendamento, True)
+    etapa("atualizar_agendamento", repo.atualizar_agendamento, a, id_agendamento, {"valor": 2})
+    etapa("resumo_agendamentos_vencidos", repo.resumo_agendamentos_vencidos)
+    etapa("agendamentos_vencidos", repo.agendamentos_vencidos, 500)
+    etapa(
+        "executar_agendamentos", repo.executar_agendamentos, [id_agendamento],
+        lambda id_moeda, valor: 0.01,
+        lambda ag, momento, erro: reagendar(ag, momento, erro, 3, 300),
+    )
+
+    reservas = [repo._gerar_chaves() for _ in range(2)]
+    etapa("pool_carteiras", repo._reservar_carteiras, [(e, h) for e, _, h in reservas])
+    etapa("pool_carteiras", repo._ativar_reservada, reservas[0][0])
+    etapa("pool_carteiras", repo._remover_reservadas_expiradas, 24 * 3600)
+    etapa("pool_carteiras", repo._remover_reservadas, [reservas[1][0]])
+
+
+def medir(semeadura: Optional[Tuple[int, int]], seed: int) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    if semeadura:
+        semear(semeadura[0], semeadura[1], seed=seed)
+    analisar_tabelas()
+
+    # Caminho em SQL puro e sem componentes em segundo plano
+    repo = CarteiraRepository(usar_procedures=False)
+    repo.fechar()
+    repo.agrupador_depositos = None
+    repo.pool_carteiras = None
+
+    captura = Captura()
+    with captura.instalar():
+        exercitar(repo, captura)
+
+    consultas: Dict[str, Any] = {}
+    for sql, capturado in captura.statements.items():
+        tabelas, mensagem = explicar(sql, capturado["params"])
+        if not tabelas and not (mensagem and mensagem.lower().startswith(MENSAGENS_SEM_LINHA)):
+            # SELECT NOW(), SELECT @saldo... e afins
+            continue
+        consultas[identificador(sql)] = {
+            "origem": capturado["origem"],
+            "sql": sql,
+            "tabelas": tabelas,
+            "mensagem": mensagem,
+        }
+    return consultas, contar_tabelas()
+
+
+def _limite_linhas(orcamento: Optional[int], tolerancia: float, folga: int) -> Optional[float]:
+    if orcamento is None:
+        return None
+    return max(orcamento * tolerancia, orcamento + folga)
+
+
+def comparar(
+    atual: Dict[str, Any], orcamento: Dict[str, Any], tolerancia: float, folga: int
+) -> Tuple[List[str], List[str]]:
+    """
+    (regressões, avisos) do plano atual contra o orçamento.
+    """
+    regressoes: List[str] = []
+    avisos: List[str] = []
+    for id_consulta, consulta in atual.items():
+        rotulo = f"{id_consulta} ({consulta['origem']})"
+        esperado = orcamento.get(id_consulta)
+        if esperado is None:
+            regressoes.append(f"{rotulo}: statement sem orçamento\n    {consulta['sql']}")
+            continue
+        if not consulta["tabelas"]:
+            # Nenhuma linha casou com a chave: o otimizador nem acessa a tabela
+            continue
+
+        formato = [t["tabela"] for t in consulta["tabelas"]]
+        if formato != [t["tabela"] for t in esperado["tabelas"]]:
+            regressoes.append(
+                f"{rotulo}: tabelas do plano mudaram "
+                f"{[t['tabela'] for t in esperado['tabelas']]} -> {formato}"
+            )
+            continue
+
+        for tabela, limite in zip(consulta["tabelas"], esperado["tabelas"]):
+            nome = tabela["tabela"]
+            if ORDEM_ACESSO.get(tabela["acesso"], len(ACESSOS)) > ORDEM_ACESSO.get(limite["acesso"], len(ACESSOS)):
+                regressoes.append(
+                    f"{rotulo}: {nome} com acesso {tabela['acesso']} (orçamento {limite['acesso']}, "
+                    f"índice {tabela['indice']} / orçamento {limite['indice']})"
+                )
+            maximo = _limite_linhas(limite["linhas"], tolerancia, folga)
+            if maximo is not None and tabela["linhas"] is not None and tabela["linhas"] > maximo:
+                regressoes.append(
+                    f"{rotulo}: {nome} examina {tabela['linhas']} linhas por varredura "
+                    f"(orçamento {limite['linhas']}, máximo {maximo:.0f})"
+                )
+
+    for id_consulta, esperado in orcamento.items():
+        if id_consulta not in atual:
+            avisos.append(f"{id_consulta} ({esperado['origem']}): não exercitado (statement mudou ou saiu?)")
+    return regressoes, avisos
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orcamento", default=ORCAMENTO_PADRAO, help="arquivo JSON do orçamento")
+    parser.add_argument("--atualizar", action="store_true", help="grava os planos atuais como orçamento")
+    parser.add_argument("--tolerancia", type=float, default=2.0, help="multiplicador das linhas orçadas")
+    parser.add_argument("--folga", type=int, default=10, help="linhas a mais aceitas em qualquer caso")
+    parser.add_argument(
+        "--semear", type=int, nargs=2, metavar=("CARTEIRAS", "HISTORICO"),
+        help="popula o banco com bench.seed antes de medir",
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    consultas, contagem = medir(tuple(args.semear) if args.semear else None, args.seed)
+
+    if args.atualizar:
+        semeadura = {"carteiras": args.semear[0], "historico": args.semear[1], "seed": args.seed} if args.semear else None
+        with open(args.orcamento, "w", encoding="utf-8") as f:
+            json.dump(
+                {"semeadura": semeadura, "tabelas": contagem, "consultas": dict(sorted(consultas.items()))},
+                f, indent=2, ensure_ascii=False, default=str,
+            )
+            f.write("\n")
+        print(f"{len(consultas)} statements gravados em {args.orcamento}")
+        return
+
+    if not os.path.exists(args.orcamento):
+        print(
+            f"NÃO ARMADO: orçamento {args.orcamento} não existe, nenhum plano foi verificado. "
+            "Grave-o numa base nova com --semear 2000 20000 --atualizar e commite o arquivo.",
+            file=sys.stderr,
+        )
+        sys.exit(2)
+    with open(args.orcamento, encoding="utf-8") as f:
+        orcamento = json.load(f)
+
+    for tabela, linhas in orcamento.get("tabelas", {}).items():
+        atual = contagem.get(tabela, 0)
+        if linhas and not (linhas / 2 <= atual <= linhas * 2):
+            print(f"aviso: {tabela} tem {atual} linhas, orçamento gravado com {linhas}")
+
+    regressoes, avisos = comparar(consultas, orcamento["consultas"], args.tolerancia, args.folga)
+    for aviso in avisos:
+        print(f"aviso: {aviso}")
+    for regressao in regressoes:
+        print(f"REGRESSÃO {regressao}")
+    print(f"{len(consultas)} statements verificados, {len(regressoes)} regressões")
+    sys.exit(1 if regressoes else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# bench/seed.py
+"""
+Popula o banco do .env com carteiras, saldos e histórico para benchmarks.
+Os saldos batem com o histórico (depósito inicial - saídas + entradas).
+Com --seed, endereços, chaves e histórico saem todos do mesmo gerador: a
+mesma seed gera as mesmas carteiras (rode num banco sem elas).
+
+Uso:
+    python -m bench.seed --carteiras 1000 --historico 20000
+"""
+import argparse
+import hashlib
+import json
+import random
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from api.persistence.db import get_connection
+
+
+DEPOSITO_INICIAL = 1_000_000.0
+LOTE = 1000
+
+
+def _em_lotes(linhas: List[Dict], tamanho: int = LOTE):
+    for i in range(0, len(linhas), tamanho):
+        yield linhas[i:i + tamanho]
+
+
+def semear(
+    n_carteiras: int,
+    n_historico: int,
+    moedas: Tuple[int, ...] = (1, 2, 3, 4),
+    seed: Optional[int] = None,
+) -> List[Tuple[str, str]]:
+    """
+    Cria n_carteiras com saldo em todas as moedas e n_historico transferências
+    entre elas. Retorna [(endereco, chave_privada)].
+    """
+    rnd = random.Random(seed)
+
+    carteiras = [
+        (f"{rnd.getrandbits(128):032x}", f"{rnd.getrandbits(256):064x}") for _ in range(n_carteiras)
+    ]
+    saldos: Dict[Tuple[str, int], float] = {
+        (endereco, id_moeda): DEPOSITO_INICIAL for endereco, _ in carteiras for id_moeda in moedas
+    }
+
+    movimentos: List[Dict] = [
+        {"endereco": endereco, "id_moeda": id_moeda, "tipo": "DEPOSITO",
+         "valor": DEPOSITO_INICIAL, "taxa_valor": DEPOSITO_INICIAL}
+        for endereco, _ in carteiras for id_moeda in moedas
+    ]
+    transferencias: List[Dict] = []
+
+    for _ in range(n_historico if n_carteiras > 1 else 0):
+        origem, destino = rnd.sample(range(n_carteiras), 2)
+        origem, destino = carteiras[origem][0], carteiras[destino][0]
+        id_moeda = rnd.choice(moedas)
+        valor = round(rnd.uniform(0.01, 10.0), 4)
+        taxa = round(max(valor * 0.01, 0.01), 4)
+
+        saldos[(origem, id_moeda)] -= valor + taxa
+        saldos[(destino, id_moeda)] += valor
+        transferencias.append({"origem": origem, "destino": destino, "id_moeda": id_moeda,
+                               "valor": valor, "taxa_valor": taxa})
+        movimentos.append({"endereco": origem, "id_moeda": id_moeda, "tipo": "SAQUE",
+                           "valor": valor, "taxa_valor": valor + taxa})
+        movimentos.append({"endereco": destino, "id_moeda": id_moeda, "tipo": "DEPOSITO",
+                           "valor": valor, "taxa_valor": valor})
+
+    with get_connection() as conn:
+        for lote in _em_lotes([
+            {"endereco": e, "hash": hashlib.sha256(c.encode()).hexdigest()} for e, c in carteiras
+        ]):
+            conn.execute(
+                text("""
+                    INSERT INTO carteira (endereco_carteira, hash_chave_privada, status)
+                    VALUES (:endereco, :hash, 'ATIVA')
+                """),
+                lote,
+            )
+
+        for lote in _em_lotes([
+            {"endereco": e, "id_moeda": m, "saldo": round(v, 4)} for (e, m), v in saldos.items()
+        ]):
+            conn.execute(
+                text("""
+                    INSERT INTO saldo_carteira (endereco_carteira, id_moeda, saldo)
+                    VALUES (:endereco, :id_moeda, :saldo)
+                """),
+                lote,
+            )
+
+        for lote in _em_lotes(transferencias):
+            conn.execute(
+                text("""
+                    INSERT INTO transferencia (endereco_origem, endereco_destino, id_moeda, valor, taxa_valor)
+                    VALUES (:origem, :destino, :id_moeda, :valor, :taxa_valor)
+                """),
+                lote,
+            )
+
+        for lote in _em_lotes(movimentos):
+            conn.execute(
+                text("""
+                    INSERT INTO deposito_saque (endereco_carteira, id_moeda, tipo, valor, taxa_valor)
+                    VALUES (:endereco, :id_moeda, :tipo, :valor, :taxa_valor)
+                """),
+                lote,
+            )
+
+    return carteiras
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--carteiras", type=int, default=1000)
+    parser.add_argument("--historico", type=int, default=10000, help="transferências no histórico")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--chaves", help="arquivo JSON para gravar [endereco, chave_privada]")
+    args = parser.parse_args()
+
+    carteiras = semear(args.carteiras, args.historico, seed=args.seed)
+    if args.chaves:
+        with open(args.chaves, "w") as f:
+            json.dump(carteiras, f)
+    print(f"{len(carteiras)} carteiras e {args.historico} transferências criadas")
+
+
+if __name__ == "__main__":
+    main()
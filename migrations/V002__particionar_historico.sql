@@ -0,0 +1,126 @@
+-- V002: particionamento mensal (RANGE por data_hora) do histórico
+--
+-- Tabelas particionadas do MySQL não aceitam chaves estrangeiras e exigem
+-- a coluna de particionamento em toda chave única. Por isso:
+--   - as FKs de deposito_saque, conversao e transferencia são removidas
+--     (a aplicação já valida carteira e moeda antes de gravar);
+--   - a PK passa a ser (id, data_hora) e os índices únicos redundantes saem,
+--     assim como os índices que só existiam para as FKs;
+--   - os índices por carteira passam a ser (carteira, data_hora), para que as
+--     consultas de histórico por período leiam só as partições do intervalo.
+--
+-- Novas partições mensais são criadas antes de pfuturo e as antigas movidas
+-- para as tabelas *_arquivo (ROW_FORMAT=COMPRESSED) ou Parquet por:
+--     python -m api.persistence.arquivamento
+--
+-- Obs.: em tabelas grandes cada ALTER reconstrói a tabela; rode em janela.
+
+-- deposito_saque
+ALTER TABLE deposito_saque
+    DROP FOREIGN KEY deposito_saque_endereco_carteira_fk,
+    DROP FOREIGN KEY deposito_saque_id_moeda_fk;
+
+ALTER TABLE deposito_saque
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (id_movimento, data_hora),
+    DROP INDEX deposito_saque_endereco_carteira_fk,
+    DROP INDEX deposito_saque_id_moeda_fk,
+    ADD INDEX deposito_saque_endereco_data_index (endereco_carteira, data_hora);
+
+ALTER TABLE deposito_saque
+    PARTITION BY RANGE COLUMNS (data_hora) (
+        PARTITION pantigo VALUES LESS THAN ('2026-01-01'),
+        PARTITION p202601 VALUES LESS THAN ('2026-02-01'),
+        PARTITION p202602 VALUES LESS THAN ('2026-03-01'),
+        PARTITION p202603 VALUES LESS THAN ('2026-04-01'),
+        PARTITION p202604 VALUES LESS THAN ('2026-05-01'),
+        PARTITION p202605 VALUES LESS THAN ('2026-06-01'),
+        PARTITION p202606 VALUES LESS THAN ('2026-07-01'),
+        PARTITION p202607 VALUES LESS THAN ('2026-08-01'),
+        PARTITION p202608 VALUES LESS THAN ('2026-09-01'),
+        PARTITION p202609 VALUES LESS THAN ('2026-10-01'),
+        PARTITION p202610 VALUES LESS THAN ('2026-11-01'),
+        PARTITION p202611 VALUES LESS THAN ('2026-12-01'),
+        PARTITION p202612 VALUES LESS THAN ('2027-01-01'),
+        PARTITION pfuturo VALUES LESS THAN (MAXVALUE)
+    );
+
+-- conversao
+ALTER TABLE conversao
+    DROP FOREIGN KEY conversao_endereco_fk,
+    DROP FOREIGN KEY conversao_id_moeda_origem_fk,
+    DROP FOREIGN KEY conversao_id_moeda_destino_fk;
+
+ALTER TABLE conversao
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (id_conversao, data_hora),
+    DROP INDEX conversao_id_conversao_uindex,
+    DROP INDEX conversao_id_moeda_origem_fk,
+    DROP INDEX conversao_id_moeda_destino_fk,
+    DROP INDEX conversao_endereco_carteira_index,
+    ADD INDEX conversao_endereco_data_index (endereco_carteira, data_hora);
+
+ALTER TABLE conversao
+    PARTITION BY RANGE COLUMNS (data_hora) (
+        PARTITION pantigo VALUES LESS THAN ('2026-01-01'),
+        PARTITION p202601 VALUES LESS THAN ('2026-02-01'),
+        PARTITION p202602 VALUES LESS THAN ('2026-03-01'),
+        PARTITION p202603 VALUES LESS THAN ('2026-04-01'),
+        PARTITION p202604 VALUES LESS THAN ('2026-05-01'),
+        PARTITION p202605 VALUES LESS THAN ('2026-06-01'),
+        PARTITION p202606 VALUES LESS THAN ('2026-07-01'),
+        PARTITION p202607 VALUES LESS THAN ('2026-08-01'),
+        PARTITION p202608 VALUES LESS THAN ('2026-09-01'),
+        PARTITION p202609 VALUES LESS THAN ('2026-10-01'),
+        PARTITION p202610 VALUES LESS THAN ('2026-11-01'),
+        PARTITION p202611 VALUES LESS THAN ('2026-12-01'),
+        PARTITION p202612 VALUES LESS THAN ('2027-01-01'),
+        PARTITION pfuturo VALUES LESS THAN (MAXVALUE)
+    );
+
+-- transferencia
+ALTER TABLE transferencia
+    DROP FOREIGN KEY transferencia_endereco_origem_fk,
+    DROP FOREIGN KEY transferencia_endereco_destino_fk,
+    DROP FOREIGN KEY transferencia_id_moeda_fk;
+
+ALTER TABLE transferencia
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (id_transferencia, data_hora),
+    DROP INDEX transferencia_id_transferencia_uindex,
+    DROP INDEX transferencia_id_moeda_fk,
+    DROP INDEX transferencia_endereco_origem_index,
+    DROP INDEX transferencia_endereco_destino_index,
+    ADD INDEX transferencia_origem_data_index (endereco_origem, data_hora),
+    ADD INDEX transferencia_destino_data_index (endereco_destino, data_hora);
+
+ALTER TABLE transferencia
+    PARTITION BY RANGE COLUMNS (data_hora) (
+        PARTITION pantigo VALUES LESS THAN ('2026-01-01'),
+        PARTITION p202601 VALUES LESS THAN ('2026-02-01'),
+        PARTITION p202602 VALUES LESS THAN ('2026-03-01'),
+        PARTITION p202603 VALUES LESS THAN ('2026-04-01'),
+        PARTITION p202604 VALUES LESS THAN ('2026-05-01'),
+        PARTITION p202605 VALUES LESS THAN ('2026-06-01'),
+        PARTITION p202606 VALUES LESS THAN ('2026-07-01'),
+        PARTITION p202607 VALUES LESS THAN ('2026-08-01'),
+        PARTITION p202608 VALUES LESS THAN ('2026-09-01'),
+        PARTITION p202609 VALUES LESS THAN ('2026-10-01'),
+        PARTITION p202610 VALUES LESS THAN ('2026-11-01'),
+        PARTITION p202611 VALUES LESS THAN ('2026-12-01'),
+        PARTITION p202612 VALUES LESS THAN ('2027-01-01'),
+        PARTITION pfuturo VALUES LESS THAN (MAXVALUE)
+    );
+
+-- Tabelas de arquivo: mesma estrutura, sem partições, compactadas
+CREATE TABLE IF NOT EXISTS deposito_saque_arquivo LIKE deposito_saque;
+ALTER TABLE deposito_saque_arquivo REMOVE PARTITIONING;
+ALTER TABLE deposito_saque_arquivo ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8;
+
+CREATE TABLE IF NOT EXISTS conversao_arquivo LIKE conversao;
+ALTER TABLE conversao_arquivo REMOVE PARTITIONING;
+ALTER TABLE conversao_arquivo ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8;
+
+CREATE TABLE IF NOT EXISTS transferencia_arquivo LIKE transferencia;
+ALTER TABLE transferencia_arquivo REMOVE PARTITIONING;
+ALTER TABLE transferencia_arquivo ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8;
@@ -0,0 +1,23 @@
+-- V003: outbox transacional de eventos das movimentações
+--
+-- Depósitos, saques, conversões e transferências gravam uma linha em
+-- outbox_evento na mesma transação do lançamento. O relay
+-- (api/persistence/outbox.py) lê a tabela em ordem de id_evento e guarda em
+-- outbox_posicao o último id entregue: consumidores leem um stream só de
+-- inserções, sem varrer as tabelas do histórico.
+
+CREATE TABLE IF NOT EXISTS outbox_evento (
+    id_evento BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+    tipo VARCHAR(20) NOT NULL,
+    id_referencia BIGINT NOT NULL,
+    endereco_carteira VARCHAR(32) NOT NULL,
+    data_hora DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    payload JSON NOT NULL,
+    PRIMARY KEY (id_evento)
+);
+
+CREATE TABLE IF NOT EXISTS outbox_posicao (
+    consumidor VARCHAR(50) NOT NULL PRIMARY KEY,
+    ultimo_id BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    atualizado_em DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP NOT NULL
+);
@@ -0,0 +1,35 @@
+-- V004: transferências agendadas e recorrentes
+--
+-- Cada linha é uma ordem permanente ("enviar 10 USD para Y toda segunda").
+-- proxima_ocorrencia é o horário nominal da próxima execução;
+-- proxima_execucao é quando o agendador deve executá-la (ocorrência +
+-- jitter_s, ou o horário da retentativa após uma falha). O agendador
+-- (api/services/agendador.py) busca as vencidas por
+-- (status, proxima_execucao) com FOR UPDATE SKIP LOCKED.
+
+CREATE TABLE IF NOT EXISTS transferencia_agendada (
+    id_agendamento BIGINT AUTO_INCREMENT PRIMARY KEY,
+    endereco_origem VARCHAR(32) NOT NULL,
+    endereco_destino VARCHAR(32) NOT NULL,
+    id_moeda SMALLINT NOT NULL,
+    valor DECIMAL(18, 4) NOT NULL,
+    periodicidade ENUM ('UNICA', 'DIARIA', 'SEMANAL', 'MENSAL') NOT NULL,
+    data_inicio DATETIME NOT NULL,
+    data_fim DATETIME NULL,
+    proxima_ocorrencia DATETIME NULL,
+    proxima_execucao DATETIME NULL,
+    jitter_s SMALLINT UNSIGNED NOT NULL DEFAULT 0,
+    status ENUM ('ATIVA', 'PAUSADA', 'CONCLUIDA', 'CANCELADA', 'FALHOU') NOT NULL DEFAULT 'ATIVA',
+    execucoes INT UNSIGNED NOT NULL DEFAULT 0,
+    falhas_consecutivas SMALLINT UNSIGNED NOT NULL DEFAULT 0,
+    ultima_execucao DATETIME NULL,
+    id_ultima_transferencia BIGINT NULL,
+    ultimo_erro VARCHAR(255) NULL,
+    data_criacao DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    CONSTRAINT transferencia_agendada_origem_fk FOREIGN KEY (endereco_origem) REFERENCES carteira (endereco_carteira) ON UPDATE CASCADE ON DELETE CASCADE,
+    CONSTRAINT transferencia_agendada_destino_fk FOREIGN KEY (endereco_destino) REFERENCES carteira (endereco_carteira) ON UPDATE CASCADE ON DELETE CASCADE,
+    CONSTRAINT transferencia_agendada_id_moeda_fk FOREIGN KEY (id_moeda) REFERENCES moeda (id_moeda) ON UPDATE CASCADE ON DELETE CASCADE
+);
+
+CREATE INDEX transferencia_agendada_vencimento_index ON transferencia_agendada (status, proxima_execucao);
+CREATE INDEX transferencia_agendada_origem_index ON transferencia_agendada (endereco_origem);
@@ -0,0 +1,13 @@
+-- V005: carteiras reservadas do pool de criação
+--
+-- O pool (api/persistence/pool_carteiras.py) insere carteiras em lote com
+-- status RESERVADA; POST /carteiras ativa uma delas com um UPDATE. Carteiras
+-- reservadas não aparecem nas consultas da API. O índice atende a limpeza
+-- das reservas expiradas (status = 'RESERVADA' AND data_criacao < ...).
+--
+-- Acrescentar um valor no fim do ENUM não reconstrói a tabela.
+
+ALTER TABLE carteira
+    MODIFY status ENUM ('ATIVA', 'BLOQUEADA', 'RESERVADA') NOT NULL;
+
+CREATE INDEX carteira_status_criacao_index ON carteira (status, data_criacao);
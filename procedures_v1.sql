@@ -0,0 +1,193 @@
+-- =========================================================
+--  Stored procedures (versão 1)
+--  Projeto: Carteira Digital
+--  Banco:   MySQL 8+
+--
+--  Executam transferência e conversão inteiramente no servidor,
+--  com um único CALL por operação. A transação continua sendo
+--  controlada pela API (get_connection faz commit/rollback).
+--
+--  Instalação (usuário com CREATE ROUTINE):
+--      python -m api.persistence.procedures
+--  ou
+--      mysql -u root -p wallet_homolog < procedures_v1.sql
+-- =========================================================
+
+DELIMITER $$
+
+DROP PROCEDURE IF EXISTS sp_registrar_transferencia_v1$$
+
+CREATE PROCEDURE sp_registrar_transferencia_v1(
+    IN  p_endereco_origem    VARCHAR(32),
+    IN  p_endereco_destino   VARCHAR(32),
+    IN  p_id_moeda           SMALLINT,
+    IN  p_valor              DECIMAL(18, 4),
+    IN  p_taxa_valor         DECIMAL(18, 4),
+    OUT p_id_transferencia   BIGINT,
+    OUT p_saldo_origem_final DECIMAL(18, 4),
+    OUT p_saldo_destino_final DECIMAL(18, 4),
+    OUT p_data_hora          DATETIME
+)
+BEGIN
+    DECLARE v_status_origem  VARCHAR(10) DEFAULT NULL;
+    DECLARE v_status_destino VARCHAR(10) DEFAULT NULL;
+    DECLARE v_saldo_origem   DECIMAL(18, 4) DEFAULT NULL;
+    DECLARE v_valor_total    DECIMAL(18, 4);
+
+    -- 1. Valida carteiras (ativas)
+    SELECT status INTO v_status_origem
+      FROM carteira
+     WHERE endereco_carteira = p_endereco_origem;
+
+    IF v_status_origem IS NULL OR v_status_origem <> 'ATIVA' THEN
+        SIGNAL SQLSTATE '45000'
+            SET MESSAGE_TEXT = 'Carteira origem não encontrada ou bloqueada';
+    END IF;
+
+    SELECT status INTO v_status_destino
+      FROM carteira
+     WHERE endereco_carteira = p_endereco_destino;
+
+    IF v_status_destino IS NULL OR v_status_destino <> 'ATIVA' THEN
+        SIGNAL SQLSTATE '45000'
+            SET MESSAGE_TEXT = 'Carteira destino não encontrada ou bloqueada';
+    END IF;
+
+    IF p_endereco_origem = p_endereco_destino THEN
+        SIGNAL SQLSTATE '45000'
+            SET MESSAGE_TEXT = 'Não é possível transferir para a mesma carteira';
+    END IF;
+
+    -- 2. Trava e verifica saldo da origem (valor + taxa)
+    SET v_valor_total = p_valor + p_taxa_valor;
+
+    SELECT saldo INTO v_saldo_origem
+      FROM saldo_carteira
+     WHERE endereco_carteira = p_endereco_origem
+       AND id_moeda = p_id_moeda
+       FOR UPDATE;
+
+    IF v_saldo_origem IS NULL OR v_saldo_origem < v_valor_total THEN
+        SIGNAL SQLSTATE '45000'
+            SET MESSAGE_TEXT = 'Saldo insuficiente para realizar a transferência (valor + taxa)';
+    END IF;
+
+    SET p_data_hora = NOW();
+
+    -- 3. Debita origem e credita destino
+    UPDATE saldo_carteira
+       SET saldo = saldo - v_valor_total,
+           data_atualizacao = p_data_hora
+     WHERE endereco_carteira = p_endereco_origem
+       AND id_moeda = p_id_moeda;
+
+    INSERT INTO saldo_carteira (endereco_carteira, id_moeda, saldo, data_atualizacao)
+    VALUES (p_endereco_destino, p_id_moeda, p_valor, p_data_hora)
+    ON DUPLICATE KEY UPDATE
+        saldo = saldo + p_valor,
+        data_atualizacao = p_data_hora;
+
+    -- 4. Registra a transferência e as movimentações
+    INSERT INTO transferencia
+        (endereco_origem, endereco_destino, id_moeda, valor, taxa_valor, data_hora)
+    VALUES (p_endereco_origem, p_endereco_destino, p_id_moeda, p_valor, p_taxa_valor, p_data_hora);
+
+    SET p_id_transferencia = LAST_INSERT_ID();
+
+    INSERT INTO deposito_saque
+        (endereco_carteira, id_moeda, tipo, valor, taxa_valor, data_hora)
+    VALUES
+        (p_endereco_origem, p_id_moeda, 'SAQUE', p_valor, v_valor_total, p_data_hora),
+        (p_endereco_destino, p_id_moeda, 'DEPOSITO', p_valor, p_valor, p_data_hora);
+
+    -- 5. Saldos finais
+    SET p_saldo_origem_final = v_saldo_origem - v_valor_total;
+
+    SELECT saldo INTO p_saldo_destino_final
+      FROM saldo_carteira
+     WHERE endereco_carteira = p_endereco_destino
+       AND id_moeda = p_id_moeda;
+END$$
+
+
+DROP PROCEDURE IF EXISTS sp_registrar_conversao_v1$$
+
+CREATE PROCEDURE sp_registrar_conversao_v1(
+    IN  p_endereco_carteira   VARCHAR(32),
+    IN  p_id_moeda_origem     SMALLINT,
+    IN  p_id_moeda_destino    SMALLINT,
+    IN  p_valor_origem        DECIMAL(18, 4),
+    IN  p_valor_destino       DECIMAL(18, 4),
+    IN  p_taxa_percentual     DECIMAL(5, 2),
+    IN  p_cotacao_utilizada   DECIMAL(18, 4),
+    OUT p_id_conversao        BIGINT,
+    OUT p_saldo_origem_final  DECIMAL(18, 4),
+    OUT p_saldo_destino_final DECIMAL(18, 4),
+    OUT p_data_hora           DATETIME
+)
+BEGIN
+    DECLARE v_status       VARCHAR(10) DEFAULT NULL;
+    DECLARE v_saldo_origem DECIMAL(18, 4) DEFAULT NULL;
+
+    -- 1. Verifica se carteira existe e está ativa
+    SELECT status INTO v_status
+      FROM carteira
+     WHERE endereco_carteira = p_endereco_carteira;
+
+    IF v_status IS NULL OR v_status <> 'ATIVA' THEN
+        SIGNAL SQLSTATE '45000'
+            SET MESSAGE_TEXT = 'Carteira não encontrada ou bloqueada';
+    END IF;
+
+    -- 2. Trava e verifica saldo da moeda origem
+    SELECT saldo INTO v_saldo_origem
+      FROM saldo_carteira
+     WHERE endereco_carteira = p_endereco_carteira
+       AND id_moeda = p_id_moeda_origem
+       FOR UPDATE;
+
+    IF v_saldo_origem IS NULL OR v_saldo_origem < p_valor_origem THEN
+        SIGNAL SQLSTATE '45000'
+            SET MESSAGE_TEXT = 'Saldo insuficiente na moeda origem';
+    END IF;
+
+    SET p_data_hora = NOW();
+
+    -- 3. Debita origem e credita destino
+    UPDATE saldo_carteira
+       SET saldo = saldo - p_valor_origem,
+           data_atualizacao = p_data_hora
+     WHERE endereco_carteira = p_endereco_carteira
+       AND id_moeda = p_id_moeda_origem;
+
+    INSERT INTO saldo_carteira (endereco_carteira, id_moeda, saldo, data_atualizacao)
+    VALUES (p_endereco_carteira, p_id_moeda_destino, p_valor_destino, p_data_hora)
+    ON DUPLICATE KEY UPDATE
+        saldo = saldo + p_valor_destino,
+        data_atualizacao = p_data_hora;
+
+    -- 4. Registra a conversão e as movimentações
+    INSERT INTO conversao
+        (endereco_carteira, id_moeda_origem, id_moeda_destino,
+         valor_origem, valor_destino, taxa_percentual, cotacao_utilizada, data_hora)
+    VALUES (p_endereco_carteira, p_id_moeda_origem, p_id_moeda_destino,
+            p_valor_origem, p_valor_destino, p_taxa_percentual, p_cotacao_utilizada, p_data_hora);
+
+    SET p_id_conversao = LAST_INSERT_ID();
+
+    INSERT INTO deposito_saque
+        (endereco_carteira, id_moeda, tipo, valor, taxa_valor, data_hora)
+    VALUES
+        (p_endereco_carteira, p_id_moeda_origem, 'SAQUE', p_valor_origem, p_valor_origem, p_data_hora),
+        (p_endereco_carteira, p_id_moeda_destino, 'DEPOSITO', p_valor_destino, p_valor_destino, p_data_hora);
+
+    -- 5. Saldos finais
+    SET p_saldo_origem_final = v_saldo_origem - p_valor_origem;
+
+    SELECT saldo INTO p_saldo_destino_final
+      FROM saldo_carteira
+     WHERE endereco_carteira = p_endereco_carteira
+       AND id_moeda = p_id_moeda_destino;
+END$$
+
+DELIMITER ;
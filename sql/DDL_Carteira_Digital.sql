@@ -19,6 +19,11 @@ GRANT SELECT, INSERT, UPDATE, DELETE
     ON wallet_homolog.*
     TO 'wallet_api_homolog'@'%';
 
+-- 3.1) Execução das stored procedures (procedures_v1.sql)
+GRANT EXECUTE
+    ON wallet_homolog.*
+    TO 'wallet_api_homolog'@'%';
+
 FLUSH PRIVILEGES;
 
 -- 4) Usar a base
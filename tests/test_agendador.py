@@ -0,0 +1,109 @@
+# tests/test_agendador.py
+import asyncio
+from datetime import datetime, timedelta
+
+from api.services.agendador import (
+    AgendadorTransferencias, estado_da_ocorrencia, ocorrencia_apos, proxima_ocorrencia, reagendar,
+)
+
+
+def test_mensal_mantem_o_dia_de_inicio_depois_de_mes_curto():
+    inicio = datetime(2026, 1, 31, 9)
+    fevereiro = proxima_ocorrencia("MENSAL", inicio, inicio)
+    assert fevereiro == datetime(2026, 2, 28, 9)
+    assert proxima_ocorrencia("MENSAL", inicio, fevereiro) == datetime(2026, 3, 31, 9)
+
+
+def test_mensal_em_ano_bissexto_e_virada_de_ano():
+    inicio = datetime(2027, 12, 31)
+    assert proxima_ocorrencia("MENSAL", inicio, inicio) == datetime(2028, 1, 31)
+    assert proxima_ocorrencia("MENSAL", inicio, datetime(2028, 1, 31)) == datetime(2028, 2, 29)
+
+
+def test_diaria_semanal_e_unica():
+    base = datetime(2026, 3, 1, 12)
+    assert proxima_ocorrencia("DIARIA", base, base) == base + timedelta(days=1)
+    assert proxima_ocorrencia("SEMANAL", base, base) == base + timedelta(weeks=1)
+    assert proxima_ocorrencia("UNICA", base, base) is None
+
+
+def test_ocorrencias_atrasadas_sao_puladas():
+    inicio = datetime(2026, 1, 1, 9)
+    agora = datetime(2026, 1, 10, 8)
+    assert ocorrencia_apos("DIARIA", inicio, inicio, agora) == datetime(2026, 1, 10, 9)
+    # Exatamente no horário conta como passada
+    assert ocorrencia_apos("DIARIA", inicio, inicio, datetime(2026, 1, 10, 9)) == datetime(2026, 1, 11, 9)
+    assert ocorrencia_apos("UNICA", inicio, inicio, agora) is None
+
+
+def test_estado_aplica_jitter_e_data_fim():
+    agendamento = {"jitter_s": 30, "data_fim": datetime(2026, 1, 31)}
+    estado = estado_da_ocorrencia(agendamento, datetime(2026, 1, 15))
+    assert estado["status"] == "ATIVA"
+    assert estado["proxima_execucao"] == datetime(2026, 1, 15, 0, 0, 30)
+    assert estado_da_ocorrencia(agendamento, datetime(2026, 2, 1))["status"] == "CONCLUIDA"
+    assert estado_da_ocorrencia(agendamento, None)["status"] == "CONCLUIDA"
+
+
+def _agendamento(**campos):
+    agendamento = {
+        "periodicidade": "DIARIA",
+        "data_inicio": datetime(2026, 1, 1, 9),
+        "data_fim": None,
+        "proxima_ocorrencia": datetime(2026, 1, 5, 9),
+        "jitter_s": 0,
+        "falhas_consecutivas": 0,
+    }
+    agendamento.update(campos)
+    return agendamento
+
+
+def test_reagendar_retenta_ate_o_maximo_de_falhas():
+    agora = datetime(2026, 1, 5, 9, 1)
+    estado = reagendar(_agendamento(), agora, "Saldo insuficiente", max_falhas=3, retentativa_s=60)
+    assert estado["proxima_ocorrencia"] == datetime(2026, 1, 5, 9)
+    assert estado["proxima_execucao"] == agora + timedelta(seconds=60)
+    assert estado["falhas_consecutivas"] == 1
+
+    estado = reagendar(_agendamento(falhas_consecutivas=2), agora, "Saldo insuficiente", 3, 60)
+    assert estado["proxima_ocorrencia"] == datetime(2026, 1, 6, 9)
+    assert estado["falhas_consecutivas"] == 0
+
+
+def test_reagendar_unica_que_esgota_falhas_fica_falhou():
+    estado = reagendar(_agendamento(periodicidade="UNICA", falhas_consecutivas=2), datetime(2026, 1, 5, 10), "erro", 3, 60)
+    assert estado["status"] == "FALHOU"
+
+
+def test_reagendar_sucesso_vai_para_a_proxima():
+    estado = reagendar(_agendamento(), datetime(2026, 1, 5, 9, 0, 5), None, 3, 60)
+    assert estado["status"] == "ATIVA"
+    assert estado["proxima_ocorrencia"] == datetime(2026, 1, 6, 9)
+    assert estado["ultimo_erro"] is None
+
+
+class _RepoFalso:
+    def resumo_agendamentos_vencidos(self):
+        return 2, 0.0
+
+    def agendamentos_vencidos(self, limite):
+        return [
+            {"id_agendamento": 1, "endereco_origem": "a", "endereco_destino": "x"},
+            {"id_agendamento": 2, "endereco_origem": "b", "endereco_destino": "y"},
+        ]
+
+
+class _ServiceFalso:
+    carteira_repo = _RepoFalso()
+
+    async def executar_em_fila(self, enderecos, operacao, *args):
+        if enderecos[0] == "a":
+            raise RuntimeError("conexão perdida")
+        return []
+
+
+def test_tick_segue_com_os_outros_grupos_quando_um_falha():
+    agendador = AgendadorTransferencias(
+        _ServiceFalso(), intervalo_s=1, lote=10, paralelismo=2, max_falhas=3, retentativa_s=60
+    )
+    assert asyncio.run(agendador.tick()) == 0
@@ -0,0 +1,34 @@
+# tests/test_pool_carteiras.py
+import itertools
+
+from api.persistence.pool_carteiras import PoolCarteiras
+
+
+def _pool(ativar):
+    contador = itertools.count(1)
+    return PoolCarteiras(
+        lambda: (f"e{next(contador)}", "chave", "hash"),
+        lambda reservas: None, ativar, lambda segundos: 0, lambda enderecos: 0,
+        tamanho=4, minimo=0, lote=4, validade_s=3600,
+    )
+
+
+def test_falha_ao_ativar_cai_para_a_criacao_normal():
+    def ativar(endereco):
+        raise RuntimeError("conexão perdida")
+
+    pool = _pool(ativar)
+    pool._completar()
+    assert pool.retirar() is None
+    assert pool.disponiveis == 3
+    pool.fechar()
+
+
+def test_reservas_vencidas_sao_descartadas_na_retirada():
+    pool = _pool(lambda endereco: {"endereco": endereco})
+    pool._completar()
+    chaves, _ = pool._fila[0]
+    pool._fila[0] = (chaves, -float("inf"))
+    carteira = pool.retirar()
+    assert carteira == {"endereco": "e2", "chave_privada": "chave"}
+    pool.fechar()
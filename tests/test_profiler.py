@@ -0,0 +1,29 @@
+# tests/test_profiler.py
+import asyncio
+import pstats
+import threading
+
+from api import profiler
+
+
+def _trabalho():
+    return sum(range(1000)), threading.get_ident()
+
+
+def test_requisicao_perfilada_inclui_o_threadpool(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiler, "PROFILER_DIR", str(tmp_path))
+
+    async def requisicao():
+        with profiler.perfilar_requisicao() as perfil:
+            _, thread = await profiler.em_threadpool(_trabalho)
+        assert thread != threading.get_ident()
+        return perfil.salvar("/carteiras")
+
+    caminho = asyncio.run(requisicao())
+    funcoes = {nome for _, _, nome in pstats.Stats(caminho).stats}
+    assert "_trabalho" in funcoes
+
+
+def test_sem_trechos_por_thread_quando_o_cprofile_vale_para_o_processo(monkeypatch):
+    monkeypatch.setattr(profiler, "PERFIL_POR_THREAD", False)
+    assert profiler.perfilavel(_trabalho) is _trabalho
@@ -0,0 +1,68 @@
+# tests/test_taxas.py
+import pytest
+
+from api.services.taxas import TabelaTaxas, compilar_regra, mesclar_configuracao
+
+
+def test_regra_simples_aplica_percentual_minima_e_maxima():
+    regra = compilar_regra({"percentual": 0.01, "minima": 0.5, "maxima": 2})
+    assert regra.calcular(10) == 0.5
+    assert regra.calcular(100) == pytest.approx(1.0)
+    assert regra.calcular(1000) == 2
+
+
+def test_faixa_vale_para_o_valor_inteiro():
+    regra = compilar_regra({"faixas": [
+        {"a_partir_de": 0, "percentual": 0.01},
+        {"a_partir_de": 10, "percentual": 0.005},
+    ]})
+    # Não é progressiva: cruzar o limite reduz a taxa do valor todo
+    assert regra.calcular(9.99) == pytest.approx(0.0999)
+    assert regra.calcular(10) == pytest.approx(0.05)
+    assert regra.calcular(20) == pytest.approx(0.1)
+
+
+def test_valor_abaixo_da_primeira_faixa_usa_a_primeira():
+    regra = compilar_regra({"faixas": [
+        {"a_partir_de": 5, "percentual": 0.02},
+        {"a_partir_de": 10, "percentual": 0.01},
+    ]})
+    assert regra.calcular(1) == pytest.approx(0.02)
+
+
+def test_faixa_herda_campos_da_regra_e_da_base():
+    regra = compilar_regra(
+        {"minima": 0.1, "faixas": [{"a_partir_de": 0}, {"a_partir_de": 100, "percentual": 0.001}]},
+        base={"percentual": 0.01},
+    )
+    assert regra.calcular(1) == pytest.approx(0.1)
+    assert regra.calcular(50) == pytest.approx(0.5)
+    assert regra.calcular(200) == pytest.approx(0.2)
+
+
+@pytest.mark.parametrize("config", [
+    {"percentual": -0.01},
+    {"minima": 2, "maxima": 1},
+    {"desconto": 0.1},
+    {"faixas": [{"a_partir_de": 1}, {"a_partir_de": 1}]},
+])
+def test_regra_invalida(config):
+    with pytest.raises(ValueError):
+        compilar_regra(config)
+
+
+def test_regra_por_moeda_sobrepoe_a_padrao():
+    config = mesclar_configuracao(
+        {"SAQUE": {"percentual": 0.01}, "CONVERSAO": {}, "TRANSFERENCIA": {}},
+        {"SAQUE": {"moedas": {"btc": {"minima": 0.0001}}}},
+    )
+    tabela = TabelaTaxas(config, {1: "BRL", 2: "BTC"})
+    assert tabela.regra("SAQUE", 1).calcular(0.001) == pytest.approx(0.00001)
+    # Herda o percentual da regra da operação
+    assert tabela.regra("SAQUE", 2).calcular(0.001) == pytest.approx(0.0001)
+    assert tabela.regra("SAQUE", 2).calcular(1) == pytest.approx(0.01)
+
+
+def test_operacao_desconhecida_no_arquivo():
+    with pytest.raises(ValueError):
+        mesclar_configuracao({"SAQUE": {}}, {"DEPOSITO": {"percentual": 0.01}})